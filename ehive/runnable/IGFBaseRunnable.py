@@ -1,8 +1,9 @@
-import os, eHive, json
+import os, eHive, json, atexit
 from datetime import datetime
 from igf_data.utils.dbutils import read_dbconf_json
 from igf_data.task_tracking.igf_slack import IGF_slack
 from igf_data.task_tracking.igf_asana import IGF_asana
+from igf_data.task_tracking.notification_dispatcher import Notification_dispatcher
 from igf_data.igfdb.baseadaptor import BaseAdaptor
 from igf_data.utils.fileutils import get_datestamp_label,get_temp_dir,copy_local_file
 from numpy import isin
@@ -15,7 +16,13 @@ class IGFBaseRunnable(eHive.BaseRunnable):
   def param_defaults(self):
     return { 'log_slack':True,
              'log_asana':True,
-             'sub_tasks':list()
+             'sub_tasks':list(),
+             'asana_task_cache_ttl':3600,
+             'reference_cache_ttl':600,
+             'reference_cache_dir':None,
+             'notification_async':True,
+             'notification_spool_dir':None,
+             'notification_queue_size':1000
            }
 
 
@@ -59,8 +66,15 @@ class IGFBaseRunnable(eHive.BaseRunnable):
     '''
     try:
       if self.param('log_slack'):
-        igf_slack = self.param_required('igf_slack')
-        igf_slack.post_message_to_channel(message,reaction)
+        if self.param('notification_async'):
+          self._get_notification_dispatcher().\
+            post_slack_message(
+              message=message,
+              reaction=reaction,
+              group_key=self._get_notification_group_key())                     # never blocks the job
+        else:
+          igf_slack = self.param_required('igf_slack')
+          igf_slack.post_message_to_channel(message,reaction)
     except:
       raise
 
@@ -74,12 +88,113 @@ class IGFBaseRunnable(eHive.BaseRunnable):
     '''
     try:
       if self.param('log_slack'):
-        igf_slack = self.param_required('igf_slack')
-        igf_slack.post_file_to_channel(message=message,filepath=filepath)
+        if self.param('notification_async'):
+          self._get_notification_dispatcher().\
+            post_slack_file(
+              filepath=filepath,
+              message=message)
+        else:
+          igf_slack = self.param_required('igf_slack')
+          igf_slack.post_file_to_channel(message=message,filepath=filepath)
     except:
       raise
 
 
+  def _get_igf_asana(self):
+    '''
+    An internal method for fetching an IGF_asana instance. The instance is reused
+    for all jobs of the worker with same asana config and project id
+
+    :param asana_config: An asana config json file
+    :param asana_project_id: An asana project id
+    :param asana_task_cache_ttl: Time in seconds before the cached task list is refreshed, default 3600
+    :returns: An IGF_asana instance
+    '''
+    asana_config = self.param_required('asana_config')
+    asana_project_id = str(self.param_required('asana_project_id'))
+    asana_key = (asana_config,asana_project_id)
+    if getattr(self,'_igf_asana_key',None) != asana_key:
+      self._igf_asana = \
+        IGF_asana(\
+          asana_config=asana_config,
+          asana_project_id=asana_project_id,
+          task_cache_ttl=self.param('asana_task_cache_ttl'))
+      self._igf_asana_key = asana_key
+    return self._igf_asana
+
+
+  def _get_notification_group_key(self):
+    '''
+    An internal method for fetching the seqrun or project id of the job for merging messages
+
+    :returns: A seqrun igf id or project igf id, or None if both are missing
+    '''
+    for param_name in ('seqrun_igf_id','project_igf_id'):
+      if self.param_is_defined(param_name):
+        return str(self.param(param_name))
+    return None
+
+
+  def _get_notification_dispatcher(self,use_asana=False):
+    '''
+    An internal method for fetching the notification dispatcher of the worker.
+    Pending notifications are sent before the worker process exits, with a timeout.
+    Asana params are only required when an Asana notification is queued, so Slack
+    messages never depend on the Asana config
+
+    :param use_asana: Set the asana client of the dispatcher, default False
+    :param notification_spool_dir: A spool dir for notifications, default None for
+                                   sending them from a background thread
+    :param notification_queue_size: Maximum number of queued notifications, default 1000
+    :returns: A Notification_dispatcher instance
+    '''
+    igf_slack = None
+    if self.param('log_slack'):
+      igf_slack = self.param_required('igf_slack')
+    asana_key = None
+    if use_asana:
+      asana_params = {
+        'asana_config':self.param_required('asana_config'),
+        'asana_project_id':str(self.param_required('asana_project_id')),
+        'task_cache_ttl':self.param('asana_task_cache_ttl')}
+      asana_key = json.dumps(asana_params,sort_keys=True)
+    dispatcher_key = (
+      getattr(igf_slack,'slack_config',None),
+      self.param('notification_spool_dir'))
+    current_asana_key = getattr(self,'_notification_asana_key',None)
+    if getattr(self,'_notification_dispatcher_key',None) != dispatcher_key or \
+       (asana_key is not None and \
+        current_asana_key is not None and \
+        current_asana_key != asana_key):                                        # new dispatcher for changed asana params
+      self._close_notification_dispatcher()
+      self._notification_dispatcher = \
+        Notification_dispatcher(
+          igf_slack=igf_slack,
+          spool_dir=self.param('notification_spool_dir'),
+          max_queue_size=self.param('notification_queue_size'))
+      self._notification_dispatcher_key = dispatcher_key
+      self._notification_asana_key = None
+      atexit.register(self._close_notification_dispatcher)
+    if asana_key is not None and \
+       self._notification_asana_key is None:
+      self._notification_dispatcher.\
+        set_igf_asana(lambda: IGF_asana(**asana_params))                        # asana client is created in the background thread
+      self._notification_asana_key = asana_key
+    return self._notification_dispatcher
+
+
+  def _close_notification_dispatcher(self):
+    '''
+    An internal method for sending pending notifications and stopping the dispatcher
+    '''
+    dispatcher = getattr(self,'_notification_dispatcher',None)
+    if dispatcher is not None:
+      dispatcher.close()
+      self._notification_dispatcher = None
+      self._notification_dispatcher_key = None
+      self._notification_asana_key = None
+
+
   def upload_file_to_asana_task(self,task_name,filepath,remote_filename=None,
                                 comment=None):
     '''
@@ -89,21 +204,24 @@ class IGFBaseRunnable(eHive.BaseRunnable):
     :param filepath: A filepath
     :param remote_filename: Name of the uploaded file, default None
     :param comment: An optional text comment
+    :param notification_async: Queue the upload and send it from a background thread, default True
     '''
     try:
       if self.param('log_asana'):
-        asana_config = self.param_required('asana_config')
-        asana_project_id = self.param_required('asana_project_id')
-        igf_asana = \
-          IGF_asana(\
-            asana_config=asana_config,
-            asana_project_id=str(asana_project_id))
-        igf_asana.\
-        attach_file_to_asana_task(\
-          task_name=task_name,
-          filepath=filepath,
-          remote_filename=remote_filename,
-          comment=comment)
+        if self.param('notification_async'):
+          self._get_notification_dispatcher(use_asana=True).\
+            attach_file_to_asana_task(\
+              task_name=task_name,
+              filepath=filepath,
+              remote_filename=remote_filename,
+              comment=comment)
+        else:
+          self._get_igf_asana().\
+            attach_file_to_asana_task(\
+              task_name=task_name,
+              filepath=filepath,
+              remote_filename=remote_filename,
+              comment=comment)
     except:
       pass
 
@@ -114,22 +232,23 @@ class IGFBaseRunnable(eHive.BaseRunnable):
     
     :param task_name: A task name
     :param comment: A text comment
-    :returns: response code asana update
+    :param notification_async: Queue the comment and send it from a background thread, default True
+    :returns: response code asana update, None for queued comments
     '''
     try:
       res=None
       if self.param('log_asana'):
-        asana_config = self.param_required('asana_config')
-        asana_project_id = self.param_required('asana_project_id')
-        igf_asana = \
-          IGF_asana(\
-            asana_config=asana_config,
-            asana_project_id=str(asana_project_id))
-        res = \
-          igf_asana.\
+        if self.param('notification_async'):
+          self._get_notification_dispatcher(use_asana=True).\
             comment_asana_task(\
               task_name=task_name,
               comment=comment)
+        else:
+          res = \
+            self._get_igf_asana().\
+              comment_asana_task(\
+                task_name=task_name,
+                comment=comment)
       return res
     except:
       pass
@@ -147,12 +266,7 @@ class IGFBaseRunnable(eHive.BaseRunnable):
       res=None
       if self.param('log_asana'):
         try:
-          asana_config = self.param_required('asana_config')
-          asana_project_id = self.param_required('asana_project_id')
-          igf_asana = \
-            IGF_asana(\
-              asana_config=asana_config,
-              asana_project_id=str(asana_project_id))
+          igf_asana = self._get_igf_asana()
           res=igf_asana.add_notes_for_task(task_name, notes)
         except:
           pass
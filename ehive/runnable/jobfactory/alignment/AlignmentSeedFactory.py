@@ -1,4 +1,6 @@
 import pandas as pd
+from igf_data.igfdb.pipelineadaptor import PipelineAdaptor
+from igf_data.utils.analysis_fastq_fetch_utils import Experiment_fastq_resolver
 from ehive.runnable.IGFBaseJobFactory import IGFBaseJobFactory
 
 class AlignmentSeedFactory(IGFBaseJobFactory):
@@ -12,6 +14,10 @@ class AlignmentSeedFactory(IGFBaseJobFactory):
                          'running_label':'RUNNING',
                          'experiment_id_label':'experiment_id',
                          'seed_status_label':'status',
+                         'experiment_igf_id_label':'experiment_igf_id',
+                         'run_fastq_list_label':'run_fastq_list',
+                         'fastq_collection_type':'demultiplexed_fastq',
+                         'active_status':'ACTIVE',
                        })
     return params_dict
 
@@ -26,9 +32,14 @@ class AlignmentSeedFactory(IGFBaseJobFactory):
     :param running_label: A text label for the status running in the pipeline_seed table, default RUNNING
     :param seed_status_label: A text label for the pipeline_seed status column name, default status
     :param experiment_id_label: A text label for the experiment_id, default experiment_id
+    :param experiment_igf_id_label: A text label for the experiment_igf_id, default experiment_igf_id
+    :param run_fastq_list_label: A text label for the run level fastq list of each seed, default run_fastq_list
+    :param fastq_collection_type: Fastq collection type name, default demultiplexed_fastq
+    :param active_status: text label for active runs, default ACTIVE
     :returns: A list of dictionary containing the experiment_igf_ids seed for analysis
     '''
     try:
+      dbconnected=False
       igf_session_class = self.param_required('igf_session_class')              # set by base class
       pipeline_name = self.param_required('pipeline_name')
       seed_id_label = self.param_required('seed_id_label')
@@ -36,9 +47,14 @@ class AlignmentSeedFactory(IGFBaseJobFactory):
       running_label = self.param_required('running_label')
       experiment_id_label = self.param_required('experiment_id_label')
       seed_status_label = self.param_required('seed_status_label')
-      
+      experiment_igf_id_label = self.param_required('experiment_igf_id_label')
+      run_fastq_list_label = self.param_required('run_fastq_list_label')
+      fastq_collection_type = self.param_required('fastq_collection_type')
+      active_status = self.param_required('active_status')
+
       pa = PipelineAdaptor(**{'session_class':igf_session_class})               # get db adaptor
       pa.start_session()                                                        # connect to db
+      dbconnected=True
       (pipeseeds_data,table_data) = \
           pa.fetch_pipeline_seed_with_table_data(pipeline_name=pipeline_name,
                                                  table_name='experiment')       # fetch requires entries as list of dictionaries from table for the seeded entries
@@ -47,8 +63,8 @@ class AlignmentSeedFactory(IGFBaseJobFactory):
         raise AttributeError('Expecting a pandas dataframe of pipeseed data and received {0}, {1}').\
                              format(type(pipeseeds_data),type(table_data))
 
-      if len(pipeseeds_data.index) == 0 and \
-         len(table_data.index) == 0:
+      if len(pipeseeds_data.index) > 0 and \
+         len(table_data.index) > 0:
         pipeseeds_data[seed_id_label]=pipeseeds_data[seed_id_label].\
                                 map(lambda x: int(x))                           # convert pipeseed column type
         table_data[experiment_id_label]=table_data[experiment_id_label].\
@@ -64,23 +80,45 @@ class AlignmentSeedFactory(IGFBaseJobFactory):
         dataflow_seed_data=merged_data.\
                            applymap(lambda x: str(x)).\
                            to_dict(orient='records')                            # convert dataframe to string and add as list of dictionaries
+        fastq_resolver = \
+          Experiment_fastq_resolver(\
+            db_session_class=igf_session_class,
+            fastq_collection_type=fastq_collection_type,
+            active_status=active_status)
+        fastq_data = \
+          fastq_resolver.resolve(\
+            [seed[experiment_igf_id_label]
+               for seed in dataflow_seed_data])                                 # fetch fastqs for all seeded experiments in one go
+        for seed in dataflow_seed_data:
+          seed[run_fastq_list_label] = \
+            fastq_data.get(seed[experiment_igf_id_label])                       # add run level fastq list for the seed
+
         self.param('sub_tasks',dataflow_seed_data)                              # set sub_tasks param for the data flow
         pipeseeds_data[seed_status_label]=pipeseeds_data[seed_status_label].\
                                           map({seeded_label:running_label})     # update seed records in pipeseed table, changed status to RUNNING
-        pa.update_pipeline_seed(data=pipeseeds_data.to_dict(orient='records'))  # set pipeline seeds as running
-
+        pa.update_pipeline_seed(data=pipeseeds_data.to_dict(orient='records'),
+                                autosave=False)                                 # set pipeline seeds as running
+        pa.commit_session()                                                     # save changes to db
+        pa.close_session()                                                      # close db connection
+        dbconnected=False
         message='Total {0} new job found for {1}, pipeline: {2}'.\
-                 format(len(seed_data),self.__class__.__name__,pipeline_name)   # format msg for slack
+                 format(len(dataflow_seed_data),self.__class__.__name__,
+                        pipeline_name)                                          # format msg for slack
         self.post_message_to_slack(message,reaction='pass')                     # send update to slack
       else:
+        pa.close_session()
+        dbconnected=False
         message='{0}, {1}: no new job created'.format(self.__class__.__name__,\
                                                       pipeline_name)            # format msg for failed jobs
         self.warning(message)
         self.post_message_to_slack(message,reaction='sleep')                    # post about failed job to slack
 
-    except:
+    except Exception as e:
       message='Error in {0},{1}: {2}'.format(self.__class__.__name__,\
                                              pipeline_name, e)                  # format slack msg
       self.warning(message)
       self.post_message_to_slack(message,reaction='fail')                       # send msg to slack
+      if dbconnected:
+        pa.rollback_session()                                                   # remove changes from db
+        pa.close_session()
       raise
\ No newline at end of file
@@ -1,4 +1,4 @@
-from igf_data.igfdb.experimentadaptor import ExperimentAdaptor
+from igf_data.utils.analysis_fastq_fetch_utils import Experiment_fastq_resolver
 from ehive.runnable.IGFBaseJobFactory import IGFBaseJobFactory
 
 class RunFactory(IGFBaseJobFactory):
@@ -7,21 +7,47 @@ class RunFactory(IGFBaseJobFactory):
   '''
   def param_defaults(self):
     params_dict=super(RunFactory,self).param_defaults()
+    params_dict.update({
+        'run_fastq_list':None,
+        'fastq_collection_type':'demultiplexed_fastq',
+        'active_status':'ACTIVE',
+      })
     return params_dict
 
   def run(self):
+    '''
+    Run method for the run job factory class
+
+    :param project_igf_id: A project igf id
+    :param experiment_igf_id: An experiment igf id
+    :param sample_igf_id: A sample igf id
+    :param igf_session_class: A database session class
+    :param run_fastq_list: A dictionary of active run igf ids and lists of fastq files,
+                           set by the seed factory, default None for fetching it from db
+    :param fastq_collection_type: Fastq collection type name, default demultiplexed_fastq
+    :param active_status: text label for active runs, default ACTIVE
+    :returns: A list of dictionary containing the run_igf_ids and fastq_lists
+    '''
     try:
       project_igf_id=self.param_required('project_igf_id')
       experiment_igf_id=self.param_required('experiment_igf_id')
       sample_igf_id=self.param_required('sample_igf_id')
-      igf_session_class=self.param_required('igf_session_class')
-      ea=ExperimentAdaptor(**{'session_class':igf_session_class})
-      ea.start_session()
-      runs=ea.fetch_runs_for_igf_id(experiment_igf_id=experiment_igf_id,
-                                    include_active_runs=True,
-                                    output_mode='dataframe')                    # fetch active runs for an experiment
-      ea.close_session()
-      runs=runs.to_dict(orient='records')                                       # convert run ids to a list
+      run_fastq_list=self.param('run_fastq_list')
+      if run_fastq_list is None:
+        igf_session_class=self.param_required('igf_session_class')
+        fastq_collection_type=self.param_required('fastq_collection_type')
+        active_status=self.param_required('active_status')
+        fastq_resolver=\
+          Experiment_fastq_resolver(\
+            db_session_class=igf_session_class,
+            fastq_collection_type=fastq_collection_type,
+            active_status=active_status)
+        run_fastq_list=\
+          fastq_resolver.get_run_fastq_list(experiment_igf_id)                  # fetch active runs and fastqs in one query
+
+      runs=[{'run_igf_id':run_igf_id,
+             'fastq_list':run_fastq_list.get(run_igf_id)}
+              for run_igf_id in sorted(run_fastq_list.keys())]                  # convert run ids to a list
       self.param('sub_tasks',runs)                                              # pass on run factory output list
     except Exception as e:
       message='project: {2}, sample:{3}, Error in {0}: {1}'.format(self.__class__.__name__, \
@@ -30,4 +56,4 @@ class RunFactory(IGFBaseJobFactory):
                                                       sample_igf_id)
       self.warning(message)
       self.post_message_to_slack(message,reaction='fail')                       # post msg to slack for failed jobs
-      raise
\ No newline at end of file
+      raise
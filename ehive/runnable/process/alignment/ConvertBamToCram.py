@@ -85,7 +85,9 @@ class ConvertBamToCram(IGFBaseProcess):
         Reference_genome_utils(\
           genome_tag=species_name,
           dbsession_class=igf_session_class,
-          genome_fasta_type=reference_type)
+          genome_fasta_type=reference_type,
+          cache_ttl=self.param('reference_cache_ttl'),
+          cache_dir=self.param('reference_cache_dir'))
       genome_fasta = ref_genome.get_genome_fasta()                              # get genome fasta
       temp_work_dir = get_temp_dir(use_ephemeral_space=use_ephemeral_space)     # get temp dir
       cram_file = os.path.basename(bam_file).replace('.bam','.cram')            # get base cram file name
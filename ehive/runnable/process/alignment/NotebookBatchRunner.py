@@ -0,0 +1,140 @@
+import os
+from ehive.runnable.IGFBaseProcess import IGFBaseProcess
+from igf_data.utils.jupyter_nbconvert_wrapper import nbconvert_batch_in_singularity
+from igf_data.utils.singularity_image_cache import Singularity_image_cache
+
+class NotebookBatchRunner(IGFBaseProcess):
+  '''
+  A runnable class for running a batch of jupyter notebook based analysis concurrently
+  '''
+  def param_defaults(self):
+    params_dict=super(NotebookBatchRunner,self).param_defaults()
+    params_dict.update({
+      'sample_igf_id':None,
+      'experiment_igf_id':None,
+      'date_tag':'date_tag',
+      'use_ephemeral_space':0,
+      'kernel':'python3',
+      'timeout':600,
+      'output_format':'html',
+      'allow_errors':0,
+      'container_dir_prefix':'/tmp',
+      'use_singularity_image_cache':0,
+      'singularity_image_cache_dir':None,
+      'use_bind_mount':1,
+      'max_workers':4,
+    })
+    return params_dict
+
+  def run(self):
+    '''
+    A method for running a batch of notebook based analysis in ehive
+
+    :param project_igf_id: A project tag
+    :param sample_igf_id: A sample tag, default None
+    :param experiment_igf_id: An experiment tag, default None
+    :param singularity_image_path: Singularity image path
+    :param notebook_list: A list of dictionaries with template_ipynb_path, input_param_map and
+                          optional output_file_map, output_dir and notebook_tag keys for each notebook
+    :param base_work_dir: Base work dir path
+    :param max_workers: Number of notebooks running in parallel, default 4
+    :param use_ephemeral_space: A toggle for temp dir settings
+    :param date_tag: A text tag for date_tag, default 'date_tag'
+    :param kernel: Notebook kernel name, default is 'python3'
+    :param timeout: Timeout setting for notebook run, default 600
+    :param output_format: Notebook output format, default 'html'
+    :param allow_errors: Allow notebook run with errors, default 0
+    :param container_dir_prefix: target dir in container, default /tmp
+    :param use_singularity_image_cache: Run containers from the node local image cache, default 0
+                                        Cache hit and miss counts are added to the dataflow as
+                                        singularity_image_cache_metrics
+    :param singularity_image_cache_dir: Image cache dir path, default None
+    :param use_bind_mount: Bind input files to containers instead of staging them in temp dir, default 1
+    '''
+    try:
+      project_igf_id = self.param_required('project_igf_id')
+      sample_igf_id = self.param('sample_igf_id')
+      experiment_igf_id = self.param('experiment_igf_id')
+      singularity_image_path = self.param_required('singularity_image_path')
+      notebook_list = self.param_required('notebook_list')
+      base_work_dir = self.param_required('base_work_dir')
+      max_workers = self.param('max_workers')
+      use_ephemeral_space = self.param('use_ephemeral_space')
+      date_tag = self.param('date_tag')
+      kernel = self.param('kernel')
+      timeout = self.param('timeout')
+      output_format = self.param('output_format')
+      allow_errors = self.param('allow_errors')
+      container_dir_prefix = self.param('container_dir_prefix')
+      use_singularity_image_cache = self.param('use_singularity_image_cache')
+      singularity_image_cache_dir = self.param('singularity_image_cache_dir')
+      use_bind_mount = self.param('use_bind_mount')
+      if not isinstance(notebook_list,list):
+        raise ValueError(
+                "Expecting a list as notebook_list, got {0}".\
+                  format(type(notebook_list)))                                  # checking notebook list
+      work_dir_prefix_list = [
+        base_work_dir,
+        project_igf_id]
+      if sample_igf_id is not None:
+        work_dir_prefix_list.\
+          append(sample_igf_id)
+      if experiment_igf_id is not None:
+        work_dir_prefix_list.\
+          append(experiment_igf_id)
+      work_dir_prefix = \
+        os.path.join(*work_dir_prefix_list)
+      work_dir = \
+        self.get_job_work_dir(
+          work_dir=work_dir_prefix)                                             # get a run work dir
+      image_cache = None
+      if use_singularity_image_cache:
+        image_cache = \
+          Singularity_image_cache(
+            cache_dir=singularity_image_cache_dir,
+            use_ephemeral_space=bool(use_ephemeral_space))
+      results = \
+        nbconvert_batch_in_singularity(
+          singularity_image_path=singularity_image_path,
+          notebook_list=notebook_list,
+          output_dir=work_dir,
+          max_workers=max_workers,
+          container_dir_prefix=container_dir_prefix,
+          date_tag=date_tag,
+          use_ephemeral_space=use_ephemeral_space,
+          output_format=output_format,
+          timeout=timeout,
+          kernel=kernel,
+          allow_errors=bool(allow_errors),
+          use_bind_mount=bool(use_bind_mount),
+          image_cache=image_cache)                                              # run notebooks in parallel
+      failed_list = \
+        ['notebook {0}: {1}'.format(index,result.get('error'))
+           for index,result in enumerate(results)
+             if result.get('status')!='success']
+      if len(failed_list) > 0:
+        raise ValueError(
+                "Failed to run {0} of {1} notebooks, errors: {2}".\
+                  format(len(failed_list),len(results),failed_list))
+      notebook_outputs = \
+        [result.get('output_params') for result in results]
+      notebook_runtimes = \
+        [round(result.get('runtime'),2) for result in results]                  # runtime in seconds for each notebook
+      dataflow_params = {
+        'notebook_outputs':notebook_outputs,
+        'notebook_runtimes':notebook_runtimes}
+      if image_cache is not None:                                               # report cache hits and misses
+        dataflow_params.\
+          update({'singularity_image_cache_metrics':image_cache.get_metrics()})
+      self.param('dataflow_params',dataflow_params)                             # update dataflow
+    except Exception as e:
+      message = \
+        'project: {2}, sample:{3}, Error in {0}: {1}'.\
+          format(
+            self.__class__.__name__,
+            e,
+            project_igf_id,
+            sample_igf_id)
+      self.warning(message)
+      self.post_message_to_slack(message,reaction='fail')                       # post msg to slack for failed jobs
+      raise
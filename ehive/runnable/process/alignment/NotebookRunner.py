@@ -2,6 +2,7 @@ import os
 from ehive.runnable.IGFBaseProcess import IGFBaseProcess
 from igf_data.utils.fileutils import get_temp_dir,remove_dir,check_file_path
 from igf_data.utils.jupyter_nbconvert_wrapper import Notebook_runner
+from igf_data.utils.singularity_image_cache import Singularity_image_cache
 
 class NotebookRunner(IGFBaseProcess):
   '''
@@ -22,6 +23,9 @@ class NotebookRunner(IGFBaseProcess):
       'allow_errors':0,
       'container_dir_prefix':'/tmp',
       'notebook_tag':'notebook',
+      'use_singularity_image_cache':0,
+      'singularity_image_cache_dir':None,
+      'use_bind_mount':1,
     })
     return params_dict
 
@@ -46,6 +50,11 @@ class NotebookRunner(IGFBaseProcess):
     :param allow_errors: Allow notebook run with errors, default 0
     :param container_dir_prefix: target dir in container, default /tmp
     :param notebook_tag: Notebook output tag for dataflow param, default notebook
+    :param use_singularity_image_cache: Run container from the node local image cache, default 0
+                                        Cache hit and miss counts are added to the dataflow as
+                                        singularity_image_cache_metrics
+    :param singularity_image_cache_dir: Image cache dir path, default None
+    :param use_bind_mount: Bind input files to container instead of staging them in temp dir, default 1
     '''
     try:
       project_igf_id = self.param_required('project_igf_id')
@@ -64,6 +73,9 @@ class NotebookRunner(IGFBaseProcess):
       allow_errors = self.param('allow_errors')
       notebook_tag = self.param('notebook_tag')
       container_dir_prefix = self.param('container_dir_prefix')
+      use_singularity_image_cache = self.param('use_singularity_image_cache')
+      singularity_image_cache_dir = self.param('singularity_image_cache_dir')
+      use_bind_mount = self.param('use_bind_mount')
       if input_param_map is not None and \
          not isinstance(input_param_map,dict):
         raise ValueError(
@@ -105,10 +117,21 @@ class NotebookRunner(IGFBaseProcess):
             timeout=timeout,
             kernel=kernel,
             allow_errors=allow_errors,
-            notebook_tag=notebook_tag)
+            notebook_tag=notebook_tag,
+            use_bind_mount=bool(use_bind_mount))
+        image_cache = None
+        if use_singularity_image_cache:
+          image_cache = \
+            Singularity_image_cache(
+              cache_dir=singularity_image_cache_dir,
+              use_ephemeral_space=bool(use_ephemeral_space))
         res, run_cmd, data_flow_param_dict = \
           nr.nbconvert_singularity(
-            singularity_image_path=singularity_image_path)
+            singularity_image_path=singularity_image_path,
+            image_cache=image_cache)
+        if image_cache is not None:                                             # report cache hits and misses
+          data_flow_param_dict.\
+            update({'singularity_image_cache_metrics':image_cache.get_metrics()})
       except Exception as e:
         raise ValueError(
                 "Failed to run notebook, response: {0}, command: {1}, error: {2}".\
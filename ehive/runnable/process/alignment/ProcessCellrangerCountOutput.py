@@ -1,7 +1,6 @@
 import os
 from fnmatch import fnmatch
 from igf_data.utils.fileutils import get_temp_dir,remove_dir,move_file
-from igf_data.utils.fileutils import create_file_manifest_for_dir
 from igf_data.utils.fileutils import prepare_file_archive
 from ehive.runnable.IGFBaseProcess import IGFBaseProcess
 from igf_data.utils.tools.reference_genome_utils import Reference_genome_utils
@@ -21,6 +20,7 @@ class ProcessCellrangerCountOutput(IGFBaseProcess):
         'collection_type':'CELLRANGER_RESULTS',
         'collection_table':'experiment',
         'use_ephemeral_space':0,
+        'archive_threads':1,
       })
     return params_dict
 
@@ -38,6 +38,7 @@ class ProcessCellrangerCountOutput(IGFBaseProcess):
     :param species_name: Reference genome collection name
     :param reference_type: Reference genome collection type, default TRANSCRIPTOME_TENX
     :param use_ephemeral_space: A toggle for temp dir settings, default 0
+    :param archive_threads: Number of threads for archive compression, default 1
     :returns: Adding cellranger_output to the dataflow_params
     '''
     try:
@@ -53,18 +54,13 @@ class ProcessCellrangerCountOutput(IGFBaseProcess):
       collection_type = self.param('collection_type')
       collection_table = self.param('collection_table')
       use_ephemeral_space = self.param('use_ephemeral_space')
+      archive_threads = self.param('archive_threads')
 
-      # prepare manifest file for the results dir
+      # create archive and manifest file for the results dir
       manifest_file = \
         os.path.join(
           cellranger_output,
           manifest_filename)                                                    # get name of the manifest file
-      create_file_manifest_for_dir(
-        results_dirpath=cellranger_output,
-        output_file=manifest_file,
-        md5_label='md5',
-        exclude_list=['*.bam','*.bai','*.cram'])                                # create manifest for output dir
-      # create archive for the results dir
       temp_archive_name = \
         os.path.join(
           get_temp_dir(use_ephemeral_space=use_ephemeral_space),
@@ -72,7 +68,10 @@ class ProcessCellrangerCountOutput(IGFBaseProcess):
       prepare_file_archive(
         results_dirpath=cellranger_output,
         output_file=temp_archive_name,
-        exclude_list=['*.bam','*.bai','*.cram'])                                # archive cellranget output
+        exclude_list=['*.bam','*.bai','*.cram'],
+        threads=archive_threads,
+        manifest_file=manifest_file,
+        md5_label='md5')                                                        # archive cellranget output with manifest
       # load archive file to db collection and results dir
       au = \
         Analysis_collection_utils(
@@ -59,7 +59,9 @@ class RunBWA(IGFBaseProcess):
         Reference_genome_utils(
           genome_tag=species_name,
           dbsession_class=igf_session_class,
-          bwa_ref_type=reference_type)                                          # setup ref genome utils
+          bwa_ref_type=reference_type,
+          cache_ttl=self.param('reference_cache_ttl'),
+          cache_dir=self.param('reference_cache_dir'))                          # setup ref genome utils
       bwa_ref = ref_genome.get_genome_bwa()                                     # get bwa ref
       bwa_obj = \
         BWA_util(
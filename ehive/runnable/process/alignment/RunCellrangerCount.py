@@ -94,13 +94,17 @@ class RunCellrangerCount(IGFBaseProcess):
           Reference_genome_utils(\
             genome_tag=species_name,
             dbsession_class=igf_session_class,
-            tenx_ref_type=nuclei_reference_type)                                # fetch ref genome for pre-mRNA samples
+            tenx_ref_type=nuclei_reference_type,
+            cache_ttl=self.param('reference_cache_ttl'),
+            cache_dir=self.param('reference_cache_dir'))                        # fetch ref genome for pre-mRNA samples
       else:
         ref_genome = \
           Reference_genome_utils(\
             genome_tag=species_name,
             dbsession_class=igf_session_class,
-            tenx_ref_type=reference_type)
+            tenx_ref_type=reference_type,
+            cache_ttl=self.param('reference_cache_ttl'),
+            cache_dir=self.param('reference_cache_dir'))
 
       # collect fastq input for run
       cellranger_ref_transcriptome = ref_genome.get_transcriptome_tenx()        # fetch tenx ref transcriptome from db
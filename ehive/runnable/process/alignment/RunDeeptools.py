@@ -82,7 +82,9 @@ class RunDeeptools(IGFBaseProcess):
         Reference_genome_utils(\
           genome_tag=species_name,
           dbsession_class=igf_session_class,
-          blacklist_interval_type=blacklist_reference_type)                     # setup ref genome utils
+          blacklist_interval_type=blacklist_reference_type,
+          cache_ttl=self.param('reference_cache_ttl'),
+          cache_dir=self.param('reference_cache_dir'))                          # setup ref genome utils
       blacklist_bed = ref_genome.get_blacklist_region_bed()                     # get genome fasta
       if deeptools_command == 'plotCoverage':
         output_raw_counts = \
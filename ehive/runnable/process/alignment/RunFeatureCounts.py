@@ -56,7 +56,9 @@ class RunFeatureCounts(IGFBaseProcess):
         Reference_genome_utils(
           genome_tag=species_name,
           dbsession_class=igf_session_class,
-          gene_gtf_type=reference_gtf)                                          # setup ref genome utils
+          gene_gtf_type=reference_gtf,
+          cache_ttl=self.param('reference_cache_ttl'),
+          cache_dir=self.param('reference_cache_dir'))                          # setup ref genome utils
       gene_gtf = ref_genome.get_gene_gtf()                                      # get gtf file
       summary_file,featureCount_cmd = \
         run_featureCounts(
@@ -65,7 +65,9 @@ class RunGATK(IGFBaseProcess):
           dbsession_class=igf_session_class,
           genome_fasta_type=reference_fasta_type,
           genome_dbsnp_type=reference_dbsnp_type,
-          gatk_indel_ref_type=reference_indel_type)                             # setup ref genome utils
+          gatk_indel_ref_type=reference_indel_type,
+          cache_ttl=self.param('reference_cache_ttl'),
+          cache_dir=self.param('reference_cache_dir'))                          # setup ref genome utils
       genome_fasta = ref_genome.get_genome_fasta()                              # get genome fasta
       dbsnp_vcf = ref_genome.get_dbsnp_vcf()                                    # get dbsnp vcf
       indel_vcf = ref_genome.get_gatk_indel_ref()                               # get indel vcf
@@ -94,7 +94,9 @@ class RunPicard(IGFBaseProcess):
           dbsession_class=igf_session_class,
           genome_fasta_type=reference_type,
           gene_reflat_type=reference_refFlat,
-          ribosomal_interval_type=ribosomal_interval_type)                      # setup ref genome utils
+          ribosomal_interval_type=ribosomal_interval_type,
+          cache_ttl=self.param('reference_cache_ttl'),
+          cache_dir=self.param('reference_cache_dir'))                          # setup ref genome utils
       genome_fasta = ref_genome.get_genome_fasta()                              # get genome fasta
       ref_flat_file = ref_genome.get_gene_reflat()                              # get refFlat file
       ribosomal_interval_file = ref_genome.get_ribosomal_interval()             # get ribosomal interval file
@@ -60,7 +60,9 @@ class RunRSEM(IGFBaseProcess):
         Reference_genome_utils(
           genome_tag=species_name,
           dbsession_class=igf_session_class,
-          gene_rsem_type=reference_type)
+          gene_rsem_type=reference_type,
+          cache_ttl=self.param('reference_cache_ttl'),
+          cache_dir=self.param('reference_cache_dir'))
       rsem_ref = ref_genome.get_transcriptome_rsem()                            # fetch rsem refrence
       if library_layout =='PAIRED':
         paired_end=True
@@ -6,6 +6,7 @@ from igf_data.utils.tools.reference_genome_utils import Reference_genome_utils
 from igf_data.utils.fileutils import move_file,get_temp_dir,remove_dir,get_datestamp_label
 from igf_data.utils.tools.samtools_utils import run_bam_flagstat,run_bam_idxstat,merge_multiple_bam,run_bam_stats
 from igf_data.utils.tools.samtools_utils import filter_bam_file,convert_bam_to_cram,run_samtools_view,index_bam_or_cram
+from igf_data.utils.tools.samtools_utils import run_bam_qc_metrics,format_samtools_qc_metrics
 
 class RunSamtools(IGFBaseProcess):
   '''
@@ -33,6 +34,8 @@ class RunSamtools(IGFBaseProcess):
         'encodePeExcludeFlag':1804,
         'encodeSeExcludeFlag':1796,
         'use_ephemeral_space':0,
+        'qc_commands':['stats','flagstat','idxstats'],
+        'qc_max_workers':3,
       })
     return params_dict
 
@@ -56,6 +59,8 @@ class RunSamtools(IGFBaseProcess):
     :param encodeSeExcludeFlag: For samtools filter, Encode exclude flag for PE reads, default 1796
     :param use_ephemeral_space: A toggle for temp dir settings, default 0
     :param copy_input: A toggle for copying input file to temp, 1 for True default 0 for False
+    :param qc_commands: List of samtools commands for the combined qc mode, default stats, flagstat and idxstats
+    :param qc_max_workers: Number of samtools commands to run in parallel for qc mode, default 3
     '''
     try:
       temp_output_dir = False
@@ -123,6 +128,7 @@ class RunSamtools(IGFBaseProcess):
         self.get_job_work_dir(work_dir=work_dir_prefix)                         # get a run work dir
       samtools_cmdline = ''
       temp_output = None
+      temp_output_list = list()
       if samtools_command == 'idxstats':
         temp_output,samtools_cmdline = \
           run_bam_idxstat(
@@ -151,24 +157,37 @@ class RunSamtools(IGFBaseProcess):
             force=True)                                                         # run samtools stats
         if load_metrics_to_cram and \
            len(stats_metrics) > 0:
-          ca = CollectionAdaptor(**{'session_class':igf_session_class})
-          attribute_data = \
-          ca.prepare_data_for_collection_attribute(\
+          self._load_metrics_to_cram_collection(
+            metrics_list=stats_metrics,
             collection_name=experiment_igf_id,
             collection_type=cram_collection_type,
-            data_list=stats_metrics)
-          ca.start_session()
-          try:
-            ca.create_or_update_collection_attributes(\
-              data=attribute_data,
-              autosave=False)
-            ca.commit_session()
-            ca.close_session()
-          except Exception as e:
-            ca.rollback_session()
-            ca.close_session()
-            raise ValueError('Failed to load data to db: {0}'.\
-                           format(e))
+            igf_session_class=igf_session_class)                                # load stats metrics to db
+
+      elif samtools_command == 'qc':
+        qc_results = \
+          run_bam_qc_metrics(
+            samtools_exe=samtools_exe,
+            bam_file=input_file,
+            output_dir=temp_output_dir,
+            output_prefix=output_prefix,
+            threads=threads,
+            force=True,
+            qc_commands=self.param('qc_commands'),
+            max_workers=self.param('qc_max_workers'))                           # run stats, flagstat and idxstats on the same bam
+        for qc_command,qc_result in qc_results.items():
+          temp_output_list.append(qc_result.get('output_path'))
+        samtools_cmdline = \
+          '; '.join([
+            ' '.join(qc_result.get('cmd'))
+              for qc_result in qc_results.values()])
+        qc_metrics = format_samtools_qc_metrics(qc_results)
+        if load_metrics_to_cram and \
+           len(qc_metrics) > 0:
+          self._load_metrics_to_cram_collection(
+            metrics_list=qc_metrics,
+            collection_name=experiment_igf_id,
+            collection_type=cram_collection_type,
+            igf_session_class=igf_session_class)                                # load all qc metrics in one transaction
 
       elif samtools_command == 'merge':
         if output_prefix is None:
@@ -199,7 +218,9 @@ class RunSamtools(IGFBaseProcess):
           Reference_genome_utils(\
             genome_tag=species_name,
             dbsession_class=igf_session_class,
-            genome_fasta_type=reference_type)
+            genome_fasta_type=reference_type,
+            cache_ttl=self.param('reference_cache_ttl'),
+            cache_dir=self.param('reference_cache_dir'))
         genome_fasta = ref_genome.get_genome_fasta()                            # get genome fasta
         cram_file = \
           os.path.basename(input_file).\
@@ -279,6 +300,9 @@ class RunSamtools(IGFBaseProcess):
                          format(samtools_command))
 
       if temp_output is not None:
+        temp_output_list.append(temp_output)
+
+      for temp_output in temp_output_list:
         dest_path = \
           os.path.join(\
             work_dir,
@@ -318,4 +342,35 @@ class RunSamtools(IGFBaseProcess):
             sample_igf_id)
       self.warning(message)
       self.post_message_to_slack(message,reaction='fail')                       # post msg to slack for failed jobs
-      raise
\ No newline at end of file
+      raise
+
+
+  @staticmethod
+  def _load_metrics_to_cram_collection(metrics_list,collection_name,collection_type,igf_session_class):
+    '''
+    An internal static method for loading samtools metrics to CRAM collection attribute table
+    in a single transaction
+
+    :param metrics_list: A list of dictionaries containing metrics name and value
+    :param collection_name: Collection name
+    :param collection_type: Collection type
+    :param igf_session_class: A database session class
+    '''
+    ca = CollectionAdaptor(**{'session_class':igf_session_class})
+    attribute_data = \
+      ca.prepare_data_for_collection_attribute(\
+        collection_name=collection_name,
+        collection_type=collection_type,
+        data_list=metrics_list)
+    ca.start_session()
+    try:
+      ca.create_or_update_collection_attributes(\
+        data=attribute_data,
+        autosave=False)
+      ca.commit_session()
+      ca.close_session()
+    except Exception as e:
+      ca.rollback_session()
+      ca.close_session()
+      raise ValueError('Failed to load data to db: {0}'.\
+                       format(e))
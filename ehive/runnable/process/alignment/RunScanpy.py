@@ -26,6 +26,10 @@ class RunScanpy(IGFBaseProcess):
         'use_ephemeral_space':0,
         'species_name_lookup':{'HG38':'hsapiens',
                                'MM10':'mmusculus'},
+        'gene_snapshot_dir':None,
+        'allow_network_lookup':True,
+        'low_memory':False,
+        'plot_subsample_size':None,
       })
     return params_dict
 
@@ -105,6 +109,12 @@ class RunScanpy(IGFBaseProcess):
     :param cellranger_collection_type: Cellranger analysis collection type, default CELLRANGER_RESULTS
     :param scanpy_collection_type: Scanpy report collection type, default SCANPY_RESULTS
     :param collection_table: Collection table name for loading scanpy report, default experiment
+    :param gene_snapshot_dir: A local biomart snapshot dir for MT-genes lookup, default None
+    :param allow_network_lookup: Toggle biomart network lookup for MT-genes, default True
+    :param low_memory: Toggle low memory mode for scanpy qc, default False
+    :param plot_subsample_size: Maximum number of cells for the scanpy qc and 3D UMAP plots, default None
+    :returns: A dataflow with output_report, scanpy_h5ad_path and scanpy_process_peak_rss_mb, the
+              peak memory of the worker process in MB, not only of the scanpy report run
     '''
     try:
       project_igf_id = self.param_required('project_igf_id')
@@ -122,6 +132,11 @@ class RunScanpy(IGFBaseProcess):
       collection_table = self.param('collection_table')
       cellbrowser_dir_prefix = self.param('cellbrowser_dir_prefix')
       use_ephemeral_space = self.param('use_ephemeral_space')
+      gene_snapshot_dir = self.param('gene_snapshot_dir')
+      allow_network_lookup = self.param('allow_network_lookup')
+      low_memory = self.param('low_memory')
+      plot_subsample_size = self.param('plot_subsample_size')
+      process_peak_rss_mb = None
       cellranger_tarfile = ''
       output_report = ''
       work_dir_prefix = \
@@ -183,8 +198,13 @@ class RunScanpy(IGFBaseProcess):
             species_name=ensembl_species_name,
             output_file=output_report,
             use_ephemeral_space=use_ephemeral_space,
-            cellbrowser_h5ad=cellbrowser_h5ad)
+            cellbrowser_h5ad=cellbrowser_h5ad,
+            gene_snapshot_dir=gene_snapshot_dir,
+            allow_network_lookup=allow_network_lookup,
+            low_memory=low_memory,
+            plot_subsample_size=plot_subsample_size)
         sp.generate_report()                                                    # generate scanpy report
+        process_peak_rss_mb = sp.process_peak_rss_mb
         # load files to db and disk
         au = \
           Analysis_collection_utils(\
@@ -203,7 +223,8 @@ class RunScanpy(IGFBaseProcess):
 
       self.param('dataflow_params',
                  {'output_report':output_report,
-                  'scanpy_h5ad_path':cellbrowser_h5ad})                         # pass on output report filepath
+                  'scanpy_h5ad_path':cellbrowser_h5ad,
+                  'scanpy_process_peak_rss_mb':process_peak_rss_mb})            # pass on output report filepath
     except Exception as e:
       message = 'project: {2}, sample:{3}, Error in {0}: {1}'.\
                 format(self.__class__.__name__,
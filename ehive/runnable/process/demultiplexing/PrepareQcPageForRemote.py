@@ -3,7 +3,7 @@ import pandas as pd
 from jinja2 import Template,Environment, FileSystemLoader,select_autoescape
 from ehive.runnable.IGFBaseProcess import IGFBaseProcess
 from igf_data.utils.fileutils import get_temp_dir
-from igf_data.utils.fastqc_utils import get_fastq_info_from_fastq_zip
+from igf_data.utils.fastqc_utils import get_fastq_info_from_fastq_zip_list
 from igf_data.utils.fileutils import copy_remote_file
 from igf_data.igfdb.baseadaptor import BaseAdaptor
 from igf_data.igfdb.collectionadaptor import CollectionAdaptor
@@ -388,6 +388,15 @@ class PrepareQcPageForRemote(IGFBaseProcess):
           flowcell_id,
           lane_index_info)                                                      # get remote base path
 
+      fastqc_info = \
+        get_fastq_info_from_fastq_zip_list(\
+          [fastqc_file['fastqc_zip']
+             for fastqc_file in qc_files['fastqc']
+               if fastqc_file['fastq_dir']==fastq_dir])                         # parse fastqc zips in parallel
+      fastqc_info = \
+        dict(zip(\
+          fastqc_info['fastqc_zip'].values,
+          fastqc_info['total_reads'].values))
       base = BaseAdaptor(**{'session_class':igf_session_class})
       base.start_session()                                                      # connect to db
       ca = CollectionAdaptor(**{'session':base.session})
@@ -404,8 +413,7 @@ class PrepareQcPageForRemote(IGFBaseProcess):
             os.path.relpath(\
               remote_fastqc_path,
               start=remote_path)                                                # get relative path
-          (total_reads, _) = \
-            get_fastq_info_from_fastq_zip(fastqc_zip)
+          total_reads = fastqc_info.get(fastqc_zip)
           (collection_name,_) = \
             ca.fetch_collection_name_and_table_from_file_path(\
               file_path=fastq_file)                                             # fetch collection name and table info
@@ -1,5 +1,5 @@
 #!/usr/bin/env python
-import os, subprocess,re
+import os, subprocess,re,time
 from shutil import copytree,copy2,move
 from shlex import quote
 from igf_data.utils.fileutils import get_temp_dir,remove_dir
@@ -26,6 +26,7 @@ class RunBcl2Fastq(IGFBaseProcess):
         'singlecell_tag':'10X',
         'reset_mask_short_adapter_reads':False,
         'use_ephemeral_space':0,
+        'bcl_staging_mode':'symlink',
       })
     return params_dict
 
@@ -53,6 +54,7 @@ class RunBcl2Fastq(IGFBaseProcess):
       use_ephemeral_space = self.param('use_ephemeral_space')
       model_name = self.param('model_name')
       reset_mask_short_adapter_reads = self.param('reset_mask_short_adapter_reads')
+      bcl_staging_mode = self.param('bcl_staging_mode')
 
       project_type = ''                                                         # default single cell status is empty
       seqrun_dir = os.path.join(seqrun_local_dir,seqrun_igf_id)                 # local seqrun dir
@@ -97,83 +99,113 @@ class RunBcl2Fastq(IGFBaseProcess):
             flowcell_lane,
             index_length)
       self.post_message_to_slack(message,reaction='pass')                       # send log to slack
-      seqrun_temp_dir = \
-        get_temp_dir(use_ephemeral_space=use_ephemeral_space)                   # create a new input directory in TMPDIR
-      move_file = \
-        moveBclFilesForDemultiplexing(\
-          input_dir=seqrun_dir,
-          output_dir=seqrun_temp_dir,
-          samplesheet=samplesheet_file,
-          run_info_xml=runinfo_file,
-          platform_model=model_name)                                            # get lists of files to move to TMPDIR
-      move_file.copy_bcl_files()                                                # move files to TMPDIR
       job_name = self.job_name()
-      output_temp_dir = \
-        get_temp_dir(use_ephemeral_space=use_ephemeral_space)                   # create tmp directory in TMPDIR for cluster
-      report_dir = \
-        os.path.join(\
-          base_work_dir,
-          seqrun_igf_id,
-          job_name,
-          'Reports')                                                            # creating report directory in main storage
-      if not os.path.exists(report_dir):
-        os.makedirs(report_dir,mode=0o770)
-
-      stats_dir = \
-        os.path.join(\
-          base_work_dir,
-          seqrun_igf_id,
-          job_name,
-          'Stats')                                                              # create stats directory in main storage
-      if not os.path.exists(stats_dir):
-        os.makedirs(stats_dir,mode=0o770)
-
-      bcl2fastq_cmd = \
-        [quote(bcl2fastq_exe),
-         '--runfolder-dir',quote(seqrun_temp_dir),
-         '--sample-sheet',quote(samplesheet_file),
-         '--output-dir',quote(output_temp_dir),
-         '--reports-dir',quote(report_dir),
-         '--use-bases-mask',quote(bases_mask),
-         '--stats-dir',quote(stats_dir)]                                        # bcl2fastq base parameters
-
-      bcl2fastq_param = \
-        self.format_tool_options(bcl2fastq_options)                             # format bcl2fastq params
-      bcl2fastq_cmd.extend(bcl2fastq_param)                                     # add additional parameters
-      if reset_mask_short_adapter_reads and \
-         '--mask-short-adapter-reads' not in bcl2fastq_options:
-        read_pattern = re.compile(r'^y(\d+)n?\d?')
-        read_values = [int(re.match(read_pattern,i).group(1))
-                         for i in bases_mask.split(',')
-                           if i.startswith('y') and re.match(read_pattern,i)
-                             if int(re.match(read_pattern,i).group(1)) < 22 ]   # hack for checking if reads are lower than the Illumina threasholds
-        if len(read_values) > 0 and \
-            min(read_values) > 5:
-          bcl2fastq_cmd.\
-            append("--mask-short-adapter-reads={0}".\
-                   format(quote(str(min(read_values)))))
-          message = \
-            'Setting masked bases length for {0},{1}:{2}_{3}, value: {4}'.\
-              format(
-                seqrun_igf_id,
-                project_name,
-                flowcell_lane,
-                index_length,
-                min(read_values))
-          self.post_message_to_slack(message,reaction='pass')                   # send log to slack
-          self.comment_asana_task(\
-            task_name=seqrun_igf_id,
-            comment=message)                                                    # send log to asana
-
-      if project_type==singlecell_tag:
-        sc_bcl2fastq_param = self.format_tool_options(singlecell_options)       # format singlecell bcl2fastq params
-        bcl2fastq_cmd.extend(sc_bcl2fastq_param)                                # add additional parameters
-
-      message = ' '.join(bcl2fastq_cmd)
-      self.post_message_to_slack(message,reaction='pass')                       # send bcl2fastq command to Slack
-      self.comment_asana_task(task_name=seqrun_igf_id, comment=message)         # send bcl2fastq command to Asana
-
-      subprocess.check_call(' '.join(bcl2fastq_cmd),shell=True)                 # run bcl2fastq
+      staging_start_time = time.time()
+      if bcl_staging_mode == 'copy':
+        seqrun_temp_dir = \
+          get_temp_dir(use_ephemeral_space=use_ephemeral_space)                 # create a new input directory in TMPDIR
+        move_file = \
+          moveBclFilesForDemultiplexing(\
+            input_dir=seqrun_dir,
+            output_dir=seqrun_temp_dir,
+            samplesheet=samplesheet_file,
+            run_info_xml=runinfo_file,
+            platform_model=model_name)                                          # get lists of files to move to TMPDIR
+        staged_bytes = move_file.copy_bcl_files()                               # move files to TMPDIR
+      else:
+        move_file = \
+          moveBclFilesForDemultiplexing(\
+            input_dir=seqrun_dir,
+            output_dir=os.path.join(base_work_dir,seqrun_igf_id),
+            samplesheet=samplesheet_file,
+            run_info_xml=runinfo_file,
+            platform_model=model_name)
+        seqrun_temp_dir, staged_bytes = \
+          move_file.stage_shared_bcl_files(
+            staging_mode=bcl_staging_mode,
+            holder_id=job_name)                                                 # link files to a dir shared by lane jobs
+      try:
+        message = \
+          'staged bcl files for {0}, {1} : {2}_{3}, mode: {4}, bytes: {5}, time: {6:.1f}s'.\
+            format(
+              seqrun_igf_id,
+              project_name,
+              flowcell_lane,
+              index_length,
+              bcl_staging_mode,
+              staged_bytes,
+              time.time()-staging_start_time)
+        self.post_message_to_slack(message,reaction='pass')                     # send log to slack
+        output_temp_dir = \
+          get_temp_dir(use_ephemeral_space=use_ephemeral_space)                 # create tmp directory in TMPDIR for cluster
+        report_dir = \
+          os.path.join(\
+            base_work_dir,
+            seqrun_igf_id,
+            job_name,
+            'Reports')                                                          # creating report directory in main storage
+        if not os.path.exists(report_dir):
+          os.makedirs(report_dir,mode=0o770)
+
+        stats_dir = \
+          os.path.join(\
+            base_work_dir,
+            seqrun_igf_id,
+            job_name,
+            'Stats')                                                            # create stats directory in main storage
+        if not os.path.exists(stats_dir):
+          os.makedirs(stats_dir,mode=0o770)
+
+        bcl2fastq_cmd = \
+          [quote(bcl2fastq_exe),
+           '--runfolder-dir',quote(seqrun_temp_dir),
+           '--sample-sheet',quote(samplesheet_file),
+           '--output-dir',quote(output_temp_dir),
+           '--reports-dir',quote(report_dir),
+           '--use-bases-mask',quote(bases_mask),
+           '--stats-dir',quote(stats_dir)]                                      # bcl2fastq base parameters
+
+        bcl2fastq_param = \
+          self.format_tool_options(bcl2fastq_options)                           # format bcl2fastq params
+        bcl2fastq_cmd.extend(bcl2fastq_param)                                   # add additional parameters
+        if reset_mask_short_adapter_reads and \
+           '--mask-short-adapter-reads' not in bcl2fastq_options:
+          read_pattern = re.compile(r'^y(\d+)n?\d?')
+          read_values = [int(re.match(read_pattern,i).group(1))
+                           for i in bases_mask.split(',')
+                             if i.startswith('y') and re.match(read_pattern,i)
+                               if int(re.match(read_pattern,i).group(1)) < 22 ] # hack for checking if reads are lower than the Illumina threasholds
+          if len(read_values) > 0 and \
+              min(read_values) > 5:
+            bcl2fastq_cmd.\
+              append("--mask-short-adapter-reads={0}".\
+                     format(quote(str(min(read_values)))))
+            message = \
+              'Setting masked bases length for {0},{1}:{2}_{3}, value: {4}'.\
+                format(
+                  seqrun_igf_id,
+                  project_name,
+                  flowcell_lane,
+                  index_length,
+                  min(read_values))
+            self.post_message_to_slack(message,reaction='pass')                 # send log to slack
+            self.comment_asana_task(\
+              task_name=seqrun_igf_id,
+              comment=message)                                                  # send log to asana
+
+        if project_type==singlecell_tag:
+          sc_bcl2fastq_param = self.format_tool_options(singlecell_options)     # format singlecell bcl2fastq params
+          bcl2fastq_cmd.extend(sc_bcl2fastq_param)                              # add additional parameters
+
+        message = ' '.join(bcl2fastq_cmd)
+        self.post_message_to_slack(message,reaction='pass')                     # send bcl2fastq command to Slack
+        self.comment_asana_task(task_name=seqrun_igf_id, comment=message)       # send bcl2fastq command to Asana
+        subprocess.check_call(' '.join(bcl2fastq_cmd),shell=True)               # run bcl2fastq
+      finally:
+        if bcl_staging_mode == 'copy':
+          remove_dir(seqrun_temp_dir)                                           # remove copied files from TMPDIR
+        else:
+          move_file.release_shared_bcl_files(holder_id=job_name)                # last lane job removes the staged dir
 
       copytree(output_temp_dir,output_fastq_dir)                                # copy output from TMPDIR
       copy2(\
@@ -198,7 +230,6 @@ class RunBcl2Fastq(IGFBaseProcess):
       self.comment_asana_task(\
         task_name=seqrun_igf_id,
         comment=message)                                                        # send log to asana
-      remove_dir(seqrun_temp_dir)
       remove_dir(output_temp_dir)                                               # remove temp dirs
     except Exception as e:
       message = \
@@ -1,4 +1,8 @@
+import json,numbers
+import numpy as np
 import pandas as pd
+from sqlalchemy import Enum
+from sqlalchemy.types import TypeDecorator,Integer,Float,Numeric,Boolean,DateTime,Date
 from igf_data.igfdb.dbconnect import DBConnect
 
 class BaseAdaptor(DBConnect):
@@ -59,17 +63,42 @@ class BaseAdaptor(DBConnect):
         raise AttributeError('Attribute session not found')
 
       if not isinstance(data,dict):
-        data=data.to_dict(orient='records')
+        data=data.fillna('').to_dict(orient='records')
       else:
         raise ValueError('Expecting a dictionary and recieved data type: {0}'.\
                          format(type(data)))
 
+      data=[{key:value
+               for key,value in record.items()
+                 if value}
+              for record in data]                                               # filter any key with empty value
       session=self.session
       session.bulk_insert_mappings(table,data)
     except:
       raise
 
 
+  @staticmethod
+  def _upcast_attribute_values(row_list,attribute_value_column):
+    '''
+    An internal static method for converting integer attribute values to float
+    if the same row also contains float values, as a row level dataframe would
+
+    :param row_list: a list of attribute dictionaries for a single record
+    :param attribute_value_column: column label for attribute value
+    :returns: A list of attribute dictionaries
+    '''
+    values=[row_dict[attribute_value_column] for row_dict in row_list]
+    if len(values)>0 and \
+       all([isinstance(value,numbers.Real) and \
+            not isinstance(value,(bool,np.bool_))
+              for value in values]) and \
+       any([not isinstance(value,numbers.Integral) for value in values]):
+      for row_dict in row_list:
+        row_dict[attribute_value_column]=float(row_dict[attribute_value_column])
+    return row_list
+
+
   def _format_attribute_table_row(self,data,required_column,attribute_name_column,
                                   attribute_value_column ):
     '''
@@ -114,19 +143,19 @@ class BaseAdaptor(DBConnect):
           else:
             raise TypeError('Expecting a string or list and got: {0}'.\
                             format(type(required_column)))
-        row_df=pd.DataFrame(row_list)
         if not id_name and id_value:
           raise ValueError('Required id or value not found for column: {0}'.\
                            format(required_column))
 
-        if isinstance(required_column,str):
-          row_df[id_name]=id_value
-        elif isinstance(required_column,list):
-          for key,value in id_list.items():
-            row_df[key]=value
+        row_list=self._upcast_attribute_values(row_list,attribute_value_column)  # keep the dtype coercion of a per row dataframe
+        for row_dict in row_list:
+          if isinstance(required_column,str):
+            row_dict[id_name]=id_value
+          elif isinstance(required_column,list):
+            for key,value in id_list.items():
+              row_dict[key]=value
 
-        row_df_data=row_df.to_dict(orient='records')
-        final_list.extend(row_df_data)
+        final_list.extend(row_list)
 
       new_data_series=pd.DataFrame(final_list)
       new_data_series=new_data_series.dropna()
@@ -255,12 +284,12 @@ class BaseAdaptor(DBConnect):
         data=pd.DataFrame(data)                                                 # convert dictionary to dataframe
 
       session=self.session
-      if mode is 'serial':
+      if mode == 'serial':
         data.apply(lambda x: self._store_record_serial(\
                                     table=table,
                                     data=x),
                    axis=1)                                                      # load data in serial mode
-      elif mode is 'bulk':
+      elif mode == 'bulk':
         self._store_record_bulk( table=table,data=data)                         # load data in bulk mode
       session.flush()
     except:
@@ -268,6 +297,59 @@ class BaseAdaptor(DBConnect):
         raise
 
 
+  def map_foreign_table_ids(self,data,lookup_table,lookup_column_name,
+                            target_column_name,chunk_size=500):
+    '''
+    A method for mapping foreign key ids to a new column for all the rows of a dataframe.
+    It fetches the ids using a few IN queries, instead of one query per row
+
+    :param data: A pandas dataframe or a list of dictionaries
+    :param lookup_table: A table class to look for the foreign key id
+    :param lookup_column_name: A column name which will be used to link the
+                               dataframe with lookup_table, this column will be
+                               removed from the output dataframe
+    :param target_column_name: Column name for the foreign key id
+    :param chunk_size: Number of lookup values per IN query, default 500
+    :returns: A pandas dataframe
+    '''
+    try:
+      if not isinstance(data,pd.DataFrame):
+        data=pd.DataFrame(data)
+
+      lookup_column=[column
+                       for column in lookup_table.__table__.columns
+                         if column.key == lookup_column_name][0]
+      target_column=[column
+                       for column in lookup_table.__table__.columns
+                         if column.key == target_column_name][0]
+      query=self.session.query(lookup_column,target_column)
+      id_map=\
+        self.fetch_records_by_column_values(
+          query=query,
+          column_name=lookup_column,
+          column_values=data[lookup_column_name].tolist(),
+          chunk_size=chunk_size)
+      id_map=dict(zip(id_map[lookup_column_name].values,
+                      id_map[target_column_name].values))
+      missing_values=\
+        set(data[lookup_column_name].values).\
+        difference(set(id_map.keys()))
+      if len(missing_values) > 0:
+        raise ValueError('Missing {0} records for {1}: {2}'.\
+                         format(lookup_table.__tablename__,
+                                lookup_column_name,
+                                ','.join(map(str,missing_values))))
+
+      data=data.copy()
+      data[target_column_name]=\
+        data[lookup_column_name].\
+        map(lambda x: int(id_map[x]))                                           # set value for target column
+      data.drop(lookup_column_name,axis=1,inplace=True)
+      return data
+    except:
+      raise
+
+
   def store_attributes(self,attribute_table,data,linked_column='',db_id='',
                        mode='serial'):
     '''
@@ -306,6 +388,177 @@ class BaseAdaptor(DBConnect):
       raise
 
 
+  @staticmethod
+  def _get_query_column_dtypes(query,categorical_columns=None):
+    '''
+    An internal static method for fetching the dataframe dtypes for query columns.
+    Enum columns are low-cardinality and they are mapped to categorical dtype with fixed
+    categories, so all the dataframe chunks for a query have the same dtypes
+
+    :param query: A sqlalchmeny query object
+    :param categorical_columns: A list of additional column names for categorical dtype, default None
+    :returns: A list of dtypes, one for each query column, None for the default dtype
+    '''
+    try:
+      if categorical_columns is None:
+        categorical_columns=list()
+
+      dtype_list=list()
+      for column in query.statement.columns:
+        column_type=getattr(column,'type',None)
+        if isinstance(column_type,Enum):
+          dtype_list.append(
+            pd.api.types.CategoricalDtype(
+              categories=list(column_type.enums)))                              # fixed categories for enum columns
+        elif column.name in categorical_columns:
+          dtype_list.append('category')
+        else:
+          dtype_list.append(None)
+      return dtype_list
+    except:
+      raise
+
+
+  @staticmethod
+  def _get_query_arrow_schema(query,categorical_columns=None):
+    '''
+    An internal static method for building a pyarrow schema from the query column types,
+    so all the dataframe chunks are written with the same schema. Enum and categorical
+    columns are mapped to dictionary type and column types without a numeric or time
+    mapping are stored as string. It requires the pyarrow package
+
+    :param query: A sqlalchmeny query object
+    :param categorical_columns: A list of additional column names for dictionary type, default None
+    :returns: A pyarrow schema object
+    '''
+    try:
+      import pyarrow as pa
+      if categorical_columns is None:
+        categorical_columns=list()
+
+      fields=list()
+      for column in query.statement.columns:
+        column_type=getattr(column,'type',None)
+        if isinstance(column_type,TypeDecorator):
+          column_type=column_type.impl                                          # check custom types using impl
+        if isinstance(column_type,Enum) or \
+           column.name in categorical_columns:
+          arrow_type=pa.dictionary(pa.int32(),pa.string())
+        elif isinstance(column_type,Boolean):
+          arrow_type=pa.bool_()
+        elif isinstance(column_type,Integer):
+          arrow_type=pa.int64()
+        elif isinstance(column_type,(Float,Numeric)):
+          arrow_type=pa.float64()
+        elif isinstance(column_type,DateTime):
+          arrow_type=pa.timestamp('ns')
+        elif isinstance(column_type,Date):
+          arrow_type=pa.date32()
+        else:
+          arrow_type=pa.string()
+        fields.append(pa.field(column.name,arrow_type))
+      return pa.schema(fields)
+    except:
+      raise
+
+
+  @staticmethod
+  def _normalize_chunk_dtypes(data,schema):
+    '''
+    An internal static method for converting the dataframe columns of a chunk to match
+    the pyarrow schema. Pandas infers the dtypes separately for each chunk, e.g. an
+    integer column with nulls is float and a column without any value is object
+
+    :param data: A pandas dataframe
+    :param schema: A pyarrow schema object for the dataframe columns
+    :returns: A pandas dataframe
+    '''
+    try:
+      import pyarrow as pa
+      def _to_string(value):
+        if value is None or isinstance(value,str):
+          return value
+        if isinstance(value,(dict,list)):
+          return json.dumps(value)                                              # json column values
+        if pd.isnull(value):
+          return None
+        return str(value)
+
+      data=data.copy()
+      data.columns=range(len(schema.names))                                     # column names can be duplicate
+      for index,arrow_type in enumerate(schema.types):
+        if pa.types.is_dictionary(arrow_type):
+          if data[index].dtype.name!='category':
+            data[index]=data[index].astype('category')
+        elif pa.types.is_integer(arrow_type) or \
+             pa.types.is_floating(arrow_type):
+          data[index]=pd.to_numeric(data[index]).astype(float)                  # float keeps the nulls
+        elif pa.types.is_timestamp(arrow_type):
+          data[index]=pd.to_datetime(data[index])
+        elif pa.types.is_string(arrow_type):
+          data[index]=data[index].map(_to_string)
+      data.columns=schema.names
+      return data
+    except:
+      raise
+
+
+  def _fetch_records_as_dataframe_chunks(self,query,chunk_size=10000,
+                                         categorical_columns=None):
+    '''
+    An internal method for fetching database records as a generator of dataframes.
+    It uses a server side cursor (stream_results) within the current session, if
+    the database driver supports it, and fetches chunk_size rows at a time. A single
+    empty dataframe is returned if the query has no records, so the chunks can always
+    be merged using pd.concat
+
+    :param query: A sqlalchmeny query object
+    :param chunk_size: Number of rows for each dataframe, default 10000
+    :param categorical_columns: A list of additional column names for categorical dtype, default None
+    :returns: A generator of pandas dataframes
+    '''
+    try:
+      if not hasattr(self,'session'):
+        raise AttributeError('Attribute session not found')
+
+      dtype_list=\
+        self._get_query_column_dtypes(
+          query=query,
+          categorical_columns=categorical_columns)
+      result=\
+        self.session.\
+          connection().\
+          execution_options(stream_results=True).\
+          execute(query.statement)                                              # server side cursor
+      try:
+        columns=list(result.keys())
+        column_dtypes={
+          index:dtype
+            for index,dtype in enumerate(dtype_list)
+              if dtype is not None}
+        chunk_count=0
+        while True:
+          rows=result.fetchmany(chunk_size)
+          if len(rows)==0 and chunk_count>0:
+            break
+          chunk_count+=1
+          data=\
+            pd.DataFrame.from_records(
+              [tuple(row) for row in rows],
+              columns=columns)
+          if len(column_dtypes)>0:
+            data.columns=range(len(columns))                                    # column names can be duplicate
+            data=data.astype(column_dtypes)
+            data.columns=columns
+          yield data
+          if len(rows)==0:
+            break                                                               # empty query result
+      finally:
+        result.close()
+    except:
+      raise
+
+
   def _fetch_records_as_object(self,query):
     '''
     An internal method for fetching database records as query object
@@ -371,22 +624,33 @@ class BaseAdaptor(DBConnect):
       raise
 
 
-  def fetch_records(self,query,output_mode='dataframe'):
+  def fetch_records(self,query,output_mode='dataframe',chunk_size=10000,
+                    categorical_columns=None):
     '''
     A method for fetching records using a query
 
     :param query: A sqlalchmeny query object
-    :param output_mode: dataframe / object / one / one_or_none
-    :returns: A pandas dataframe for dataframe mode and a generator object for object mode
+    :param output_mode: dataframe / dataframe_chunks / object / one / one_or_none
+    :param chunk_size: Number of rows for each dataframe in dataframe_chunks mode, default 10000
+    :param categorical_columns: A list of column names for categorical dtype in dataframe_chunks mode,
+                                enum columns are always categorical, default None
+    :returns: A pandas dataframe for dataframe mode, a generator of dataframes for dataframe_chunks mode
+              and a generator object for object mode
     '''
     try:
-      if output_mode not in ('dataframe','object','one','one_or_none'):
+      if output_mode not in ('dataframe','dataframe_chunks','object','one','one_or_none'):
         raise ValueError('Expecting output_mode as dataframe or object, no support for {0}'.\
                          format(output_mode))
 
       result=''
       if output_mode == 'dataframe':
         result=self._fetch_records_as_dataframe(query=query)                    # result is a dataframe
+      elif output_mode == 'dataframe_chunks':
+        result=\
+          self._fetch_records_as_dataframe_chunks(
+            query=query,
+            chunk_size=chunk_size,
+            categorical_columns=categorical_columns)                            # result is a generator of dataframes
       elif output_mode == 'object':
         result=self._fetch_records_as_object(query=query)                       # result is a generator object
       elif output_mode == 'one':
@@ -398,6 +662,64 @@ class BaseAdaptor(DBConnect):
       raise 
 
 
+  def export_records_to_parquet(self,query,output_file,chunk_size=10000,
+                                categorical_columns=None,compression='snappy'):
+    '''
+    A method for exporting query records to a parquet file for offline analysis.
+    Records are fetched and written in chunks, using a schema from the query column
+    types. Enum and categorical columns are stored as dictionary encoded columns.
+    It requires the pyarrow package
+
+    :param query: A sqlalchmeny query object
+    :param output_file: An output parquet file path
+    :param chunk_size: Number of rows per chunk, default 10000
+    :param categorical_columns: A list of additional column names for categorical dtype, default None
+    :param compression: Parquet compression codec, default snappy
+    :returns: Number of exported rows, output file is not created if the query has no records
+    '''
+    try:
+      import pyarrow as pa
+      import pyarrow.parquet as pq
+      row_count=0
+      writer=None
+      schema=\
+        self._get_query_arrow_schema(
+          query=query,
+          categorical_columns=categorical_columns)                              # same schema for all chunks
+      try:
+        for data in \
+          self._fetch_records_as_dataframe_chunks(
+            query=query,
+            chunk_size=chunk_size,
+            categorical_columns=categorical_columns):
+          if len(data.index)==0:
+            continue
+          data=\
+            self._normalize_chunk_dtypes(
+              data=data,
+              schema=schema)
+          table=\
+            pa.Table.from_pandas(
+              data,
+              schema=schema,
+              preserve_index=False)
+          if writer is None:
+            writer=\
+              pq.ParquetWriter(
+                output_file,
+                schema,
+                compression=compression)
+          writer.write_table(table)
+          row_count+=len(data.index)
+      finally:
+        if writer is not None:
+          writer.close()
+      return row_count
+    except Exception as e:
+      raise ValueError("Failed to export records to parquet file {0}, error: {1}".\
+                       format(output_file,e))
+
+
   def fetch_records_by_column(self,table,column_name,column_id,output_mode):
     '''
     A method for fetching record with the column
@@ -441,6 +763,46 @@ class BaseAdaptor(DBConnect):
       raise
 
 
+  def fetch_records_by_column_values(self,query,column_name,column_values,
+                                    chunk_size=500):
+    '''
+    A method for fetching records as a dataframe for a list of column values.
+    It runs one IN query for each chunk of the unique column values, within
+    the current session, so uncommitted records are also visible
+
+    :param query: A sqlalchemy query object for one or more columns
+    :param column_name: A column for filtering the query
+    :param column_values: A list of column values
+    :param chunk_size: Number of column values per IN query, default 500
+    :returns: A pandas dataframe
+    '''
+    try:
+      if not hasattr(self,'session'):
+        raise AttributeError('Attribute session not found')
+
+      column_values=\
+        list(set([value
+                    for value in column_values
+                      if not pd.isnull(value)]))
+      results=list()
+      for index in range(0,len(column_values),chunk_size):
+        chunk_query=\
+          query.filter(
+            column_name.in_(column_values[index:index+chunk_size]))
+        results.extend(
+          self.fetch_records(
+            query=chunk_query,
+            output_mode='object'))
+      result=\
+        pd.DataFrame(
+          [tuple(row) for row in results],
+          columns=[column['name']
+                     for column in query.column_descriptions])
+      return result
+    except:
+      raise
+
+
   def get_attributes_by_dbid(self,attribute_table,linked_table,linked_column_name,
                              db_id):
     '''
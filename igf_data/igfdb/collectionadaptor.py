@@ -1,10 +1,27 @@
 import os
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from igf_data.utils.fileutils import calculate_file_checksum
 from igf_data.igfdb.baseadaptor import BaseAdaptor
 from igf_data.igfdb.fileadaptor import FileAdaptor
 from igf_data.igfdb.igfTables import Collection, File, Collection_group, Collection_attribute
 
+def _calculate_file_size_and_checksum(file_path,hasher='md5'):
+  '''
+  An internal function for calculating file size and checksum, used by the process pool
+
+  :param file_path: A file path
+  :param hasher: Method for file checksum, default md5
+  :returns: File size and checksum
+  '''
+  file_size=os.path.getsize(file_path)
+  file_checksum=\
+    calculate_file_checksum(
+      filepath=file_path,
+      hasher=hasher)
+  return file_size,file_checksum
+
+
 class CollectionAdaptor(BaseAdaptor):
   '''
   An adaptor class for Collection, Collection_group and Collection_attribute tables
@@ -412,6 +429,208 @@ class CollectionAdaptor(BaseAdaptor):
       raise
 
 
+  def load_file_and_create_collection_in_bulk(self,data,autosave=True,hasher='md5',
+                                              calculate_file_size_and_md5=True,
+                                              max_workers=4,chunk_size=1000,
+                                              required_coumns=('name','type','table',
+                                                               'file_path','size','md5',
+                                                               'location')):
+    '''
+    A function for loading a large number of files to db and creating collections.
+    Data is processed in chunks, existing files, collections and collection groups are
+    checked with one query per chunk and new records are inserted with bulk mappings.
+    File checksums are calculated in parallel and only for the files not present in db.
+    Existing file records are not updated, they are only linked to the collections
+
+    :param data: A list of dictionary or a Pandas dataframe, or an iterator of list of dictionaries,
+                 e.g. output of read_json_data_in_chunks, for loading large inputs in chunks
+    :param autosave: Save data to db, default True
+    :param hasher: Method for file checksum, default md5
+    :param calculate_file_size_and_md5: Enable file size and md5 check, default True
+    :param max_workers: Number of processes for file checksum calculation, default 4
+    :param chunk_size: Number of input rows per chunk, default 1000
+    :param required_coumns: List of required columns
+    :returns: A dictionary with the counts of new file, collection and collection_group records
+    '''
+    try:
+      if isinstance(data, pd.DataFrame):
+        data = data.to_dict(orient='records')
+      if isinstance(data, list):
+        data = [data[index:index+chunk_size]
+                  for index in range(0,len(data),chunk_size)]                   # split input data to chunks
+
+      record_counts = {'file':0,'collection':0,'collection_group':0}
+      executor = None
+      if calculate_file_size_and_md5 and max_workers > 1:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+      try:
+        for data_chunk in data:
+          chunk_counts = \
+            self._load_file_and_collection_chunk(
+              data=data_chunk,
+              hasher=hasher,
+              calculate_file_size_and_md5=calculate_file_size_and_md5,
+              executor=executor,
+              required_coumns=required_coumns)
+          for key,value in chunk_counts.items():
+            record_counts[key] += value
+      finally:
+        if executor is not None:
+          executor.shutdown(wait=True)
+      if autosave:
+        self.commit_session()
+      return record_counts
+    except:
+      if autosave:
+        self.rollback_session()
+      raise
+
+
+  def _load_file_and_collection_chunk(self,data,hasher,calculate_file_size_and_md5,
+                                      executor,required_coumns):
+    '''
+    An internal method for loading a chunk of file and collection data without autosave
+
+    :param data: A list of dictionary or a Pandas dataframe
+    :param hasher: Method for file checksum
+    :param calculate_file_size_and_md5: Enable file size and md5 check
+    :param executor: A process pool executor for file checksum or None for serial run
+    :param required_coumns: List of required columns
+    :returns: A dictionary with the counts of new file, collection and collection_group records
+    '''
+    try:
+      required_coumns = list(required_coumns)
+      if not isinstance(data, pd.DataFrame):
+        data=pd.DataFrame(data)
+
+      if len(data.index)==0:
+        return {'file':0,'collection':0,'collection_group':0}
+
+      data.fillna('',inplace=True)                                              # replace missing value
+      if not set(data.columns).issubset(set(required_coumns)):
+        raise ValueError('missing required columns: {0}, found columns:{1}'.\
+                         format(required_coumns,data.columns))
+
+      for column in required_coumns:
+        if column not in data.columns:
+          data[column]=''
+
+      data['file_path']=data['file_path'].astype(str)
+      existing_files=\
+        self.fetch_records_by_column_values(
+          query=self.session.query(File.file_path,File.file_id),
+          column_name=File.file_path,
+          column_values=data['file_path'].values.tolist())                      # check existing files in one go
+      file_data=\
+        data[~data['file_path'].isin(existing_files['file_path'].values)].\
+          loc[:,['file_path','md5','size','location']].\
+          drop_duplicates('file_path')
+      if calculate_file_size_and_md5 and len(file_data.index)>0:
+        file_path_list=file_data['file_path'].values.tolist()
+        if executor is not None:
+          file_info=\
+            list(executor.map(
+              _calculate_file_size_and_checksum,
+              file_path_list,
+              [hasher]*len(file_path_list),
+              chunksize=10))                                                    # calculate checksum in parallel
+        else:
+          file_info=[
+            _calculate_file_size_and_checksum(file_path,hasher)
+              for file_path in file_path_list]
+        file_data['size']=[str(entry[0]) for entry in file_info]
+        file_data['md5']=[entry[1] for entry in file_info]
+
+      if len(file_data.index)>0:
+        self.session.\
+          bulk_insert_mappings(
+            File,
+            self._get_bulk_mappings(file_data))                                 # store new files
+        self.session.flush()
+
+      file_ids=\
+        self.fetch_records_by_column_values(
+          query=self.session.query(File.file_path,File.file_id),
+          column_name=File.file_path,
+          column_values=data['file_path'].values.tolist())
+      collection_data=\
+        data.loc[:,['name','type','table']].\
+          drop_duplicates(['name','type'])
+      existing_collections=\
+        self.fetch_records_by_column_values(
+          query=self.session.query(Collection.name,Collection.type,Collection.collection_id),
+          column_name=Collection.name,
+          column_values=collection_data['name'].values.tolist())                # check existing collections in one go
+      collection_data=\
+        collection_data.merge(
+          existing_collections,
+          how='left',
+          on=['name','type'])
+      collection_data=\
+        collection_data[collection_data['collection_id'].isnull()].\
+          drop('collection_id',axis=1)
+      if len(collection_data.index)>0:
+        self.session.\
+          bulk_insert_mappings(
+            Collection,
+            self._get_bulk_mappings(collection_data))                           # store new collections
+        self.session.flush()
+
+      collection_ids=\
+        self.fetch_records_by_column_values(
+          query=self.session.query(Collection.name,Collection.type,Collection.collection_id),
+          column_name=Collection.name,
+          column_values=data['name'].values.tolist())
+      collection_group_data=\
+        data.loc[:,['name','type','file_path']].\
+          merge(collection_ids,how='inner',on=['name','type']).\
+          merge(file_ids,how='inner',on='file_path').\
+          loc[:,['collection_id','file_id']].\
+          drop_duplicates()
+      existing_groups=\
+        self.fetch_records_by_column_values(
+          query=self.session.query(Collection_group.collection_id,Collection_group.file_id),
+          column_name=Collection_group.collection_id,
+          column_values=collection_group_data['collection_id'].values.tolist())
+      collection_group_data=\
+        collection_group_data.merge(
+          existing_groups,
+          how='left',
+          on=['collection_id','file_id'],
+          indicator=True)
+      collection_group_data=\
+        collection_group_data[collection_group_data['_merge']=='left_only'].\
+          drop('_merge',axis=1)                                                 # skip existing collection groups
+      if len(collection_group_data.index)>0:
+        self.session.\
+          bulk_insert_mappings(
+            Collection_group,
+            self._get_bulk_mappings(collection_group_data))                     # link files to collections
+        self.session.flush()
+
+      return {
+        'file':len(file_data.index),
+        'collection':len(collection_data.index),
+        'collection_group':len(collection_group_data.index)}
+    except:
+      raise
+
+
+  @staticmethod
+  def _get_bulk_mappings(data):
+    '''
+    A static method for converting a dataframe to a list of dictionaries for bulk insert,
+    empty values are removed to use the column defaults
+
+    :param data: A pandas dataframe
+    :returns: A list of dictionaries
+    '''
+    return [{key:(value.item() if hasattr(value,'item') else value)
+               for key,value in record.items()
+                 if value is not None and value != ''}
+              for record in data.to_dict(orient='records')]
+
+
   def _tag_existing_collection_data(self,data,tag='EXISTS',tag_column='data_exists'):
     '''
     An internal method for checking a dataframe for existing collection record
@@ -160,6 +160,27 @@ class FileAdaptor(BaseAdaptor):
       raise
 
 
+  def fetch_existing_file_paths(self,file_paths,chunk_size=500):
+    '''
+    A method for fetching the existing file paths from a list of file paths
+
+    :param file_paths: A list of absolute filepaths
+    :param chunk_size: Number of filepaths per IN query, default 500
+    :returns: A list of filepaths present in the File table
+    '''
+    try:
+      query=self.session.query(File.file_path)
+      results=\
+        self.fetch_records_by_column_values(\
+          query=query,
+          column_name=File.file_path,
+          column_values=file_paths,
+          chunk_size=chunk_size)
+      return results['file_path'].tolist()
+    except:
+      raise
+
+
   def remove_file_data_for_file_path(self,file_path,remove_file=False,
                                      autosave=True):
     '''
@@ -8,20 +8,23 @@ class ProjectAdaptor(BaseAdaptor):
   An adaptor class for Project, ProjectUser and Project_attribute tables
   '''
 
-  def store_project_and_attribute_data(self, data, autosave=True):
+  def store_project_and_attribute_data(self, data, autosave=True, mode='serial'):
     '''
     A method for dividing and storing data to project and attribute_table
 
     :param data: A list of data or a pandas dataframe
     :param autosave: A toggle for autocommit, default True
+    :param mode: serial / bulk, default serial
     :returns: None
     '''
     (project_data, project_attr_data) = \
       self.divide_data_to_table_and_attribute(data=data)
     try:
-      self.store_project_data(data=project_data)                                # store project
+      self.store_project_data(data=project_data, mode=mode)                     # store project
       if len(project_attr_data.index) > 0:                                      # check if any attribute is present
-        self.store_project_attributes(data=project_attr_data)                   # store project attributes
+        self.store_project_attributes(
+          data=project_attr_data,
+          mode=mode)                                                            # store project attributes
       if autosave:
         self.commit_session()                                                   # save changes to database
     except Exception as e:
@@ -71,16 +74,17 @@ class ProjectAdaptor(BaseAdaptor):
                 format(e))
 
 
-  def store_project_data(self, data, autosave=False):
+  def store_project_data(self, data, autosave=False, mode='serial'):
     '''
     Load data to Project table
 
     :param data: A list of data or a pandas dataframe
     :param autosave: A toggle for autocommit, default False
+    :param mode: serial / bulk, default serial
     :returns: None
     '''
     try:
-      self.store_records(table=Project, data=data)
+      self.store_records(table=Project, data=data, mode=mode)
       if autosave:
         self.commit_session()                                                   # save changes to database
     except Exception as e:
@@ -90,20 +94,29 @@ class ProjectAdaptor(BaseAdaptor):
               "failed to store project data, error: {0}".format(e))
 
 
-  def store_project_attributes(self, data, project_id='', autosave=False):
+  def store_project_attributes(self, data, project_id='', autosave=False, mode='serial'):
     '''
     A method for storing data to Project_attribute table
 
     :param data: A pandas dataframe
     :param project_id: Project id for attribute table, default ''
     :param autosave: A toggle for autocommit, default False
+    :param mode: serial / bulk, default serial
     :returns: None
     '''
     try:
       if not isinstance(data, pd.DataFrame):
         data = pd.DataFrame(data)                                               # convert data to dataframe
 
-      if 'project_igf_id' in data.columns:                                      # map foreign key if project_igf_id is found
+      if 'project_igf_id' in data.columns and \
+         mode == 'bulk':
+        data = \
+          self.map_foreign_table_ids(
+            data=data,
+            lookup_table=Project,
+            lookup_column_name='project_igf_id',
+            target_column_name='project_id')                                    # map foreign key ids in bulk
+      elif 'project_igf_id' in data.columns:                                    # map foreign key if project_igf_id is found
         map_function = \
           lambda x: self.map_foreign_table_and_store_attribute(
             data=x,
@@ -116,7 +129,8 @@ class ProjectAdaptor(BaseAdaptor):
       self.store_attributes(
         attribute_table=Project_attribute,
         linked_column='project_id',
-        db_id=project_id, data=data)                                            # store attributes without auto commit
+        db_id=project_id, data=data,
+        mode=mode)                                                              # store attributes without auto commit
       if autosave:
         self.commit_session()                                                   # save changes to database
     except Exception as e:
@@ -129,7 +143,7 @@ class ProjectAdaptor(BaseAdaptor):
 
   def assign_user_to_project(
         self, data, required_project_column='project_igf_id',required_user_column='email_id', 
-        data_authority_column='data_authority', autosave=True):
+        data_authority_column='data_authority', autosave=True, mode='serial'):
     '''
     Load data to ProjectUser table
     
@@ -142,6 +156,7 @@ class ProjectAdaptor(BaseAdaptor):
     :param required_user_column: Name of the user id column, default email_id
     :param data_authority_column: Name of the data_authority column, default data_authority
     :param autosave: A toggle for autocommit to db, default True
+    :param mode: serial / bulk, default serial
     :returns: None
     '''
     try:
@@ -155,25 +170,39 @@ class ProjectAdaptor(BaseAdaptor):
         raise ValueError('Missing required value in input data {0}'.\
                          format(data.columns))
 
-      project_map_function = \
-        lambda x: self.map_foreign_table_and_store_attribute(
-          data=x,
-          lookup_table=Project,
-          lookup_column_name=required_project_column,
-          target_column_name='project_id' )                                     # prepare the function for Project id
-      new_data = data.apply(project_map_function, 1)                            # map project id
-      user_map_function = \
-        lambda x: self.map_foreign_table_and_store_attribute(\
-          data=x,
-          lookup_table=User,
-          lookup_column_name=required_user_column,
-          target_column_name='user_id' )                                        # prepare the function for User id
-      new_data = new_data.apply(user_map_function, 1)                           # map user id
+      if mode == 'bulk':
+        new_data = \
+          self.map_foreign_table_ids(
+            data=data,
+            lookup_table=Project,
+            lookup_column_name=required_project_column,
+            target_column_name='project_id')                                    # map project ids in bulk
+        new_data = \
+          self.map_foreign_table_ids(
+            data=new_data,
+            lookup_table=User,
+            lookup_column_name=required_user_column,
+            target_column_name='user_id')                                       # map user ids in bulk
+      else:
+        project_map_function = \
+          lambda x: self.map_foreign_table_and_store_attribute(
+            data=x,
+            lookup_table=Project,
+            lookup_column_name=required_project_column,
+            target_column_name='project_id' )                                   # prepare the function for Project id
+        new_data = data.apply(project_map_function, 1)                          # map project id
+        user_map_function = \
+          lambda x: self.map_foreign_table_and_store_attribute(\
+            data=x,
+            lookup_table=User,
+            lookup_column_name=required_user_column,
+            target_column_name='user_id' )                                      # prepare the function for User id
+        new_data = new_data.apply(user_map_function, 1)                         # map user id
       data_authotiry_dict = {True:'T'}                                          # create a mapping dictionary for data authority value
       new_data[data_authority_column] = \
         new_data[data_authority_column].\
         map(data_authotiry_dict)                                                # add value for data authority
-      self.store_records(table=ProjectUser, data=new_data)                      # store the project_user data
+      self.store_records(table=ProjectUser, data=new_data, mode=mode)           # store the project_user data
       if autosave:
         self.commit_session()                                                   # save changes to database
     except Exception as e:
@@ -212,6 +241,30 @@ class ProjectAdaptor(BaseAdaptor):
               "Failed to check project records, error: {0}".format(e))
 
 
+  def fetch_existing_project_igf_ids(self, project_igf_ids, chunk_size=500):
+    '''
+    A method for fetching the existing project igf ids from a list of project igf ids
+
+    :param project_igf_ids: A list of project igf ids
+    :param chunk_size: Number of project igf ids per IN query, default 500
+    :returns: A list of project igf ids present in the Project table
+    '''
+    try:
+      query = \
+        self.session.\
+          query(Project.project_igf_id)
+      results = \
+        self.fetch_records_by_column_values(
+          query=query,
+          column_name=Project.project_igf_id,
+          column_values=project_igf_ids,
+          chunk_size=chunk_size)
+      return results['project_igf_id'].tolist()
+    except Exception as e:
+      raise ValueError(
+              "Failed to fetch existing project igf ids, error: {0}".format(e))
+
+
   def fetch_project_records_igf_id(self, project_igf_id, target_column_name='project_igf_id'):
     '''
     A method for fetching data for Project table
@@ -311,6 +364,39 @@ class ProjectAdaptor(BaseAdaptor):
               "Failed to check existing project user, error: {0}".format(e))
 
 
+  def fetch_existing_project_users(self, project_igf_ids, chunk_size=500):
+    '''
+    A method for fetching the existing project and user email id combinations
+    for a list of project igf ids
+
+    :param project_igf_ids: A list of project igf ids
+    :param chunk_size: Number of project igf ids per IN query, default 500
+    :returns: A pandas dataframe with project_igf_id and email_id columns
+    '''
+    try:
+      query = \
+        self.session.\
+          query(
+            Project.project_igf_id,
+            User.email_id).\
+          join(
+            ProjectUser,
+            Project.project_id==ProjectUser.project_id).\
+          join(
+            User,
+            User.user_id==ProjectUser.user_id)
+      results = \
+        self.fetch_records_by_column_values(
+          query=query,
+          column_name=Project.project_igf_id,
+          column_values=project_igf_ids,
+          chunk_size=chunk_size)
+      return results
+    except Exception as e:
+      raise ValueError(
+              "Failed to fetch existing project users, error: {0}".format(e))
+
+
   def check_data_authority_for_project(self,project_igf_id):
     '''
     A method for checking user data authority for existing projects
@@ -10,16 +10,20 @@ class SampleAdaptor(BaseAdaptor):
   An adaptor class for Sample and Sample_attribute tables
   '''
 
-  def store_sample_and_attribute_data(self, data, autosave=True):
+  def store_sample_and_attribute_data(self, data, autosave=True, mode='serial'):
     '''
     A method for dividing and storing data to sample and attribute table
+
+    :param data: A list of dictionaries or a pandas dataframe
+    :param autosave: A toggle for autocommit, default True
+    :param mode: serial / bulk, default serial
     '''
     (sample_data, sample_attr_data)=self.divide_data_to_table_and_attribute(data=data)
 
     try:
-      self.store_sample_data(data=sample_data)                                         # store sample records
+      self.store_sample_data(data=sample_data, mode=mode)                              # store sample records
       if len(sample_attr_data.index) > 0:                                            # check if any attribute is present
-        self.store_sample_attributes(data=sample_attr_data)                            # store project attributes
+        self.store_sample_attributes(data=sample_attr_data, mode=mode)                 # store project attributes
       if autosave:
         self.commit_session()
     except:
@@ -62,17 +66,24 @@ class SampleAdaptor(BaseAdaptor):
     return (sample_df, sample_attr_df)
 
 
-  def store_sample_data(self, data, autosave=False):
+  def store_sample_data(self, data, autosave=False, mode='serial'):
     '''
     Load data to Sample table
     
     :param data: A dataframe or list of dictionary containing the data
+    :param mode: serial / bulk, default serial
     '''
     try:
       if not isinstance(data, pd.DataFrame):
         data=pd.DataFrame(data)                                                          # convert data to dataframe
 
-      if 'project_igf_id' in data.columns:
+      if 'project_igf_id' in data.columns and mode=='bulk':
+        data=self.map_foreign_table_ids(\
+               data=data,
+               lookup_table=Project,
+               lookup_column_name='project_igf_id',
+               target_column_name='project_id')                                          # map project ids in bulk
+      elif 'project_igf_id' in data.columns:
         project_map_function=lambda x: self.map_foreign_table_and_store_attribute(\
                                                 data=x, \
                                                 lookup_table=Project, \
@@ -81,7 +92,7 @@ class SampleAdaptor(BaseAdaptor):
         new_data=data.apply(project_map_function,1)                                      # map project id
         data=new_data                                                                    # overwrite data
 
-      self.store_records(table=Sample, data=data)                                        # store data without autocommit
+      self.store_records(table=Sample, data=data, mode=mode)                             # store data without autocommit
       if autosave:
         self.commit_session()
     except:
@@ -90,18 +101,25 @@ class SampleAdaptor(BaseAdaptor):
       raise
 
 
-  def store_sample_attributes(self, data, sample_id='', autosave=False):
+  def store_sample_attributes(self, data, sample_id='', autosave=False, mode='serial'):
     '''
     A method for storing data to Sample_attribute table
     
     :param data: A dataframe or list of dictionary containing the Sample_attribute data
     :param sample_id: An optional parameter to link the sample attributes to a specific sample
+    :param mode: serial / bulk, default serial
     '''
     try:
       if not isinstance(data, pd.DataFrame):
         data=pd.DataFrame(data)                                                         # convert data to dataframe
 
-      if 'sample_igf_id' in data.columns: 
+      if 'sample_igf_id' in data.columns and mode=='bulk':
+        data=self.map_foreign_table_ids(\
+               data=data,
+               lookup_table=Sample,
+               lookup_column_name='sample_igf_id',
+               target_column_name='sample_id')                                          # map sample ids in bulk
+      elif 'sample_igf_id' in data.columns: 
         sample_map_function=lambda x: self.map_foreign_table_and_store_attribute(\
                                                 data=x, \
                                                 lookup_table=Sample, \
@@ -110,7 +128,7 @@ class SampleAdaptor(BaseAdaptor):
         new_data=data.apply(sample_map_function, 1)                                     # map sample id
         data=new_data                                                                   # overwrite data
 
-      self.store_attributes(data=data, attribute_table=Sample_attribute, linked_column='sample_id', db_id=sample_id)  # store without autocommit
+      self.store_attributes(data=data, attribute_table=Sample_attribute, linked_column='sample_id', db_id=sample_id, mode=mode)  # store without autocommit
       if autosave:
         self.commit_session()
     except:
@@ -187,6 +205,30 @@ class SampleAdaptor(BaseAdaptor):
       raise
 
 
+  def fetch_sample_and_project_igf_ids(self, sample_igf_ids, chunk_size=500):
+    '''
+    A method for fetching the existing samples and their project igf ids
+    for a list of sample igf ids
+
+    :param sample_igf_ids: A list of sample igf ids
+    :param chunk_size: Number of sample igf ids per IN query, default 500
+    :returns: A pandas dataframe with sample_igf_id and project_igf_id columns,
+              project_igf_id is None for samples without any project
+    '''
+    try:
+      query=self.session.\
+            query(Sample.sample_igf_id,Project.project_igf_id).\
+            outerjoin(Project,Project.project_id==Sample.project_id)            # set query
+      results=self.fetch_records_by_column_values(\
+                query=query,
+                column_name=Sample.sample_igf_id,
+                column_values=sample_igf_ids,
+                chunk_size=chunk_size)
+      return results
+    except:
+      raise
+
+
   def fetch_sample_project(self, sample_igf_id):
     '''
     A method for fetching project information for the sample
@@ -130,12 +130,13 @@ class UserAdaptor(BaseAdaptor):
       raise
 
 
-  def store_user_data(self, data, autosave=True):
+  def store_user_data(self, data, autosave=True, mode='serial'):
     '''
     Load data to user table
 
     :param data: A pandas dataframe
     :param autosave: A toggle for autocommit, default True
+    :param mode: serial / bulk, default serial
     :returns: None
     '''
     try:
@@ -143,7 +144,7 @@ class UserAdaptor(BaseAdaptor):
         data=pd.DataFrame(data)
 
       data=self._preprocess_data(data=data)
-      self.store_records(table=User, data=data, mode='serial' )
+      self.store_records(table=User, data=data, mode=mode )
       if autosave:
         self.commit_session()
     except:
@@ -190,6 +191,27 @@ class UserAdaptor(BaseAdaptor):
       raise
 
 
+  def fetch_existing_user_email_ids(self,email_ids,chunk_size=500):
+    '''
+    A method for fetching the existing user email ids from a list of email ids
+
+    :param email_ids: A list of email ids
+    :param chunk_size: Number of email ids per IN query, default 500
+    :returns: A list of email ids present in the User table
+    '''
+    try:
+      query=self.session.query(User.email_id)
+      results=\
+        self.fetch_records_by_column_values(\
+          query=query,
+          column_name=User.email_id,
+          column_values=email_ids,
+          chunk_size=chunk_size)
+      return results['email_id'].tolist()
+    except:
+      raise
+
+
   def check_user_records_email_id(self,email_id):
     '''
     A method for checking existing user data in db
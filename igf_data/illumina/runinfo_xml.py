@@ -1,6 +1,6 @@
 import re, os, warnings
 from collections import defaultdict
-from bs4 import BeautifulSoup
+from igf_data.illumina.xml_utils import read_illumina_xml
 
 class RunInfo_xml:
   '''
@@ -25,11 +25,10 @@ class RunInfo_xml:
     try:
       tags = list(tags)
       reads_stats=defaultdict(lambda: defaultdict(dict))
-      soup=self._soup
       match_count=0
-      for r in soup.find_all(root_tag):
+      for r,_ in self._xml_elements.get(root_tag.lower(),()):
         for tag_name in tags:
-          reads_stats[r[number_tag]][tag_name]=r[tag_name]
+          reads_stats[r[number_tag.lower()]][tag_name]=r[tag_name.lower()]
           match_count+=1
 
       if match_count==0:
@@ -45,8 +44,7 @@ class RunInfo_xml:
     Function for fetching the instrument series number
     '''           
     series_number=None
-    soup=self._soup
-    series_number=soup.instrument.contents[0]
+    series_number=self._get_tag_text(tag_name='instrument')
 
     if not series_number:
       raise ValueError('couldn\'t find tag {0}'.format('instrument'))
@@ -58,17 +56,26 @@ class RunInfo_xml:
     A mthod for accessing flowcell name from the runinfo xml file
     '''
     flowcell=None
-    flowcell=self._soup.flowcell.contents[0]
+    flowcell=self._get_tag_text(tag_name='flowcell')
 
     if not flowcell:
       raise ValueError('couldn\'t find tag {0}'.format('flowcell'))
     return flowcell
 
+  def _get_tag_text(self,tag_name):
+    '''
+    Internal function for fetching the text of the first matching tag
+
+    :param tag_name: A tag name, case insensitive
+    :returns: Text of the tag or None
+    '''
+    elements=self._xml_elements.get(tag_name.lower())
+    if not elements:
+      return None
+    return elements[0][1]
+
   def _read_xml(self):
     '''
-    Internal function for reading the xml file using BS4
+    Internal function for reading the xml file using ElementTree, with a parse cache
     '''
-    xml_file=self.xml_file
-    with open(xml_file, 'r') as fp:
-      soup = BeautifulSoup(fp, "html5lib")
-    self._soup = soup
+    self._xml_elements=read_illumina_xml(xml_file=self.xml_file)
@@ -1,4 +1,4 @@
-from bs4 import BeautifulSoup
+from igf_data.illumina.xml_utils import read_illumina_xml
 
 class RunParameter_xml:
   '''
@@ -13,12 +13,9 @@ class RunParameter_xml:
 
   def _read_xml(self):
     '''
-    Internal function for reading the xml file using BS4
+    Internal function for reading the xml file using ElementTree, with a parse cache
     '''
-    xml_file=self.xml_file
-    with open(xml_file, 'r') as fp:
-      soup = BeautifulSoup(fp, "html5lib")
-    self._soup = soup
+    self._xml_elements=read_illumina_xml(xml_file=self.xml_file)
 
 
   def get_hiseq_flowcell(self):
@@ -27,10 +24,10 @@ class RunParameter_xml:
     
     :returns: Flowcell info or None (for MiSeq and NextSeq runs)
     '''
-    soup=self._soup
     try:
-      if soup.flowcell:
-        flowcell=soup.flowcell.contents[0]
+      elements=self._xml_elements.get('flowcell')
+      if elements:
+        flowcell=elements[0][1]
       else:
         flowcell=None
       return flowcell
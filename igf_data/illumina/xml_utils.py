@@ -0,0 +1,77 @@
+import os
+from functools import lru_cache
+from collections import defaultdict
+import xml.etree.ElementTree as ET
+from bs4 import BeautifulSoup
+
+def _strip_namespace(name):
+  '''
+  An internal function for removing the xml namespace prefix and converting a tag or
+  attribute name to lower case, similar to the BeautifulSoup html5lib parser
+
+  :param name: A tag or attribute name
+  :returns: A lower case name without namespace
+  '''
+  return name.split('}')[-1].lower()
+
+
+@lru_cache(maxsize=256)
+def _parse_xml_file(xml_file,file_key):
+  '''
+  An internal function for parsing xml file, cached by the file identity
+
+  :param xml_file: A xml file path
+  :param file_key: A tuple of file device, inode, mtime and size, used as the cache key
+  :returns: A dictionary of lower case tag names and a tuple of elements in document order,
+            each element is a tuple of a dictionary of lower case attributes and the element text
+  '''
+  try:
+    elements = defaultdict(list)
+    try:
+      for _,elem in ET.iterparse(xml_file,events=('start',)):
+        elements[_strip_namespace(elem.tag)].\
+          append(
+            ({_strip_namespace(key):value
+                for key,value in elem.attrib.items()},
+             elem))
+      elements = {
+        tag_name:tuple((attrib,elem.text) for attrib,elem in entries)
+          for tag_name,entries in elements.items()}                             # fetch text after parsing
+    except ET.ParseError:
+      with open(xml_file,'r') as fp:
+        soup = BeautifulSoup(fp,'html5lib')                                     # fall back to lenient parser
+      elements = defaultdict(list)
+      for tag in soup.find_all(True):
+        text = None
+        if len(tag.contents) > 0 and isinstance(tag.contents[0],str):
+          text = str(tag.contents[0])
+        elements[tag.name].\
+          append((dict(tag.attrs),text))
+      elements = {
+        tag_name:tuple(entries)
+          for tag_name,entries in elements.items()}
+    return elements
+  except:
+    raise
+
+
+def read_illumina_xml(xml_file):
+  '''
+  A function for reading Illumina run level xml files, e.g. RunInfo.xml and RunParameters.xml.
+  Parsed files are cached using the file identity, so repeated reads of the same file are not
+  parsed again unless the file is modified
+
+  :param xml_file: A xml file path
+  :returns: A dictionary of lower case tag names and a tuple of elements in document order,
+            each element is a tuple of a dictionary of lower case attributes and the element text
+  '''
+  try:
+    file_stat = os.stat(xml_file)
+    file_key = \
+      (file_stat.st_dev,
+       file_stat.st_ino,
+       file_stat.st_mtime_ns,
+       file_stat.st_size)
+    return _parse_xml_file(os.path.realpath(xml_file),file_key)
+  except:
+    raise
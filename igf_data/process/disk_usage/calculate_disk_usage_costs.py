@@ -1,115 +1,266 @@
+import os
 import pandas as pd
 from igf_data.utils.dbutils import read_dbconf_json
 from igf_data.igfdb.baseadaptor import BaseAdaptor
 from igf_data.utils.disk_usage_utils import get_sub_directory_size_in_gb
-from igf_data.utils.fileutils import copy_remote_file, get_temp_dir, remove_dir
 from igf_data.igfdb.igfTables import Project,ProjectUser,User,Sample,Experiment,Seqrun,Run
 
-def calculate_igf_disk_usage_costs(list_of_dir_paths,dbconf_file,costs_unit=2.8):
+def calculate_igf_disk_usage_costs(list_of_dir_paths,dbconf_file,costs_unit=2.8,
+                                   snapshot_dir=None,max_workers=4,
+                                   excluded_email_list=('igf@imperial.ac.uk',)):
   '''
   A function for calculating disk usage costs
 
   :param list_of_dir_paths: A list of dictionary containing directory paths to check for disk usage
                             e.g. [{'tag':'location1','path':'/path'}]
+                            An optional key storage_class can be used for the cost unit lookup
+                            e.g. [{'tag':'location1','path':'/path','storage_class':'archive'}]
   :param dbconf_file: A db config file path
-  :param costs_unit: A cost unit, default 2.8
+  :param costs_unit: A cost unit per TB, default 2.8, or a dictionary of storage_class (or tag)
+                     and cost unit for tiered costs, e.g. {'fast':2.8,'archive':0.5}. Usage is
+                     reported in GB and converted to TB for the costs
+  :param snapshot_dir: A directory path for recording usage snapshots of each location, default None
+  :param max_workers: Number of parallel sub-directory scans, default 4
+  :param excluded_email_list: A list of user emails to exclude from the costs, default ('igf@imperial.ac.uk',)
   :returns: A list of dictionaries, a list of column names and a dictionary of descriptions for gviz conversion
   '''
   try:
-    merged_df = pd.DataFrame(columns=['path'])
+    usage_data = \
+      get_storage_usage_for_locations(
+        list_of_dir_paths=list_of_dir_paths,
+        snapshot_dir=snapshot_dir,
+        max_workers=max_workers)
+    project_user_data,project_flowcell_data = \
+      _fetch_project_user_and_flowcell_info(dbconf_file=dbconf_file)
+    formatted_data,column_order,description = \
+      calculate_storage_costs(
+        usage_data=usage_data,
+        project_user_data=project_user_data,
+        project_flowcell_data=project_flowcell_data,
+        costs_unit=costs_unit,
+        list_of_dir_paths=list_of_dir_paths,
+        excluded_email_list=excluded_email_list)
+    return formatted_data,column_order,description
+  except Exception as e:
+    raise ValueError('Error: {0}'.format(e))
+
+
+def get_storage_usage_for_locations(list_of_dir_paths,snapshot_dir=None,max_workers=4,
+                                    dir_name_col='directory_name',
+                                    dir_size_col='directory_size'):
+  '''
+  A function for fetching sub-directory disk usage for multiple storage locations
+
+  :param list_of_dir_paths: A list of dictionary containing directory paths to check for disk usage
+                            e.g. [{'tag':'location1','path':'/path'}]
+  :param snapshot_dir: A directory path for recording usage snapshots of each location, default None
+  :param max_workers: Number of parallel sub-directory scans, default 4
+  :param dir_name_col: Column name for directory name, default directory_name
+  :param dir_size_col: Column name for directory size, default directory_size
+  :returns: A pandas dataframe with sub-directory names as index and one usage column (in GB)
+            for each storage location tag
+  '''
+  try:
+    tag_list = list()
+    usage_list = list()
     for entry in list_of_dir_paths:
       tag_name = entry.get('tag')
       path = entry.get('path')
+      if tag_name is None or path is None:
+        raise ValueError('Missing tag or path in entry {0}'.format(entry))
+      if tag_name in tag_list:
+        raise ValueError('Duplicate storage tag {0}'.format(tag_name))
+      tag_list.append(tag_name)
+      location_snapshot_dir = None
+      if snapshot_dir is not None:
+        location_snapshot_dir = \
+          os.path.join(snapshot_dir,tag_name)                                   # keep snapshots for each location
       storage_stats, _, _ = \
-        get_sub_directory_size_in_gb(input_path=path)
-      temp_df = pd.DataFrame(storage_stats,columns=['path',tag_name])
-      merged_df = \
-        merged_df.\
-        set_index('path').\
-        join(\
-          temp_df.set_index('path'),
-          how='outer').\
-        fillna(0).\
-        reset_index()
-    
+        get_sub_directory_size_in_gb(
+          input_path=path,
+          dir_name_col=dir_name_col,
+          dir_size_col=dir_size_col,
+          snapshot_dir=location_snapshot_dir,
+          max_workers=max_workers)
+      temp_df = \
+        pd.DataFrame(
+          storage_stats,
+          columns=[dir_name_col,dir_size_col])
+      temp_df['tag'] = tag_name
+      usage_list.append(temp_df)
+
+    usage_data = pd.concat(usage_list,ignore_index=True) \
+                 if len(usage_list) > 0 else pd.DataFrame()
+    if len(usage_data.index) == 0:
+      return pd.DataFrame(columns=tag_list,dtype=float)
+    usage_data = \
+      usage_data.\
+      pivot_table(
+        index=dir_name_col,
+        columns='tag',
+        values=dir_size_col,
+        aggfunc='sum',
+        fill_value=0).\
+      reindex(columns=tag_list,fill_value=0)                                    # merge all locations in one go
+    usage_data.columns.name = None
+    return usage_data
+  except:
+    raise
+
+
+def _fetch_project_user_and_flowcell_info(dbconf_file,chunk_size=10000):
+  '''
+  An internal function for fetching the primary user and the list of flowcells for all
+  projects. Duplicate rows are removed by the database, so the result has one row for each
+  project user and project flowcell pair, instead of one row per run
+
+  :param dbconf_file: A db config file path
+  :param chunk_size: Number of db records to fetch at a time, default 10000
+  :returns: A dataframe with project_igf_id, name and email_id columns, and a dataframe with
+            project_igf_id and flowcell_id columns
+  '''
+  try:
     dbparam = read_dbconf_json(dbconf_file)
     base = BaseAdaptor(**dbparam)
     base.start_session()
-    query = \
-    base.session.\
-    query(\
-      Project.project_igf_id,
-      User.name,
-      User.email_id,
-      Seqrun.flowcell_id).\
-    join(ProjectUser,Project.project_id==ProjectUser.project_id).\
-    join(User,User.user_id==ProjectUser.user_id).\
-    join(Sample,Project.project_id==Sample.project_id).\
-    join(Experiment,Sample.sample_id==Experiment.sample_id).\
-    join(Run,Experiment.experiment_id==Run.experiment_id).\
-    join(Seqrun,Run.seqrun_id==Seqrun.seqrun_id)
-    records = base.fetch_records(query=query)
+    user_query = \
+      base.session.\
+        query(
+          Project.project_igf_id,
+          User.name,
+          User.email_id).\
+        join(ProjectUser,Project.project_id==ProjectUser.project_id).\
+        join(User,User.user_id==ProjectUser.user_id).\
+        filter(ProjectUser.data_authority=='T').\
+        distinct()
+    project_user_data = \
+      pd.concat(
+        base.fetch_records(
+          query=user_query,
+          output_mode='dataframe_chunks',
+          chunk_size=chunk_size),
+        ignore_index=True)
+    flowcell_query = \
+      base.session.\
+        query(
+          Project.project_igf_id,
+          Seqrun.flowcell_id).\
+        join(Sample,Project.project_id==Sample.project_id).\
+        join(Experiment,Sample.sample_id==Experiment.sample_id).\
+        join(Run,Experiment.experiment_id==Run.experiment_id).\
+        join(Seqrun,Run.seqrun_id==Seqrun.seqrun_id).\
+        distinct()
+    project_flowcell_data = \
+      pd.concat(
+        base.fetch_records(
+          query=flowcell_query,
+          output_mode='dataframe_chunks',
+          chunk_size=chunk_size),
+        ignore_index=True)
     base.close_session()
-    final_df = \
-      merged_df.\
-      set_index('index').\
-      join(\
-        records.set_index('project_igf_id'),
-        how='outer').\
-      fillna(0)
-    final_df = \
-      final_df[final_df['email_id'] != 'igf@imperial.ac.uk']
-    project_grouped_data = \
-      final_df.\
-      drop_duplicates().\
-      reset_index().\
-      groupby('index').\
-      agg({\
-        'raw_data':'min',
-        'results_data':'min',
-        'name':'min',
-        'email_id':'min',
-        'flowcell_id':';'.join
-      })
-    user_groupped_data = \
-      project_grouped_data.\
-      reset_index().\
-      groupby('email_id').\
-      agg({\
-        'index':';'.join,
-        'raw_data':'sum',
-        'results_data':'sum',
-        'name':'min',
-        'flowcell_id':';'.join
-      })
-    formatted_df = \
-      user_groupped_data.\
-      apply(\
-        lambda x: \
-          __calculate_storage_costs(series=x,costs_unit=costs_unit),
-        axis=1).\
-      sort_values(\
-        'costs_pm',
-        ascending=False,
-        inplace=True)
-    formatted_data = \
-      formatted_df.\
-      reset_index().\
-      to_dict(orient='records')
-    return formatted_data
+    return project_user_data,project_flowcell_data
+  except:
+    raise
 
-  except Exception as e:
-    raise ValueError('Error: {0}'.format(e))
 
-def __calculate_storage_costs(series,costs_unit):
+def calculate_storage_costs(usage_data,project_user_data,project_flowcell_data,
+                            costs_unit=2.8,list_of_dir_paths=None,
+                            excluded_email_list=('igf@imperial.ac.uk',),
+                            unknown_user='UNKNOWN'):
+  '''
+  A function for calculating the storage costs of each user from project disk usage
+
+  :param usage_data: A dataframe with project names as index and one usage column (in GB) for
+                     each storage location tag
+  :param project_user_data: A dataframe with project_igf_id, name and email_id columns
+  :param project_flowcell_data: A dataframe with project_igf_id and flowcell_id columns
+  :param costs_unit: A cost unit per TB, default 2.8, or a dictionary of storage_class (or tag)
+                     and cost unit
+  :param list_of_dir_paths: A list of storage location dictionaries, for the storage_class lookup,
+                            default None
+  :param excluded_email_list: A list of user emails to exclude from the costs, default ('igf@imperial.ac.uk',)
+  :param unknown_user: Name and email for the directories without any project user, default UNKNOWN
+  :returns: A list of dictionaries, a list of column names and a dictionary of descriptions for gviz conversion
+  '''
   try:
-    raw_data = series.get('raw_data')
-    results_data = series.get('results_data')
-    if (raw_data + results_data) > 0:
-      costs_pm = (raw_data + results_data) * 2.8
-    else:
-      costs_pm = 0
-    series['costs_pm'] = costs_pm
-    return series
-  except Exception as e:
-    raise ValueError('Error: {0}'.format(e))
\ No newline at end of file
+    tag_list = list(usage_data.columns)
+    for tag_name in tag_list:
+      if tag_name in ('project_igf_id','name','email_id','costs_pm','flowcell_id'):
+        raise ValueError('Storage tag {0} is a reserved column name'.format(tag_name))
+    storage_class = dict()
+    if list_of_dir_paths is not None:
+      storage_class = {
+        entry.get('tag'):entry.get('storage_class',entry.get('tag'))
+          for entry in list_of_dir_paths}
+    tag_costs_unit = dict()
+    for tag_name in tag_list:
+      if isinstance(costs_unit,dict):
+        class_name = storage_class.get(tag_name,tag_name)
+        if class_name not in costs_unit:
+          raise ValueError('No cost unit found for storage {0}'.format(class_name))
+        tag_costs_unit[tag_name] = costs_unit.get(class_name)
+      else:
+        tag_costs_unit[tag_name] = costs_unit
+
+    project_data = usage_data.copy()
+    project_data['costs_pm'] = \
+      project_data[tag_list].\
+        div(1024).\
+        mul(pd.Series(tag_costs_unit),axis=1).\
+        sum(axis=1)                                                             # tiered costs per TB for all projects
+    project_data.index.name = 'project_igf_id'
+    project_data = project_data.reset_index()
+    project_data['project_igf_id'] = project_data['project_igf_id'].astype(str)
+    project_user_data = \
+      project_user_data[['project_igf_id','name','email_id']].\
+        drop_duplicates('project_igf_id')
+    project_data = \
+      project_data.merge(
+        project_user_data,
+        how='left',
+        on='project_igf_id')
+    project_data[['name','email_id']] = \
+      project_data[['name','email_id']].fillna(unknown_user)
+    project_data = \
+      project_data[~project_data['email_id'].isin(list(excluded_email_list))]
+    flowcell_data = \
+      project_flowcell_data.\
+        dropna().\
+        sort_values('flowcell_id').\
+        groupby('project_igf_id')['flowcell_id'].\
+        agg(';'.join).\
+        reset_index()
+    project_data = \
+      project_data.merge(
+        flowcell_data,
+        how='left',
+        on='project_igf_id')
+    project_data['flowcell_id'] = project_data['flowcell_id'].fillna('')
+
+    agg_dict = {tag_name:'sum' for tag_name in tag_list}
+    agg_dict.update({
+      'project_igf_id':';'.join,
+      'name':'min',
+      'costs_pm':'sum',
+      'flowcell_id':lambda x: ';'.join([f for f in x if f != ''])})
+    user_data = \
+      project_data.\
+        sort_values('project_igf_id').\
+        groupby('email_id').\
+        agg(agg_dict).\
+        reset_index().\
+        sort_values('costs_pm',ascending=False)
+    column_order = \
+      ['email_id','name','project_igf_id'] + tag_list + ['costs_pm','flowcell_id']
+    description = {
+      'email_id':('string','Email'),
+      'name':('string','Name'),
+      'project_igf_id':('string','Projects'),
+      'costs_pm':('number','Costs per month'),
+      'flowcell_id':('string','Flowcells')}
+    for tag_name in tag_list:
+      description.update({tag_name:('number','{0} (in GB)'.format(tag_name))})
+    formatted_data = user_data[column_order].to_dict(orient='records')
+    return formatted_data,column_order,description
+  except:
+    raise
@@ -1,5 +1,6 @@
-import re,string
+import os,re,string
 import pandas as pd
+from tempfile import mkstemp
 
 EXPERIMENT_TYPE_LOOKUP = \
 [{'library_preparation': 'WHOLE GENOME SEQUENCING - SAMPLE', 'library_type': 'WHOLE GENOME',
@@ -199,6 +200,15 @@ METADATA_COLUMNS = [
   'species_name'
   ]
 
+WHITESPACE_PATTERN = re.compile(r'\s+?')
+SAMPLE_NAME_CHARS_PATTERN = \
+  re.compile('[{0}]'.format(string.punctuation))
+TAG_NAME_CHARS_PATTERN = \
+  re.compile('[{0}]'.format(''.join(list(filter(lambda x: x != '_',string.punctuation)))))
+MULTIPLE_DASH_PATTERN = re.compile('-+')
+TRAILING_DASH_PATTERN = re.compile('-$')
+LEADING_DASH_PATTERN = re.compile('^-')
+
 
 class Reformat_metadata_file:
   '''
@@ -289,6 +299,8 @@ class Reformat_metadata_file:
     self.sample_description = sample_description
     self.species_text = species_text
     self.biomaterial_type = biomaterial_type
+    self._assay_lookup_tables = dict()
+    self._species_lookup_table = None
 
 
   @staticmethod
@@ -300,18 +312,12 @@ class Reformat_metadata_file:
     :returns: A string
     '''
     try:
-      restricted_chars = string.punctuation
-      pattern0 = re.compile(r'\s+?')
-      pattern1 = re.compile('[{0}]'.format(restricted_chars))
-      pattern2 = re.compile('-+')
-      pattern3 = re.compile('-$')
-      pattern4 = re.compile('^-')
       sample_name = \
-        re.sub(pattern4,'',
-          re.sub(pattern3,'',
-            re.sub(pattern2,'-',
-              re.sub(pattern1,'-',
-                re.sub(pattern0,'-',
+        re.sub(LEADING_DASH_PATTERN,'',
+          re.sub(TRAILING_DASH_PATTERN,'',
+            re.sub(MULTIPLE_DASH_PATTERN,'-',
+              re.sub(SAMPLE_NAME_CHARS_PATTERN,'-',
+                re.sub(WHITESPACE_PATTERN,'-',
                   sample_name)))))
       return sample_name
     except:
@@ -326,19 +332,12 @@ class Reformat_metadata_file:
     :returns: A string
     '''
     try:
-      restricted_chars = \
-        ''.join(list(filter(lambda x: x != '_',string.punctuation)))
-      pattern0 = re.compile(r'\s+?')
-      pattern1 = re.compile('[{0}]'.format(restricted_chars))
-      pattern2 = re.compile('-+')
-      pattern3 = re.compile('-$')
-      pattern4 = re.compile('^-')
       tag_name = \
-        re.sub(pattern4,'',
-          re.sub(pattern3,'',
-            re.sub(pattern2,'-',
-              re.sub(pattern1,'-',
-                re.sub(pattern0,'-',
+        re.sub(LEADING_DASH_PATTERN,'',
+          re.sub(TRAILING_DASH_PATTERN,'',
+            re.sub(MULTIPLE_DASH_PATTERN,'-',
+              re.sub(TAG_NAME_CHARS_PATTERN,'-',
+                re.sub(WHITESPACE_PATTERN,'-',
                   tag_name)))))
       return tag_name
     except:
@@ -478,7 +477,8 @@ class Reformat_metadata_file:
            biomaterial_type != 'UNKNOWN':
           row[self.biomaterial_type] = biomaterial_type
 
-      if self.species_name in row.keys():
+      if self.species_name in row.keys() or \
+         self.species_text in row.keys():
         row[self.taxon_id],row[self.scientific_name],row[self.species_name] = \
           self.get_species_info(\
             species_text_val=row[self.species_text])
@@ -491,11 +491,6 @@ class Reformat_metadata_file:
       #      self.calculate_insert_length_from_fragment(\
       #        fragment_length=row[self.fragment_length_distribution_mean])
 
-      if self.species_text in row.keys():
-        row[self.taxon_id],row[self.scientific_name],row[self.species_name] = \
-          self.get_species_info(\
-            species_text_val=row[self.species_text])
-
       if self.expected_reads in row.keys() and \
         (row[self.expected_reads] == '' or row[self.expected_reads] == 0):
         row[self.expected_reads] = self.default_expected_reads
@@ -509,62 +504,313 @@ class Reformat_metadata_file:
     except Exception as e:
       raise ValueError('Failed to reformat row: {0}, error: {1}'.format(row,e))
 
-  def reformat_raw_metadata_file(self,output_file):
+  @staticmethod
+  def _reformat_tag_column(data_series,restricted_chars_pattern):
+    '''
+    An internal static method for reformatting a column of sample or project names
+
+    :param data_series: A Pandas Series of strings
+    :param restricted_chars_pattern: A compiled regex for the restricted characters
+    :returns: A Pandas Series
+    '''
+    return \
+      data_series.\
+        str.replace(WHITESPACE_PATTERN,'-').\
+        str.replace(restricted_chars_pattern,'-').\
+        str.replace(MULTIPLE_DASH_PATTERN,'-').\
+        str.replace(TRAILING_DASH_PATTERN,'').\
+        str.replace(LEADING_DASH_PATTERN,'')
+
+  def _get_assay_lookup_table(self,key):
+    '''
+    An internal method for fetching a memoized assay lookup table for a key column
+
+    :param key: A column name from the experiment type lookup table
+    :returns: A Pandas DataFrame indexed by the key column values, with columns
+              library_source, library_strategy, experiment_type and biomaterial_type
+    '''
+    if key not in self._assay_lookup_tables:
+      if key not in self.experiment_type_lookup.columns:
+        raise KeyError('Missing column {0} in experiment type lookup'.format(key))
+
+      table = dict()
+      for record in self.experiment_type_lookup.to_dict(orient='records'):
+        val = record.get(key)
+        if pd.isnull(val) or val in table:
+          continue                                                              # keep only the first matching record
+        table[val] = \
+          [record.get(self.library_source) or 'UNKNOWN',
+           record.get(self.library_strategy) or 'UNKNOWN',
+           record.get(self.experiment_type) or 'UNKNOWN',
+           record.get(self.biomaterial_type) or 'UNKNOWN']
+      self._assay_lookup_tables[key] = \
+        pd.DataFrame.from_dict(
+          table,
+          orient='index',
+          columns=[self.library_source,
+                   self.library_strategy,
+                   self.experiment_type,
+                   self.biomaterial_type])
+    return self._assay_lookup_tables[key]
+
+  def _get_species_lookup_table(self):
+    '''
+    An internal method for fetching the memoized species lookup table
+
+    :returns: A Pandas DataFrame indexed by the species_text values, with columns
+              taxon_id, scientific_name and species_name
+    '''
+    if self._species_lookup_table is None:
+      table = dict()
+      for record in self.species_lookup.to_dict(orient='records'):
+        val = record.get(self.species_text)
+        if pd.isnull(val) or val in table:
+          continue                                                              # keep only the first matching record
+        table[val] = \
+          [str(record.get(self.taxon_id) or 'UNKNOWN'),
+           record.get(self.scientific_name) or 'UNKNOWN',
+           record.get(self.species_name) or 'UNKNOWN']
+      self._species_lookup_table = \
+        pd.DataFrame.from_dict(
+          table,
+          orient='index',
+          columns=[self.taxon_id,
+                   self.scientific_name,
+                   self.species_name])
+    return self._species_lookup_table
+
+  @staticmethod
+  def _join_lookup_table(keys,lookup_table):
+    '''
+    An internal static method for joining a column of lookup keys with a lookup table
+
+    :param keys: A Pandas Series of lookup keys
+    :param lookup_table: A Pandas DataFrame indexed by lookup keys
+    :returns: A Pandas DataFrame with the same index as keys, UNKNOWN for missing keys
+    '''
+    matched = lookup_table.reindex(keys.values)
+    matched.index = keys.index
+    matched.loc[~keys.isin(lookup_table.index)] = 'UNKNOWN'
+    return matched
+
+  def populate_metadata_columns(self,data):
+    '''
+    A method for populating metadata columns for all the rows of a DataFrame.
+    This is the column-wise equivalent of the populate_metadata_values method
+
+    :param data: A Pandas DataFrame with all the empty values filled with ''
+    :returns: A Pandas DataFrame
     '''
-    A method for reformatting raw metadata file and print a corrected output
+    try:
+      if not isinstance(data,pd.DataFrame):
+        raise TypeError('Expecting a pandas dataframe and got {0}'.format(type(data)))
+
+      data = data.copy()
+      if self.sample_igf_id in data.columns:
+        data[self.sample_igf_id] = \
+          self._reformat_tag_column(
+            data_series=data[self.sample_igf_id],
+            restricted_chars_pattern=TAG_NAME_CHARS_PATTERN)
+
+      if self.project_igf_id in data.columns:
+        data[self.project_igf_id] = \
+          self._reformat_tag_column(
+            data_series=data[self.project_igf_id],
+            restricted_chars_pattern=TAG_NAME_CHARS_PATTERN)
+
+      if self.sample_submitter_id in data.columns:
+        data[self.sample_submitter_id] = \
+          self._reformat_tag_column(
+            data_series=data[self.sample_submitter_id],
+            restricted_chars_pattern=SAMPLE_NAME_CHARS_PATTERN)
+
+      if self.library_preparation in data.columns and \
+         self.library_type in data.columns and \
+         self.sample_description in data.columns:
+        library_preparation_val = \
+          data[self.library_preparation].str.strip().str.upper()
+        sample_description_val = \
+          data[self.sample_description].str.strip().str.upper()
+        library_type_val = \
+          data[self.library_type].str.strip().str.upper()
+        use_library_type = \
+          (library_preparation_val == 'NOT APPLICABLE') & \
+          (sample_description_val == 'PRE MADE LIBRARY')
+        use_library_preparation = \
+          (~use_library_type) & \
+          (library_preparation_val != 'NOT APPLICABLE') & \
+          (library_preparation_val != '')
+        use_experiment_type = \
+          (~use_library_type) & (~use_library_preparation)
+        assay_info = list()
+        for key,mask,keys in (
+            (self.library_type,use_library_type,library_type_val),
+            (self.library_preparation,use_library_preparation,library_preparation_val),
+            (self.experiment_type,use_experiment_type,pd.Series('UNKNOWN',index=data.index))):
+          if mask.any():
+            assay_info.append(
+              self._join_lookup_table(
+                keys=keys[mask],
+                lookup_table=self._get_assay_lookup_table(key=key)))
+        assay_info = \
+          pd.concat(assay_info).reindex(data.index) \
+            if len(assay_info) > 0 else \
+              self._get_assay_lookup_table(key=self.experiment_type).reindex([])
+        data[self.library_source] = assay_info[self.library_source]
+        data[self.library_strategy] = assay_info[self.library_strategy]
+        data[self.experiment_type] = assay_info[self.experiment_type]
+        if self.biomaterial_type in data.columns:
+          biomaterial_type = assay_info[self.biomaterial_type]
+          update_biomaterial = \
+            ((data[self.biomaterial_type] == '') | \
+             (data[self.biomaterial_type].str.upper() == 'UNKNOWN')) & \
+            (biomaterial_type != 'UNKNOWN')
+          data.loc[update_biomaterial,self.biomaterial_type] = \
+            biomaterial_type[update_biomaterial]
+
+      if self.species_name in data.columns or \
+         self.species_text in data.columns:
+        if self.species_text not in data.columns:
+          raise KeyError('Missing column {0}'.format(self.species_text))
+        species_info = \
+          self._join_lookup_table(
+            keys=data[self.species_text].str.upper(),
+            lookup_table=self._get_species_lookup_table())
+        data[self.taxon_id] = species_info[self.taxon_id]
+        data[self.scientific_name] = species_info[self.scientific_name]
+        data[self.species_name] = species_info[self.species_name]
+
+      if self.expected_reads in data.columns:
+        data[self.expected_reads] = data[self.expected_reads].astype(object)
+        data.loc[(data[self.expected_reads] == '') | \
+                 (data[self.expected_reads] == 0),
+                 self.expected_reads] = self.default_expected_reads
+
+      if self.expected_lanes in data.columns:
+        data[self.expected_lanes] = data[self.expected_lanes].astype(object)
+        data.loc[(data[self.expected_lanes] == '') | \
+                 (data[self.expected_lanes] == 0),
+                 self.expected_lanes] = self.default_expected_lanes
+
+      return data
+    except Exception as e:
+      raise ValueError('Failed to reformat metadata columns, error: {0}'.format(e))
+
+  def _add_missing_metadata_columns(self,data):
+    '''
+    An internal method for adding the missing metadata columns with default values
+
+    :param data: A Pandas DataFrame
+    :returns: A Pandas DataFrame
+    '''
+    for field in self.metadata_columns:
+      if field not in data.columns:
+        if field in ('expected_reads',
+                     'expected_lanes',
+                     'insert_length',
+                     'fragment_length_distribution_mean',
+                     'fragment_length_distribution_sd'):
+          data[field] = 0
+        else:
+          data[field] = ''
+    return data
+
+  def reformat_raw_metadata_file(self,output_file,chunk_size=None):
+    '''
+    A method for reformatting raw metadata file and print a corrected output.
+    Reformatted chunks are written to a temp file next to the output file as soon as they
+    are ready, and the empty metadata columns are removed while copying it to the output file
 
     :param output_file: An output filepath
+    :param chunk_size: Number of rows to read and reformat at a time, default None for all rows
     :returns: None
     '''
     try:
+      temp_fd,temp_file = \
+        mkstemp(
+          dir=os.path.dirname(os.path.abspath(output_file)),
+          prefix='.{0}.'.format(os.path.basename(output_file)),
+          suffix='.tmp')
+      os.close(temp_fd)
       try:
-        data = pd.read_csv(self.infile,dtype=object,header=0)
-      except Exception as e:
-        raise ValueError('Failed to parse input file {0}, error {1}'.format(self.infile,e))
-
-      for field in self.metadata_columns:
-        if field not in data.columns:
-          if field in ('expected_reads',
-                       'expected_lanes',
-                       'insert_length',
-                       'fragment_length_distribution_mean',
-                       'fragment_length_distribution_sd'):
-            data[field] = 0
+        column_names = None
+        non_empty_columns = set()
+        try:
+          if chunk_size is None:
+            data_chunks = [pd.read_csv(self.infile,dtype=object,header=0)]
           else:
-            data[field] = ''
-
-      data = \
-        data.\
-        fillna('').\
-        apply(lambda x: \
-          self.populate_metadata_values(row=x),
-          axis=1,
-          result_type='reduce')                                                 # update metadata info
-
-      if self.expected_lanes in data.columns:
-        data[self.expected_lanes] = \
-          data[self.expected_lanes].\
-            astype(float).\
-              astype(int)                                                       # expected_lanes should be int
-
-      for field in self.metadata_columns:
-        total_row_count = data[field].count()
-        empty_keys = 0
-        counts = data[field].value_counts().to_dict()
-        for key,val in counts.items():
-          if key in ('unknown','UNKNOWN',''):
-            empty_keys += val
-
-        if total_row_count == empty_keys:
-          data.drop(field,axis=1,inplace=True)                                  # clean up empty columns
-
-      column_names = \
-        [column_name \
-          for column_name in data.columns \
-            if column_name in self.metadata_columns]                            # filter output columns
-      if len(column_names) == 0:
-        raise ValueError('No target metadata column found on the reformatted data')
-
-      data[column_names].to_csv(output_file,index=False)                        # filter columns and print new metadata file
+            data_chunks = \
+              pd.read_csv(
+                self.infile,
+                dtype=object,
+                header=0,
+                chunksize=chunk_size)
+          for index,chunk in enumerate(data_chunks):
+            data = \
+              self._add_missing_metadata_columns(data=chunk).\
+                fillna('')
+            data = \
+              self.populate_metadata_columns(data=data)                         # update metadata info
+            if self.expected_lanes in data.columns:
+              data[self.expected_lanes] = \
+                data[self.expected_lanes].\
+                  astype(float).\
+                    astype(int)                                                 # expected_lanes should be int
+            if column_names is None:
+              column_names = \
+                [column_name \
+                  for column_name in data.columns \
+                    if column_name in self.metadata_columns]                    # filter output columns
+            for field in column_names:
+              if field not in non_empty_columns and \
+                 (data[field].notnull() & \
+                  ~data[field].isin(['unknown','UNKNOWN',''])).any():
+                non_empty_columns.add(field)                                    # column has metadata values
+            data[column_names].\
+              to_csv(
+                temp_file,
+                index=False,
+                header=index == 0,
+                mode='a')                                                       # write header with first chunk
+        except Exception as e:
+          raise ValueError('Failed to parse input file {0}, error {1}'.format(self.infile,e))
+
+        if column_names is None:
+          column_names = list()
+        output_columns = \
+          [column_name \
+            for column_name in column_names \
+              if column_name in non_empty_columns]                              # clean up empty columns
+        if len(output_columns) == 0:
+          raise ValueError('No target metadata column found on the reformatted data')
+
+        if output_columns == column_names:
+          os.replace(temp_file,output_file)
+        else:
+          if chunk_size is None:
+            temp_chunks = \
+              [pd.read_csv(
+                 temp_file,
+                 dtype=object,
+                 na_filter=False,
+                 usecols=output_columns)]
+          else:
+            temp_chunks = \
+              pd.read_csv(
+                temp_file,
+                dtype=object,
+                na_filter=False,
+                usecols=output_columns,
+                chunksize=chunk_size)
+          with open(output_file,'w') as fp:
+            for index,chunk in enumerate(temp_chunks):
+              chunk[output_columns].\
+                to_csv(
+                  fp,
+                  index=False,
+                  header=index == 0)                                            # filter columns and print new metadata file
+      finally:
+        if os.path.exists(temp_file):
+          os.remove(temp_file)
     except Exception as e:
       raise ValueError('Failed to remormat file {0}, error {1}'.format(self.infile,e))
\ No newline at end of file
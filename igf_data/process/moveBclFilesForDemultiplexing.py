@@ -1,7 +1,8 @@
-import os, re
+import os, re, json, time, fcntl, hashlib, socket
 from shutil import copy, copytree
 from igf_data.illumina.samplesheet import SampleSheet
 from igf_data.illumina.runinfo_xml import RunInfo_xml
+from igf_data.utils.fileutils import link_or_copy_local_file,remove_dir
 
 class moveBclFilesForDemultiplexing:
   def __init__(self,input_dir,output_dir,samplesheet,run_info_xml,platform_model=None):
@@ -12,26 +13,55 @@ class moveBclFilesForDemultiplexing:
     self.platform_model=platform_model
 
 
-  def copy_bcl_files(self):
+  def copy_bcl_files(self,staging_mode='copy',output_dir=None):
     '''
     Function for copying BCL files to the output directory
+
+    :param staging_mode: Staging mode for the BCL files, default copy
+                         copy: copy all the files and dirs
+                         symlink: create new dirs and symlink all the files
+                         hardlink: create new dirs and hard link all the files, files are
+                                   copied if hard link or reflink is not possible
+    :param output_dir: Output dir path, default None for using the output_dir of the class
+    :returns: A dictionary containing bytes staged by symlink, hardlink, reflink and copy
     '''
     try:
       input_dir      = self.input_dir
-      output_dir     = self.output_dir
+      if output_dir is None:
+        output_dir   = self.output_dir
       bcl_files_list = self._generate_platform_specific_list()
+      staged_bytes   = dict()
 
       if len(bcl_files_list)==0:
         raise ValueError('no file list found for samplesheet {0}'.\
                          format(self.input_dir))
-  
+
+      if staging_mode not in ('copy','symlink','hardlink'):
+        raise ValueError('staging mode {0} is not supported'.\
+                         format(staging_mode))
+
       for bcl_entity in bcl_files_list:
         input_target=os.path.join(input_dir,bcl_entity)
 
-        if os.path.isdir(input_target):          
+        if staging_mode != 'copy':
+          # link files
+          entity_staged_bytes = \
+            link_or_copy_local_file(
+              input_target,
+              os.path.join(output_dir, bcl_entity),
+              use_symlink=staging_mode=='symlink')
+          for key,value in entity_staged_bytes.items():
+            staged_bytes[key] = staged_bytes.get(key,0) + value
+
+        elif os.path.isdir(input_target):
           # copy dir
           output_target=os.path.join(output_dir, bcl_entity)
-          copytree(input_target, output_target)   
+          copytree(input_target, output_target)
+          staged_bytes['copy'] = \
+            staged_bytes.get('copy',0) + \
+            sum([os.path.getsize(os.path.join(root,file_name))
+                   for root,_,files in os.walk(input_target)
+                     for file_name in files])
 
         else:
           output_target=os.path.join(output_dir, os.path.dirname(bcl_entity))
@@ -40,9 +70,176 @@ class moveBclFilesForDemultiplexing:
             os.makedirs(output_target)
           # copy file
           copy(input_target, output_target)
+          staged_bytes['copy'] = \
+            staged_bytes.get('copy',0) + os.path.getsize(input_target)
+
+      return staged_bytes
+    except:
+      raise
+
+
+  def _get_shared_staging_paths(self):
+    '''
+    An internal method for getting the shared staging dir, lock file and holder file paths.
+    The staging dir name is derived from the input dir and the list of BCL files, so
+    jobs with the same input files share the same dir
+
+    :returns: A shared staging dir path, a lock file path and a holder file path
+    '''
+    bcl_files_list = self._generate_platform_specific_list()
+    staging_tag = \
+      hashlib.md5(
+        '{0}:{1}'.format(
+          os.path.realpath(self.input_dir),
+          ','.join(sorted(bcl_files_list))).encode('utf-8')).\
+      hexdigest()
+    staging_dir = \
+      os.path.join(
+        self.output_dir,
+        'bcl_staging_{0}'.format(staging_tag))
+    return staging_dir,\
+           '{0}.lock'.format(staging_dir),\
+           '{0}.holders.json'.format(staging_dir)
+
+
+  @staticmethod
+  def _get_default_holder_id():
+    '''
+    An internal static method for getting a default holder id for shared staging dir
+
+    :returns: A string containing hostname and process id
+    '''
+    return '{0}:{1}'.format(socket.gethostname(),os.getpid())
+
+
+  def stage_shared_bcl_files(self,staging_mode='symlink',holder_id=None,
+                             holder_timeout=172800):
+    '''
+    A method for staging BCL files in a shared dir under the output_dir. Concurrent jobs
+    for the same input files use the same staged dir, which is created by the first job
+    and removed by the last job, after calling release_shared_bcl_files. Holders from
+    killed jobs are dropped before reusing the staged dir, see _get_live_holders
+
+    :param staging_mode: Staging mode for the BCL files, default symlink, see copy_bcl_files
+    :param holder_id: A unique id for the job using the staged dir, default None for hostname:pid
+    :param holder_timeout: Max age in seconds for holders from other hosts, default 172800
+    :returns: A staged dir path and a dictionary containing bytes staged by this job
+    '''
+    try:
+      if holder_id is None:
+        holder_id = self._get_default_holder_id()
+      if not os.path.exists(self.output_dir):
+        os.makedirs(self.output_dir,mode=0o770)
+      staging_dir,lock_file,holder_file = \
+        self._get_shared_staging_paths()
+      staged_bytes = dict()
+      with open(lock_file,'a') as lock_fp:
+        fcntl.flock(lock_fp,fcntl.LOCK_EX)                                      # wait for other jobs staging files
+        try:
+          holders = \
+            self._get_live_holders(
+              holder_file=holder_file,
+              holder_timeout=holder_timeout)
+          if len(holders) == 0 or \
+             not os.path.exists(staging_dir):
+            holders = dict()
+            if os.path.exists(staging_dir):
+              remove_dir(staging_dir)                                           # remove partial or leaked staging
+            staged_bytes = \
+              self.copy_bcl_files(
+                staging_mode=staging_mode,
+                output_dir=staging_dir)
+          holders.update({
+            holder_id:{
+              'hostname':socket.gethostname(),
+              'pid':os.getpid(),
+              'timestamp':time.time()}})
+          with open(holder_file,'w') as fp:
+            json.dump(holders,fp)
+        finally:
+          fcntl.flock(lock_fp,fcntl.LOCK_UN)
+      return staging_dir,staged_bytes
+    except Exception as e:
+      raise ValueError(
+              'Failed to stage shared bcl files for {0}, error: {1}'.\
+                format(self.input_dir,e))
+
+
+  def release_shared_bcl_files(self,holder_id=None,holder_timeout=172800):
+    '''
+    A method for releasing the shared staged dir. The dir is removed if there
+    are no other live jobs using it
+
+    :param holder_id: The id used for stage_shared_bcl_files, default None for hostname:pid
+    :param holder_timeout: Max age in seconds for holders from other hosts, default 172800
+    :returns: True if the staged dir is removed, else False
+    '''
+    try:
+      if holder_id is None:
+        holder_id = self._get_default_holder_id()
+      staging_dir,lock_file,holder_file = \
+        self._get_shared_staging_paths()
+      if not os.path.exists(lock_file):
+        return False
+      with open(lock_file,'a') as lock_fp:
+        fcntl.flock(lock_fp,fcntl.LOCK_EX)
+        try:
+          holders = \
+            self._get_live_holders(
+              holder_file=holder_file,
+              holder_timeout=holder_timeout)
+          holders.pop(holder_id,None)
+          if len(holders) > 0:
+            with open(holder_file,'w') as fp:
+              json.dump(holders,fp)
+            return False
+          if os.path.exists(staging_dir):
+            remove_dir(staging_dir)                                             # last job removes the staged dir
+          if os.path.exists(holder_file):
+            os.remove(holder_file)
+          return True
+        finally:
+          fcntl.flock(lock_fp,fcntl.LOCK_UN)
+    except Exception as e:
+      raise ValueError(
+              'Failed to release shared bcl files for {0}, error: {1}'.\
+                format(self.input_dir,e))
+
+
+  @staticmethod
+  def _get_live_holders(holder_file,holder_timeout=172800):
+    '''
+    An internal static method for reading the holders of a shared staged dir and dropping
+    the holders from killed jobs. Holders on the same host are checked using their pid,
+    and holders from other hosts are dropped if they are older than holder_timeout
+
+    :param holder_file: A holder json file path
+    :param holder_timeout: Max age in seconds for holders from other hosts, default 172800
+    :returns: A dictionary of live holder ids and their hostname, pid and timestamp
+    '''
+    try:
+      if not os.path.exists(holder_file):
+        return dict()
+      with open(holder_file,'r') as fp:
+        holders = json.load(fp)
+      hostname = socket.gethostname()
+      live_holders = dict()
+      for holder_id,holder in holders.items():
+        if holder.get('hostname') == hostname:
+          try:
+            os.kill(holder.get('pid'),0)                                        # check if the process is running
+          except ProcessLookupError:
+            continue
+          except PermissionError:
+            pass                                                                # process owned by another user
+        elif time.time() - holder.get('timestamp') > holder_timeout:
+          continue
+        live_holders.update({holder_id:holder})
+      return live_holders
     except:
-      raise    
-         
+      raise
+
+
   def _generate_platform_specific_list(self, lane_list=()):
     '''
     An internal function for getting list of files and directories specific for each platform
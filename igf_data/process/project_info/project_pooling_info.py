@@ -19,6 +19,7 @@ class Project_pooling_info:
   :param total_read_tag: Label for total read count tag, default total_read
   :param project_column: Label for project column in dataframe, default project
   :param remote_prefix: URI refix for projects, default http://eliot.med.ic.ac.uk/report/project/
+  :param chunk_size: Number of db records to fetch at a time, default 10000
   '''
   def __init__(self,dbconfig_file,
                platform_list=('HISEQ4000','NEXTSEQ'),
@@ -26,7 +27,8 @@ class Project_pooling_info:
                r1_read_tag='R1_READ_COUNT',
                total_read_tag='total_read',
                project_column='project',
-               remote_prefix='http://eliot.med.ic.ac.uk/report/project/'
+               remote_prefix='http://eliot.med.ic.ac.uk/report/project/',
+               chunk_size=10000
               ):
     self.dbconfig_file=dbconfig_file
     self.platform_list=list(platform_list)
@@ -35,6 +37,7 @@ class Project_pooling_info:
     self.total_read_tag=total_read_tag
     self.project_column=project_column
     self.remote_prefix=remote_prefix
+    self.chunk_size=chunk_size
 
   def _fetch_project_info_from_db(self):
     '''
@@ -67,8 +70,13 @@ class Project_pooling_info:
               filter(Sample_attribute.attribute_name==self.expected_read_tag).\
               filter((Run_attribute.attribute_name==self.r1_read_tag)|(Run_attribute.attribute_name.is_(None))).\
               group_by(Sample.sample_igf_id)
-      records = sa.fetch_records(query=query,
-                                 output_mode='dataframe')
+      records = \
+        pd.concat(
+          sa.fetch_records(
+            query=query,
+            output_mode='dataframe_chunks',
+            chunk_size=self.chunk_size),
+          ignore_index=True)                                                    # fetch all samples in chunks
       sa.close_session()
       records[self.total_read_tag] = records[self.total_read_tag].fillna(0).astype(int)
       return records
@@ -158,7 +166,7 @@ class Project_pooling_info:
       records['fail_samples'] = records['fail_samples'].astype(int)
       records['zero_samples'] = records['zero_samples'].astype(int)
       convert_to_gviz_json_for_display(\
-        data=records.to_dict(orient='records'),
+        data=records,
         description={'project' : ('string','Project'),
                      'total_samples': ('number','Total samples'),
                      'expected_read': ('number','Expected reads'),
@@ -2,7 +2,7 @@ import re
 import pandas as pd
 from shlex import quote
 from copy import deepcopy
-import os,subprocess,fnmatch,warnings,string
+import os,subprocess,fnmatch,warnings,string,time
 from igf_data.utils.dbutils import read_dbconf_json
 from igf_data.igfdb.baseadaptor import BaseAdaptor
 from igf_data.igfdb.fileadaptor import FileAdaptor
@@ -104,11 +104,13 @@ class Find_and_register_new_project_data:
       for project_info_file in new_project_info_list:
         try:
           new_data=self._read_project_info_and_get_new_entries(project_info_file) # get new project, user and samples information
-          self._check_and_register_data(data=new_data,\
-                                        project_info_file=project_info_file)    # register data
+          load_stats=\
+            self._check_and_register_data(data=new_data,\
+                                          project_info_file=project_info_file)  # register data
           if self.log_slack:
-            message='loaded new metadata from file {0}'.\
-                  format(os.path.basename(project_info_file))
+            message='loaded new metadata from file {0}, {1}'.\
+                  format(os.path.basename(project_info_file),\
+                         self._format_load_stats(load_stats))
             self.igf_slack.post_message_to_channel(message,reaction='pass')
 
         except Exception as e:                                                  # if error found in one file, skip the file
@@ -214,6 +216,119 @@ class Find_and_register_new_project_data:
       raise
   
   
+  def _check_existing_data_in_bulk(self,data,dbsession,table_name,check_column='EXISTS'):
+    '''
+    An internal function for checking existing project info in bulk.
+    It fetches all the existing keys for the dataframe using a few IN queries,
+    instead of checking each row separately
+
+    :param data: A pandas dataframe
+    :param dbsession: A sqlalchemy database session object
+    :param table_name: A database table name
+    :param check_column: Column name for existing data
+    :returns: A pandas dataframe with the additional check_column
+    '''
+    try:
+      if not isinstance(data, pd.DataFrame):
+        raise ValueError('Expecting a dataframe and got {0}'.format(type(data)))
+      data=data.copy()
+      if table_name=='project':
+        if self.project_lookup_column not in data or \
+           data[self.project_lookup_column].isnull().any():
+          raise ValueError('Missing or empty required column {0}'.\
+                           format(self.project_lookup_column))
+        pa=ProjectAdaptor(**{'session':dbsession})                              # connect to project adaptor
+        existing_projects=\
+          pa.fetch_existing_project_igf_ids(\
+            project_igf_ids=data[self.project_lookup_column].tolist())
+        data[check_column]=\
+          data[self.project_lookup_column].isin(existing_projects)
+      elif table_name=='user':
+        if self.user_lookup_column not in data or \
+           data[self.user_lookup_column].isnull().any():
+          raise ValueError('Missing or empty required column {0}'.\
+                           format(self.user_lookup_column))
+        ua=UserAdaptor(**{'session':dbsession})                                 # connect to user adaptor
+        existing_users=\
+          ua.fetch_existing_user_email_ids(\
+            email_ids=data[self.user_lookup_column].tolist())
+        data[check_column]=\
+          data[self.user_lookup_column].isin(existing_users)
+      elif table_name=='sample':
+        if self.sample_lookup_column not in data or \
+           data[self.sample_lookup_column].isnull().any():
+          raise ValueError('Missing or empty required column {0}'.\
+                           format(self.sample_lookup_column))
+        sa=SampleAdaptor(**{'session':dbsession})                               # connect to sample adaptor
+        existing_samples=\
+          sa.fetch_sample_and_project_igf_ids(\
+            sample_igf_ids=data[self.sample_lookup_column].tolist())
+        sample_project_map=\
+          dict(zip(existing_samples['sample_igf_id'].values,\
+                   existing_samples['project_igf_id'].values))
+        sample_exists=\
+          data[self.sample_lookup_column].isin(sample_project_map.keys())
+        sample_project_exists=\
+          sample_exists & \
+          (data[self.sample_lookup_column].map(sample_project_map)==\
+           data[self.project_lookup_column])                                    # check for existing sample_id and project-id combination
+        if (sample_exists & ~sample_project_exists).any():
+          row=data[sample_exists & ~sample_project_exists].iloc[0]
+          raise ValueError('Sample {0} exists in database but not associated with project {1}'.\
+                           format(row[self.sample_lookup_column],\
+                                  row[self.project_lookup_column]))             # inconsistency in sample project combination
+        data[check_column]=sample_project_exists
+      elif table_name=='project_user':
+        if self.user_lookup_column not in data or \
+           data[self.user_lookup_column].isnull().any() or \
+           self.project_lookup_column not in data or \
+           data[self.project_lookup_column].isnull().any():
+          raise ValueError('Missing or empty required column {0}, {1}'.\
+                           format(self.project_lookup_column,\
+                                  self.user_lookup_column))
+        pa=ProjectAdaptor(**{'session':dbsession})                              # connect to project adaptor
+        existing_project_users=\
+          pa.fetch_existing_project_users(\
+            project_igf_ids=data[self.project_lookup_column].tolist())
+        existing_project_users=\
+          set(zip(existing_project_users['project_igf_id'].values,\
+                  existing_project_users['email_id'].values))
+        if self.data_authority_column not in data:
+          data[self.data_authority_column]=None
+        data_authority_mask=\
+          (data[self.user_lookup_column]!=self.default_user_email) & \
+          (data[self.data_authority_column].isnull())
+        data.loc[data_authority_mask,self.data_authority_column]=True           # set user as data authority, filter default user
+        data[check_column]=\
+          [(project_igf_id,user_email) in existing_project_users
+             for project_igf_id,user_email in \
+               zip(data[self.project_lookup_column].values,\
+                   data[self.user_lookup_column].values)]
+      else:
+        raise ValueError('table {0} not supported'.format(table_name))
+      return data
+    except:
+      raise
+
+
+  @staticmethod
+  def _format_load_stats(load_stats):
+    '''
+    An internal staticmethod for formatting the data loading stats
+
+    :param load_stats: A dictionary containing the new record counts and timings
+    :returns: A string
+    '''
+    return 'new projects: {0}, users: {1}, project users: {2}, samples: {3}, '\
+           'check time: {4:.2f}s, load time: {5:.2f}s'.\
+             format(load_stats.get('project'),
+                    load_stats.get('user'),
+                    load_stats.get('project_user'),
+                    load_stats.get('sample'),
+                    load_stats.get('check_time'),
+                    load_stats.get('load_time'))
+
+
   def _notify_about_new_user_account(self,data,user_col='username',\
                            password_col='password',hpc_user_col='hpc_username',\
                            name_col='name',email_id_col='email_id'):
@@ -493,6 +608,8 @@ class Find_and_register_new_project_data:
   def _check_and_register_data(self,data,project_info_file):
     '''
     An internal method for checking and registering data
+    All the existing records are checked in bulk and the new records are
+    loaded with bulk inserts, in a single transaction
 
     :param data: A dictionary containing following keys
     
@@ -501,6 +618,8 @@ class Find_and_register_new_project_data:
           project_user_data
           sample_data
     :param project_info_file: A filepath for project info
+    :returns: A dictionary containing the counts of new project, user,
+              project_user and sample records and the check_time and load_time in seconds
     '''
     try:
       db_connected=False
@@ -511,17 +630,16 @@ class Find_and_register_new_project_data:
       base=BaseAdaptor(**{'session_class':self.session_class})
       base.start_session()                                                      # connect_to db
       db_connected=True
+      check_start=time.time()
       project_data=project_data[project_data[self.project_lookup_column].isnull()==False]
       project_data=project_data.drop_duplicates()
       if project_data.index.size > 0:
-        project_data=project_data.\
-                     apply(lambda x: \
-                           self._check_existing_data(\
-                              data=x,\
-                              dbsession=base.session, \
-                              table_name='project',
-                              check_column='EXISTS'),\
-                           axis=1)                                              # get project map
+        project_data=\
+          self._check_existing_data_in_bulk(\
+            data=project_data,\
+            dbsession=base.session,\
+            table_name='project',\
+            check_column='EXISTS')                                              # get project map
         project_data=project_data[project_data['EXISTS']==False]                # filter existing projects
         project_data.drop('EXISTS', axis=1, inplace=True)                       # remove extra column
 
@@ -531,28 +649,24 @@ class Find_and_register_new_project_data:
         user_data=user_data.apply(lambda x: \
                                 self._assign_username_and_password(x), \
                                 axis=1)                                         # check for use account and password
-        user_data=user_data.\
-                  apply(lambda x: \
-                        self._check_existing_data(\
-                              data=x,\
-                              dbsession=base.session, \
-                              table_name='user',
-                              check_column='EXISTS'),\
-                        axis=1)                                                 # get user map
+        user_data=\
+          self._check_existing_data_in_bulk(\
+            data=user_data,\
+            dbsession=base.session,\
+            table_name='user',\
+            check_column='EXISTS')                                              # get user map
         user_data=user_data[user_data['EXISTS']==False]                         # filter existing users
         user_data.drop('EXISTS', axis=1, inplace=True)                          # remove extra column
 
       sample_data=sample_data[sample_data[self.sample_lookup_column].isnull()==False]
       sample_data=sample_data.drop_duplicates()
       if sample_data.index.size > 0:
-        sample_data=sample_data.\
-                     apply(lambda x: \
-                           self._check_existing_data(\
-                              data=x,\
-                              dbsession=base.session, \
-                              table_name='sample',
-                              check_column='EXISTS'),\
-                           axis=1)                                              # get sample map
+        sample_data=\
+          self._check_existing_data_in_bulk(\
+            data=sample_data,\
+            dbsession=base.session,\
+            table_name='sample',\
+            check_column='EXISTS')                                              # get sample map
         sample_data=sample_data[sample_data['EXISTS']==False]                   # filter existing samples
         sample_data.drop('EXISTS', axis=1, inplace=True)                        # remove extra column
 
@@ -562,33 +676,40 @@ class Find_and_register_new_project_data:
       project_user_data=project_user_data[project_user_data_mask]               # not allowing any empty values for project or user lookup
       if project_user_data.index.size > 0:
         project_user_data=self._add_default_user_to_project(project_user_data)  # update project_user_data with default users
-        project_user_data=project_user_data.\
-                          apply(lambda x: \
-                           self._check_existing_data(\
-                              data=x,\
-                              dbsession=base.session, \
-                              table_name='project_user',
-                              check_column='EXISTS'),\
-                           axis=1)                                              # get project user map
+        project_user_data=\
+          self._check_existing_data_in_bulk(\
+            data=project_user_data,\
+            dbsession=base.session,\
+            table_name='project_user',\
+            check_column='EXISTS')                                              # get project user map
         project_user_data=project_user_data[project_user_data['EXISTS']==False] # filter existing project user
         project_user_data.drop('EXISTS', axis=1, inplace=True)                  # remove extra column
 
+      load_start=time.time()
+      load_stats={'project':len(project_data.index),
+                  'user':len(user_data.index),
+                  'project_user':len(project_user_data.index),
+                  'sample':len(sample_data.index),
+                  'check_time':load_start-check_start}
       if len(project_data.index) > 0:                                           # store new projects
         pa1=ProjectAdaptor(**{'session':base.session})                          # connect to project adaptor
-        pa1.store_project_and_attribute_data(data=project_data,autosave=False)  # load project data
+        pa1.store_project_and_attribute_data(data=project_data,autosave=False,\
+                                             mode='bulk')                       # load project data
       
       if len(user_data.index) > 0:                                              # store new users
         ua=UserAdaptor(**{'session':base.session})
-        ua.store_user_data(data=user_data,autosave=False)                       # load user data
+        ua.store_user_data(data=user_data,autosave=False,mode='bulk')           # load user data
       
       if len(project_user_data.index) > 0:                                      # store new project users
         pa2=ProjectAdaptor(**{'session':base.session})                          # connect to project adaptor
         project_user_data=project_user_data.to_dict(orient='records')           # convert dataframe to dictionary
-        pa2.assign_user_to_project(data=project_user_data, autosave=False)      # load project user data
+        pa2.assign_user_to_project(data=project_user_data, autosave=False,\
+                                   mode='bulk')                                 # load project user data
       
       if len(sample_data.index) > 0:                                            # store new samples
         sa=SampleAdaptor(**{'session':base.session})                            # connect to sample adaptor
-        sa.store_sample_and_attribute_data(data=sample_data,autosave=False)     # load samples data
+        sa.store_sample_and_attribute_data(data=sample_data,autosave=False,\
+                                           mode='bulk')                         # load samples data
       
       if self.setup_irods:
         user_data.apply(lambda x: self._setup_irods_account(data=x),axis=1)     # create irods account
@@ -602,6 +723,7 @@ class Find_and_register_new_project_data:
                 }]
       fa=FileAdaptor(**{'session':base.session})                                # connect to file adaptor
       fa.store_file_data(data=file_data,autosave=False)
+      load_stats['load_time']=time.time()-load_start
         
     except:
       if db_connected:
@@ -613,6 +735,7 @@ class Find_and_register_new_project_data:
         if len(user_data.index) > 0 and self.notify_user:
           user_data.apply(lambda x: self._notify_about_new_user_account(x),\
                           axis=1)                                               # send mail to new user with their password and forget it
+      return load_stats
     finally:
       if db_connected:
         base.close_session()                                                    # close db connection
@@ -730,18 +853,22 @@ class Find_and_register_new_project_data:
     It returns a list one new project info file
     '''
     try:
-      new_project_info_list=list()
-      fa=FileAdaptor(**{'session_class':self.session_class})
-      fa.start_session()                                                        # connect to db
+      project_info_list=list()
       for root_path,_,files in os.walk(self.projet_info_path, topdown=True):
         for file_path in files:
           if fnmatch.fnmatch(file_path, '*.csv') or \
              fnmatch.fnmatch(file_path, '*xls'):                                # only consider csv or xls files
-            file_check=fa.check_file_records_file_path(file_path=os.path.join(root_path,
-                                                                              file_path)) # check for filepath in db
-            if not file_check:
-              new_project_info_list.append(os.path.join(root_path,file_path))   # collect new project info files
+            project_info_list.append(os.path.join(root_path,file_path))
+
+      fa=FileAdaptor(**{'session_class':self.session_class})
+      fa.start_session()                                                        # connect to db
+      existing_file_paths=\
+        set(fa.fetch_existing_file_paths(file_paths=project_info_list))         # check for filepaths in db
       fa.close_session()                                                        # disconnect db
+      new_project_info_list=\
+        [file_path
+           for file_path in project_info_list
+             if file_path not in existing_file_paths]                           # collect new project info files
       return new_project_info_list
     except:
       raise
@@ -1,4 +1,7 @@
-import os, warnings, json
+import os, warnings, json, hashlib
+from shutil import copy2
+from tempfile import mkstemp
+from concurrent.futures import ThreadPoolExecutor
 from igf_data.utils.dbutils import read_dbconf_json
 from igf_data.utils.fileutils import get_temp_dir
 from igf_data.task_tracking.igf_slack import IGF_slack
@@ -7,7 +10,7 @@ from igf_data.igfdb.baseadaptor import BaseAdaptor
 from igf_data.igfdb.collectionadaptor import CollectionAdaptor
 from igf_data.igfdb.fileadaptor import FileAdaptor
 from igf_data.utils.fileutils import calculate_file_checksum,move_file
-from igf_data.igfdb.igfTables import File
+from igf_data.igfdb.igfTables import File,Collection,Collection_group
 
 class Reset_samplesheet_md5:
   '''
@@ -85,6 +88,40 @@ class Reset_samplesheet_md5:
     :param md5_field: A keyword for md5 value look up in json file, default file_md5
     :returns A string filepath if samplesheet has been updated or None
     '''
+    try:
+      json_content=\
+        Reset_samplesheet_md5._get_updated_json_content(
+          json_file_path=json_file_path,
+          samplesheet_md5=samplesheet_md5,
+          samplesheet_name=samplesheet_name,
+          file_field=file_field,
+          md5_field=md5_field)
+      if json_content is not None:
+        temp_dir=get_temp_dir()
+        json_file_name=os.path.basename(json_file_path)                         # get original json filename
+        temp_json_file=os.path.join(temp_dir,
+                                    json_file_name)                             # get temp file path
+        with open(temp_json_file,'w') as jwp:
+          jwp.write(json_content)                                               # write data to temp file
+        return temp_json_file                                                   # return file path
+      else:
+        return None                                                             # return none
+    except:
+      raise
+
+  @staticmethod
+  def _get_updated_json_content(json_file_path,samplesheet_md5,samplesheet_name,
+                                file_field='seqrun_file_name',md5_field='file_md5'):
+    '''
+    A static method for checking samplesheet md5 value in json file and creating
+    the updated json content, if samplesheet has changed
+    :param json_file_path: A file path for seqrun md5 json file
+    :param samplesheet_md5: A md5 value for samplesheet file
+    :param samplesheet_name: Name of the samplesheet file
+    :param file_field: A keyword for filename loop up in json file, default seqrun_file_name
+    :param md5_field: A keyword for md5 value look up in json file, default file_md5
+    :returns A json string if samplesheet has been updated or None
+    '''
     try:
       if not os.path.exists(json_file_path):
         raise IOError('Json md5 file {0} not found'.format(json_file_path))
@@ -102,18 +139,182 @@ class Reset_samplesheet_md5:
           break;                                                                # stop file look up
 
       if create_new_file:
-        temp_dir=get_temp_dir()
-        json_file_name=os.path.basename(json_file_path)                         # get original json filename
-        temp_json_file=os.path.join(temp_dir,
-                                    json_file_name)                             # get temp file path
-        with open(temp_json_file,'w') as jwp:
-          json.dump(json_data,jwp,indent=4)                                     # write data to temp file
-        return temp_json_file                                                   # return file path
+        return json.dumps(json_data,indent=4)                                   # same as json.dump output
       else:
         return None                                                             # return none
     except:
       raise
 
+  def _prepare_updated_json_file(self,seqrun_id,json_file_path):
+    '''
+    An internal method for writing the updated md5 json file for a seqrun to a temp file
+    in the json file directory, used by the batch mode
+    :param seqrun_id: A string of seqrun_igf_id
+    :param json_file_path: A file path for seqrun md5 json file
+    :returns: A temp json file path and its md5 value, or None if samplesheet has not changed
+    '''
+    try:
+      samplesheet_md5=self._get_samplesheet_md5(seqrun_id)                      # get md5 value for new samplesheet file
+      json_content=\
+        self._get_updated_json_content(
+          json_file_path=json_file_path,
+          samplesheet_md5=samplesheet_md5,
+          samplesheet_name=self.samplesheet_name)
+      if json_content is None:
+        return None
+
+      json_content=json_content.encode('utf-8')
+      temp_fd,temp_json_file=\
+        mkstemp(
+          dir=os.path.dirname(os.path.abspath(json_file_path)),
+          prefix='.{0}.'.format(os.path.basename(json_file_path)),
+          suffix='.tmp')                                                        # temp file on the same filesystem
+      with os.fdopen(temp_fd,'wb') as jwp:
+        jwp.write(json_content)
+      os.chmod(temp_json_file,os.stat(json_file_path).st_mode & 0o777)          # keep file permissions
+      return temp_json_file,hashlib.md5(json_content).hexdigest()               # md5 without reading the file again
+    except:
+      raise
+
+  def _fetch_json_file_paths(self,session,seqrun_list):
+    '''
+    An internal method for fetching md5 json file paths for a list of seqrun ids in one query
+    :param session: A database session
+    :param seqrun_list: A list of seqrun ids
+    :returns: A dictionary of seqrun ids and list of json file paths
+    '''
+    try:
+      base=BaseAdaptor(**{'session':session})
+      query=\
+        session.\
+          query(Collection.name,File.file_path).\
+          join(Collection_group,Collection.collection_id==Collection_group.collection_id).\
+          join(File,File.file_id==Collection_group.file_id).\
+          filter(Collection.type==self.json_collection_type)
+      records=\
+        base.fetch_records_by_column_values(
+          query=query,
+          column_name=Collection.name,
+          column_values=seqrun_list)
+      json_file_paths=dict()
+      for seqrun_id,file_path in records.values.tolist():
+        json_file_paths.setdefault(seqrun_id,list()).append(file_path)
+      return json_file_paths
+    except:
+      raise
+
+  def run_batch(self,max_workers=4):
+    '''
+    A method for resetting md5 values in the samplesheet json files for all seqrun ids in batch mode.
+    Md5 json files are fetched in one query and updated in parallel, all the File table changes are
+    saved in one transaction and a summary message is sent at the end. Original json files are
+    kept as backups till the transaction is saved, and restored if it fails
+    :param max_workers: Number of parallel json file updates, default 4
+    :returns: A dictionary with lists of updated, unchanged and failed seqrun ids
+    '''
+    try:
+      db_connected=False
+      temp_files=list()
+      backup_files=list()
+      committed=False
+      summary={'updated':list(),'unchanged':list(),'failed':list()}
+      seqrun_list=self._read_seqrun_list(self.seqrun_igf_list)                  # fetch list of seqrun ids from input file
+      seqrun_list=sorted(set([seqrun_id for seqrun_id in seqrun_list if seqrun_id!='']))
+      if len(seqrun_list)==0:
+        message='No new seqrun id found for changing samplesheet md5'
+        warnings.warn(message)
+        if self.log_slack:
+          self.igf_slack.post_message_to_channel(message, reaction='sleep')
+        return summary
+
+      base=self.base_adaptor
+      base.start_session()                                                      # connect to database
+      db_connected=True
+      json_file_paths=self._fetch_json_file_paths(base.session,seqrun_list)
+      jobs=dict()
+      with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for seqrun_id in seqrun_list:
+          file_paths=json_file_paths.get(seqrun_id,list())
+          if len(file_paths)!=1:
+            summary['failed'].\
+              append((seqrun_id,'Found {0} md5 json files'.format(len(file_paths))))
+            continue
+          jobs[seqrun_id]=\
+            (file_paths[0],
+             executor.submit(
+               self._prepare_updated_json_file,
+               seqrun_id,
+               file_paths[0]))
+      update_list=list()
+      for seqrun_id in sorted(jobs.keys()):
+        json_file_path,job=jobs.get(seqrun_id)
+        try:
+          result=job.result()
+        except Exception as e:
+          summary['failed'].append((seqrun_id,str(e)))
+          continue
+        if result is None:
+          summary['unchanged'].append(seqrun_id)
+        else:
+          temp_files.append(result[0])
+          update_list.append((seqrun_id,json_file_path,result[0],result[1]))
+
+      fa=FileAdaptor(**{'session':base.session})                                # connect to file table
+      for _,json_file_path,_,new_json_file_md5 in update_list:
+        fa.update_file_table_for_file_path(
+          file_path=json_file_path,
+          tag='md5',
+          value=new_json_file_md5,
+          autosave=False)                                                       # update json file md5 in db, don't commit yet
+      for seqrun_id,json_file_path,temp_json_file,_ in update_list:
+        backup_json_file='{0}.orig'.format(temp_json_file)
+        try:
+          os.link(json_file_path,backup_json_file)                              # keep original file till commit
+        except OSError:
+          copy2(json_file_path,backup_json_file)
+        backup_files.append((json_file_path,backup_json_file))
+        os.replace(temp_json_file,json_file_path)                               # overwrite json file atomically
+        temp_files.remove(temp_json_file)
+      base.commit_session()                                                     # save all changes in one transaction
+      committed=True
+      base.close_session()                                                      # close db connection
+      db_connected=False
+      summary['updated']=[seqrun_id for seqrun_id,_,_,_ in update_list]
+      if self.clean_up:
+        self._clear_seqrun_list(self.seqrun_igf_list)                           # clear input file
+
+      if self.log_asana:
+        for seqrun_id in summary['updated']:
+          self.igf_asana.comment_asana_task(task_name=seqrun_id,
+                                            comment='Setting new Samplesheet info for run {0}'.\
+                                                    format(seqrun_id))          # send log to asana
+      message='Samplesheet md5 reset, updated: {0}, unchanged: {1}, failed: {2}'.\
+              format(','.join(summary['updated']),
+                     ','.join(summary['unchanged']),
+                     ','.join(['{0} ({1})'.format(seqrun_id,error)
+                                 for seqrun_id,error in summary['failed']]))
+      if len(summary['failed'])>0:
+        warnings.warn(message)
+      if self.log_slack:
+        reaction='fail' if len(summary['failed'])>0 else 'pass'
+        self.igf_slack.post_message_to_channel(message, reaction=reaction)      # send summary to slack
+      return summary
+    except:
+      if db_connected:
+        base.rollback_session()
+        base.close_session()
+      if not committed:
+        for json_file_path,backup_json_file in backup_files:
+          os.replace(backup_json_file,json_file_path)                           # restore original json files
+      raise
+    finally:
+      for temp_json_file in temp_files:
+        if os.path.exists(temp_json_file):
+          os.remove(temp_json_file)                                             # remove unused temp files
+      for _,backup_json_file in backup_files:
+        if os.path.exists(backup_json_file):
+          os.remove(backup_json_file)                                           # remove backups after commit
+
   def run(self):
     '''
     A method for resetting md5 values in the samplesheet json files for all seqrun ids
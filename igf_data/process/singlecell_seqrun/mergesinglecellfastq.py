@@ -1,8 +1,9 @@
 import pandas as pd
-import os,fnmatch,re,subprocess,shutil
+import os,fnmatch,re
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor,as_completed
 from igf_data.illumina.samplesheet import SampleSheet
-from igf_data.utils.fileutils import get_temp_dir,remove_dir
+from igf_data.utils.fileutils import concatenate_local_files
 
 class MergeSingleCellFastq:
   '''
@@ -21,6 +22,8 @@ class MergeSingleCellFastq:
   :param pseudo_lane_col: A keyword for pseudo lane column, default 'PseudoLane'
   :param lane_col: A keyword for lane column, default 'Lane'
   :param force_overwrite: A toggle for overwriting output fastqs, default True
+  :param use_ephemeral_space: Not used, merged fastqs are written to a temp file in the output dir, default 0
+  :param max_workers: Number of parallel fastq merges, default 4
 
 
   SampleSheet file should contain following columns:
@@ -34,7 +37,8 @@ class MergeSingleCellFastq:
                sampleid_col='Sample_ID', samplename_col='Sample_Name',use_ephemeral_space=0,
                orig_sampleid_col='Original_Sample_ID', description_col='Description', 
                orig_samplename_col='Original_Sample_Name',project_col='Sample_Project',
-               lane_col='Lane', pseudo_lane_col='PseudoLane',force_overwrite=True):
+               lane_col='Lane', pseudo_lane_col='PseudoLane',force_overwrite=True,
+               max_workers=4):
     self.fastq_dir = fastq_dir
     self.samplesheet = samplesheet
     self.platform_name = platform_name
@@ -49,6 +53,7 @@ class MergeSingleCellFastq:
     self.pseudo_lane_col = pseudo_lane_col
     self.force_overwrite = force_overwrite
     self.use_ephemeral_space = use_ephemeral_space
+    self.max_workers = max_workers
 
   def _fetch_lane_and_sample_info_from_samplesheet(self):
     '''
@@ -112,6 +117,39 @@ class MergeSingleCellFastq:
     except:
       raise
 
+  @staticmethod
+  def _index_singlecell_fastq(fastq_dir):
+    '''
+    A static method for indexing all the single cell fastq files present in the fastq_dir
+    in a single directory walk
+
+    :param fastq_dir: A directory path containing fastq files
+    :returns: A dictionary with (sample_id, sample_name, lane_id) tuples as keys and a
+              list of (read_type, fragment_id, file_path) tuples as values
+    '''
+    try:
+      fastq_index = defaultdict(list)
+      sample_id_regex = re.compile(r'^(.+)_\d$')                                # regexp for sample id dir
+      file_name_regex = \
+        re.compile(r'^(.+)_(\d)_S\d+_L00(\d+)_([R,I][1,2])_\d+\.fastq\.gz$')    # regexp for fastq file
+      for root,_,files in os.walk(fastq_dir):
+        sm = re.match(sample_id_regex,os.path.basename(root))
+        if sm is None:
+          continue
+        sample_id = sm.group(1)
+        for file in files:
+          if fnmatch.fnmatch(file, "Undetermined_*"):                           # skip undetermined reads
+            continue
+          fm = re.match(file_name_regex,file)
+          if fm is None:
+            continue
+          sample_name,fragment_id,lane_id,read_type = fm.groups()
+          fastq_index[(sample_id,sample_name,lane_id)].\
+            append((read_type,fragment_id,os.path.join(root,file)))
+      return fastq_index
+    except:
+      raise
+
   @staticmethod
   def _group_singlecell_fastq(sample_data,fastq_dir):
     '''
@@ -133,6 +171,8 @@ class MergeSingleCellFastq:
           defaultdict(lambda: \
             defaultdict(lambda: \
               defaultdict(list))))                                              # output data structure
+      fastq_index = \
+        MergeSingleCellFastq._index_singlecell_fastq(fastq_dir)                 # walk fastq_dir only once
       for sample_record in sample_data:
         sample_lane = sample_record.get('lane_id')
         sample_id = sample_record.get('sample_id')
@@ -140,36 +180,41 @@ class MergeSingleCellFastq:
         project_id = sample_record.get('project_id')
         samples_info[sample_id]['sample_name'] = sample_name
         samples_info[sample_id]['project_id'] = project_id
-        sample_id_regex = re.compile('^{0}_\d$'.format(sample_id))              # regexp for sample id match
-        file_name_regex = \
-          re.compile(r'^{0}_(\d)_S\d+_L00{1}_([R,I][1,2])_\d+\.fastq(\.gz)?$'.\
-                     format(
-                       sample_name,
-                       sample_lane))                                            # regexp for fastq file match
-        for root,_,files in os.walk(fastq_dir):
-          for file in files:
-            if fnmatch.fnmatch(file, "*.fastq.gz") and \
-               not fnmatch.fnmatch(file, "Undetermined_*"):                     # skip undetermined reads
-              if re.search(sample_id_regex,os.path.basename(root)) and \
-                 re.search(file_name_regex,file): 
-                sm = re.match(file_name_regex,file)
-                if len(sm.groups())>=2:
-                  fragment_id=sm.group(1)
-                  read_type=sm.group(2)
-                  sample_files_list[sample_lane][sample_id][read_type][fragment_id].\
-                  append(os.path.join(root,file))                               # add fastqs to samples list
-                else:
-                  raise ValueError('Failed to determined sample info:{0}, {1}'.\
-                                   format(sample_id,file))
+        fastq_list = \
+          fastq_index.get(
+            (str(sample_id),str(sample_name),str(sample_lane)),
+            list())
+        for read_type,fragment_id,file_path in sorted(fastq_list):
+          sample_files_list[sample_lane][sample_id][read_type][fragment_id].\
+          append(file_path)                                                     # add fastqs to samples list
       return sample_files_list, samples_info
     except:
       raise
 
+  @staticmethod
+  def _merge_fastq_files(input_list,output_file,force_overwrite=True):
+    '''
+    A static method for merging fastq.gz files, same as cat command in the 10x pipeline
+
+    :param input_list: A list of input fastq file paths
+    :param output_file: An output fastq file path
+    :param force_overwrite: A toggle for overwriting output fastq, default True
+    :returns: The output file path
+    '''
+    try:
+      concatenate_local_files(
+        input_list=input_list,
+        output_file=output_file,
+        force=force_overwrite)                                                  # write temp file on destination and rename
+      return output_file
+    except:
+      raise
+
 
   def merge_fastq_per_lane_per_sample(self):
     '''
     A method for merging single cell fastq files present in input fastq_dir
-    per lane per sample basis
+    per lane per sample basis. Merges for each sample and read type run in parallel
     '''
     try:
       sample_data = \
@@ -179,6 +224,7 @@ class MergeSingleCellFastq:
           sample_data,
           self.fastq_dir)                                                       # get file groups
       all_intermediate_files=list()                                             # empty list for intermediate files
+      merge_jobs = list()
       s_count = 0                                                               # initial count for fastq S value
       for lane_id in sorted(sample_files.keys()):
         if self.platform_name=='NEXTSEQ':
@@ -220,16 +266,20 @@ class MergeSingleCellFastq:
                     sample_id,
                     lane_id,
                     read_type))                                                 # checking input files list
-            temp_dir = \
-              get_temp_dir(use_ephemeral_space=self.use_ephemeral_space)        # get a temp dir
-            temp_file = os.path.join(temp_dir,output_filename)                  # assign temp filename
-            cmd = ["cat"]+input_list+[">",temp_file]                            # shell command for merging fastq.gz files
-            subprocess.check_call(" ".join(cmd),shell=True)                     # exact same command for fastq merge as 10x pipeline
-            shutil.copy(temp_file,final_path)                                   # copy file to final location
-            remove_dir(temp_dir)                                                # remove temp dir
-            for file_path in input_list:
-              all_intermediate_files.append(file_path)                          # add fastq to intermediate list
+            merge_jobs.append((input_list,final_path))
+            all_intermediate_files.extend(input_list)                           # add fastq to intermediate list
+
+      with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+        futures = [
+          executor.submit(
+            self._merge_fastq_files,
+            input_list,
+            final_path,
+            self.force_overwrite)
+              for input_list,final_path in merge_jobs]                          # independent merges in parallel
+        for future in as_completed(futures):
+          future.result()                                                       # raise merge errors
       for file_path in all_intermediate_files:
         os.remove(file_path)                                                    # remove intermediate files once merging is complete
     except:
-      raise
\ No newline at end of file
+      raise
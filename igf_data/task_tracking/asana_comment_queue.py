@@ -0,0 +1,296 @@
+import time,threading
+from queue import Queue,Empty,Full
+
+class Asana_comment_queue:
+  '''
+  A class for sending Asana comments and attachments from a background thread.
+  Queued items are collected in batches, comments for the same task within a batch are
+  merged into a single story and requests are rate limited
+
+    asana_queue = Asana_comment_queue(igf_asana=IGF_asana(...))
+    asana_queue.add_comment(task_name='IGFP0001',comment='finished job')
+    asana_queue.close()                                                         # wait for pending items
+
+  Subclasses can change how batches are sent by overriding _send_batch and _process_batch,
+  and use _wait_for_rate_limit before each request to keep the rate limit
+
+  :param igf_asana: An IGF_asana instance or a function returning one, which is called from
+                    the background thread
+  :param batch_size: Maximum number of queued items per batch, default 20
+  :param flush_interval: Time in seconds to wait for more items before sending a batch, default 1
+  :param min_request_interval: Minimum time in seconds between two requests, default 0.4
+  :param merge_comments: Merge comments for the same task in a batch, default True
+  :param max_queue_size: Maximum number of queued items, default 0 for no limit
+  :param start_worker: Start the background thread, default True
+  '''
+  def __init__(self,igf_asana,batch_size=20,flush_interval=1,min_request_interval=0.4,
+               merge_comments=True,max_queue_size=0,start_worker=True):
+    self._igf_asana = igf_asana
+    self.batch_size = batch_size
+    self.flush_interval = flush_interval
+    self.min_request_interval = min_request_interval
+    self.merge_comments = merge_comments
+    self.metrics = {
+      'queued':0,
+      'comments':0,
+      'stories':0,
+      'attachments':0,
+      'failed':0}
+    self.errors = list()
+    self._lock = threading.Lock()
+    self._queue = Queue(maxsize=max_queue_size)
+    self._last_request_time = 0
+    self._stop_requested = False
+    self._closed = False
+    self._worker = None
+    if start_worker:
+      self._start_worker()
+
+
+  def _start_worker(self,name='asana_comment_queue'):
+    '''
+    An internal method for starting the background thread
+
+    :param name: Thread name, default asana_comment_queue
+    '''
+    self._worker = \
+      threading.Thread(
+        target=self._run_worker,
+        name=name,
+        daemon=True)
+    self._worker.start()
+
+
+  def _update_metrics(self,**counts):
+    '''
+    An internal method for updating metrics counters from any thread
+
+    :param counts: Metrics name and count to add
+    '''
+    with self._lock:
+      for key,value in counts.items():
+        self.metrics[key] += value
+
+
+  def _add_error(self,error):
+    '''
+    An internal method for recording an error message from any thread
+
+    :param error: An error message
+    '''
+    with self._lock:
+      self.errors.append(error)
+
+
+  def _get_igf_asana(self):
+    '''
+    An internal method for fetching the IGF_asana instance, creating it on first use
+
+    :returns: An IGF_asana instance
+    '''
+    if callable(self._igf_asana):
+      self._igf_asana = self._igf_asana()
+    if self._igf_asana is None:
+      raise ValueError('No asana client found')
+    return self._igf_asana
+
+
+  def add_comment(self,task_name,comment,block=True):
+    '''
+    A method for adding a comment to the queue
+
+    :param task_name: A task name
+    :param comment: A text comment
+    :param block: Wait for a free slot if the queue is full, default True
+                  It raises queue.Full if block is False and the queue is full
+    '''
+    if self._closed:
+      raise ValueError('Asana comment queue is closed')
+    self._queue.put({
+      'type':'comment',
+      'task_name':task_name,
+      'comment':comment},
+      block=block)
+    self._update_metrics(queued=1)
+
+
+  def add_attachment(self,task_name,filepath,remote_filename=None,comment=None,block=True):
+    '''
+    A method for adding a file attachment to the queue
+
+    :param task_name: A task name
+    :param filepath: A filepath to upload
+    :param remote_filename: Name of the uploaded file, default None for original name
+    :param comment: A text comment, default None
+    :param block: Wait for a free slot if the queue is full, default True
+                  It raises queue.Full if block is False and the queue is full
+    '''
+    if self._closed:
+      raise ValueError('Asana comment queue is closed')
+    self._queue.put({
+      'type':'attachment',
+      'task_name':task_name,
+      'filepath':filepath,
+      'remote_filename':remote_filename,
+      'comment':comment},
+      block=block)
+    self._update_metrics(queued=1)
+
+
+  def _wait_for_rate_limit(self):
+    '''
+    An internal method for waiting between two requests
+    '''
+    wait_time = \
+      self._last_request_time + self.min_request_interval - time.time()
+    if wait_time > 0:
+      time.sleep(wait_time)
+    self._last_request_time = time.time()
+
+
+  def _get_batch(self):
+    '''
+    An internal method for collecting a batch of items from the queue
+
+    :returns: A list of queued items, None for stopping the worker
+    '''
+    if self._stop_requested:
+      return None
+    item = self._queue.get()
+    if item is None:
+      self._queue.task_done()
+      return None
+    batch = [item]
+    deadline = time.time() + self.flush_interval
+    while len(batch) < self.batch_size:
+      try:
+        item = self._queue.get(timeout=max(0,deadline - time.time()))
+      except Empty:
+        break
+      if item is None:
+        self._stop_requested = True                                             # stop after this batch
+        self._queue.task_done()
+        break
+      batch.append(item)
+    return batch
+
+
+  def _send_batch(self,batch):
+    '''
+    An internal method for sending a batch of comments and attachments
+
+    :param batch: A list of queued items
+    '''
+    comments = dict()
+    attachments = list()
+    for item in batch:
+      if item.get('type') == 'comment':
+        comments.\
+          setdefault(item.get('task_name'),list()).\
+          append(item.get('comment'))
+      else:
+        attachments.append(item)
+    for task_name,comment_list in comments.items():
+      if self.merge_comments:
+        comment_list = ['\n\n'.join(comment_list)]                              # one story per task
+      for comment in comment_list:
+        try:
+          self._wait_for_rate_limit()
+          self._get_igf_asana().\
+            comment_asana_task(
+              task_name=task_name,
+              comment=comment)
+          self._update_metrics(stories=1)
+        except Exception as e:
+          self._update_metrics(failed=1)
+          self._add_error('task {0}: {1}'.format(task_name,e))
+    self._update_metrics(
+      comments=sum([len(comment_list) for comment_list in comments.values()]))
+    for item in attachments:
+      try:
+        self._wait_for_rate_limit()
+        self._get_igf_asana().\
+          attach_file_to_asana_task(
+            task_name=item.get('task_name'),
+            filepath=item.get('filepath'),
+            remote_filename=item.get('remote_filename'),
+            comment=item.get('comment'))
+        self._update_metrics(attachments=1)
+      except Exception as e:
+        self._update_metrics(failed=1)
+        self._add_error('task {0}: {1}'.format(item.get('task_name'),e))
+
+
+  def _process_batch(self,batch):
+    '''
+    An internal method for sending a batch from the background thread, errors are recorded
+    and never stop the worker
+
+    :param batch: A list of queued items
+    '''
+    try:
+      self._send_batch(batch)
+    except Exception as e:
+      self._update_metrics(failed=len(batch))
+      self._add_error('failed batch: {0}'.format(e))
+
+
+  def _run_worker(self):
+    '''
+    An internal method for processing the queue in the background thread
+    '''
+    while True:
+      batch = self._get_batch()
+      if batch is None:
+        break
+      try:
+        self._process_batch(batch)
+      finally:
+        for _ in batch:
+          self._queue.task_done()
+
+
+  def flush(self):
+    '''
+    A method for waiting till all queued items are sent
+    '''
+    self._queue.join()
+
+
+  def close(self,timeout=None):
+    '''
+    A method for sending all queued items and stopping the background thread
+
+    :param timeout: Maximum time in seconds to wait, default None for waiting till all items are sent
+    :returns: True if the background thread has stopped, else False
+    '''
+    if not self._closed:
+      self._closed = True
+      if self._worker is not None:
+        try:
+          self._queue.put(None,timeout=timeout)                                 # stop the worker after pending items
+        except Full:
+          return False
+    if self._worker is None:
+      return True
+    self._worker.join(timeout=timeout)
+    return not self._worker.is_alive()
+
+
+  def get_queue_depth(self):
+    '''
+    A method for fetching the number of items waiting in the queue
+
+    :returns: Number of queued items
+    '''
+    return self._queue.qsize()
+
+
+  def get_metrics(self):
+    '''
+    A method for fetching queue counters
+
+    :returns: A dictionary containing queued, comments, stories, attachments and failed counts
+    '''
+    with self._lock:
+      return dict(self.metrics)
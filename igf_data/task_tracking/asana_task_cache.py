@@ -0,0 +1,202 @@
+import os,json,time,fcntl
+from tempfile import gettempdir,mkstemp
+
+class Asana_task_cache:
+  '''
+  A class for caching Asana task name to task gid lookup for projects, with a TTL
+  and a persistent json file backing shared by all jobs of a user on a node.
+  Task names not found in the project are also cached, with a shorter TTL
+
+  Cache file format
+
+    {"PROJECT_ID":{"timestamp":1571000000.0,
+                   "tasks":{"TASK_NAME":["TASK_GID"]},
+                   "missing":{"TASK_NAME":1571000000.0}}}
+
+  :param cache_file: A json file path for the cache, default None for using env variable
+                     $ASANA_TASK_CACHE_FILE or a per user file in the system temp dir
+  :param ttl: Time in seconds before a project task listing is considered stale, default 3600
+  :param missing_ttl: Time in seconds for caching a task name not found in the project, default 60
+  '''
+  def __init__(self,cache_file=None,ttl=3600,missing_ttl=60):
+    if cache_file is None:
+      cache_file = \
+        os.environ.get(
+          'ASANA_TASK_CACHE_FILE',
+          os.path.join(
+            gettempdir(),
+            'asana_task_cache_{0}.json'.format(os.getuid())))                   # never share the file between users
+    self.cache_file = cache_file
+    self.ttl = ttl
+    self.missing_ttl = missing_ttl
+    self.metrics = {
+      'hits':0,
+      'missing_hits':0,
+      'misses':0,
+      'errors':0}
+    self._cache = dict()
+    self._cache_mtime = None
+
+
+  def _load_cache_file(self):
+    '''
+    An internal method for reading the cache file, if it has changed since the last read
+    '''
+    try:
+      if not os.path.exists(self.cache_file):
+        return None
+      cache_mtime = os.stat(self.cache_file).st_mtime_ns
+      if cache_mtime == self._cache_mtime:
+        return None
+      with open(self.cache_file,'r') as fp:
+        self._cache = json.load(fp)
+      self._cache_mtime = cache_mtime
+    except ValueError:
+      self._cache = dict()                                                      # ignore a broken cache file
+
+
+  def _update_cache_file(self,project_id,update_func):
+    '''
+    An internal method for updating the cache entry of a project. The cache file is
+    locked, re-read and replaced atomically, so updates from other jobs are not lost
+
+    :param project_id: An Asana project id
+    :param update_func: A function which accepts and modifies the project entry dictionary
+    '''
+    try:
+      cache_dir = os.path.dirname(os.path.abspath(self.cache_file))
+      os.makedirs(cache_dir,exist_ok=True)
+      with open('{0}.lock'.format(self.cache_file),'a') as lock_fp:
+        fcntl.flock(lock_fp,fcntl.LOCK_EX)
+        try:
+          self._cache_mtime = None
+          self._load_cache_file()                                               # fetch latest cache before update
+          project_entry = \
+            self._cache.get(
+              str(project_id),
+              {'timestamp':0,'tasks':dict()})
+          update_func(project_entry)
+          self._cache[str(project_id)] = project_entry
+          fd,temp_path = \
+            mkstemp(
+              prefix='.{0}.'.format(os.path.basename(self.cache_file)),
+              dir=cache_dir)
+          with os.fdopen(fd,'w') as fp:
+            json.dump(self._cache,fp)
+          os.replace(temp_path,self.cache_file)                                 # atomic rename
+          self._cache_mtime = os.stat(self.cache_file).st_mtime_ns
+        finally:
+          fcntl.flock(lock_fp,fcntl.LOCK_UN)
+    except Exception as e:
+      raise ValueError(
+              'Failed to update asana task cache {0}, error: {1}'.\
+                format(self.cache_file,e))
+
+
+  def is_fresh(self,project_id):
+    '''
+    A method for checking if the cached task listing of a project is within TTL
+
+    :param project_id: An Asana project id
+    :returns: True if cache is fresh, else False
+    '''
+    self._load_cache_file()
+    project_entry = self._cache.get(str(project_id))
+    if project_entry is None:
+      return False
+    return (time.time() - project_entry.get('timestamp')) < self.ttl
+
+
+  def get_task_ids(self,project_id,task_name):
+    '''
+    A method for fetching the cached task gids for a task name
+
+    :param project_id: An Asana project id
+    :param task_name: A task name
+    :returns: A list of task gids, an empty list if the task was recently not found in the project,
+              or None if the task is not cached or the cache is stale
+    '''
+    task_ids = None
+    if self.is_fresh(project_id):
+      task_ids = \
+        self._cache.get(str(project_id)).\
+          get('tasks').\
+          get(task_name)
+    if task_ids:
+      self.metrics['hits'] += 1
+      return list(task_ids)
+    project_entry = self._cache.get(str(project_id),dict())
+    missing_timestamp = \
+      project_entry.\
+        get('missing',dict()).\
+        get(task_name)
+    if missing_timestamp is not None and \
+       (time.time() - missing_timestamp) < self.missing_ttl:
+      self.metrics['missing_hits'] += 1
+      return list()
+    self.metrics['misses'] += 1
+    return None
+
+
+  def set_project_tasks(self,project_id,tasks):
+    '''
+    A method for replacing the cached task listing of a project
+
+    :param project_id: An Asana project id
+    :param tasks: A dictionary of task name and a list of task gids
+    '''
+    def _set_tasks(project_entry):
+      project_entry['timestamp'] = time.time()
+      project_entry['tasks'] = \
+        {name:list(gids) for name,gids in tasks.items()}
+      project_entry['missing'] = dict()
+    self._update_cache_file(project_id,_set_tasks)
+
+
+  def add_missing_task(self,project_id,task_name):
+    '''
+    A method for recording a task name not found in the project, so it is not
+    listed again till missing_ttl
+
+    :param project_id: An Asana project id
+    :param task_name: A task name
+    '''
+    def _add_missing_task(project_entry):
+      project_entry.\
+        setdefault('missing',dict()).\
+        update({task_name:time.time()})
+    self._update_cache_file(project_id,_add_missing_task)
+
+
+  def add_task(self,project_id,task_name,task_id):
+    '''
+    A method for adding a new task to the cache, e.g. after task creation
+
+    :param project_id: An Asana project id
+    :param task_name: A task name
+    :param task_id: A task gid
+    '''
+    def _add_task(project_entry):
+      project_entry.setdefault('missing',dict()).pop(task_name,None)
+      task_ids = project_entry['tasks'].setdefault(task_name,list())
+      if str(task_id) not in task_ids:
+        task_ids.append(str(task_id))
+    self._update_cache_file(project_id,_add_task)
+
+
+  def rename_task(self,project_id,task_name,new_name):
+    '''
+    A method for renaming a cached task
+
+    :param project_id: An Asana project id
+    :param task_name: A task name
+    :param new_name: A new task name
+    '''
+    def _rename_task(project_entry):
+      project_entry.setdefault('missing',dict()).pop(new_name,None)
+      task_ids = project_entry['tasks'].pop(task_name,list())
+      if len(task_ids) > 0:
+        project_entry['tasks'].\
+          setdefault(new_name,list()).\
+          extend(task_ids)
+    self._update_cache_file(project_id,_rename_task)
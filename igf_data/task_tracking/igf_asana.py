@@ -1,34 +1,125 @@
 import os, asana, json
 from datetime import datetime
-from asana.error import ForbiddenError
+from asana.error import ForbiddenError,NotFoundError
+from igf_data.task_tracking.asana_task_cache import Asana_task_cache
 
 class IGF_asana:
   '''
   A python class for accessing Asana
   
-  :params asana_config: A json config file with personal token
+  :params asana_config: A json config file with personal token and optional api url
                         e.g. { "asana_personal_token" : "zyx" }
   :param asana_project_id: A project id
+  :param use_task_cache: Cache task name to task id lookup, default True
+  :param task_cache_file: A json file path for task cache, default None for using env variable
+                          $ASANA_TASK_CACHE_FILE or a per user file in the system temp dir
+  :param task_cache_ttl: Time in seconds before the cached task list is refreshed, default 3600
+  :param task_cache_missing_ttl: Time in seconds for caching a task name not found in the project,
+                                 default 60
   '''
 
-  def __init__(self, asana_config, asana_project_id, **asana_label):
+  def __init__(self, asana_config, asana_project_id, use_task_cache=True,
+               task_cache_file=None, task_cache_ttl=3600, task_cache_missing_ttl=60,
+               **asana_label):
     asana_label.setdefault('asana_personal_token_label','asana_personal_token')
+    asana_label.setdefault('asana_base_url_label','asana_base_url')
     self.asana_personal_token_label=asana_label['asana_personal_token_label']
+    self.asana_base_url_label=asana_label['asana_base_url_label']
 
     self.asana_personal_token = None
+    self.asana_base_url = None
     self.asana_config = asana_config
     self.asana_project_id = asana_project_id                                    # project name can change, project id is stable
     self._read_and_set_asana_config()                                           # read config file and set parameters
     self.asanaclient = asana.Client.access_token(self.asana_personal_token)     # create asana client instance
     self.asanaclient.headers = {'asana-enable': 'string_ids'}                   # fix for string ids
+    if self.asana_base_url is not None:
+      self.asanaclient.options['base_url'] = self.asana_base_url
+    self.task_cache = None
+    if use_task_cache:
+      self.task_cache = \
+        Asana_task_cache(
+          cache_file=task_cache_file,
+          ttl=task_cache_ttl,
+          missing_ttl=task_cache_missing_ttl)
     self.asana_personal_token = None                                            # reset asana token value
     self._get_user_details()                                                    # load user information
     self._check_project_id()                                                    # check user given project id
 
 
+  def _fetch_project_tasks(self):
+    '''
+    An internal method for fetching all tasks of the project from asana server
+
+    :returns: A dictionary of task name and a list of task gids
+    '''
+    try:
+      tasks = dict()
+      offset = None
+      while True:
+        options = {'limit':100,'iterator_type':None,'full_payload':True}
+        if offset is not None:
+          options.update({'offset':offset})
+        page = \
+          self.asanaclient.\
+            tasks.\
+            find_all({'project':self.asana_project_id},**options)               # one page of compact task records
+        for task in page.get('data',list()):
+          tasks.\
+            setdefault(task['name'],list()).\
+            append(str(task['gid']))
+        next_page = page.get('next_page')
+        if next_page is None:
+          break
+        offset = next_page['offset']
+      return tasks
+    except:
+      raise
+
+
+  def _get_cached_task_ids(self,task_name):
+    '''
+    An internal method for fetching task ids from the task cache. Cache errors are
+    counted and ignored, so the lookup falls back to the asana server
+
+    :param task_name: A task name
+    :returns: A list of task gids, an empty list for a recently missing task or None if not cached
+    '''
+    if self.task_cache is None:
+      return None
+    try:
+      return \
+        self.task_cache.\
+          get_task_ids(
+            project_id=self.asana_project_id,
+            task_name=task_name)
+    except Exception:
+      self.task_cache.metrics['errors'] += 1
+      return None
+
+
+  def _update_task_cache(self,update_method,**params):
+    '''
+    An internal method for updating the task cache. Cache errors are counted and
+    ignored, as the cache is only used for speeding up task lookup
+
+    :param update_method: Name of the Asana_task_cache update method, e.g. add_task
+    :param params: Params for the update method, except project_id
+    '''
+    if self.task_cache is None:
+      return None
+    try:
+      getattr(self.task_cache,update_method)(
+        project_id=self.asana_project_id,
+        **params)
+    except Exception:
+      self.task_cache.metrics['errors'] += 1
+
+
   def get_asana_task_id(self,task_name,strict_check=False):
     '''
-    A method for fetching task id from asana server
+    A method for fetching task id from asana server. The task list of the project
+    is cached and the server is only queried if the task is not found in a fresh cache
     
     :param task_name: A task name
     :param strict_check: Perform strict checking for task id count, default False
@@ -38,14 +129,18 @@ class IGF_asana:
       asana_task_id = None
       matched_tasks = list()
       try:
-        all_asana_tasks = \
-          self.asanaclient.\
-            tasks.\
-            find_all({'project':self.asana_project_id})
-        matched_tasks = [
-          p for p in all_asana_tasks
-            if p['name']==task_name ]
-        asana_task_id = matched_tasks[0]['gid']
+        matched_tasks = self._get_cached_task_ids(task_name=task_name)
+        if matched_tasks is None:
+          tasks = self._fetch_project_tasks()                                   # cache miss, list all tasks once
+          self._update_task_cache(
+            'set_project_tasks',
+            tasks=tasks)
+          matched_tasks = tasks.get(task_name,list())
+          if len(matched_tasks)==0:
+            self._update_task_cache(
+              'add_missing_task',
+              task_name=task_name)                                              # don't list the project again for this task
+        asana_task_id = matched_tasks[0]
       except:
         pass
 
@@ -71,6 +166,10 @@ class IGF_asana:
       self.asanaclient.\
         tasks.\
         update(str(asana_task_id),{'name':new_name})
+      self._update_task_cache(
+        'rename_task',
+        task_name=task_name,
+        new_name=new_name)
     except:
       raise
 
@@ -95,6 +194,10 @@ class IGF_asana:
             })
       print(results)
       task_id = results['gid']                                                  # fetching gid
+      self._update_task_cache(
+        'add_task',
+        task_name=task_name,
+        task_id=task_id)
       return task_id
     except:
       raise
@@ -129,12 +232,26 @@ class IGF_asana:
     '''
     try:
       asana_task_id = self.fetch_task_id_for_task_name(task_name)
-      res = \
-        self.asanaclient.\
-          stories.\
-          create_on_task(
-            asana_task_id,
-            {'text':comment})
+      try:
+        res = \
+          self.asanaclient.\
+            stories.\
+            create_on_task(
+              asana_task_id,
+              {'text':comment})
+      except NotFoundError:
+        if self.task_cache is None:
+          raise
+        self._update_task_cache(
+          'set_project_tasks',
+          tasks=self._fetch_project_tasks())                                    # cached task id is stale, refresh it
+        asana_task_id = self.fetch_task_id_for_task_name(task_name)
+        res = \
+          self.asanaclient.\
+            stories.\
+            create_on_task(
+              asana_task_id,
+              {'text':comment})
       return res
     except ForbiddenError:
       if rename_task:
@@ -203,12 +320,13 @@ class IGF_asana:
         else:
           file_name = os.path.basename(filepath)
 
-        _ = \
-          self.asanaclient.attachments.\
-            create_on_task(
-              task_id=str(asana_task_id),
-              file_content=open(os.path.join(filepath),'rb'),
-              file_name=file_name)                                              # upload file to task_id
+        with open(filepath,'rb') as fp:
+          _ = \
+            self.asanaclient.attachments.\
+              create_on_task(
+                task_id=int(asana_task_id),
+                file_content=fp,
+                file_name=file_name)                                            # upload file to task_id, client formats id as int
     except:
       raise 
 
@@ -261,5 +379,8 @@ class IGF_asana:
       if self.asana_personal_token_label in asana_params:
         self.asana_personal_token = asana_params[self.asana_personal_token_label]
 
+      if self.asana_base_url_label in asana_params:
+        self.asana_base_url = asana_params[self.asana_base_url_label]           # optional api url, e.g. for a test server
+
     except:
       raise
@@ -26,13 +26,15 @@ class IGF_slack:
     self.slack_token=None                                                       # reset slack token 
       
 
-  def post_message_to_channel(self, message, reaction=''):
+  @staticmethod
+  def format_message(message, reaction=''):
     '''
-    A method for posting message to the slack channel
+    A static method for adding reaction emoji to a message
     required params:
     message: a text message
     optional:
     reaction: pass / fail / sleep
+    returns: a formatted message
     '''
     if reaction=='pass':
       message='{0} {1}'.format(':heavy_check_mark:',message)
@@ -40,12 +42,25 @@ class IGF_slack:
       message='{0} {1}'.format(':X:',message)
     elif reaction=='sleep':
       message='{1} {0}'.format(':robot_face: :zzz:',message)
+    return message
+
 
+  def post_message_to_channel(self, message, reaction=''):
+    '''
+    A method for posting message to the slack channel
+    required params:
+    message: a text message
+    optional:
+    reaction: pass / fail / sleep
+    returns: slack api response
+    '''
+    message=self.format_message(message,reaction)
     try:        
-      self.slackobject.api_call( "chat.postMessage", \
-                                 channel=self.slack_channel_id, \
-                                 text=message,\
-                               )
+      res=self.slackobject.api_call( "chat.postMessage", \
+                                     channel=self.slack_channel_id, \
+                                     text=message,\
+                                   )
+      return res
     except:
       raise
     
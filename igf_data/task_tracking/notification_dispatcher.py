@@ -0,0 +1,639 @@
+import os,json,time,fcntl,uuid,threading
+from queue import Queue,Empty,Full
+from shutil import copy2
+from igf_data.utils.fileutils import get_temp_dir,remove_dir
+from igf_data.task_tracking.igf_slack import IGF_slack
+from igf_data.task_tracking.asana_comment_queue import Asana_comment_queue
+
+class Notification_dispatcher:
+  '''
+  A class for sending Slack and Asana notifications without blocking the caller.
+  Notifications are either handed to background threads, or written to a local
+  spool dir which is flushed by a separate process (see flush_spool_dir)
+
+  Slack messages are collected in batches and messages with the same group key, e.g.
+  seqrun or project id, are merged into one post. Asana comments and attachments are
+  sent using an Asana_comment_queue, which merges comments per task. Requests are rate
+  limited, and failed Slack requests are retried with exponential backoff and dropped
+  after max_retries. Queued files are linked or copied to a dispatcher dir, so the
+  caller can remove the original file before it is sent
+
+    dispatcher = Notification_dispatcher(igf_slack=igf_slack,igf_asana=igf_asana)
+    dispatcher.post_slack_message(message='finished job',reaction='pass',group_key='SEQRUN1')
+    dispatcher.close()                                                          # wait for pending messages, with timeout
+
+  :param igf_slack: An IGF_slack instance, default None
+  :param igf_asana: An IGF_asana instance or a function returning one, which is called from
+                    the background thread, default None
+  :param spool_dir: A spool dir path, messages are written to this dir instead of sending them, default None
+  :param max_queue_size: Maximum number of queued messages, new messages are dropped if queue is full, default 1000
+  :param batch_size: Maximum number of messages per batch, default 50
+  :param flush_interval: Time in seconds to wait for more messages before sending a batch, default 1
+  :param min_request_interval: Minimum time in seconds between two requests, including retries, default 0.4
+  :param max_retries: Number of retries for a failed request, default 3
+  :param retry_delay: Initial wait time in seconds before retrying a request, default 1
+  :param retry_backoff: Multiplier for retry wait time, default 2
+  :param close_timeout: Maximum time in seconds to wait for pending messages on close, default 10
+  :param max_message_age: Spooled messages older than this many seconds are dropped if they can't be sent,
+                          default 86400
+  '''
+  def __init__(self,igf_slack=None,igf_asana=None,spool_dir=None,max_queue_size=1000,batch_size=50,
+               flush_interval=1,min_request_interval=0.4,max_retries=3,retry_delay=1,retry_backoff=2,
+               close_timeout=10,max_message_age=86400):
+    self.igf_slack = igf_slack
+    self._igf_asana = igf_asana
+    self.spool_dir = spool_dir
+    self.max_queue_size = max_queue_size
+    self.batch_size = batch_size
+    self.flush_interval = flush_interval
+    self.min_request_interval = min_request_interval
+    self.max_retries = max_retries
+    self.retry_delay = retry_delay
+    self.retry_backoff = retry_backoff
+    self.close_timeout = close_timeout
+    self.max_message_age = max_message_age
+    self.metrics = {
+      'queued':0,
+      'sent':0,
+      'requests':0,
+      'coalesced':0,
+      'retries':0,
+      'dropped':0}
+    self.errors = list()
+    self._lock = threading.Lock()
+    self._last_request_time = 0
+    self._stop_requested = False
+    self._closed = False
+    self._queue = None
+    self._worker = None
+    self._asana_queue = None
+    self._file_dir = None
+    if self.spool_dir is not None:
+      os.makedirs(self.spool_dir,mode=0o770,exist_ok=True)
+    else:
+      self._queue = Queue(maxsize=max_queue_size)
+      self._worker = \
+        threading.Thread(
+          target=self._run_worker,
+          name='notification_dispatcher',
+          daemon=True)                                                          # daemon thread, never keeps a finished job alive
+      self._worker.start()
+
+
+  def set_igf_asana(self,igf_asana):
+    '''
+    A method for setting the asana client, before queueing the first Asana notification
+
+    :param igf_asana: An IGF_asana instance or a function returning one, which is called from
+                      the background thread
+    '''
+    self._igf_asana = igf_asana
+
+
+  def _update_metrics(self,**counts):
+    '''
+    An internal method for updating metrics counters from any thread
+
+    :param counts: Metrics name and count to add
+    '''
+    with self._lock:
+      for key,value in counts.items():
+        self.metrics[key] += value
+
+
+  def _add_error(self,error):
+    '''
+    An internal method for recording an error message from any thread
+
+    :param error: An error message
+    '''
+    with self._lock:
+      self.errors.append(error)
+
+
+  def _get_igf_asana(self):
+    '''
+    An internal method for fetching the IGF_asana instance, creating it on first use
+
+    :returns: An IGF_asana instance
+    '''
+    if callable(self._igf_asana):
+      self._igf_asana = self._igf_asana()
+    if self._igf_asana is None:
+      raise ValueError('No asana client found for notification')
+    return self._igf_asana
+
+
+  def _get_asana_queue(self):
+    '''
+    An internal method for fetching the Asana_comment_queue for Asana notifications,
+    it is created on the first Asana notification
+
+    :returns: An Asana_comment_queue instance
+    '''
+    if self._asana_queue is None:
+      if self._igf_asana is None:
+        raise ValueError('No asana client found for notification')
+      self._asana_queue = \
+        Asana_comment_queue(
+          igf_asana=self._get_igf_asana,
+          batch_size=self.batch_size,
+          flush_interval=self.flush_interval,
+          min_request_interval=self.min_request_interval,
+          max_queue_size=self.max_queue_size)                                   # client is created in the queue thread
+    return self._asana_queue
+
+
+  def _wait_for_rate_limit(self):
+    '''
+    An internal method for waiting between two requests
+    '''
+    wait_time = \
+      self._last_request_time + self.min_request_interval - time.time()
+    if wait_time > 0:
+      time.sleep(wait_time)
+    self._last_request_time = time.time()
+
+
+  def _store_file(self,filepath):
+    '''
+    An internal method for keeping a copy of a queued file till it is sent, so the
+    caller can remove the original file. Files are hard linked if possible, else copied
+    to the spool dir or to a temp dir of the dispatcher
+
+    :param filepath: A filepath
+    :returns: The stored filepath
+    '''
+    if self.spool_dir is not None:
+      file_dir = os.path.join(self.spool_dir,'files')
+    else:
+      if self._file_dir is None:
+        self._file_dir = get_temp_dir()
+      file_dir = self._file_dir
+    target_dir = os.path.join(file_dir,uuid.uuid4().hex)
+    os.makedirs(target_dir,mode=0o770)
+    target_path = os.path.join(target_dir,os.path.basename(filepath))           # keep file name for upload
+    try:
+      try:
+        os.link(filepath,target_path)
+      except OSError:
+        copy2(filepath,target_path)
+    except:
+      remove_dir(target_dir)
+      raise
+    return target_path
+
+
+  @staticmethod
+  def _remove_stored_file(notification):
+    '''
+    An internal static method for removing the stored file of a notification, after it is
+    sent or dropped
+
+    :param notification: A notification dictionary
+    '''
+    filepath = notification.get('filepath')
+    if filepath is not None and \
+       os.path.exists(os.path.dirname(filepath)):
+      remove_dir(os.path.dirname(filepath))
+
+
+  def _dispatch(self,notification):
+    '''
+    An internal method for adding a notification to the queue or spool dir.
+    It never blocks, notifications are dropped if the queue is full
+
+    :param notification: A dictionary containing notification details
+    :returns: True if notification was accepted, else False
+    '''
+    notification.update({'timestamp':time.time()})
+    stored_file = False
+    try:
+      if self._closed:
+        raise ValueError('Notification dispatcher is closed')
+      if notification.get('filepath') is not None:
+        notification['filepath'] = \
+          self._store_file(notification.get('filepath'))
+        stored_file = True
+      if self.spool_dir is not None:
+        file_name = \
+          '{0:020d}_{1}_{2}.json'.format(
+            int(time.time()*1e6),
+            os.getpid(),
+            uuid.uuid4().hex)                                                   # sortable by creation time
+        temp_path = os.path.join(self.spool_dir,'.{0}'.format(file_name))
+        with open(temp_path,'w') as fp:
+          json.dump(notification,fp)
+        os.replace(temp_path,os.path.join(self.spool_dir,file_name))            # atomic rename for the flusher
+      elif notification.get('target') == 'asana':
+        if notification.get('type') == 'attachment':
+          self._get_asana_queue().\
+            add_attachment(
+              task_name=notification.get('task_name'),
+              filepath=notification.get('filepath'),
+              remote_filename=notification.get('remote_filename'),
+              comment=notification.get('text'),
+              block=False)
+        else:
+          self._get_asana_queue().\
+            add_comment(
+              task_name=notification.get('task_name'),
+              comment=notification.get('text'),
+              block=False)
+      else:
+        self._queue.put_nowait(notification)
+      self._update_metrics(queued=1)
+      return True
+    except (Full,ValueError,OSError) as e:
+      if stored_file:
+        self._remove_stored_file(notification)
+      self._update_metrics(dropped=1)
+      self._add_error('dropped notification: {0}'.format(e))
+      return False
+
+
+  def post_slack_message(self,message,reaction='',group_key=None):
+    '''
+    A method for queueing a Slack message
+
+    :param message: A text message
+    :param reaction: Optional parameter for slack emoji, pass / fail / sleep
+    :param group_key: Messages with same group key are merged, default None for no merging
+    :returns: True if message was accepted, else False
+    '''
+    return \
+      self._dispatch({
+        'target':'slack',
+        'type':'message',
+        'text':IGF_slack.format_message(message,reaction),
+        'group_key':group_key})
+
+
+  def post_slack_file(self,filepath,message=None):
+    '''
+    A method for queueing a Slack file upload. The file is stored when it is queued,
+    so it can be removed after this call
+
+    :param filepath: A filepath for upload
+    :param message: An optional message
+    :returns: True if file was accepted, else False
+    '''
+    return \
+      self._dispatch({
+        'target':'slack',
+        'type':'file',
+        'filepath':filepath,
+        'text':message})
+
+
+  def comment_asana_task(self,task_name,comment):
+    '''
+    A method for queueing an Asana comment, comments for same task are merged
+
+    :param task_name: A task name
+    :param comment: A text comment
+    :returns: True if comment was accepted, else False
+    '''
+    return \
+      self._dispatch({
+        'target':'asana',
+        'type':'comment',
+        'task_name':task_name,
+        'text':comment})
+
+
+  def attach_file_to_asana_task(self,task_name,filepath,remote_filename=None,comment=None):
+    '''
+    A method for queueing an Asana file attachment. The file is stored when it is queued,
+    so it can be removed after this call
+
+    :param task_name: A task name
+    :param filepath: A filepath to upload
+    :param remote_filename: Name of the uploaded file, default None for original name
+    :param comment: A text comment, default None
+    :returns: True if file was accepted, else False
+    '''
+    return \
+      self._dispatch({
+        'target':'asana',
+        'type':'attachment',
+        'task_name':task_name,
+        'filepath':filepath,
+        'remote_filename':remote_filename,
+        'text':comment})
+
+
+  @staticmethod
+  def _coalesce_notifications(notifications):
+    '''
+    An internal static method for merging a batch of notifications. Slack messages
+    are merged per group key and Asana comments are merged per task name
+
+    :param notifications: A list of notification dictionaries
+    :returns: A list of tuples containing a merged notification and the list of
+              original notifications
+    '''
+    groups = list()
+    group_index = dict()
+    for notification in notifications:
+      key = None
+      if notification.get('type') == 'message' and \
+         notification.get('group_key') is not None:
+        key = ('slack',notification.get('group_key'))
+      elif notification.get('type') == 'comment':
+        key = ('asana',notification.get('task_name'))
+      if key is None:
+        groups.append((dict(notification),[notification]))                      # files are not merged
+      elif key not in group_index:
+        group_index[key] = len(groups)
+        groups.append((dict(notification),[notification]))
+      else:
+        merged,members = groups[group_index[key]]
+        separator = '\n' if key[0] == 'slack' else '\n\n'
+        merged['text'] = \
+          '{0}{1}{2}'.format(
+            merged.get('text'),
+            separator,
+            notification.get('text'))
+        members.append(notification)
+    return groups
+
+
+  def _send_notification(self,notification):
+    '''
+    An internal method for sending one notification
+
+    :param notification: A notification dictionary
+    '''
+    if notification.get('target') == 'slack':
+      if self.igf_slack is None:
+        raise ValueError('No slack client found for notification')
+      if notification.get('type') == 'file':
+        res = \
+          self.igf_slack.\
+            post_file_to_channel(
+              filepath=notification.get('filepath'),
+              message=notification.get('text'))
+      else:
+        res = \
+          self.igf_slack.\
+            post_message_to_channel(
+              message=notification.get('text'),
+              reaction='')                                                      # reaction is already in the text
+      if isinstance(res,dict) and \
+         not res.get('ok',True):
+        raise ValueError('Slack error: {0}'.format(res.get('error')))
+    else:
+      igf_asana = self._get_igf_asana()
+      if notification.get('type') == 'attachment':
+        igf_asana.\
+          attach_file_to_asana_task(
+            task_name=notification.get('task_name'),
+            filepath=notification.get('filepath'),
+            remote_filename=notification.get('remote_filename'),
+            comment=notification.get('text'))
+      else:
+        igf_asana.\
+          comment_asana_task(
+            task_name=notification.get('task_name'),
+            comment=notification.get('text'))
+
+
+  def _send_with_retry(self,notification):
+    '''
+    An internal method for sending a notification with exponential backoff. Each
+    request waits for min_request_interval after the previous one
+
+    :param notification: A notification dictionary
+    :returns: True if notification was sent, else False
+    '''
+    for attempt in range(self.max_retries + 1):
+      try:
+        self._wait_for_rate_limit()
+        self._update_metrics(requests=1)
+        self._send_notification(notification)
+        return True
+      except Exception as e:
+        error = e
+        if attempt < self.max_retries:
+          self._update_metrics(retries=1)
+          time.sleep(self.retry_delay * self.retry_backoff ** attempt)
+    self._add_error(
+      'failed {0} {1}: {2}'.format(
+        notification.get('target'),
+        notification.get('type'),
+        error))
+    return False
+
+
+  def _send_batch(self,notifications):
+    '''
+    An internal method for coalescing and sending a batch of notifications
+
+    :param notifications: A list of notification dictionaries
+    :returns: A list of notifications which couldn't be sent
+    '''
+    failed = list()
+    for merged,members in self._coalesce_notifications(notifications):
+      if self._send_with_retry(merged):
+        self._update_metrics(
+          sent=len(members),
+          coalesced=len(members) - 1)
+      else:
+        failed.extend(members)
+    return failed
+
+
+  def _process_batch(self,notifications):
+    '''
+    An internal method for sending a batch from the background thread, notifications
+    which couldn't be sent are counted as dropped
+
+    :param notifications: A list of notification dictionaries
+    '''
+    try:
+      failed = self._send_batch(notifications)
+      self._update_metrics(dropped=len(failed))
+    except Exception as e:
+      self._update_metrics(dropped=len(notifications))
+      self._add_error('failed batch: {0}'.format(e))
+    finally:
+      for notification in notifications:
+        self._remove_stored_file(notification)
+
+
+  def _get_batch(self):
+    '''
+    An internal method for collecting a batch of notifications from the queue
+
+    :returns: A list of notifications, None for stopping the worker
+    '''
+    if self._stop_requested:
+      return None
+    notification = self._queue.get()
+    if notification is None:
+      self._queue.task_done()
+      return None
+    batch = [notification]
+    deadline = time.time() + self.flush_interval
+    while len(batch) < self.batch_size:
+      try:
+        notification = self._queue.get(timeout=max(0,deadline - time.time()))
+      except Empty:
+        break
+      if notification is None:
+        self._stop_requested = True                                             # stop after this batch
+        self._queue.task_done()
+        break
+      batch.append(notification)
+    return batch
+
+
+  def _run_worker(self):
+    '''
+    An internal method for processing the queue in the background thread
+    '''
+    while True:
+      batch = self._get_batch()
+      if batch is None:
+        break
+      try:
+        self._process_batch(batch)
+      finally:
+        for _ in batch:
+          self._queue.task_done()
+
+
+  def _list_spool_files(self):
+    '''
+    An internal method for listing spooled notification files, oldest first
+
+    :returns: A list of spool file paths
+    '''
+    return [
+      os.path.join(self.spool_dir,file_name)
+        for file_name in sorted(os.listdir(self.spool_dir))
+          if file_name.endswith('.json') and \
+             not file_name.startswith('.')]
+
+
+  def flush_spool_dir(self):
+    '''
+    A method for sending spooled notifications, to be run from a separate flusher
+    process. Only one flusher can run on a spool dir at a time. Notifications which
+    can't be sent are kept for the next flush till they are older than max_message_age
+
+    :returns: A dictionary containing sent, dropped and pending counts, or None if
+              another flusher is running
+    '''
+    try:
+      if self.spool_dir is None:
+        raise ValueError('No spool dir found for flushing')
+      with open(os.path.join(self.spool_dir,'.flush.lock'),'a') as lock_fp:
+        try:
+          fcntl.flock(lock_fp,fcntl.LOCK_EX|fcntl.LOCK_NB)
+        except (BlockingIOError,PermissionError):
+          return None                                                           # another flusher is running
+        try:
+          counts = {'sent':0,'dropped':0,'pending':0}
+          spool_files = self._list_spool_files()
+          for start in range(0,len(spool_files),self.batch_size):
+            notifications = list()
+            for spool_file in spool_files[start:start+self.batch_size]:
+              try:
+                with open(spool_file,'r') as fp:
+                  notification = json.load(fp)
+                notification.update({'spool_file':spool_file})
+                notifications.append(notification)
+              except ValueError:
+                os.remove(spool_file)                                           # remove broken spool file
+                counts['dropped'] += 1
+            failed = self._send_batch(notifications)
+            failed_files = set([n.get('spool_file') for n in failed])
+            for notification in notifications:
+              spool_file = notification.get('spool_file')
+              if spool_file not in failed_files:
+                os.remove(spool_file)
+                self._remove_stored_file(notification)
+                counts['sent'] += 1
+              elif time.time() - notification.get('timestamp') > self.max_message_age:
+                os.remove(spool_file)
+                self._remove_stored_file(notification)
+                counts['dropped'] += 1
+              else:
+                counts['pending'] += 1                                          # retry on next flush
+          self._update_metrics(dropped=counts['dropped'])
+          return counts
+        finally:
+          fcntl.flock(lock_fp,fcntl.LOCK_UN)
+    except Exception as e:
+      raise ValueError(
+              'Failed to flush notification spool dir {0}, error: {1}'.\
+                format(self.spool_dir,e))
+
+
+  def get_queue_depth(self):
+    '''
+    A method for fetching the number of pending notifications
+
+    :returns: Number of queued or spooled notifications
+    '''
+    if self.spool_dir is not None:
+      return len(self._list_spool_files())
+    queue_depth = self._queue.qsize()
+    if self._asana_queue is not None:
+      queue_depth += self._asana_queue.get_queue_depth()
+    return queue_depth
+
+
+  def close(self,timeout=None):
+    '''
+    A method for sending pending notifications and stopping the background threads.
+    It waits for at most close_timeout seconds, notifications which are still pending
+    after that are counted as dropped
+
+    :param timeout: Maximum time in seconds to wait, default None for close_timeout
+    '''
+    if self._closed:
+      return None
+    self._closed = True
+    if self._worker is None:
+      return None
+    if timeout is None:
+      timeout = self.close_timeout
+    deadline = time.time() + timeout
+    try:
+      self._queue.put(None,timeout=timeout)
+    except Full:
+      pass
+    self._worker.join(timeout=max(0,deadline - time.time()))
+    pending = 0
+    if self._worker.is_alive():
+      pending += self._queue.qsize()
+    if self._asana_queue is not None:
+      if not self._asana_queue.close(timeout=max(0,deadline - time.time())):
+        pending += self._asana_queue.get_queue_depth()
+      for error in self._asana_queue.errors:
+        self._add_error(error)
+    if pending > 0:
+      self._update_metrics(dropped=pending)
+      self._add_error(
+        'dropped {0} pending notifications on close'.format(pending))
+    if self._file_dir is not None:
+      remove_dir(self._file_dir)                                                # remove stored files
+
+
+  def get_metrics(self):
+    '''
+    A method for fetching dispatcher counters
+
+    :returns: A dictionary containing queued, sent, requests, coalesced, retries, dropped
+              and queue_depth, and the Asana_comment_queue counters as asana_queue if
+              Asana notifications were queued
+    '''
+    with self._lock:
+      metrics = dict(self.metrics)
+    metrics.update({'queue_depth':self.get_queue_depth()})
+    if self._asana_queue is not None:
+      metrics.update({'asana_queue':self._asana_queue.get_metrics()})
+    return metrics
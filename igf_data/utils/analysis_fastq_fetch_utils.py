@@ -1,4 +1,5 @@
 import os
+from sqlalchemy import and_
 from igf_data.igfdb.baseadaptor import BaseAdaptor
 from igf_data.igfdb.collectionadaptor import CollectionAdaptor
 from igf_data.igfdb.experimentadaptor import ExperimentAdaptor
@@ -19,43 +20,183 @@ def get_fastq_input_list(db_session_class,experiment_igf_id,combine_fastq_dir=Fa
   :raises ValueError: It raises ValueError if no fastq directory found
   '''
   try:
-    fastq_output_list=[]                                                        # default list of fastqs
+    fastq_data=\
+      get_fastq_input_list_for_experiments(\
+        db_session_class=db_session_class,
+        experiment_igf_id_list=[experiment_igf_id],
+        fastq_collection_type=fastq_collection_type,
+        active_status=active_status)
+    fastq_output_list=\
+      _format_fastq_input_list(\
+        run_fastq_data=fastq_data.get(experiment_igf_id),
+        experiment_igf_id=experiment_igf_id,
+        combine_fastq_dir=combine_fastq_dir)
+    return fastq_output_list                                                    # return list of fastq dirs
+  except:
+    raise
+
+
+def get_fastq_input_list_for_experiments(db_session_class,experiment_igf_id_list,
+                                         fastq_collection_type='demultiplexed_fastq',
+                                         active_status='ACTIVE',chunk_size=500):
+  '''
+  A function for fetching all the fastq files linked to a list of experiment ids, grouped
+  by experiment and run. It runs one joined query for each chunk of experiment ids
+
+  :param db_session_class: A database session class
+  :param experiment_igf_id_list: A list of experiment igf ids
+  :param fastq_collection_type: Fastq collection type name, default demultiplexed_fastq
+  :param active_status: text label for active runs, default ACTIVE
+  :param chunk_size: Number of experiment ids per query, default 500
+  :returns: A dictionary of experiment igf ids and dictionaries of active run igf ids and
+            sorted lists of fastq file paths, e.g. {'experiment1':{'run1':['/path/run1_R1_001.fastq.gz']}}
+            Active runs without any fastq file are added with an empty list and experiments
+            without any active run are added with an empty dictionary
+  '''
+  try:
     dbconnected=False
     base=BaseAdaptor(**{'session_class':db_session_class})
     base.start_session()
     dbconnected=True
-    subquery=base.session.\
-             query(Run.run_igf_id).\
-             join(Experiment, Experiment.experiment_id==Run.experiment_id).\
-             filter(Run.experiment_id==Experiment.experiment_id).\
-             filter(Experiment.experiment_igf_id==experiment_igf_id).\
-             filter(Run.status==active_status)                                  # get subquery for run_igf_ids
     query=base.session.\
-          query(File.file_path).\
-          join(Collection_group,File.file_id==Collection_group.file_id).\
-          join(Collection,Collection.collection_id==Collection_group.collection_id).\
-          filter(Collection.collection_id==Collection_group.collection_id).\
-          filter(Collection_group.file_id==File.file_id).\
-          filter(Collection.type==fastq_collection_type).\
-          filter(Collection.name.in_(subquery))                                 # select file_path linked to run_igf_ids
-    results=base.fetch_records(query=query,
-                               output_mode='object')                            # fetch results as generator expression
-    for row in results:
-      if combine_fastq_dir:
-        fastq_output_list.append(os.path.dirname(row.file_path))                # add fastq directory path to the output list
-      else:
-        fastq_output_list.append(row.file_path)                                 # add fastq files to the output list
+          query(Experiment.experiment_igf_id,
+                Run.run_igf_id,
+                File.file_path).\
+          join(Run,Experiment.experiment_id==Run.experiment_id).\
+          outerjoin(Collection,
+                    and_(Collection.name==Run.run_igf_id,
+                         Collection.type==fastq_collection_type)).\
+          outerjoin(Collection_group,Collection.collection_id==Collection_group.collection_id).\
+          outerjoin(File,File.file_id==Collection_group.file_id).\
+          filter(Run.status==active_status)                                     # select file_path linked to all active runs
+    results=base.fetch_records_by_column_values(\
+              query=query,
+              column_name=Experiment.experiment_igf_id,
+              column_values=experiment_igf_id_list,
+              chunk_size=chunk_size)                                            # fetch all experiments in chunks
+    base.close_session()
+    dbconnected=False
+    fastq_data={experiment_igf_id:dict()
+                  for experiment_igf_id in experiment_igf_id_list}
+    for row in results.to_dict(orient='records'):
+      run_fastq_data=fastq_data[row.get('experiment_igf_id')]
+      run_fastq_list=run_fastq_data.setdefault(row.get('run_igf_id'),list())
+      file_path=row.get('file_path')
+      if file_path is not None and \
+         file_path not in run_fastq_list:
+        run_fastq_list.append(file_path)                                        # add fastq files to the run list
+
+    for run_fastq_data in fastq_data.values():
+      for run_fastq_list in run_fastq_data.values():
+        run_fastq_list.sort()
+    return fastq_data
+  except:
+    if dbconnected:
+      base.close_session()
+    raise
+
+
+def _format_fastq_input_list(run_fastq_data,experiment_igf_id,combine_fastq_dir=False):
+  '''
+  An internal function for converting the run level fastq data of an experiment to a list
+  of unique fastq files or fastq dirs
+
+  :param run_fastq_data: A dictionary of run igf ids and lists of fastq file paths
+  :param experiment_igf_id: An experiment igf id
+  :param combine_fastq_dir: Combine fastq file directories for output line, default False
+  :returns: A list of fastq file or fastq dir paths
+  :raises ValueError: It raises ValueError if no fastq file found
+  '''
+  try:
+    fastq_output_list=list()
+    if run_fastq_data is not None:
+      for run_fastq_list in run_fastq_data.values():
+        for file_path in run_fastq_list:
+          if combine_fastq_dir:
+            fastq_output_list.append(os.path.dirname(file_path))                # add fastq directory path to the output list
+          else:
+            fastq_output_list.append(file_path)                                 # add fastq files to the output list
 
     if len(fastq_output_list) > 0:
       fastq_output_list=list(set(fastq_output_list))                            # remove redundant values
     else:
       raise ValueError('No fastq found for experiment {0}'.\
                        format(experiment_igf_id))
-
-    base.close_session()
-    dbconnected=False
-    return fastq_output_list                                                    # return list of fastq dirs
+    return fastq_output_list
   except:
-    if dbconnected:
-      base.close_session()
-    raise
\ No newline at end of file
+    raise
+
+
+class Experiment_fastq_resolver:
+  '''
+  A class for resolving fastq files for a list of experiments in bulk. Fetched records are
+  kept for the life of the object, so repeated lookups don't query the database again
+
+  :param db_session_class: A database session class
+  :param fastq_collection_type: Fastq collection type name, default demultiplexed_fastq
+  :param active_status: text label for active runs, default ACTIVE
+  :param chunk_size: Number of experiment ids per query, default 500
+  '''
+  def __init__(self,db_session_class,fastq_collection_type='demultiplexed_fastq',
+               active_status='ACTIVE',chunk_size=500):
+    self.db_session_class=db_session_class
+    self.fastq_collection_type=fastq_collection_type
+    self.active_status=active_status
+    self.chunk_size=chunk_size
+    self._fastq_data=dict()
+
+  def resolve(self,experiment_igf_id_list):
+    '''
+    A method for fetching fastq files for a list of experiments, only the experiments
+    not resolved before are fetched from database
+
+    :param experiment_igf_id_list: A list of experiment igf ids
+    :returns: A dictionary of experiment igf ids and dictionaries of run igf ids and
+              lists of fastq file paths
+    '''
+    try:
+      missing_list=[experiment_igf_id
+                      for experiment_igf_id in set(experiment_igf_id_list)
+                        if experiment_igf_id not in self._fastq_data]
+      if len(missing_list) > 0:
+        self._fastq_data.\
+          update(
+            get_fastq_input_list_for_experiments(\
+              db_session_class=self.db_session_class,
+              experiment_igf_id_list=missing_list,
+              fastq_collection_type=self.fastq_collection_type,
+              active_status=self.active_status,
+              chunk_size=self.chunk_size))                                      # fetch all new experiments in one go
+      return {experiment_igf_id:self._fastq_data.get(experiment_igf_id)
+                for experiment_igf_id in experiment_igf_id_list}
+    except:
+      raise
+
+  def get_run_fastq_list(self,experiment_igf_id):
+    '''
+    A method for fetching the fastq files of an experiment grouped by runs
+
+    :param experiment_igf_id: An experiment igf id
+    :returns: A dictionary of active run igf ids and lists of fastq file paths
+    '''
+    try:
+      return self.resolve([experiment_igf_id]).get(experiment_igf_id)
+    except:
+      raise
+
+  def get_fastq_input_list(self,experiment_igf_id,combine_fastq_dir=False):
+    '''
+    A method for fetching all the fastq files linked to an experiment
+
+    :param experiment_igf_id: An experiment igf id
+    :param combine_fastq_dir: Combine fastq file directories for output line, default False
+    :returns: A list of fastq file or fastq dir paths for the analysis run
+    :raises ValueError: It raises ValueError if no fastq file found
+    '''
+    try:
+      return _format_fastq_input_list(\
+               run_fastq_data=self.get_run_fastq_list(experiment_igf_id),
+               experiment_igf_id=experiment_igf_id,
+               combine_fastq_dir=combine_fastq_dir)
+    except:
+      raise
@@ -1,5 +1,7 @@
-import re,os
+import re,os,json,hashlib
+from tempfile import NamedTemporaryFile
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor,as_completed
 from igf_data.igfdb.baseadaptor import BaseAdaptor
 from igf_data.utils.dbutils import read_dbconf_json
 from igf_data.utils.fileutils import get_temp_dir,remove_dir,copy_local_file
@@ -38,12 +40,18 @@ class Config_genome_browser:
     self.analysis_path_prefix = analysis_path_prefix
     self.use_ephemeral_space = use_ephemeral_space
     self.analysis_dir_structure_list = list(analysis_dir_structure_list)
+    self._ref_genome_info_cache = dict()
 
-  def _fetch_track_files_with_metadata(self,level='experiment'):
+  def _fetch_track_files_with_metadata(self,level='experiment',project_igf_id_list=None,
+                                       all_projects=False,filter_species=False):
     '''
     An internal method for fetching track files with the metadata information
     
     :param level: Specific level for fetching metadata information, default 'experiment'
+    :param project_igf_id_list: A list of project igf ids for fetching tracks of multiple
+                                projects in one query, default None for self.project_igf_id
+    :param all_projects: A toggle for fetching tracks of all projects, default False
+    :param filter_species: A toggle for fetching tracks of samples with self.species_name only, default False
     :returns: A pandas dataframe object
     '''
     try:
@@ -82,12 +90,26 @@ class Config_genome_browser:
             filter(File.status=='ACTIVE').\
             filter(Pipeline_seed.status=='FINISHED').\
             filter(Pipeline.pipeline_id==Pipeline_seed.pipeline_id).\
-            filter(Pipeline.pipeline_name==self.pipeline_name).\
-            filter(Project.project_igf_id==self.project_igf_id)
-        records = \
-          base.fetch_records(
-            query=query,
-            output_mode='dataframe')
+            filter(Pipeline.pipeline_name==self.pipeline_name)
+        if filter_species:
+          query = \
+            query.filter(Sample.species_name==self.species_name)                # tracks must match the reference genome
+        if all_projects:
+          records = \
+            base.fetch_records(
+              query=query,
+              output_mode='dataframe')
+        elif project_igf_id_list is not None:
+          records = \
+            base.fetch_records_by_column_values(
+              query=query,
+              column_name=Project.project_igf_id,
+              column_values=project_igf_id_list)                                # fetch multiple projects in one go
+        else:
+          records = \
+            base.fetch_records(
+              query=query.filter(Project.project_igf_id==self.project_igf_id),
+              output_mode='dataframe')
         base.close_session()
         return records
       else:
@@ -96,16 +118,20 @@ class Config_genome_browser:
     except:
       raise
 
-  def build_biodalliance_config(self,template_file,output_file):
+  def _get_ref_genome_info(self):
     '''
-    A method for building biodalliance specific config file
-    :param template_file: A template file path
-    :param output_file: An output filepath
+    An internal method for fetching species specific track info and reference genome urls.
+    Results are cached for the species, so batch builds look up the reference only once
+
+    :returns: A dictionary with species_specific_data, ref_genome_url and track_file_urls
     '''
     try:
-      if not os.path.exists(template_file):
-        raise IOError('Template file {0} not found'.\
-                      format(template_file))
+      cache_key = \
+        (self.species_name,
+         self.ref_genome_type,
+         self.track_file_type)
+      if cache_key in self._ref_genome_info_cache:
+        return self._ref_genome_info_cache.get(cache_key)
 
       species_specific_data = \
         self._get_species_specific_info_for_track(
@@ -116,57 +142,263 @@ class Config_genome_browser:
           dbsession_class=self.dbsession_class,
           genome_twobit_uri_type=self.ref_genome_type)                          # setup ref genome utils
       ref_genome_url = ref_genome.get_twobit_genome_url()
+      track_file_urls = None
       if self.track_file_type is not None:
         track_file_urls = \
           ref_genome.get_generic_ref_files(
             collection_type=self.track_file_type,
             check_missing=True)                                                 # fetch additional track files
 
+      ref_genome_info = {
+        'species_specific_data':species_specific_data,
+        'ref_genome_url':ref_genome_url,
+        'track_file_urls':track_file_urls}
+      self._ref_genome_info_cache[cache_key] = ref_genome_info
+      return ref_genome_info
+    except:
+      raise
+
+  @staticmethod
+  def _get_biodalliance_template(template_file):
+    '''
+    An internal static method for loading the biodalliance config template
+
+    :param template_file: A template file path
+    :returns: A jinja2 template object
+    '''
+    try:
+      if not os.path.exists(template_file):
+        raise IOError('Template file {0} not found'.\
+                      format(template_file))
+
+      template_env = \
+        Environment(
+          loader=\
+            FileSystemLoader(
+              searchpath=os.path.dirname(template_file)),
+          autoescape=select_autoescape(['html', 'xml','ipynb']))
+      template = \
+        template_env.\
+          get_template(os.path.basename(template_file))
+      return template
+    except:
+      raise
+
+  def _write_biodalliance_config(self,template,ref_genome_info,bwdata,output_file):
+    '''
+    An internal method for writing a biodalliance config file from formatted track records
+
+    :param template: A jinja2 template object
+    :param ref_genome_info: A dictionary from _get_ref_genome_info method
+    :param bwdata: A list of dictionaries containing the reformatted track info
+    :param output_file: An output filepath
+    '''
+    try:
+      species_specific_data = ref_genome_info.get('species_specific_data')
+      temp_dir = \
+        get_temp_dir(
+          use_ephemeral_space=self.use_ephemeral_space)
+      temp_output = \
+        os.path.join(
+          temp_dir,
+          os.path.basename(output_file))                                        # get temp output file
+      template.\
+        stream(
+          chrname=species_specific_data.get('chrname'),
+          startPosition=species_specific_data.get('startPosition'),
+          endPosition=species_specific_data.get('endPosition'),
+          speciesCommonName=species_specific_data.get('speciesCommonName'),
+          speciesTaxon=species_specific_data.get('speciesTaxon'),
+          refAuthority=species_specific_data.get('refAuthority'),
+          refVersion=species_specific_data.get('refVersion'),
+          speciesUcscName=species_specific_data.get('speciesUcscName'),
+          ensemblSpecies=species_specific_data.get('ensemblSpecies'),
+          twoBitRefRemoteUrl=ref_genome_info.get('ref_genome_url'),
+          bwdata=bwdata).\
+        dump(temp_output)
+      if not os.path.exists(temp_output):
+        raise IOError('Failed to write temp output file')
+
+      copy_local_file(
+        source_path=temp_output,
+        destinationa_path=output_file,
+        force=True)                                                             # copy output config file
+      remove_dir(temp_dir)
+    except:
+      raise
+
+  def build_biodalliance_config(self,template_file,output_file):
+    '''
+    A method for building biodalliance specific config file
+    :param template_file: A template file path
+    :param output_file: An output filepath
+    '''
+    try:
+      if not os.path.exists(template_file):
+        raise IOError('Template file {0} not found'.\
+                      format(template_file))
+
+      ref_genome_info = self._get_ref_genome_info()                             # get species specific data
       records = self._fetch_track_files_with_metadata(level='experiment')
       if len(records.index)>0:
-        records = \
-          records.\
-            apply(
-              lambda x: self._reformat_track_info(data=x),
-              axis=1)                                                           # reformat data for track config
-        template_env = \
-          Environment(
-            loader=\
-              FileSystemLoader(
-                searchpath=os.path.dirname(template_file)),
-            autoescape=select_autoescape(['html', 'xml','ipynb']))
+        bwdata = \
+          [self._reformat_track_info(data=row)
+             for row in records.to_dict(orient='records')]                      # reformat data for track config
         template = \
-          template_env.\
-            get_template(os.path.basename(template_file))
+          self._get_biodalliance_template(
+            template_file=template_file)
+        self._write_biodalliance_config(
+          template=template,
+          ref_genome_info=ref_genome_info,
+          bwdata=bwdata,
+          output_file=output_file)
+    except:
+      raise
+
+  @staticmethod
+  def _get_track_files_fingerprint(file_list,extra_info=()):
+    '''
+    An internal static method for calculating a checksum of the track file set, using
+    the file paths and modification times
+
+    :param file_list: A list of track file paths
+    :param extra_info: A list of additional values to include in the checksum, default empty
+    :returns: A md5 hexdigest string
+    '''
+    try:
+      file_md5 = hashlib.md5()
+      for item in extra_info:
+        file_md5.update('{0}\n'.format(item).encode('utf-8'))
+      for file_path in sorted(set(file_list)):
+        try:
+          file_mtime = os.stat(file_path).st_mtime_ns
+        except FileNotFoundError:
+          file_mtime = None                                                     # missing files are part of the state
+        file_md5.update('{0}\t{1}\n'.format(file_path,file_mtime).encode('utf-8'))
+      return file_md5.hexdigest()
+    except:
+      raise
+
+  def build_biodalliance_config_for_projects(self,template_file,output_dir,
+                                             project_igf_id_list=None,state_file=None,
+                                             force=False,max_workers=4):
+    '''
+    A method for building biodalliance config files for multiple projects, using a single
+    track file query. Only the tracks of samples with matching species_name are included, as
+    all the configs use the reference genome of species_name. Projects are skipped if their
+    track file paths and modification times are unchanged since the last build recorded in
+    the state file
+
+    Output files are written to output_dir/PROJECT_IGF_ID/TEMPLATE_FILE_NAME
+
+    :param template_file: A template file path
+    :param output_dir: An output directory path
+    :param project_igf_id_list: A list of project igf ids, default None for all projects
+    :param state_file: A json file for recording the track file checksum of each project,
+                       default None for output_dir/genome_browser_build_state.json
+    :param force: A toggle for rebuilding all configs, default False
+    :param max_workers: Number of parallel config writers, default 4
+    :returns: A dictionary of project igf id and output file path for the updated projects
+    '''
+    try:
+      if not os.path.exists(template_file):
+        raise IOError('Template file {0} not found'.\
+                      format(template_file))
 
-        temp_dir = \
-          get_temp_dir(
-            use_ephemeral_space=self.use_ephemeral_space)
-        temp_output = \
+      if state_file is None:
+        state_file = \
           os.path.join(
-            temp_dir,
-            os.path.basename(output_file))                                      # get temp output file
-        template.\
-          stream(
-            chrname=species_specific_data.get('chrname'),
-            startPosition=species_specific_data.get('startPosition'),
-            endPosition=species_specific_data.get('endPosition'),
-            speciesCommonName=species_specific_data.get('speciesCommonName'),
-            speciesTaxon=species_specific_data.get('speciesTaxon'),
-            refAuthority=species_specific_data.get('refAuthority'),
-            refVersion=species_specific_data.get('refVersion'),
-            speciesUcscName=species_specific_data.get('speciesUcscName'),
-            ensemblSpecies=species_specific_data.get('ensemblSpecies'),
-            twoBitRefRemoteUrl=ref_genome_url,
-            bwdata=records.to_dict(orient='records')).\
-          dump(temp_output)
-        if not os.path.exists(temp_output):
-          raise IOError('Failed to write temp output file')
-
-        copy_local_file(
-          source_path=temp_output,
-          destinationa_path=output_file,
-          force=True)                                                           # copy output config file
+            output_dir,
+            'genome_browser_build_state.json')
+      build_state = dict()
+      if os.path.exists(state_file) and not force:
+        with open(state_file,'r') as fp:
+          build_state = json.load(fp)
+
+      ref_genome_info = self._get_ref_genome_info()
+      if project_igf_id_list is None:
+        records = \
+          self._fetch_track_files_with_metadata(
+            level='experiment',
+            all_projects=True,
+            filter_species=True)
+      else:
+        records = \
+          self._fetch_track_files_with_metadata(
+            level='experiment',
+            project_igf_id_list=project_igf_id_list,
+            filter_species=True)                                                # fetch all tracks in one query
+
+      template = \
+        self._get_biodalliance_template(
+          template_file=template_file)
+      extra_info = \
+        [os.stat(template_file).st_mtime_ns,
+         ref_genome_info.get('ref_genome_url')]                                 # rebuild if template or ref changed
+      project_tracks = dict()
+      for row in records.to_dict(orient='records'):
+        project_tracks.\
+          setdefault(row.get('project_igf_id'),list()).\
+          append(row)
+
+      def _build_project_config(project_igf_id,track_records):
+        output_file = \
+          os.path.join(
+            output_dir,
+            project_igf_id,
+            os.path.basename(template_file))
+        fingerprint = \
+          self._get_track_files_fingerprint(
+            file_list=[row.get('file_path') for row in track_records],
+            extra_info=extra_info)
+        if build_state.get(project_igf_id) == fingerprint and \
+           os.path.exists(output_file):
+          return project_igf_id,fingerprint,None                                # skip unchanged project
+
+        bwdata = \
+          [self._reformat_track_info(data=row)
+             for row in track_records]
+        os.makedirs(os.path.dirname(output_file),exist_ok=True)
+        self._write_biodalliance_config(
+          template=template,
+          ref_genome_info=ref_genome_info,
+          bwdata=bwdata,
+          output_file=output_file)
+        return project_igf_id,fingerprint,output_file
+
+      output_files = dict()
+      errors = list()
+      with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+          executor.submit(
+            _build_project_config,
+            project_igf_id,
+            track_records)
+            for project_igf_id,track_records in sorted(project_tracks.items())]
+        for future in as_completed(futures):
+          try:
+            project_igf_id,fingerprint,output_file = future.result()
+            build_state[project_igf_id] = fingerprint
+            if output_file is not None:
+              output_files[project_igf_id] = output_file
+          except Exception as e:
+            errors.append(str(e))
+
+      state_dir = os.path.dirname(os.path.abspath(state_file))
+      os.makedirs(state_dir,exist_ok=True)
+      with NamedTemporaryFile(
+             mode='w',
+             dir=state_dir,
+             prefix='.{0}.'.format(os.path.basename(state_file)),
+             delete=False) as fp:                                               # unique temp file for each run
+        temp_state_file = fp.name
+        json.dump(build_state,fp,indent=2,sort_keys=True)
+      os.replace(temp_state_file,state_file)                                    # update state file atomically
+      if len(errors) > 0:
+        raise ValueError(
+                'Failed to build config for {0} projects: {1}'.\
+                  format(len(errors),'; '.join(errors)))
+      return output_files
     except:
       raise
 
@@ -202,13 +434,13 @@ class Config_genome_browser:
     '''
     An internal method for reformatting data for track
     
-    :param data: A pandas data series
-    :returns: A pandas data series with updated entries
+    :param data: A pandas data series or a dictionary
+    :returns: A pandas data series or a dictionary with updated entries
     '''
     try:
       tag_name = None
-      if not isinstance(data,pd.Series):
-        raise AttributeError('Expecting a pandas data series and got {0}'.\
+      if not isinstance(data,(pd.Series,dict)):
+        raise AttributeError('Expecting a pandas data series or dictionary and got {0}'.\
                              format(type(data)))
 
       sample_igf_id = data.get('sample_igf_id')
@@ -219,7 +451,7 @@ class Config_genome_browser:
 
       if file_path is None:
         raise ValueError('No filepath found:{0}'.\
-                         format(data.to_dict()))
+                         format(dict(data)))
 
       file_path = os.path.basename(file_path)
       if collection_type=='STAR_BIGWIG':                                        # adding collection type specific codes
@@ -234,7 +466,7 @@ class Config_genome_browser:
          experiment_type is None or \
          collection_type is None:
         raise ValueError('Required metadata not found: {0}'.\
-                         format(data.to_dict()))
+                         format(dict(data)))
 
       track_name = \
         '{0}.{1}.{2}'.format(
@@ -250,7 +482,7 @@ class Config_genome_browser:
       for item in self.analysis_dir_structure_list:
         if data.get(item) is None:
           raise ValueError('path item {0} not found: {1}'.\
-                           format(item,data.to_dict()))
+                           format(item,dict(data)))
         track_path_list.append(data.get(item))
 
       track_path_list.append(file_path)
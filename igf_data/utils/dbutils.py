@@ -28,6 +28,60 @@ def read_json_data(data_file):
     raise
 
 
+def read_json_data_in_chunks(data_file,chunk_size=1000,block_size=1048576):
+  '''
+  A generator for reading a list of dictionaries from a json file in chunks, without loading
+  the whole file in memory. Files with a single dictionary are read as a list of one entry
+
+  :param data_file: A Json format file
+  :param chunk_size: Number of dictionaries in each chunk, default 1000
+  :param block_size: Number of characters to read from the file at a time, default 1048576
+  :returns: A generator of lists of dictionaries
+  '''
+  try:
+    if not os.path.exists(data_file):
+      raise IOError('file {0} not found'.format(data_file))
+
+    decoder = json.JSONDecoder()
+    with open(data_file, 'r') as json_data:
+      buffer = json_data.read(block_size).lstrip()
+      if not buffer.startswith('['):
+        yield read_json_data(data_file)                                         # not a list, read all data
+        return
+      buffer = buffer[1:]
+      position = 0
+      chunk = list()
+      eof = False
+      while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+          position += 1                                                         # skip separators
+        if position < len(buffer) and buffer[position] == ']':
+          break                                                                 # end of list
+        try:
+          if position == len(buffer):
+            raise ValueError('Need more data')
+          entry,position = decoder.raw_decode(buffer,position)
+        except ValueError:
+          if eof:
+            raise ValueError('Incomplete json data in file {0}'.format(data_file))
+          new_data = json_data.read(block_size)
+          eof = new_data == ''
+          buffer = buffer[position:] + new_data                                 # keep the partial entry
+          position = 0
+          continue
+        if not isinstance(entry, dict):
+          raise ValueError('Expecting a list of dictionaries in file {0}, got {1}'.\
+                           format(data_file,type(entry)))
+        chunk.append(entry)
+        if len(chunk) >= chunk_size:
+          yield chunk
+          chunk = list()
+      if len(chunk) > 0:
+        yield chunk
+  except:
+    raise
+
+
 def read_dbconf_json(dbconfig):
   '''
   A method for reading dbconfig json file
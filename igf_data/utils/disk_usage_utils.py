@@ -1,6 +1,6 @@
-import shutil,os, subprocess,json
+import shutil,os,json,time
 import pandas as pd
-from shlex import quote
+from concurrent.futures import ThreadPoolExecutor,as_completed
 
 def get_storage_stats_in_gb(storage_list):
   '''
@@ -106,15 +106,127 @@ def merge_storage_stats_json(config_file,label_file=None,
   except:
     raise
 
+def _scan_directory_tree(dir_path,dir_snapshot=None):
+  '''
+  An internal function for calculating disk usage of a directory tree using os.scandir.
+  Disk usage is calculated from the allocated blocks (similar to du -s) and hard linked
+  files are counted only once within the tree. Directories with unchanged mtime in the
+  dir_snapshot are not stat'ed again, and the recorded file usage is reused
+
+  :param dir_path: A directory path
+  :param dir_snapshot: A dictionary of relative dir path and the recorded usage from
+                       a previous scan, default None
+  :returns: Total disk usage in bytes, a new dir snapshot dictionary and count of rescanned dirs
+  '''
+  try:
+    if dir_snapshot is None:
+      dir_snapshot = dict()
+    new_snapshot = dict()
+    hard_links = dict()
+    total_bytes = 0
+    scanned_dirs = 0
+    dir_list = [dir_path]
+    while len(dir_list) > 0:
+      current_dir = dir_list.pop()
+      dir_stat = os.stat(current_dir,follow_symlinks=False)                     # stat dir before listing it
+      rel_path = os.path.relpath(current_dir,dir_path)
+      total_bytes += dir_stat.st_blocks * 512
+      cached_entry = dir_snapshot.get(rel_path)
+      use_cache = \
+        cached_entry is not None and \
+        cached_entry.get('mtime_ns') == dir_stat.st_mtime_ns
+      file_bytes = 0
+      links = list()
+      with os.scandir(current_dir) as entries:
+        for entry in entries:
+          if entry.is_dir(follow_symlinks=False):
+            dir_list.append(entry.path)                                         # symlinked dirs are not followed
+          elif not use_cache:
+            entry_stat = entry.stat(follow_symlinks=False)
+            entry_bytes = entry_stat.st_blocks * 512
+            if entry_stat.st_nlink > 1:
+              links.append([entry_stat.st_dev,entry_stat.st_ino,entry_bytes])
+            else:
+              file_bytes += entry_bytes
+      if use_cache:
+        file_bytes = cached_entry.get('bytes')
+        links = cached_entry.get('links')
+      else:
+        scanned_dirs += 1
+      new_snapshot[rel_path] = {
+        'mtime_ns':dir_stat.st_mtime_ns,
+        'bytes':file_bytes,
+        'links':links}
+      total_bytes += file_bytes
+      for dev,ino,entry_bytes in links:
+        hard_links[(dev,ino)] = entry_bytes                                     # count hard links only once
+    total_bytes += sum(hard_links.values())
+    return total_bytes,new_snapshot,scanned_dirs
+  except Exception as e:
+    raise ValueError(
+            'Failed directory size check for {0}, error: {1}'.\
+              format(dir_path,e))
+
+
+def _get_path_usage(path,snapshot_file=None,force=False):
+  '''
+  An internal function for calculating disk usage of a file or directory tree, with an
+  optional json snapshot file for incremental rescans
+
+  :param path: A file or directory path
+  :param snapshot_file: A json file for the dir usage snapshot, default None
+  :param force: A toggle for ignoring the existing snapshot, default False
+  :returns: Disk usage in bytes
+  '''
+  try:
+    if not os.path.isdir(path) or os.path.islink(path):
+      return os.stat(path,follow_symlinks=False).st_blocks * 512
+
+    dir_snapshot = None
+    if snapshot_file is not None and \
+       os.path.exists(snapshot_file) and \
+       not force:
+      try:
+        with open(snapshot_file,'r') as fp:
+          dir_snapshot = json.load(fp).get('dirs')
+      except ValueError:
+        dir_snapshot = None                                                     # ignore broken snapshot file
+
+    total_bytes,new_snapshot,_ = \
+      _scan_directory_tree(
+        dir_path=path,
+        dir_snapshot=dir_snapshot)
+    if snapshot_file is not None:
+      temp_snapshot_file = '{0}.tmp'.format(snapshot_file)
+      with open(temp_snapshot_file,'w') as fp:
+        json.dump({
+          'path':path,
+          'timestamp':time.time(),
+          'bytes':total_bytes,
+          'dirs':new_snapshot},fp)
+      os.replace(temp_snapshot_file,snapshot_file)                              # record snapshot for each path
+    return total_bytes
+  except:
+    raise
+
+
 def get_sub_directory_size_in_gb(input_path,dir_name_col='directory_name',
-                                 dir_size_col='directory_size'):
+                                 dir_size_col='directory_size',snapshot_dir=None,
+                                 max_workers=4,force=False):
   '''
   A utility function for listing disk size of all sub-directories for a given path
   (similar to linux command du -sh /path/* )
 
+  Sub-directories are scanned in parallel using os.scandir. If a snapshot_dir is present,
+  a usage snapshot is recorded for each sub-directory as soon as it is scanned, and on the
+  next run only the directories with a changed mtime are listed again
+
   :param input_path: a input file path
   :param dir_name_col: column name for directory name, default directory_name
   :param dir_size_col: column name for directory size, default directory size
+  :param snapshot_dir: a directory path for the usage snapshot files, default None
+  :param max_workers: number of parallel sub-directory scans, default 4
+  :param force: a toggle for rescanning all the directories, default False
   :returns:
     * a list of dictionaries containing following keys
         directory_name
@@ -123,20 +235,38 @@ def get_sub_directory_size_in_gb(input_path,dir_name_col='directory_name',
     * a column order list for gviz _api
   '''
   try:
+    if snapshot_dir is not None:
+      os.makedirs(snapshot_dir,exist_ok=True)
+
+    dir_names = sorted(os.listdir(input_path))
     storage_stats=list()
-    for dir_name in os.listdir(input_path):
-      cmd=['du','-s',quote(os.path.join(input_path,dir_name))]
-      proc=subprocess.Popen(cmd,stdout=subprocess.PIPE,stderr=subprocess.PIPE)
-      proc.wait()
-      outs,err=proc.communicate()
-      if proc.returncode == 0:
-        dir_size,dir_name=outs.decode('utf-8').split()
-        storage_stats.append({dir_name_col:os.path.basename(dir_name),
-                              dir_size_col:int(dir_size)/1024/1024/1024})
-      else:
-        raise ValueError('Failed directory size check: {0}'.format(err))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+      futures = dict()
+      for dir_name in dir_names:
+        snapshot_file = None
+        if snapshot_dir is not None:
+          snapshot_file = \
+            os.path.join(
+              snapshot_dir,
+              '{0}.json'.format(dir_name))
+        future = \
+          executor.submit(
+            _get_path_usage,
+            path=os.path.join(input_path,dir_name),
+            snapshot_file=snapshot_file,
+            force=force)
+        futures[future] = dir_name
+      for future in as_completed(futures):
+        storage_stats.append({dir_name_col:futures[future],
+                              dir_size_col:future.result()/1024/1024/1024})
 
-    storage_stats=pd.DataFrame(storage_stats)                                   # convert to dataframe
+    if snapshot_dir is not None:
+      for snapshot_file in os.listdir(snapshot_dir):
+        if snapshot_file.endswith('.json') and \
+           snapshot_file[:-len('.json')] not in dir_names:
+          os.remove(os.path.join(snapshot_dir,snapshot_file))                   # remove snapshot for deleted dirs
+
+    storage_stats=pd.DataFrame(storage_stats,columns=[dir_name_col,dir_size_col]) # convert to dataframe
     storage_stats[dir_size_col]=storage_stats[dir_size_col].astype(float)       # change column type to float
     storage_stats.sort_values(by=[dir_size_col],ascending=False,inplace=True)   # sort dataframe by dir size
     storage_stats=storage_stats.to_dict(orient='record')                        # convert to list of dictionary
@@ -146,4 +276,4 @@ def get_sub_directory_size_in_gb(input_path,dir_name_col='directory_name',
     column_order=[dir_name_col,dir_size_col]                                    # a column order for gviz_api
     return storage_stats, description, column_order
   except:
-    raise
\ No newline at end of file
+    raise
@@ -1,40 +1,80 @@
-import os,zipfile, fnmatch, re
-from igf_data.utils.fileutils import get_temp_dir
+import io,re
+import pandas as pd
+from multiprocessing import Pool
+from igf_data.utils.fileutils import read_archive_member
 
 def get_fastq_info_from_fastq_zip(fastqc_zip,fastqc_datafile='*/fastqc_data.txt'):
   '''
-  A function for retriving total reads and fastq file name from fastqc_zip file
-  
+  A function for retriving total reads and fastq file name from fastqc_zip file.
+  The fastqc data file is parsed from memory, without extracting the zip file
+
   :param fastqc_zip: A zip file containing fastqc results
   :param fastqc_datafile: A pattern f
   :returns: return total read count and fastq filename
   '''
   try:
-    zip_obj=zipfile.ZipFile(file=fastqc_zip)
     total_seq_pattern=re.compile(r'Total\sSequences\s+(\d+)\n')
     filename_pattern=re.compile(r'Filename\s(\S+)\n')
     total_reads=None
     fastq_filename=None
-    
-    fastqc_data=os.path.join(get_temp_dir(),\
-                             'fastqc_data.txt')
-    for file in zip_obj.namelist():
-      if fnmatch.fnmatch(file,fastqc_datafile):
-        with open(fastqc_data,'wb') as f1:
-          f1.write(zip_obj.read(name=file))                                     # write fastqc data to temp file
-          
-    if not os.path.exists(fastqc_data):
-      raise IOError('file {0} not found'.format(fastqc_data))
-    
-    with open(fastqc_data,'r') as t1:
+
+    _,fastqc_data=read_archive_member(archive_path=fastqc_zip,
+                                      member_pattern=fastqc_datafile)           # read fastqc data to memory
+
+    with io.TextIOWrapper(io.BytesIO(fastqc_data)) as t1:
       for l in t1:
         m1=re.match(total_seq_pattern,l)
         if m1:
           total_reads=m1.group(1)
-          
+
         m2=re.match(filename_pattern,l)
         if m2:
           fastq_filename=m2.group(1)
+
+        if total_reads is not None and \
+           fastq_filename is not None:
+          break                                                                 # both are in the basic statistics module
     return total_reads, fastq_filename
   except:
-    raise
\ No newline at end of file
+    raise
+
+
+def _get_fastq_info_record(fastqc_zip):
+  '''
+  An internal function for fetching fastqc info as a dictionary
+
+  :param fastqc_zip: A zip file containing fastqc results
+  :returns: A dictionary containing fastqc_zip, total_reads and fastq_filename
+  '''
+  total_reads,fastq_filename=get_fastq_info_from_fastq_zip(fastqc_zip)
+  return {'fastqc_zip':fastqc_zip,
+          'total_reads':total_reads,
+          'fastq_filename':fastq_filename}
+
+
+def get_fastq_info_from_fastq_zip_list(fastqc_zip_list,threads=4):
+  '''
+  A function for retriving total reads and fastq file names from a list of fastqc zip files
+  using parallel processes
+
+  :param fastqc_zip_list: A list of zip files containing fastqc results
+  :param threads: Number of parallel processes, default 4
+  :returns: A pandas dataframe with columns fastqc_zip, total_reads and fastq_filename
+  '''
+  try:
+    fastqc_zip_list=list(fastqc_zip_list)
+    columns=['fastqc_zip','total_reads','fastq_filename']
+    if len(fastqc_zip_list)==0:
+      return pd.DataFrame(columns=columns)
+
+    if threads > 1 and \
+       len(fastqc_zip_list) > 1:
+      with Pool(processes=min(threads,len(fastqc_zip_list))) as pool:
+        fastqc_info=pool.map(_get_fastq_info_record,fastqc_zip_list)           # parse zip files in parallel
+    else:
+      fastqc_info=[_get_fastq_info_record(fastqc_zip)
+                     for fastqc_zip in fastqc_zip_list]
+    return pd.DataFrame(fastqc_info,columns=columns)
+  except Exception as e:
+    raise ValueError('Failed to get fastq info from fastqc zip list, error: {0}'.\
+                     format(e))
@@ -1,12 +1,14 @@
 #!/usr/bin/env python
 import pandas as pd
-import os,subprocess,hashlib,string,re
-import tarfile,fnmatch
+import os,sys,subprocess,hashlib,string,re,struct,time,zlib
+import tarfile,fnmatch,fcntl,json,zipfile,gzip,bz2,lzma
 from shlex import quote
 from datetime import datetime
 from dateutil.parser import parse
-from tempfile import mkdtemp,gettempdir
-from shutil import rmtree, move, copy2,copytree
+from tempfile import mkdtemp,mkstemp,gettempdir
+from shutil import rmtree, move, copy2,copytree,copyfileobj
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 def move_file(source_path,destinationa_path, force=False):
   '''
@@ -140,6 +142,213 @@ def copy_local_file(source_path,destinationa_path,cd_to_dest=True,force=False):
     raise ValueError("Failed to copy local file, error: {0}".format(e))
 
 
+FICLONE = 0x40049409                                                            # ioctl request for reflink on linux
+
+def _reflink_local_file(source_path,destination_path):
+  '''
+  An internal function for cloning a file using reflink (FICLONE ioctl),
+  it works only for files on the same copy-on-write filesystem, e.g. btrfs or xfs
+
+  :param source_path: A source file path
+  :param destination_path: A destination file path
+  :raises OSError: If reflink is not supported for the paths
+  '''
+  with open(source_path,'rb') as src_fp:
+    try:
+      with open(destination_path,'wb') as dest_fp:
+        fcntl.ioctl(dest_fp.fileno(),FICLONE,src_fp.fileno())
+    except:
+      if os.path.exists(destination_path):
+        os.remove(destination_path)
+      raise
+  source_stats = os.stat(source_path)
+  os.utime(destination_path,ns=(source_stats.st_atime_ns,source_stats.st_mtime_ns))
+
+
+def link_or_copy_local_file(source_path,destination_path,force=False,
+                            use_hardlink=True,use_reflink=True,use_symlink=False):
+  '''
+  A function for staging local files or dirs without copying the data, if possible.
+  It tries symlink (only if use_symlink is True), hard link, reflink and copy, in that
+  order, for each file. Dirs are always created as new dirs in the destination path.
+  Linked files share the data with the source path, so staged files must
+  not be modified in place
+
+  :param source_path: A source file or dir path
+  :param destination_path: A destination file or dir path
+  :param force: Optional, set True to overwrite existing destination path, default False
+  :param use_hardlink: Toggle for using hard links, default True
+  :param use_reflink: Toggle for using reflink, default True
+  :param use_symlink: Toggle for using symlinks to the absolute source paths, default False
+  :returns: A dictionary containing bytes staged by symlink, hardlink, reflink and copy
+  '''
+  try:
+    if not os.path.exists(source_path):
+      raise IOError('source file {0} not found'.\
+                    format(source_path))
+
+    if os.path.exists(destination_path):
+      if not force:
+        raise IOError(
+                'destination file {0} already present. set option "force" as True to overwrite it'.\
+                  format(destination_path))
+      elif os.path.isdir(destination_path) and \
+           not os.path.islink(destination_path):
+        rmtree(destination_path)
+      else:
+        os.remove(destination_path)
+
+    file_list = list()
+    real_source_path = os.path.realpath(source_path)                            # symlink target prefix
+    if os.path.isdir(source_path):
+      for root,_,files in os.walk(source_path):
+        relative_root = os.path.relpath(root,source_path)
+        target_root = \
+          os.path.join(
+            destination_path,
+            relative_root)
+        os.makedirs(target_root,mode=0o770,exist_ok=True)
+        for file_name in files:
+          file_list.append((
+            os.path.join(root,file_name),
+            os.path.join(target_root,file_name),
+            os.path.normpath(
+              os.path.join(real_source_path,relative_root,file_name))))
+    else:
+      dir_path = os.path.dirname(destination_path)
+      if dir_path != '' and \
+         not os.path.exists(dir_path):
+        os.makedirs(dir_path, mode=0o770)
+      file_list.append((source_path,destination_path,real_source_path))
+
+    staged_bytes = {
+      'symlink':0,
+      'hardlink':0,
+      'reflink':0,
+      'copy':0}
+    for source_file,destination_file,link_target in file_list:
+      file_size = os.path.getsize(source_file)
+      if use_symlink:
+        os.symlink(link_target,destination_file)
+        staged_bytes['symlink'] += file_size
+        continue
+      if use_hardlink:
+        try:
+          os.link(source_file,destination_file,follow_symlinks=True)
+          staged_bytes['hardlink'] += file_size
+          continue
+        except OSError:
+          pass                                                                  # cross device or link not permitted
+      if use_reflink:
+        try:
+          _reflink_local_file(source_file,destination_file)
+          staged_bytes['reflink'] += file_size
+          continue
+        except OSError:
+          pass                                                                  # reflink not supported
+      copy2(source_file,destination_file,follow_symlinks=True)
+      staged_bytes['copy'] += file_size
+    return staged_bytes
+  except Exception as e:
+    raise ValueError(
+            "Failed to link or copy local file {0}, error: {1}".\
+              format(source_path,e))
+
+
+def _append_file_data(source_fp,destination_fp):
+  '''
+  An internal function for appending the content of a file to another open file without
+  reading the data in python. It uses copy_file_range if available, otherwise sendfile,
+  and falls back to a buffered copy if the kernel does not support either of them
+
+  :param source_fp: A file object for the source file, opened in binary read mode
+  :param destination_fp: A file object for the destination file, opened in binary write mode
+  :returns: Number of bytes copied
+  '''
+  source_fd = source_fp.fileno()
+  destination_fd = destination_fp.fileno()
+  file_size = os.fstat(source_fd).st_size
+  copied_bytes = 0
+  try:
+    while copied_bytes < file_size:
+      if hasattr(os,'copy_file_range'):
+        sent = \
+          os.copy_file_range(
+            source_fd,
+            destination_fd,
+            file_size - copied_bytes)                                           # in kernel copy, python 3.8+
+      else:
+        sent = \
+          os.sendfile(
+            destination_fd,
+            source_fd,
+            copied_bytes,
+            file_size - copied_bytes)                                           # file to file sendfile on linux
+      if sent == 0:
+        break
+      copied_bytes += sent
+  except OSError:
+    if copied_bytes > 0:
+      raise                                                                     # don't retry a partial copy
+    source_fp.seek(0)
+    copyfileobj(source_fp,destination_fp,length=1024*1024)                      # buffered copy
+    destination_fp.flush()
+    copied_bytes = file_size
+  return copied_bytes
+
+
+def concatenate_local_files(input_list,output_file,force=False):
+  '''
+  A function for concatenating local files, e.g. gzipped fastq files, in the given order.
+  Data is written to a temp file in the destination dir, which is then renamed to the
+  output file, so the output path never contains a partial file
+
+  :param input_list: A list of input file paths
+  :param output_file: An output file path
+  :param force: Optional, set True to overwrite existing output file, default False
+  :returns: Number of bytes written to the output file
+  '''
+  temp_file = None
+  try:
+    if len(input_list) == 0:
+      raise ValueError('No input file found for {0}'.format(output_file))
+    for file_path in input_list:
+      if not os.path.exists(file_path):
+        raise IOError('source file {0} not found'.format(file_path))
+    if os.path.exists(output_file) and not force:
+      raise IOError(
+              'destination file {0} already present. set option "force" as True to overwrite it'.\
+                format(output_file))
+
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    if not os.path.exists(output_dir):
+      os.makedirs(output_dir,mode=0o770)
+    temp_fd,temp_file = \
+      mkstemp(
+        dir=output_dir,
+        prefix='.{0}.'.format(os.path.basename(output_file)),
+        suffix='.tmp')                                                          # temp file on the destination filesystem
+    total_bytes = 0
+    with os.fdopen(temp_fd,'wb') as destination_fp:
+      for file_path in input_list:
+        with open(file_path,'rb') as source_fp:
+          total_bytes += \
+            _append_file_data(
+              source_fp=source_fp,
+              destination_fp=destination_fp)
+    os.chmod(temp_file,0o664)
+    os.replace(temp_file,output_file)                                           # atomic rename
+    temp_file = None
+    return total_bytes
+  except Exception as e:
+    if temp_file is not None and \
+       os.path.exists(temp_file):
+      os.remove(temp_file)
+    raise ValueError(
+            "Failed to concatenate files for {0}, error: {1}".\
+              format(output_file,e))
+
+
 def copy_remote_file(source_path,destinationa_path, source_address=None,
                      destination_address=None, copy_method='rsync',
                      check_file=True, force_update=False,
@@ -234,15 +443,17 @@ def calculate_file_checksum(filepath, hasher='md5'):
   :returns: file checksum value
   '''
   try:
+    if hasher=='md5':
+      file_hasher=hashlib.md5()
+    elif hasher=='sha256':
+      file_hasher=hashlib.sha256()
+    else:
+      raise ValueError('hasher {0} is not supported'.format(hasher))
     with open(filepath, 'rb') as infile:
-      if hasher=='md5':
-        file_checksum=hashlib.md5(infile.read()).hexdigest()
-        return file_checksum
-      elif hasher=='sha256':
-        file_checksum=hashlib.sha256(infile.read()).hexdigest()
-        return file_checksum
-      else:
-        raise ValueError('hasher {0} is not supported'.format(hasher))
+      for block in iter(lambda: infile.read(1048576), b''):
+        file_hasher.update(block)                                               # read file in blocks
+    file_checksum=file_hasher.hexdigest()
+    return file_checksum
   except Exception as e:
     raise ValueError("Failed to check file checksum, error: {0}".format(e))
 
@@ -366,23 +577,216 @@ def get_file_extension(input_file):
     raise ValueError("Failed to get file extension, error: {0}".format(e))
 
 
+class Parallel_gzip_writer:
+  '''
+  A write only file object for creating gzip files using multiple threads, similar to pigz.
+  Input data is split into blocks and each block is compressed as raw deflate data in a
+  thread pool, using the last 32KB of the previous block as the dictionary. Compressed
+  blocks are written in order as a single gzip member, so the output can be read by gzip,
+  pigz or python gzip module
+
+  :param output_file: An output gzip file path
+  :param compress_level: Compression level, default 9
+  :param threads: Number of compression threads, default 4
+  :param block_size: Size of uncompressed data block in bytes, default 1MB
+  '''
+  def __init__(self,output_file,compress_level=9,threads=4,block_size=1024*1024):
+    self.output_file = output_file
+    self.compress_level = compress_level
+    self.threads = threads
+    self.block_size = block_size
+    self._fp = open(output_file,'wb')
+    self._executor = ThreadPoolExecutor(max_workers=threads)
+    self._pending_blocks = deque()
+    self._buffer = bytearray()
+    self._dictionary = b''
+    self._crc = 0
+    self._size = 0
+    self.closed = False
+    if compress_level == 9:
+      extra_flag = b'\x02'                                                      # max compression
+    elif compress_level == 1:
+      extra_flag = b'\x04'                                                      # fastest compression
+    else:
+      extra_flag = b'\x00'
+    self._fp.write(
+      b'\x1f\x8b\x08\x00' + \
+      struct.pack('<L',int(time.time())) + \
+      extra_flag + b'\xff')                                                     # gzip header
+
+  @staticmethod
+  def _compress_block(data,dictionary,compress_level,last_block):
+    '''
+    A static method for compressing a block of data as raw deflate stream
+
+    :param data: A block of uncompressed data
+    :param dictionary: Preset dictionary for the compression
+    :param compress_level: Compression level
+    :param last_block: A toggle for finishing the deflate stream
+    :returns: Compressed data
+    '''
+    if len(dictionary) > 0:
+      compressor = \
+        zlib.compressobj(
+          compress_level,
+          zlib.DEFLATED,
+          -zlib.MAX_WBITS,
+          zdict=dictionary)
+    else:
+      compressor = \
+        zlib.compressobj(
+          compress_level,
+          zlib.DEFLATED,
+          -zlib.MAX_WBITS)
+    if last_block:
+      return compressor.compress(data) + compressor.flush(zlib.Z_FINISH)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)      # byte aligned end of block
+
+  def _submit_block(self,data,last_block=False):
+    '''
+    An internal method for submitting a block for compression
+    '''
+    self._crc = zlib.crc32(data,self._crc)
+    self._size += len(data)
+    self._pending_blocks.append(
+      self._executor.submit(
+        self._compress_block,
+        data,
+        self._dictionary,
+        self.compress_level,
+        last_block))
+    self._dictionary = data[-32768:]                                            # deflate window size
+    while len(self._pending_blocks) > 2 * self.threads or \
+          (len(self._pending_blocks) > 0 and self._pending_blocks[0].done()):
+      self._fp.write(self._pending_blocks.popleft().result())                   # write blocks in order
+
+  def write(self,data):
+    '''
+    A method for writing data to the gzip file
+
+    :param data: Bytes to write
+    :returns: Number of bytes written
+    '''
+    if self.closed:
+      raise ValueError('I/O operation on closed file {0}'.format(self.output_file))
+    self._buffer.extend(data)
+    while len(self._buffer) >= self.block_size:
+      block = bytes(self._buffer[:self.block_size])
+      del self._buffer[:self.block_size]
+      self._submit_block(block)
+    return len(data)
+
+  def tell(self):
+    '''
+    A method for fetching the number of uncompressed bytes written
+    '''
+    return self._size + len(self._buffer)
+
+  def flush(self):
+    pass
+
+  def close(self):
+    '''
+    A method for finishing the gzip stream and closing the output file
+    '''
+    if self.closed:
+      return
+    try:
+      self._submit_block(bytes(self._buffer),last_block=True)
+      self._buffer = bytearray()
+      while len(self._pending_blocks) > 0:
+        self._fp.write(self._pending_blocks.popleft().result())
+      self._fp.write(
+        struct.pack(
+          '<LL',
+          self._crc & 0xffffffff,
+          self._size & 0xffffffff))                                             # gzip trailer
+    finally:
+      self.closed = True
+      self._executor.shutdown(wait=True)
+      self._fp.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self,exc_type,exc_value,traceback):
+    if exc_type is not None:
+      self.closed = True                                                        # skip writing a partial stream
+      self._executor.shutdown(wait=True)
+      self._fp.close()
+    else:
+      self.close()
+
+
+class _Checksum_reader:
+  '''
+  An internal file object wrapper for calculating md5 checksum while reading the data
+  '''
+  def __init__(self,fp):
+    self._fp = fp
+    self.hasher = hashlib.md5()
+
+  def read(self,size=-1):
+    data = self._fp.read(size)
+    self.hasher.update(data)
+    return data
+
+
+def _scan_archive_files(dir_path,exclude_list=None,skip_list=()):
+  '''
+  An internal generator for listing files for archiving using os.scandir. Files are listed
+  in the same order as os.walk, and symlinks to dirs are not followed
+
+  :param dir_path: A directory path
+  :param exclude_list: A list of file name patterns to exclude, default None
+  :param skip_list: A list of file paths to skip, default empty
+  :returns: A generator of os.DirEntry for the files
+  '''
+  sub_dirs = list()
+  with os.scandir(dir_path) as entries:
+    for entry in sorted(entries,key=lambda x: x.name):
+      if entry.is_dir():
+        if not entry.is_symlink():
+          sub_dirs.append(entry.path)
+        continue
+      if os.path.abspath(entry.path) in skip_list:
+        continue
+      if exclude_list is not None and \
+         any(fnmatch.fnmatch(entry.name,exclude_pattern)
+               for exclude_pattern in exclude_list):                            # check for match with exclude pattern list
+        continue
+      yield entry
+  for sub_dir in sub_dirs:
+    for entry in _scan_archive_files(sub_dir,exclude_list,skip_list):
+      yield entry
+
+
 def prepare_file_archive(results_dirpath,output_file,gzip_output=True,
-                         exclude_list=None,force=True):
+                         exclude_list=None,force=True,threads=1,
+                         compress_level=9,manifest_file=None,
+                         manifest_exclude_list=None,md5_label='md5',
+                         size_lavel='size',path_label='file_path'):
   '''
-  A method for creating tar.gz archive with the files present in filepath
+  A method for creating tar.gz archive with the files present in filepath.
+  It can also create the file manifest for the archived files in the same pass, so the
+  files are read only once. If the manifest file is present under results_dirpath, it's
+  added to the archive after all other files
   
   :param results_dirpath: A file path for input file directory
   :param output_file: Name of the output archive filepath
   :param gzip_output: A toggle for creating gzip output tarfile, default True
   :param exclude_list: A list of file pattern to exclude from the archive, default None
   :param force: A toggle for replacing output file, if its already present, default True
+  :param threads: Number of threads for gzip compression, default 1
+  :param compress_level: Gzip compression level, default 9
+  :param manifest_file: A file path for writing the file manifest csv, default None
+  :param manifest_exclude_list: A list of file pattern to exclude from the manifest, default None
+  :param md5_label: A string for manifest checksum column, default md5
+  :param size_lavel: A string for manifest file size column, default size
+  :param path_label: A string for manifest file path column, default file_path
   :returns: None
   '''
   try:
-    output_mode='w'                                                             # write mode for non compressed output
-    if gzip_output:
-      output_mode='w:gz'                                                        # set write mode for gzip output
-
     if not os.path.exists(results_dirpath):
       raise IOError('Input directory path {0} not found'.\
                     format(results_dirpath))                                    # check input directory path
@@ -402,26 +806,240 @@ def prepare_file_archive(results_dirpath,output_file,gzip_output=True,
       raise ValueError('Expecting a list for excluding file to archive, got {0}'.\
                        format(type(exclude_list)))                              # check exclude list type if its not None
 
-    with tarfile.open(output_file, "{0}".format(output_mode)) as tar:           # overwrite output file
-      for root,_,files in os.walk(results_dirpath):                           # check for files under results_dirpath
-        for file in files:
-          file_path=os.path.join(root,
-                                 file)
-          if exclude_list is None:
-            tar.add(file_path,
-                    arcname=os.path.relpath(file_path,
-                                            start=results_dirpath))             # add all files to archive
-          else:
-            exclude_flag=[exclude_pattern 
-                            for exclude_pattern in exclude_list 
-                              if fnmatch.fnmatch(file,exclude_pattern)]         # check for match with exclude pattern list
-            if len(exclude_flag)==0:
-              tar.add(file_path,
-                      arcname=os.path.relpath(file_path,
-                                              start=results_dirpath))           # add files to archive if its not in the list
+    skip_list = list()
+    manifest_relpath = None
+    if manifest_file is not None:
+      if os.path.exists(manifest_file):
+        if not force:
+          raise ValueError('Output manifest already present: {0},set force as True to overwrite'.\
+                           format(manifest_file))
+        os.remove(manifest_file)                                                # removing existing manifest
+      if not os.path.relpath(manifest_file,start=results_dirpath).startswith('..'):
+        manifest_relpath = os.path.relpath(manifest_file,start=results_dirpath)
+        skip_list.append(os.path.abspath(manifest_file))                        # add manifest at the end
+
+    if gzip_output and threads > 1:
+      output_fp = \
+        Parallel_gzip_writer(
+          output_file=output_file,
+          compress_level=compress_level,
+          threads=threads)                                                      # multi-threaded gzip
+      tar = tarfile.open(fileobj=output_fp,mode='w')
+    elif gzip_output:
+      output_fp = None
+      tar = tarfile.open(output_file,mode='w:gz',compresslevel=compress_level) # single thread gzip
+    else:
+      output_fp = None
+      tar = tarfile.open(output_file,mode='w')                                  # write mode for non compressed output
+
+    file_manifest_list = list()
+    try:
+      for entry in _scan_archive_files(results_dirpath,exclude_list,skip_list):
+        file_relpath = os.path.relpath(entry.path,start=results_dirpath)
+        add_to_manifest = \
+          manifest_file is not None and \
+          (manifest_exclude_list is None or \
+           not any(fnmatch.fnmatch(entry.name,exclude_pattern)
+                     for exclude_pattern in manifest_exclude_list))
+        if entry.is_symlink() or \
+           not entry.is_file():
+          tar.add(entry.path,arcname=file_relpath)                              # add links without reading data
+          if add_to_manifest:
+            file_manifest_list.append(
+              _get_file_manifest_info(
+                file_path=entry.path,
+                start_dir=results_dirpath,
+                md5_label=md5_label,
+                size_lavel=size_lavel,
+                path_label=path_label))
+          continue
+        tarinfo = tar.gettarinfo(entry.path,arcname=file_relpath)
+        with open(entry.path,'rb') as fp:
+          reader = _Checksum_reader(fp)
+          tar.addfile(tarinfo,reader)                                           # add file and calculate md5 in one read
+        if add_to_manifest:
+          file_manifest_list.append({
+            path_label:file_relpath,
+            md5_label:reader.hasher.hexdigest(),
+            size_lavel:tarinfo.size})
+      if manifest_file is not None:
+        pd.DataFrame(file_manifest_list).\
+          to_csv(
+            manifest_file,
+            sep=',',
+            encoding='utf-8',
+            index=False)                                                        # write manifest csv file
+        if manifest_relpath is not None:
+          tar.add(manifest_file,arcname=manifest_relpath)                       # add manifest to the archive
+      tar.close()
+      if output_fp is not None:
+        output_fp.close()
+    except:
+      tar.close()
+      if output_fp is not None:
+        output_fp.__exit__(*sys.exc_info())
+      if os.path.exists(output_file):
+        os.remove(output_file)                                                  # remove partial archive
+      raise
   except Exception as e:
     raise ValueError("Failed to prepare file archive, error: {0}".format(e))
 
+
+def _get_archive_compression(archive_path):
+  '''
+  An internal function for checking compression type of a tar file using the magic bytes
+
+  :param archive_path: A tar file path
+  :returns: A string, gz, bz2, xz or None for uncompressed file
+  '''
+  with open(archive_path,'rb') as fp:
+    magic_bytes = fp.read(6)
+  if magic_bytes.startswith(b'\x1f\x8b'):
+    return 'gz'
+  elif magic_bytes.startswith(b'BZh'):
+    return 'bz2'
+  elif magic_bytes.startswith(b'\xfd7zXZ\x00'):
+    return 'xz'
+  return None
+
+
+def _open_archive_stream(archive_path,compression):
+  '''
+  An internal function for opening an uncompressed and seekable stream for a tar file.
+  Seeking in a compressed stream decompresses all the data before the target offset
+
+  :param archive_path: A tar file path
+  :param compression: Compression type, gz, bz2, xz or None
+  :returns: A file object
+  '''
+  if compression == 'gz':
+    return gzip.open(archive_path,'rb')
+  elif compression == 'bz2':
+    return bz2.open(archive_path,'rb')
+  elif compression == 'xz':
+    return lzma.open(archive_path,'rb')
+  return open(archive_path,'rb')
+
+
+def build_archive_member_index(archive_path,index_file=None):
+  '''
+  A function for building a member index sidecar file for a tar file. The index
+  contains the data offset and size of each file member in the uncompressed tar
+  stream, and it is used by read_archive_member for reading a member without
+  scanning the member headers. Only plain tar files get random access from the index,
+  for gz, bz2 and xz files the stream is still decompressed from the start up to the
+  member offset, as no decompressor access points are stored
+
+  :param archive_path: A tar file path
+  :param index_file: Index file path, default None for ARCHIVE_PATH.index.json
+  :returns: Index file path
+  '''
+  try:
+    check_file_path(archive_path)
+    if index_file is None:
+      index_file = '{0}.index.json'.format(archive_path)
+    archive_stat = os.stat(archive_path)
+    member_list = list()
+    with tarfile.open(archive_path,mode='r|*') as tar:
+      for member in tar:
+        if member.isfile():
+          member_list.append([member.name,member.offset_data,member.size])
+    index_data = {
+      'archive_size':archive_stat.st_size,
+      'archive_mtime_ns':archive_stat.st_mtime_ns,
+      'compression':_get_archive_compression(archive_path),
+      'members':member_list}
+    temp_index_file = '{0}.{1}.tmp'.format(index_file,os.getpid())
+    with open(temp_index_file,'w') as fp:
+      json.dump(index_data,fp)
+    os.replace(temp_index_file,index_file)                                      # replace index atomically
+    return index_file
+  except Exception as e:
+    raise ValueError(
+            "Failed to build member index for archive {0}, error: {1}".\
+              format(archive_path,e))
+
+
+def _load_archive_member_index(archive_path,index_file):
+  '''
+  An internal function for loading a member index sidecar file
+
+  :param archive_path: A tar file path
+  :param index_file: Index file path
+  :returns: A dictionary containing the index data or None if the index is missing or out of date
+  '''
+  if not os.path.exists(index_file):
+    return None
+  with open(index_file,'r') as fp:
+    index_data = json.load(fp)
+  archive_stat = os.stat(archive_path)
+  if index_data.get('archive_size') != archive_stat.st_size or \
+     index_data.get('archive_mtime_ns') != archive_stat.st_mtime_ns:
+    return None                                                                 # archive has changed after indexing
+  return index_data
+
+
+def read_archive_member(archive_path,member_pattern,match_basename=False,
+                        use_index=False,index_file=None):
+  '''
+  A function for reading the first matching member of a zip or tar archive to memory.
+  Tar files are read as a stream and the reading stops at the first match.
+  Optionally a member index sidecar file can be used for tar files, which is created
+  on the first read if it's not present or out of date. The index gives a direct seek
+  only for uncompressed tar files, see build_archive_member_index
+
+  :param archive_path: A zip or tar file path
+  :param member_pattern: A fnmatch pattern for the member name
+  :param match_basename: Match pattern with the member basename, default False
+  :param use_index: Use a member index sidecar file for tar files, default False
+  :param index_file: Index file path, default None for ARCHIVE_PATH.index.json
+  :returns: Member name and the member content as bytes
+  :raises IOError: If no member matches the pattern
+  '''
+  try:
+    check_file_path(archive_path)
+    match_member = \
+      lambda x: fnmatch.fnmatch(
+                  os.path.basename(x) if match_basename else x,
+                  member_pattern)
+    if zipfile.is_zipfile(archive_path):
+      with zipfile.ZipFile(archive_path,'r') as zip_obj:                        # zip central directory is the index
+        for member_name in zip_obj.namelist():
+          if match_member(member_name):
+            return member_name,zip_obj.read(member_name)
+    elif use_index:
+      if index_file is None:
+        index_file = '{0}.index.json'.format(archive_path)
+      index_data = \
+        _load_archive_member_index(
+          archive_path=archive_path,
+          index_file=index_file)
+      if index_data is None:
+        build_archive_member_index(
+          archive_path=archive_path,
+          index_file=index_file)
+        index_data = \
+          _load_archive_member_index(
+            archive_path=archive_path,
+            index_file=index_file)
+      for member_name,offset_data,member_size in index_data.get('members'):
+        if match_member(member_name):
+          with _open_archive_stream(archive_path,index_data.get('compression')) as fp:
+            fp.seek(offset_data)
+            return member_name,fp.read(member_size)
+    else:
+      with tarfile.open(archive_path,mode='r|*') as tar:                        # stream, without loading all member headers
+        for member in tar:
+          if member.isfile() and \
+             match_member(member.name):
+            return member.name,tar.extractfile(member).read()
+    raise IOError('Required file {0} not found in archive {1}'.\
+                  format(member_pattern,archive_path))
+  except Exception as e:
+    raise ValueError(
+            "Failed to read member from archive {0}, error: {1}".\
+              format(archive_path,e))
+
 def _get_file_manifest_info(file_path,start_dir=None,md5_label='md5',
                             size_lavel='size',path_label='file_path'):
   '''
@@ -1,16 +1,146 @@
+import io,gzip
 import gviz_api
+import numpy as np
+import pandas as pd
+
+def _get_gviz_row_values(data,columns):
+  '''
+  An internal generator for fetching gviz table rows as dictionaries of column id and value
+
+  :param data, A pandas DataFrame or an iterator of rows. Each row can be a dictionary,
+               a list or tuple of values matching the description, or a single value
+               for a single column description
+  :param columns, A list of parsed gviz column descriptions
+  :returns: A generator of row dictionaries
+  '''
+  container = columns[-1]['container']
+  column_ids = [col['id'] for col in columns]
+  if isinstance(data,pd.DataFrame):
+    frame_columns = \
+      [col_id for col_id in column_ids
+         if col_id in data.columns]                                             # missing columns are written as null
+    for row in data[frame_columns].itertuples(index=False,name=None):
+      yield {col_id:(value.item() if isinstance(value,np.generic) else value)
+               for col_id,value in zip(frame_columns,row)}                      # convert numpy types to python types
+  elif container == 'scalar':
+    for row in data:
+      yield {column_ids[0]:row}
+  elif container == 'iter':
+    for row in data:
+      if not hasattr(row,'__iter__') or \
+         isinstance(row,(str,dict)):
+        raise ValueError('Expected iterable row, got {0}'.format(type(row)))
+      row = list(row)
+      if len(row) > len(column_ids):
+        raise ValueError('Too many elements given in row: {0}'.format(row))
+      yield dict(zip(column_ids,row))
+  else:
+    for row in data:
+      if not isinstance(row,dict):
+        raise ValueError('Expected dictionary row, got {0}'.format(type(row)))
+      yield row
+
+
+def write_gviz_json(description,data,columns_order=None,output_file=None,compress=None):
+  '''
+  A utility method for writing gviz format json data incrementally, without loading the
+  full data table to gviz_api. The output is byte compatible with gviz_api DataTable.ToJSon
+
+  Only flat table descriptions are supported, i.e. a dictionary of column id and type,
+  a list of column descriptions or a single column description
+
+  :param description, A dictionary or list for the data table description
+  :param data, A pandas DataFrame or an iterator of rows, e.g. a list of dictionaries
+  :param columns_order, A list of data table column order, default None for description order
+  :param output_file, Output filename, default None for returning json data string
+  :param compress, Toggle for gzip compression of the output file, default None for
+                   compressing if the output_file has a .gz extension
+  :returns: None if output_file name is present, or else json_data string
+  '''
+  try:
+    columns = gviz_api.DataTable.TableDescriptionParser(description)            # parse and validate description
+    if columns[-1]['depth'] > 0:
+      raise ValueError('Nested table description is not supported')
+
+    col_dict = dict([(col['id'],col) for col in columns])
+    if columns_order is None:
+      columns_order = [col['id'] for col in columns]
+    for col_id in columns_order:
+      if col_id not in col_dict:
+        raise ValueError('Column {0} not found in description'.format(col_id))
+
+    encoder = gviz_api.DataTableJSONEncoder()
+    col_objs = list()
+    for col_id in columns_order:
+      col_obj = {'id':col_dict[col_id]['id'],
+                 'label':col_dict[col_id]['label'],
+                 'type':col_dict[col_id]['type']}
+      if col_dict[col_id]['custom_properties']:
+        col_obj['p'] = col_dict[col_id]['custom_properties']
+      col_objs.append(col_obj)
+
+    col_types = [(col_id,col_dict[col_id]['type']) for col_id in columns_order]
+    if output_file is None:
+      fp = io.StringIO()
+    elif compress or \
+         (compress is None and output_file.endswith('.gz')):
+      fp = gzip.open(output_file,'wt',encoding='utf-8')
+    else:
+      fp = open(output_file,'w',encoding='utf-8')
+
+    try:
+      fp.write('{{"cols":{0},"rows":['.format(encoder.encode(col_objs)))        # write column block
+      for row_index,row in enumerate(_get_gviz_row_values(data,columns)):
+        cell_objs = list()
+        for col_id,col_type in col_types:
+          value = \
+            gviz_api.DataTable.CoerceValue(
+              row.get(col_id,None),
+              col_type)
+          if value is None:
+            cell_obj = None
+          elif isinstance(value,tuple):
+            cell_obj = {'v':value[0]}
+            if len(value) > 1 and value[1] is not None:
+              cell_obj['f'] = value[1]
+            if len(value) == 3:
+              cell_obj['p'] = value[2]
+          else:
+            cell_obj = {'v':value}
+          cell_objs.append(cell_obj)
+        if row_index > 0:
+          fp.write(',')
+        fp.write(encoder.encode({'c':cell_objs}))                               # write one row at a time
+      fp.write(']}')
+      if output_file is None:
+        return fp.getvalue()
+      return None
+    finally:
+      fp.close()
+  except Exception as e:
+    raise ValueError(
+            'Failed to write gviz json data, error: {0}'.format(e))
+
 
 def convert_to_gviz_json_for_display(description,data,columns_order,output_file=None):
   '''
   A utility method for writing gviz format json file for data display using Google charts
-  
+
   :param description, A dictionary for the data table description
-  :param data, A dictionary containing the data table
+  :param data, A dictionary containing the data table or a pandas DataFrame
   :column_order, A tuple of data table column order
   :param output_file, Output filename, default None
   :returns: None if output_file name is present, or else json_data string
   '''
   try:
+    columns = gviz_api.DataTable.TableDescriptionParser(description)
+    if columns[-1]['depth'] == 0:
+      return write_gviz_json(
+               description=description,
+               data=data,
+               columns_order=columns_order,
+               output_file=output_file)                                         # stream flat tables to output
+
     data_table = gviz_api.DataTable(description)                                # load description to gviz api
     data_table.LoadData(data)                                                   # load data to gviz_api
     final_data=data_table.ToJSon(columns_order=columns_order)                   # create final data structure
@@ -21,4 +151,4 @@ def convert_to_gviz_json_for_display(description,data,columns_order,output_file=
         jf.write(final_data)                                                    # write final data to output file
       return None
   except:
-    raise
\ No newline at end of file
+    raise
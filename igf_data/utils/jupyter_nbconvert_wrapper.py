@@ -1,9 +1,11 @@
-import os
+import os,time
 from shutil import copytree
 from datetime import datetime
 from shlex import quote
+from concurrent.futures import ThreadPoolExecutor
 from igf_data.utils.singularity_run_wrapper import singularity_run
-from igf_data.utils.fileutils import get_temp_dir,remove_dir,check_file_path,copy_local_file
+from igf_data.utils.singularity_image_cache import Singularity_image_cache
+from igf_data.utils.fileutils import get_temp_dir,remove_dir,check_file_path,copy_local_file,link_or_copy_local_file
 from jinja2 import Template,Environment, FileSystemLoader, select_autoescape
 
 class Notebook_runner:
@@ -22,10 +24,13 @@ class Notebook_runner:
   :param kernel: Kernel name for the jupyter nbconvert run, default python3
   :param allow_errors: Allow notebook execution with errors, default False
   :param notebook_tag: A tag for dataflow to identify notebook output, default notebook
+  :param use_bind_mount: Bind input files to the container as read only paths instead of staging them
+                         in the temp dir, default True. Inputs are hard linked, reflinked or copied to
+                         the temp dir if this is False or the path can't be used for bind mount
   '''
   def __init__(self,template_ipynb_path,output_dir,input_param_map,container_dir_prefix='/tmp',
                output_file_map=None,date_tag='DATE_TAG',use_ephemeral_space=False,output_format='html',
-               timeout=600,kernel='python3',allow_errors=False,notebook_tag='notebook'):
+               timeout=600,kernel='python3',allow_errors=False,notebook_tag='notebook',use_bind_mount=True):
     self.template_ipynb_path = template_ipynb_path
     self.output_dir = output_dir
     self.input_param_map = input_param_map
@@ -38,38 +43,99 @@ class Notebook_runner:
     self.kernel = kernel
     self.allow_errors = allow_errors
     self.notebook_tag = notebook_tag
+    self.use_bind_mount = use_bind_mount
     self.temp_dir = \
       get_temp_dir(use_ephemeral_space=self.use_ephemeral_space)
+    self.bind_paths = list()
+    self._staged_inputs = dict()
+    self.staging_stats = {
+      'bind':0,
+      'hardlink':0,
+      'reflink':0,
+      'copy':0}
 
 
   @staticmethod
-  def _copy_to_container_temp(mount_dir,container_path_prefix,filepath):
+  def _get_path_size(filepath):
     '''
-    An internal static method for copying files to container temp dir
+    An internal static method for calculating size of a file or dir
 
-    :param mount_dir: A dir path to mount in container
-    :param container_path_prefix: Temp dir path in container
-    :param filepath: File or dir path to copy
-    :returns: A path in mounted temp dir and a path in the container temp dir
+    :param filepath: A file or dir path
+    :returns: Size in bytes
+    '''
+    if os.path.isdir(filepath):
+      path_size = 0
+      for root,_,files in os.walk(filepath):
+        for file_name in files:
+          path_size += \
+            os.path.getsize(
+              os.path.join(root,file_name))
+      return path_size
+    return os.path.getsize(filepath)
+
+
+  def _stage_input_path(self,filepath):
+    '''
+    An internal method for staging an input file or dir for the container run.
+    It adds a read only bind mount for the path if use_bind_mount is True, else
+    the path is hard linked, reflinked or copied to the temp dir.
+    Repeated input paths are staged only once
+
+    :param filepath: File or dir path to stage
+    :returns: A path in the container temp dir
     '''
     try:
       check_file_path(filepath)
+      real_path = os.path.realpath(filepath)
+      if real_path in self._staged_inputs:
+        return self._staged_inputs.get(real_path)                               # reuse staged input
       container_path = \
         os.path.join(
-          container_path_prefix,
+          self.container_dir_prefix,
           os.path.basename(filepath))
       mount_dir_path = \
         os.path.join(
-          mount_dir,
+          self.temp_dir,
           os.path.basename(filepath))
-      copy_local_file(
-        filepath,
-        mount_dir_path,
-        force=True)
-      return mount_dir_path, container_path
+      if self.use_bind_mount and \
+         ':' not in real_path and \
+         ',' not in real_path:
+        if os.path.isdir(real_path):
+          os.makedirs(mount_dir_path,exist_ok=True)                             # mount point in temp dir
+        else:
+          open(mount_dir_path,'a').close()
+        self.bind_paths.\
+          append('{0}:{1}:ro'.format(real_path,container_path))
+        self.staging_stats['bind'] += \
+          self._get_path_size(real_path)
+      else:
+        staged_bytes = \
+          link_or_copy_local_file(
+            filepath,
+            mount_dir_path,
+            force=True)
+        for key,value in staged_bytes.items():
+          self.staging_stats[key] = \
+            self.staging_stats.get(key,0) + value
+      self._staged_inputs.\
+        update({real_path:container_path})
+      return container_path
     except Exception as e:
-      raise ValueError("Failed to copy path {0} to temp dir: {1}, error: {2}".\
-                        format(filepath,mount_dir,e))
+      raise ValueError("Failed to stage path {0} to temp dir: {1}, error: {2}".\
+                        format(filepath,self.temp_dir,e))
+
+
+  def get_staging_stats(self):
+    '''
+    A method for fetching input staging stats
+
+    :returns: A dictionary containing bytes staged per method, total staged bytes and copied bytes
+    '''
+    staging_stats = dict(self.staging_stats)
+    staging_stats.update({
+      'staged_bytes':sum(self.staging_stats.values()),
+      'copied_bytes':self.staging_stats.get('copy')})
+    return staging_stats
 
 
   def _substitute_input_path_and_copy_files_to_tempdir(self):
@@ -89,22 +155,16 @@ class Notebook_runner:
       for key,entry in self.input_param_map.items():
         if isinstance(entry,str) and \
            os.path.exists(entry):
-          _,new_entry = \
-            self._copy_to_container_temp(
-              mount_dir=self.temp_dir,
-              container_path_prefix=self.container_dir_prefix,
-              filepath=entry)
+          new_entry = \
+            self._stage_input_path(filepath=entry)
           modified_input_map.\
             update({key:new_entry})                                             # for filepath entry
         elif isinstance(entry,list):
           new_entry_list = list()
           for e in entry:
             if os.path.exists(e):
-              _,new_entry = \
-                self._copy_to_container_temp(
-                  mount_dir=self.temp_dir,
-                  container_path_prefix=self.container_dir_prefix,
-                  filepath=e)
+              new_entry = \
+                self._stage_input_path(filepath=e)
               new_entry_list.append(new_entry)
             else:
               new_entry_list.append(e)
@@ -114,11 +174,8 @@ class Notebook_runner:
           new_entry_dict = dict()
           for e_key,e_val in entry.items():
             if os.path.exists(e_val):
-              _,new_entry = \
-                self._copy_to_container_temp(
-                  mount_dir=self.temp_dir,
-                  container_path_prefix=self.container_dir_prefix,
-                  filepath=e_val)
+              new_entry = \
+                self._stage_input_path(filepath=e_val)
               new_entry_dict.\
                 update({e_key:new_entry})
             else:
@@ -191,12 +248,18 @@ class Notebook_runner:
                          format(self.template_ipynb_path,e))
 
 
-  def nbconvert_singularity(self,singularity_image_path,dry_run=False):
+  def nbconvert_singularity(self,singularity_image_path,dry_run=False,use_image_cache=False,
+                            image_cache_dir=None,copy_image=True,image_cache=None):
     '''
-    A method for generating notebook from template and executing in singularity container
+    A method for generating notebook from template and executing in singularity container.
+    Input files are bind mounted or staged in the temp dir, see get_staging_stats
 
     :param singularity_image_path: A singularity image path
     :param dry_run: A toggle for dry run, default False
+    :param use_image_cache: Run container from the node local image cache, default False
+    :param image_cache_dir: Image cache dir path, default None
+    :param copy_image: Copy image to a temp dir if use_image_cache is False, default True
+    :param image_cache: A Singularity_image_cache object to run from, default None
     :returns: A response str from singularity, run command and a dictionary of output params for dataflow
     '''
     try:
@@ -234,7 +297,12 @@ class Notebook_runner:
             path_bind=self.temp_dir,
             use_ephemeral_space=self.use_ephemeral_space,
             args_list=args_list,
-            dry_run=dry_run)                                                    # run notebook in singularity container
+            dry_run=dry_run,
+            use_image_cache=use_image_cache,
+            image_cache_dir=image_cache_dir,
+            extra_bind_paths=self.bind_paths,
+            copy_image=copy_image,
+            image_cache=image_cache)                                            # run notebook in singularity container
       except Exception as e:
         raise ValueError(
                 "Failed to run jupyter command in singularity, error {0}, response: {1}".\
@@ -318,12 +386,140 @@ class Notebook_runner:
 
 
 
+def nbconvert_batch_in_singularity(singularity_image_path,notebook_list,output_dir,max_workers=4,
+                                   container_dir_prefix='/tmp',date_tag='DATE_TAG',
+                                   use_ephemeral_space=False,output_format='html',timeout=600,
+                                   kernel='python3',allow_errors=False,use_bind_mount=True,
+                                   dry_run=False,use_image_cache=False,image_cache_dir=None,
+                                   image_cache=None):
+  '''
+  A function for rendering a batch of notebooks concurrently in singularity containers.
+  The image is staged once for the whole batch, either locked in the node local image cache
+  or copied to a temp dir, and a bounded pool of containers runs the notebooks from it.
+  Outputs of each notebook are copied back using the Notebook_runner output map
+
+  :param singularity_image_path: A singularity image path
+  :param notebook_list: A list of dictionaries, one for each notebook, with following keys
+
+                          template_ipynb_path (required)
+                          input_param_map (required)
+                          output_file_map
+                          output_dir
+                          notebook_tag
 
+                        Default output dir for a notebook is a sub-directory of output_dir, named after its index
+  :param output_dir: Base output path
+  :param max_workers: Number of containers running in parallel, default 4
+  :param container_dir_prefix: Container mount dir, default /tmp
+  :param date_tag: A string tag for adding dates in the notebooks, default DATE_TAG
+  :param use_ephemeral_space: A toggle for temp dir settings, default False
+  :param output_format: Notebook output format, default html
+  :param timeout: Timeout settings for jupyter nbconvert run, default 600
+  :param kernel: Kernel name for the jupyter nbconvert run, default python3
+  :param allow_errors: Allow notebook execution with errors, default False
+  :param use_bind_mount: Bind input files to the containers as read only paths, default True
+  :param dry_run: A toggle for dry run, default False
+                  The image is not staged and the commands contain the source image path
+  :param use_image_cache: Stage the image in the node local image cache, default False
+  :param image_cache_dir: Image cache dir path, default None
+  :param image_cache: A Singularity_image_cache object for staging the image, default None
+                      It overrides use_image_cache and image_cache_dir
+  :returns: A list of dictionaries in the order of notebook_list, with status, error,
+            run_cmd, output_params and runtime (in seconds) keys for each notebook
+  '''
+  try:
+    check_file_path(singularity_image_path)
+    check_file_path(output_dir)
+    if not isinstance(notebook_list,list) or \
+       len(notebook_list)==0:
+      raise ValueError("Missing notebooks for batch run")
+
+    def _run_notebook(index,staged_image_path):
+      start_time = time.time()
+      result = {
+        'status':'success',
+        'error':None,
+        'run_cmd':None,
+        'output_params':dict()}
+      try:
+        entry = notebook_list[index]
+        notebook_output_dir = \
+          entry.get(
+            'output_dir',
+            os.path.join(output_dir,str(index)))
+        os.makedirs(notebook_output_dir,exist_ok=True)
+        nr = \
+          Notebook_runner(
+            template_ipynb_path=entry['template_ipynb_path'],
+            output_dir=notebook_output_dir,
+            input_param_map=entry['input_param_map'],
+            container_dir_prefix=container_dir_prefix,
+            output_file_map=entry.get('output_file_map'),
+            date_tag=date_tag,
+            use_ephemeral_space=use_ephemeral_space,
+            output_format=output_format,
+            timeout=timeout,
+            kernel=kernel,
+            allow_errors=allow_errors,
+            notebook_tag=entry.get('notebook_tag','notebook'),
+            use_bind_mount=use_bind_mount)
+        _,run_cmd,output_params = \
+          nr.nbconvert_singularity(
+            singularity_image_path=staged_image_path,
+            dry_run=dry_run,
+            use_image_cache=False,
+            copy_image=False)                                                   # run from staged image
+        result.update({
+          'run_cmd':run_cmd,
+          'output_params':output_params})
+      except Exception as e:
+        result.update({
+          'status':'failed',
+          'error':str(e)})
+      result.update({'runtime':time.time() - start_time})
+      return result
+
+    def _run_batch(staged_image_path):
+      with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return \
+          list(
+            executor.map(
+              lambda index: _run_notebook(index,staged_image_path),
+              range(len(notebook_list))))
+
+    if dry_run:
+      return _run_batch(singularity_image_path)                                 # no image staging for dry run
+    if image_cache is None and \
+       use_image_cache:
+      image_cache = \
+        Singularity_image_cache(
+          cache_dir=image_cache_dir,
+          use_ephemeral_space=use_ephemeral_space)
+    if image_cache is not None:
+      with image_cache.cached_image(singularity_image_path) as cached_image_path:
+        return _run_batch(cached_image_path)                                    # image is locked in cache during batch run
+    temp_dir = get_temp_dir(use_ephemeral_space=use_ephemeral_space)
+    try:
+      temp_image_path = \
+        os.path.join(
+          temp_dir,
+          os.path.basename(singularity_image_path))
+      copy_local_file(
+        singularity_image_path,
+        temp_image_path)                                                        # copy image once for the batch
+      return _run_batch(temp_image_path)
+    finally:
+      remove_dir(temp_dir)
+  except Exception as e:
+    raise ValueError(
+            "Failed to run notebook batch in singularity, error: {0}".\
+              format(e))
 
 
 def nbconvert_execute_in_singularity(image_path,ipynb_path,input_list,output_dir,output_format='html',
                                      output_file_map=None,timeout=600,kernel='python3',
-                                     use_ephemeral_space=False,allow_errors=False,dry_run=False):
+                                     use_ephemeral_space=False,allow_errors=False,dry_run=False,
+                                     use_image_cache=False,image_cache_dir=None):
   '''
   A function for running jupyter nbconvert within singularity containers
 
@@ -338,6 +534,8 @@ def nbconvert_execute_in_singularity(image_path,ipynb_path,input_list,output_dir
   :param allow_errors: A toggle for running notebook with errors, default False
   :param use_ephemeral_space: Toggle for using ephemeral space for temp dir, default False
   :param dry_run: Return the notebook command without run, default False
+  :param use_image_cache: Run container from the node local image cache, default False
+  :param image_cache_dir: Image cache dir path, default None
   :returns: notebook cmd
   '''
   try:
@@ -356,7 +554,7 @@ def nbconvert_execute_in_singularity(image_path,ipynb_path,input_list,output_dir
         os.path.join(
           tmp_dir,
           os.path.basename(f))
-      copy_local_file(f,temp_path)                                              # copy input files to temp dir
+      link_or_copy_local_file(f,temp_path)                                      # link or copy input files to temp dir
       tmp_input_list.append(temp_path)
     temp_ipynb_path = \
       os.path.join(
@@ -384,7 +582,9 @@ def nbconvert_execute_in_singularity(image_path,ipynb_path,input_list,output_dir
           path_bind=tmp_dir,
           use_ephemeral_space=use_ephemeral_space,
           args_list=args_list,
-          dry_run=dry_run)                                                      # run notebook in singularity container
+          dry_run=dry_run,
+          use_image_cache=use_image_cache,
+          image_cache_dir=image_cache_dir)                                      # run notebook in singularity container
     except Exception as e:
       raise ValueError("Failed to run jupyter command in singularity, error {0}, response: {1}".\
                          format(e,res))
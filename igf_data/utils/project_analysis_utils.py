@@ -236,7 +236,7 @@ class Project_analysis:
           convert_to_gviz_json_for_display(\
             description=description,
             columns_order=column_order,
-            data=chart_data.to_dict(orient='records'),
+            data=chart_data,
             output_file=temp_chart_output)
           move_file(\
             source_path=temp_chart_output,
@@ -0,0 +1,328 @@
+import os,fcntl,hashlib
+from contextlib import contextmanager
+from tempfile import gettempdir,mkstemp
+from shutil import copy2
+from igf_data.utils.fileutils import check_file_path,calculate_file_checksum,remove_dir
+
+class Singularity_image_cache:
+  '''
+  A class for managing a node local cache of singularity images. Images are
+  stored once per content key, i.e. source path, size and mtime or md5 checksum,
+  and containers can run straight from the cached copy
+
+  Cache layout
+
+    cache_dir/
+      KEY.lock
+      KEY/IMAGE_NAME.sif
+
+  The cache dir is created on the first cache lookup, see get_default_cache_dir for the
+  default location. Lock files are removed with their entries on eviction
+
+  :param cache_dir: A node local cache dir path, default None for using get_default_cache_dir
+  :param max_cache_size: Size budget for the cache in bytes, least recently used images are
+                         removed if the cache is larger than this, default 50GB
+  :param use_checksum: Use md5 checksum of the image as cache key, instead of path, size
+                       and mtime, default False
+  :param use_ephemeral_space: Use $EPHEMERAL for the default cache dir, default False
+  '''
+  def __init__(self,cache_dir=None,max_cache_size=50*1024**3,use_checksum=False,
+               use_ephemeral_space=False):
+    if cache_dir is None:
+      cache_dir = \
+        self.get_default_cache_dir(
+          use_ephemeral_space=use_ephemeral_space)
+    self.cache_dir = cache_dir
+    self.max_cache_size = max_cache_size
+    self.use_checksum = use_checksum
+    self.metrics = {
+      'hits':0,
+      'misses':0,
+      'evictions':0,
+      'evicted_bytes':0}
+
+
+  @staticmethod
+  def get_default_cache_dir(use_ephemeral_space=False):
+    '''
+    A static method for getting the default cache dir path. It uses env variable
+    $SINGULARITY_IMAGE_CACHE_DIR if it's set, else a singularity_image_cache dir in
+    $EPHEMERAL (if use_ephemeral_space is True) or in the system temp dir
+
+    :param use_ephemeral_space: Use $EPHEMERAL for the cache dir, default False
+    :returns: A cache dir path
+    '''
+    cache_dir = os.environ.get('SINGULARITY_IMAGE_CACHE_DIR')
+    if cache_dir is not None:
+      return cache_dir
+    if use_ephemeral_space:
+      base_dir = os.environ.get('EPHEMERAL')
+      if base_dir is None:
+        raise ValueError('Env variable EPHEMERAL is not available, set use_ephemeral_space as False')
+    else:
+      base_dir = gettempdir()
+    return os.path.join(base_dir,'singularity_image_cache')
+
+
+  @staticmethod
+  def _is_current_lock_file(lock_fp,lock_file):
+    '''
+    An internal static method for checking if an open lock file is still present in
+    the cache, as lock files are removed with their entries on eviction
+
+    :param lock_fp: An open lock file object
+    :param lock_file: Lock file path
+    :returns: True if the lock file path points to the open file, else False
+    '''
+    try:
+      return os.fstat(lock_fp.fileno()).st_ino == os.stat(lock_file).st_ino
+    except FileNotFoundError:
+      return False
+
+
+  def _lock_entry(self,lock_file,lock_type):
+    '''
+    An internal method for opening and locking the lock file of a cache entry. It opens
+    the lock file again if it was removed by eviction while waiting for the lock
+
+    :param lock_file: Lock file path
+    :param lock_type: A fcntl lock type, LOCK_SH or LOCK_EX
+    :returns: A locked file object
+    '''
+    while True:
+      lock_fp = open(lock_file,'a')
+      try:
+        fcntl.flock(lock_fp,lock_type)
+        if self._is_current_lock_file(lock_fp,lock_file):
+          return lock_fp
+      except:
+        lock_fp.close()
+        raise
+      lock_fp.close()                                                           # entry evicted, lock file removed
+
+
+  def _get_cache_key(self,image_path):
+    '''
+    An internal method for calculating cache key for an image file
+
+    :param image_path: A singularity image path
+    :returns: A string of cache key
+    '''
+    try:
+      check_file_path(image_path)
+      if self.use_checksum:
+        cache_key = \
+          calculate_file_checksum(
+            filepath=image_path,
+            hasher='md5')
+      else:
+        image_stat = os.stat(image_path)
+        cache_key = \
+          hashlib.md5(
+            '{0}:{1}:{2}'.format(
+              os.path.realpath(image_path),
+              image_stat.st_size,
+              image_stat.st_mtime_ns).encode('utf-8')).\
+          hexdigest()
+      return cache_key
+    except Exception as e:
+      raise ValueError(
+              'Failed to get cache key for image {0}, error: {1}'.\
+                format(image_path,e))
+
+
+  def get_cached_image_path(self,image_path):
+    '''
+    A method for getting the cached image path without populating the cache
+
+    :param image_path: A singularity image path
+    :returns: A cached image path
+    '''
+    cache_key = self._get_cache_key(image_path=image_path)
+    cached_image_path = \
+      os.path.join(
+        self.cache_dir,
+        cache_key,
+        os.path.basename(image_path))
+    return cached_image_path
+
+
+  def _populate_entry(self,image_path,cached_image_path):
+    '''
+    An internal method for copying an image to the cache. The image is copied
+    to a temp file in the entry dir and moved to the final path atomically,
+    so a partial copy is never visible to other jobs
+
+    :param image_path: A singularity image path
+    :param cached_image_path: Target path in the cache
+    '''
+    entry_dir = os.path.dirname(cached_image_path)
+    os.makedirs(entry_dir,mode=0o770,exist_ok=True)
+    fd,temp_path = \
+      mkstemp(
+        prefix='.{0}.'.format(os.path.basename(cached_image_path)),
+        dir=entry_dir)
+    os.close(fd)
+    try:
+      copy2(image_path,temp_path)                                               # copy image to temp file in cache
+      os.replace(temp_path,cached_image_path)                                   # atomic rename
+    except:
+      if os.path.exists(temp_path):
+        os.remove(temp_path)
+      raise
+
+
+  @contextmanager
+  def cached_image(self,image_path):
+    '''
+    A context manager for fetching an image from the cache, copying it on a miss.
+    The cached image is locked for the lifetime of the context and is never evicted
+    while it is in use
+
+      with image_cache.cached_image(image_path) as cached_image_path:
+        Client.run(image=cached_image_path,...)
+
+    :param image_path: A singularity image path
+    :returns: A cached image path
+    '''
+    cached_image_path = \
+      self.get_cached_image_path(image_path=image_path)
+    lock_file = \
+      '{0}.lock'.format(os.path.dirname(cached_image_path))
+    os.makedirs(self.cache_dir,mode=0o770,exist_ok=True)
+    lock_fp = None
+    try:
+      cache_miss = False
+      while True:
+        lock_fp = self._lock_entry(lock_file,fcntl.LOCK_SH)                     # shared lock for running from the cached image
+        if os.path.exists(cached_image_path):
+          break
+        fcntl.flock(lock_fp,fcntl.LOCK_EX)                                      # wait for other jobs populating same image
+        if self._is_current_lock_file(lock_fp,lock_file) and \
+           not os.path.exists(cached_image_path):
+          cache_miss = True
+          self._populate_entry(
+            image_path=image_path,
+            cached_image_path=cached_image_path)
+        lock_fp.close()                                                         # entry can be evicted before the shared lock, check again
+        lock_fp = None
+      if cache_miss:
+        self.metrics['misses'] += 1
+      else:
+        self.metrics['hits'] += 1
+      os.utime(os.path.dirname(cached_image_path))                              # mark entry as recently used
+      self.evict_images(keep_paths=[cached_image_path])
+      yield cached_image_path
+    finally:
+      if lock_fp is not None:
+        fcntl.flock(lock_fp,fcntl.LOCK_UN)
+        lock_fp.close()
+
+
+  def fetch_image(self,image_path):
+    '''
+    A method for fetching an image from the cache, copying it on a miss.
+    The returned image is not locked and it can be evicted by other jobs,
+    use cached_image for running containers
+
+    :param image_path: A singularity image path
+    :returns: A cached image path
+    '''
+    try:
+      with self.cached_image(image_path=image_path) as cached_image_path:
+        return cached_image_path
+    except Exception as e:
+      raise ValueError(
+              'Failed to fetch image {0} from cache {1}, error: {2}'.\
+                format(image_path,self.cache_dir,e))
+
+
+  def _list_cache_entries(self):
+    '''
+    An internal method for listing cache entries
+
+    :returns: A list of tuples containing entry dir, last used time and size in bytes
+    '''
+    entries = list()
+    if not os.path.exists(self.cache_dir):
+      return entries
+    for entry in os.scandir(self.cache_dir):
+      if entry.is_dir(follow_symlinks=False) and \
+         not entry.name.startswith('.'):
+        entry_size = \
+          sum([f.stat(follow_symlinks=False).st_size
+                 for f in os.scandir(entry.path)
+                   if f.is_file(follow_symlinks=False)])
+        entries.append((
+          entry.path,
+          entry.stat(follow_symlinks=False).st_mtime,
+          entry_size))
+    return entries
+
+
+  def get_cache_size(self):
+    '''
+    A method for calculating the total size of the cached images
+
+    :returns: Cache size in bytes
+    '''
+    return sum([entry[2] for entry in self._list_cache_entries()])
+
+
+  def evict_images(self,keep_paths=()):
+    '''
+    A method for removing least recently used images till the cache size is within
+    the max_cache_size budget. Images in use by other jobs are skipped, and the lock
+    files of the removed entries are deleted
+
+    :param keep_paths: A list of cached image paths to keep, default empty
+    :returns: A list of removed entry dirs
+    '''
+    try:
+      removed_entries = list()
+      if self.max_cache_size is None or \
+         not os.path.exists(self.cache_dir):
+        return removed_entries
+      keep_dirs = \
+        set([os.path.dirname(path) for path in keep_paths])
+      with open(os.path.join(self.cache_dir,'.cache.lock'),'a') as cache_lock_fp:
+        fcntl.flock(cache_lock_fp,fcntl.LOCK_EX)                                # only one job can run eviction
+        entries = self._list_cache_entries()
+        cache_size = sum([entry[2] for entry in entries])
+        for entry_dir,_,entry_size in sorted(entries,key=lambda x: x[1]):
+          if cache_size <= self.max_cache_size:
+            break
+          if entry_dir in keep_dirs:
+            continue
+          lock_file = '{0}.lock'.format(entry_dir)
+          with open(lock_file,'a') as lock_fp:
+            try:
+              fcntl.flock(lock_fp,fcntl.LOCK_EX|fcntl.LOCK_NB)
+            except (BlockingIOError,PermissionError):
+              continue                                                          # image is in use
+            try:
+              remove_dir(entry_dir)
+              if self._is_current_lock_file(lock_fp,lock_file):
+                os.remove(lock_file)                                            # remove lock file while holding the lock
+            finally:
+              fcntl.flock(lock_fp,fcntl.LOCK_UN)
+          cache_size -= entry_size
+          removed_entries.append(entry_dir)
+          self.metrics['evictions'] += 1
+          self.metrics['evicted_bytes'] += entry_size
+      return removed_entries
+    except Exception as e:
+      raise ValueError(
+              'Failed to evict images from cache {0}, error: {1}'.\
+                format(self.cache_dir,e))
+
+
+  def get_metrics(self):
+    '''
+    A method for fetching cache hit and miss counts
+
+    :returns: A dictionary containing hits, misses, evictions, evicted_bytes and cache_size
+    '''
+    metrics = dict(self.metrics)
+    metrics.update({'cache_size':self.get_cache_size()})
+    return metrics
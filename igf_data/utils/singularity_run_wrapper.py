@@ -1,8 +1,29 @@
 import os
 from spython.main import Client
 from igf_data.utils.fileutils import check_file_path,copy_local_file,get_temp_dir,remove_dir
+from igf_data.utils.singularity_image_cache import Singularity_image_cache
 
-def singularity_run(image_path,path_bind,args_list,container_dir='/tmp',return_results=True,use_ephemeral_space=False,dry_run=False):
+def _get_singularity_run_cmd(image_path,bind_list,args):
+  '''
+  An internal function for formatting singularity run command line
+
+  :param image_path: Singularity image path
+  :param bind_list: A list of bind path strings
+  :param args: A string of args for singularity run
+  :returns: A string containing singularity command line
+  '''
+  singularity_run_cmd = \
+    'singularity run {0} {1} {2}'.\
+      format(
+        image_path,
+        ' '.join(['--bind {0}'.format(bind) for bind in bind_list]),
+        args)
+  return singularity_run_cmd
+
+
+def singularity_run(image_path,path_bind,args_list,container_dir='/tmp',return_results=True,use_ephemeral_space=False,dry_run=False,
+                    use_image_cache=False,image_cache_dir=None,max_image_cache_size=50*1024**3,extra_bind_paths=None,
+                    copy_image=True,image_cache=None):
   '''
   A wrapper module for running singularity based containers
 
@@ -10,46 +31,101 @@ def singularity_run(image_path,path_bind,args_list,container_dir='/tmp',return_r
   :param path_bind: Path to bind to singularity /tmp dir
   :param args_list: List of args for singulatiy run
   :param return_results: Return singulatiy run results, default True
-  :param use_ephemeral_space: Toggle for using ephemeral space for temp dir, default False
+  :param use_ephemeral_space: Toggle for using ephemeral space for temp dir and for the default
+                              image cache dir, default False
   :param dry_run: Return the singularity command without run, default False
+                  It never copies the image or creates any dir, the command contains the cached image
+                  path for use_image_cache and the source image path for copy_image
+  :param use_image_cache: Run container from a node local image cache instead of a temp copy, default False
+  :param image_cache_dir: Image cache dir path, default None for $SINGULARITY_IMAGE_CACHE_DIR, or a
+                          singularity_image_cache dir in $EPHEMERAL or system temp dir, see use_ephemeral_space
+  :param max_image_cache_size: Size budget for image cache in bytes, default 50GB
+  :param extra_bind_paths: A list of additional bind path strings, e.g. /host/path:/container/path:ro, default None
+  :param copy_image: Copy image to a temp dir before run if use_image_cache is False, default True
+                     Set it to False for running an image which is already staged for the run
+  :param image_cache: A Singularity_image_cache object to run from, default None
+                      Pass it for sharing one cache between runs and for reading its hit and miss
+                      metrics after the run, it overrides use_image_cache and the cache settings
   :returns: A response from container run and a string containing singularity command line
   '''
   try:
     check_file_path(image_path)
     check_file_path(path_bind)
-    temp_dir = get_temp_dir(use_ephemeral_space=use_ephemeral_space)
-    res = None
-    temp_image_path = \
-      os.path.join(
-        temp_dir,
-        os.path.basename(image_path))
-    copy_local_file(
-      image_path,
-      temp_image_path )                                                         # copy image to tmp dir
     if not isinstance(args_list,list) and \
        len(args_list) > 0:
        raise ValueError('No args provided for singularity run')                 # safemode
     args = ' '.join(args_list)                                                  # flatten args
-    singularity_run_cmd = \
-      'singularity run {0} --bind {1}:{2} {3}'.\
-        format(
-          temp_image_path,
-          path_bind,
-          container_dir,
-          args)
-    if dry_run:
+    bind_list = ['{0}:{1}'.format(path_bind,container_dir)]
+    if extra_bind_paths is not None:
+      bind_list.extend(extra_bind_paths)
+    res = None
+    if image_cache is None and \
+       use_image_cache:
+      image_cache = \
+        Singularity_image_cache(
+          cache_dir=image_cache_dir,
+          max_cache_size=max_image_cache_size,
+          use_ephemeral_space=use_ephemeral_space)                              # cache dir is created on first lookup
+    if image_cache is not None:
+      if dry_run:
+        singularity_run_cmd = \
+          _get_singularity_run_cmd(
+            image_path=image_cache.get_cached_image_path(image_path),
+            bind_list=bind_list,
+            args=args)
+        return res,singularity_run_cmd
+      with image_cache.cached_image(image_path) as cached_image_path:           # image is locked in cache during run
+        singularity_run_cmd = \
+          _get_singularity_run_cmd(
+            image_path=cached_image_path,
+            bind_list=bind_list,
+            args=args)
+        res = \
+          Client.run(
+            image=cached_image_path,
+            bind=bind_list,
+            args=args,
+            return_result=return_results)
+      return res,singularity_run_cmd
+    if not copy_image or \
+       dry_run:
+      singularity_run_cmd = \
+        _get_singularity_run_cmd(
+          image_path=image_path,
+          bind_list=bind_list,
+          args=args)
+      if not dry_run:
+        res = \
+          Client.run(
+            image=image_path,
+            bind=bind_list,
+            args=args,
+            return_result=return_results)                                       # run staged image
       return res,singularity_run_cmd
-    else:
-      
+    temp_dir = get_temp_dir(use_ephemeral_space=use_ephemeral_space)
+    try:
+      temp_image_path = \
+        os.path.join(
+          temp_dir,
+          os.path.basename(image_path))
+      copy_local_file(
+        image_path,
+        temp_image_path )                                                       # copy image to tmp dir
+      singularity_run_cmd = \
+        _get_singularity_run_cmd(
+          image_path=temp_image_path,
+          bind_list=bind_list,
+          args=args)
       res = \
         Client.run(
           image=temp_image_path,
-          bind='{0}:{1}'.format(path_bind,container_dir),
+          bind=bind_list,
           args=args,
           return_result=return_results)
+    finally:
       remove_dir(temp_dir)                                                      # remove copied image after run
-      return res,singularity_run_cmd
+    return res,singularity_run_cmd
   except Exception as e:
     raise ValueError(
             'Failed to run image {0}, error: {1}'.\
-              format(image_path,e))
\ No newline at end of file
+              format(image_path,e))
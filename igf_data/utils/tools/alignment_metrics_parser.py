@@ -0,0 +1,250 @@
+import re,subprocess
+from igf_data.utils.fileutils import check_file_path
+
+def _convert_metrics_value(value):
+  '''
+  An internal function for converting a metrics value string to int or float
+
+  :param value: A metrics value string
+  :returns: An int, float or string value, or None for empty value
+  '''
+  value = value.strip()
+  if value == '':
+    return None
+  try:
+    return int(value)
+  except ValueError:
+    pass
+  try:
+    return float(value)
+  except ValueError:
+    return value
+
+
+class Samtools_stats_parser:
+  '''
+  A class for parsing the summary numbers (SN) section of samtools stats output,
+  one line at a time
+
+    parser = Samtools_stats_parser()
+    for line in fp:
+      parser.parse_line(line)
+    stats_metrics = parser.get_metrics()
+
+  :param typed: Convert metrics values to int or float, default True
+  '''
+  def __init__(self,typed=True):
+    self.typed = typed
+    self.metrics = dict()
+
+  def parse_line(self,line):
+    '''
+    A method for parsing a single line of samtools stats output
+
+    :param line: A line from samtools stats output
+    '''
+    if not line.startswith('SN\t'):
+      return None                                                               # skip all other sections
+    fields = line.rstrip('\n').split('\t')
+    if len(fields) < 3:
+      return None
+    metrics_name = \
+      fields[1].rstrip(':').strip().replace(' ','_')
+    metrics_value = fields[2].strip()
+    if self.typed:
+      metrics_value = _convert_metrics_value(metrics_value)
+    self.metrics[metrics_name] = metrics_value
+
+  def get_metrics(self):
+    '''
+    A method for fetching the parsed SN metrics
+
+    :returns: A dictionary of SN metrics name and value, e.g. {'reads_mapped':160190290}
+    '''
+    return dict(self.metrics)
+
+
+class Samtools_flagstat_parser:
+  '''
+  A class for parsing samtools flagstat output, one line at a time
+
+  :param typed: Convert read counts to int, default True
+  '''
+  def __init__(self,typed=True):
+    self.typed = typed
+    self.metrics = dict()
+    self.line_pattern = \
+      re.compile(r'^(\d+)\s+\+\s+(\d+)\s+(.+)$')
+
+  def parse_line(self,line):
+    '''
+    A method for parsing a single line of samtools flagstat output
+
+    :param line: A line from samtools flagstat output
+    '''
+    m = re.match(self.line_pattern,line.strip())
+    if not m:
+      return None
+    qc_passed,qc_failed,description = m.groups()
+    if description.endswith(')') and \
+       ' (' in description:
+      suffix = description[description.rindex(' ('):]
+      if '%' in suffix or \
+         'QC-passed' in suffix:
+        description = description[:description.rindex(' (')]                    # remove percentage and total suffix
+    metrics_name = \
+      re.sub(r'[^0-9A-Za-z]+','_',description).strip('_').lower()
+    if self.typed:
+      qc_passed = int(qc_passed)
+      qc_failed = int(qc_failed)
+    self.metrics[metrics_name] = {
+      'qc_passed':qc_passed,
+      'qc_failed':qc_failed}
+
+  def get_metrics(self):
+    '''
+    A method for fetching the parsed flagstat metrics
+
+    :returns: A dictionary of flagstat metrics, e.g. {'mapped':{'qc_passed':160190290,'qc_failed':0}}
+    '''
+    return dict(self.metrics)
+
+
+class Samtools_idxstats_parser:
+  '''
+  A class for parsing samtools idxstats output, one line at a time
+
+  :param typed: Convert length and read counts to int, default True
+  '''
+  def __init__(self,typed=True):
+    self.typed = typed
+    self.metrics = dict()
+
+  def parse_line(self,line):
+    '''
+    A method for parsing a single line of samtools idxstats output
+
+    :param line: A line from samtools idxstats output
+    '''
+    fields = line.rstrip('\n').split('\t')
+    if len(fields) != 4:
+      return None
+    ref_name,ref_length,mapped,unmapped = fields
+    if self.typed:
+      ref_length,mapped,unmapped = \
+        int(ref_length),int(mapped),int(unmapped)
+    self.metrics[ref_name] = {
+      'length':ref_length,
+      'mapped':mapped,
+      'unmapped':unmapped}
+
+  def get_metrics(self):
+    '''
+    A method for fetching the parsed idxstats metrics
+
+    :returns: A dictionary of reference name and counts, e.g. {'chr1':{'length':248956422,'mapped':100,'unmapped':0}}
+    '''
+    return dict(self.metrics)
+
+
+class Picard_metrics_parser:
+  '''
+  A class for parsing the metrics section of Picard metrics files, one line at a time.
+  The metrics table is located using the '## METRICS CLASS' header line, not by line count,
+  and the histogram section is ignored
+
+  :param typed: Convert metrics values to int or float, default True
+  '''
+  def __init__(self,typed=True):
+    self.typed = typed
+    self.metrics_class = None
+    self.header = None
+    self.rows = list()
+    self._in_metrics = False
+
+  def parse_line(self,line):
+    '''
+    A method for parsing a single line of Picard metrics file
+
+    :param line: A line from Picard metrics file
+    '''
+    line = line.rstrip('\n')
+    if line.startswith('## METRICS CLASS'):
+      fields = line.split('\t')
+      if len(fields) > 1:
+        self.metrics_class = fields[1].strip()
+      self._in_metrics = True
+      return None
+    if not self._in_metrics:
+      return None
+    if line.strip() == '' or \
+       line.startswith('#'):
+      self._in_metrics = False                                                  # end of metrics table
+      return None
+    fields = line.split('\t')
+    if self.header is None:
+      self.header = fields
+      return None
+    row = dict()
+    for index,column in enumerate(self.header):
+      value = fields[index] if index < len(fields) else ''
+      if self.typed:
+        value = _convert_metrics_value(value)
+      row[column] = value
+    self.rows.append(row)
+
+  def get_metrics(self):
+    '''
+    A method for fetching the parsed Picard metrics
+
+    :returns: A dictionary containing metrics_class and a list of metrics rows
+    '''
+    return {
+      'metrics_class':self.metrics_class,
+      'metrics':[dict(row) for row in self.rows]}
+
+
+def parse_metrics_file(metrics_file,parser):
+  '''
+  A function for parsing a metrics file line by line
+
+  :param metrics_file: A metrics file path
+  :param parser: A parser object with parse_line and get_metrics methods
+  :returns: The output of parser.get_metrics
+  '''
+  try:
+    check_file_path(metrics_file)
+    with open(metrics_file,'r') as fp:
+      for line in fp:
+        parser.parse_line(line)
+    return parser.get_metrics()
+  except Exception as e:
+    raise ValueError('Failed to parse file {0}, got error {1}'.\
+                     format(metrics_file,e))
+
+
+def run_and_tee_command_output(cmd,output_path,parser=None):
+  '''
+  A function for running a command and writing its stdout to a file line by line,
+  while parsing the same lines. The command output is never fully buffered in memory
+
+  :param cmd: A command list
+  :param output_path: Output file path for command stdout
+  :param parser: A parser object with parse_line and get_metrics methods, default None
+  :returns: The output of parser.get_metrics, or None if no parser is provided
+  '''
+  try:
+    with open(output_path,'w') as fp:
+      with subprocess.Popen(cmd,stdout=subprocess.PIPE,universal_newlines=True) as proc:
+        for line in proc.stdout:
+          fp.write(line)                                                        # tee command output to file
+          if parser is not None:
+            parser.parse_line(line)
+    if proc.returncode != 0:
+      raise ValueError('Command exited with status {0}'.\
+                       format(proc.returncode))
+    if parser is not None:
+      return parser.get_metrics()
+  except Exception as e:
+    raise ValueError('Failed to run command {0}, error: {1}'.\
+                     format(' '.join(cmd),e))
@@ -1,6 +1,6 @@
-import os,tarfile
+import os,io
 import pandas as pd
-from igf_data.utils.fileutils import check_file_path,get_temp_dir,remove_dir
+from igf_data.utils.fileutils import check_file_path,read_archive_member
 from igf_data.utils.analysis_fastq_fetch_utils import get_fastq_input_list
 
 def get_cellranger_count_input_list(db_session_class,experiment_igf_id,
@@ -88,34 +88,31 @@ def extract_cellranger_count_metrics_summary(cellranger_tar,
                                              attribute_name='attribute_name',
                                              attribute_value='attribute_value',
                                              attribute_prefix='None',
-                                             target_filename='metrics_summary.csv'):
+                                             target_filename='metrics_summary.csv',
+                                             use_archive_index=False):
   '''
   A function for extracting metrics summary file for cellranger ourput tar and parse the file.
   Optionally it can add the collection name and type info to the output dictionary.
+  The tar file is read as a stream and the metrics file is parsed from memory.
   
   :param cellranger_tar: A cellranger output tar file
   :param target_filename: A filename for metrics summary file lookup, default metrics_summary.csv
   :param collection_name: Optional collection name, default None
   :param collection_type: Optional collection type, default None
   :param attribute_tag: An optional string to add as prefix of the attribute names, default None
+  :param use_archive_index: Use a member index sidecar file for the tar, default False
   :returns: A dictionary containing the metrics values
   '''
   try:
     check_file_path(cellranger_tar)
-    temp_work_dir = get_temp_dir(use_ephemeral_space=False)
-    metrics_file = None
-    with tarfile.open(cellranger_tar,mode='r') as tar:
-      for file_name in tar.getnames():
-        if os.path.basename(file_name) == target_filename:
-            tar.extract(file_name,path=temp_work_dir)
-            metrics_file = os.path.join(temp_work_dir,
-                                        file_name)
+    _,metrics_data = \
+      read_archive_member(
+        archive_path=cellranger_tar,
+        member_pattern=target_filename,
+        match_basename=True,
+        use_index=use_archive_index)                                            # read first metrics file from tar
 
-    if metrics_file is None:
-      raise IOError('Required file {0} not found in tar {1}'.\
-                    format(target_filename,cellranger_tar))
-
-    attribute_data = pd.read_csv(metrics_file).T.\
+    attribute_data = pd.read_csv(io.BytesIO(metrics_data)).T.\
                      reset_index()
     attribute_data.columns = [attribute_name,attribute_value]
     if attribute_prefix is None:
@@ -137,7 +134,6 @@ def extract_cellranger_count_metrics_summary(cellranger_tar,
 
     attribute_data = attribute_data.\
                      to_dict(orient='records')
-    remove_dir(temp_work_dir)
     return attribute_data
   except:
     raise
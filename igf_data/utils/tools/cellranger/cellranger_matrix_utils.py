@@ -0,0 +1,255 @@
+import gzip
+import numpy as np
+import pandas as pd
+
+def _open_text_file(file_path):
+  '''
+  An internal function for opening plain or gzipped text files
+
+  :param file_path: A file path
+  :returns: A text file object
+  '''
+  if file_path.endswith('.gz'):
+    return gzip.open(file_path,'rt')
+  return open(file_path,'r')
+
+
+def _read_mtx_header(matrix_file):
+  '''
+  An internal function for reading the dimensions of a matrix market file
+
+  :param matrix_file: A matrix.mtx or matrix.mtx.gz file
+  :returns: Number of features, number of barcodes, number of entries and number of header lines
+  '''
+  try:
+    header_lines = 0
+    with _open_text_file(matrix_file) as fp:
+      for line in fp:
+        header_lines += 1
+        if line.startswith('%'):
+          continue
+        n_features,n_barcodes,n_entries = \
+          [int(value) for value in line.strip().split()]
+        return n_features,n_barcodes,n_entries,header_lines
+    raise ValueError('No matrix dimension found in file {0}'.format(matrix_file))
+  except:
+    raise
+
+
+def iterate_mtx_chunks(matrix_file,chunk_size=5000000):
+  '''
+  A generator for reading a cellranger matrix market file in chunks, without loading
+  the full matrix in memory
+
+  :param matrix_file: A matrix.mtx or matrix.mtx.gz file
+  :param chunk_size: Number of matrix entries per chunk, default 5000000
+  :returns: A generator of zero based feature index, zero based barcode index and
+            float32 count arrays
+  '''
+  try:
+    _,_,_,header_lines = _read_mtx_header(matrix_file)
+    reader = \
+      pd.read_csv(
+        matrix_file,
+        sep=' ',
+        header=None,
+        skiprows=header_lines,
+        names=['feature','barcode','count'],
+        dtype={'feature':np.int32,'barcode':np.int32,'count':np.float32},
+        chunksize=chunk_size)
+    for chunk in reader:
+      yield chunk['feature'].values - 1, \
+            chunk['barcode'].values - 1, \
+            chunk['count'].values
+  except:
+    raise
+
+
+def read_feature_and_barcode_names(features_tsv,barcode_tsv):
+  '''
+  A function for reading gene symbols and barcodes from cellranger output files
+
+  :param features_tsv: A features.tsv.gz or genes.tsv file
+  :param barcode_tsv: A barcodes.tsv.gz file
+  :returns: A dataframe of features with gene_ids, gene_symbols and feature_types columns
+            and a list of barcodes
+  '''
+  try:
+    features = \
+      pd.read_csv(
+        features_tsv,
+        sep='\t',
+        header=None,
+        dtype=str)
+    features = \
+      pd.DataFrame({
+        'gene_ids':features[0].values,
+        'gene_symbols':features[1].values \
+                       if features.shape[1] > 1 else features[0].values,
+        'feature_types':features[2].values \
+                        if features.shape[1] > 2 else 'Gene Expression'},
+        columns=['gene_ids','gene_symbols','feature_types'])                    # old genes.tsv files have only gene expression
+    barcodes = \
+      pd.read_csv(
+        barcode_tsv,
+        sep='\t',
+        header=None,
+        dtype=str)[0].tolist()
+    return features,barcodes
+  except:
+    raise
+
+
+def calculate_cell_qc_metrics_from_mtx(matrix_file,features_tsv,barcode_tsv,
+                                       mito_genes=(),chunk_size=5000000,
+                                       feature_mask=None):
+  '''
+  A function for calculating per-cell qc metrics from a cellranger matrix market file,
+  in one streaming pass over the matrix
+
+  :param matrix_file: A matrix.mtx or matrix.mtx.gz file
+  :param features_tsv: A features.tsv.gz file
+  :param barcode_tsv: A barcodes.tsv.gz file
+  :param mito_genes: A list of mitochondrial gene symbols, default empty list
+  :param chunk_size: Number of matrix entries per chunk, default 5000000
+  :param feature_mask: A boolean array for the features used in the metrics, default None for all the features
+  :returns: A dataframe with barcodes as index and n_genes, n_counts and percent_mito columns
+  '''
+  try:
+    n_features,n_barcodes,_,_ = _read_mtx_header(matrix_file)
+    features,barcodes = \
+      read_feature_and_barcode_names(
+        features_tsv=features_tsv,
+        barcode_tsv=barcode_tsv)
+    if len(features.index) != n_features or \
+       len(barcodes) != n_barcodes:
+      raise ValueError('Matrix dimension {0}x{1} not matching features {2} and barcodes {3}'.\
+                       format(n_features,n_barcodes,len(features.index),len(barcodes)))
+    mito_mask = features['gene_symbols'].isin(set(mito_genes)).values
+    if feature_mask is not None:
+      feature_mask = np.asarray(feature_mask,dtype=bool)
+      mito_mask = mito_mask & feature_mask
+    n_genes = np.zeros(n_barcodes,dtype=np.int64)
+    n_counts = np.zeros(n_barcodes,dtype=np.float64)
+    mito_counts = np.zeros(n_barcodes,dtype=np.float64)
+    for feature_index,barcode_index,counts in \
+        iterate_mtx_chunks(matrix_file,chunk_size=chunk_size):
+      if feature_mask is not None:
+        selected = feature_mask[feature_index]
+        feature_index = feature_index[selected]
+        barcode_index = barcode_index[selected]
+        counts = counts[selected]
+      n_genes += \
+        np.bincount(
+          barcode_index[counts != 0],
+          minlength=n_barcodes)
+      n_counts += \
+        np.bincount(
+          barcode_index,
+          weights=counts,
+          minlength=n_barcodes)
+      mito_index = mito_mask[feature_index]
+      mito_counts += \
+        np.bincount(
+          barcode_index[mito_index],
+          weights=counts[mito_index],
+          minlength=n_barcodes)                                                 # add counts for mito genes
+    percent_mito = \
+      np.divide(
+        mito_counts,
+        n_counts,
+        out=np.zeros(n_barcodes,dtype=np.float64),
+        where=n_counts > 0)
+    cell_qc = \
+      pd.DataFrame({
+        'n_genes':n_genes,
+        'n_counts':n_counts.astype(np.float32),
+        'percent_mito':percent_mito.astype(np.float32)},
+        index=barcodes,
+        columns=['n_genes','n_counts','percent_mito'])
+    return cell_qc
+  except:
+    raise
+
+
+def count_cells_per_feature_from_mtx(matrix_file,cell_mask=None,chunk_size=5000000):
+  '''
+  A function for counting the number of cells with non-zero counts for each feature,
+  in one streaming pass over a cellranger matrix market file
+
+  :param matrix_file: A matrix.mtx or matrix.mtx.gz file
+  :param cell_mask: A boolean array for the barcodes to count, default None for all cells
+  :param chunk_size: Number of matrix entries per chunk, default 5000000
+  :returns: A numpy array with the number of cells for each feature
+  '''
+  try:
+    n_features,_,_,_ = _read_mtx_header(matrix_file)
+    if cell_mask is not None:
+      cell_mask = np.asarray(cell_mask,dtype=bool)
+    n_cells = np.zeros(n_features,dtype=np.int64)
+    for feature_index,barcode_index,counts in \
+        iterate_mtx_chunks(matrix_file,chunk_size=chunk_size):
+      selected = counts != 0
+      if cell_mask is not None:
+        selected = selected & cell_mask[barcode_index]
+      n_cells += \
+        np.bincount(
+          feature_index[selected],
+          minlength=n_features)
+    return n_cells
+  except:
+    raise
+
+
+def read_mtx_as_csr(matrix_file,cell_index=None,dtype=np.float32,chunk_size=5000000,
+                    feature_index=None):
+  '''
+  A function for reading a cellranger matrix market file as a cell x gene sparse matrix,
+  keeping only the selected cells and features. Entries are read in chunks, so only the
+  selected part of the matrix is kept in memory
+
+  :param matrix_file: A matrix.mtx or matrix.mtx.gz file
+  :param cell_index: A list of zero based barcode index to keep, default None for all cells
+  :param dtype: Data type of the matrix values, default float32
+  :param chunk_size: Number of matrix entries per chunk, default 5000000
+  :param feature_index: A list of zero based feature index to keep, default None for all features
+  :returns: A scipy csr matrix
+  '''
+  try:
+    from scipy import sparse                                                    # only required for matrix output
+    n_features,n_barcodes,_,_ = _read_mtx_header(matrix_file)
+    cell_map = np.arange(n_barcodes,dtype=np.int64)
+    n_cells = n_barcodes
+    if cell_index is not None:
+      cell_map = np.full(n_barcodes,-1,dtype=np.int64)
+      cell_map[np.asarray(cell_index,dtype=np.int64)] = \
+        np.arange(len(cell_index),dtype=np.int64)                               # map old barcode index to new row index
+      n_cells = len(cell_index)
+    feature_map = np.arange(n_features,dtype=np.int64)
+    if feature_index is not None:
+      feature_map = np.full(n_features,-1,dtype=np.int64)
+      feature_map[np.asarray(feature_index,dtype=np.int64)] = \
+        np.arange(len(feature_index),dtype=np.int64)                            # map old feature index to new column index
+      n_features = len(feature_index)
+    row_list = list()
+    col_list = list()
+    data_list = list()
+    for mtx_feature_index,barcode_index,counts in \
+        iterate_mtx_chunks(matrix_file,chunk_size=chunk_size):
+      row_index = cell_map[barcode_index]
+      col_index = feature_map[mtx_feature_index]
+      selected = (row_index >= 0) & (col_index >= 0)
+      row_list.append(row_index[selected].astype(np.int32))
+      col_list.append(col_index[selected].astype(np.int32))
+      data_list.append(counts[selected].astype(dtype))
+    matrix = \
+      sparse.coo_matrix(
+        (np.concatenate(data_list) if len(data_list) > 0 else np.array([],dtype=dtype),
+         (np.concatenate(row_list) if len(row_list) > 0 else np.array([],dtype=np.int32),
+          np.concatenate(col_list) if len(col_list) > 0 else np.array([],dtype=np.int32))),
+        shape=(n_cells,n_features),
+        dtype=dtype).\
+      tocsr()
+    return matrix
+  except:
+    raise
@@ -1,32 +1,303 @@
+import os,json
 import pandas as pd
-from bioservices import biomart
+from io import StringIO
+from shutil import rmtree
+from tempfile import mkdtemp
+from functools import lru_cache
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
-def fetch_rRNA_genes_from_biomart(org,host='www.ensembl.org'):
+_biomart_datasets = {
+  'hsapiens':('hsapiens_gene_ensembl','hgnc_symbol'),                           # dataset name and gene symbol attribute
+  'mmusculus':('mmusculus_gene_ensembl','mgi_symbol')}
+_biomart_gene_sets = {
+  'mitochondrial':{'filter':('chromosome_name','MT'),
+                   'symbol':'external_gene_name'},
+  'rRNA':{'filter':('biotype','rRNA'),
+          'symbol':None}}                                                       # use symbol attribute of the dataset
+_snapshot_manifest = 'snapshot.json'
+
+def _query_biomart_gene_set(org,gene_set,host='www.ensembl.org'):
   '''
+  An internal function for fetching a gene set table from biomart
+
+  :param org: An Ensembl organism name, e.g. hsapiens or mmusculus
+  :param gene_set: A gene set name, e.g. mitochondrial or rRNA
+  :param host: Biomart host name, default www.ensembl.org
+  :returns: A dataframe with symbol and chromosome_name columns
   '''
   try:
-    if org not in ['hsapiens',
-                   'mmusculus']:
+    if org not in _biomart_datasets:
       raise ValueError('Organism {0} not supported for biomart lookup'.\
                        format(org))
+    if gene_set not in _biomart_gene_sets:
+      raise ValueError('Gene set {0} not supported for biomart lookup'.\
+                       format(gene_set))
+    from bioservices import biomart                                             # only required for network lookup
+    dataset,symbol_attribute = _biomart_datasets.get(org)
+    filter_name,filter_value = _biomart_gene_sets.get(gene_set).get('filter')
+    if _biomart_gene_sets.get(gene_set).get('symbol') is not None:
+      symbol_attribute = _biomart_gene_sets.get(gene_set).get('symbol')
     s=biomart.BioMart(host=host)
     s.new_query()
-    if org=='hsapiens':
-      s.add_dataset_to_xml('hsapiens_gene_ensembl')
-      s.add_attribute_to_xml('hgnc_symbol')                                     # fetch human gene names
-    elif org=='mmusculus':
-      s.add_dataset_to_xml('mmusculus_gene_ensembl')
-      s.add_attribute_to_xml('mgi_symbol')                                      # fetch mouse gene names
-    else:
-      raise ValueError('Organism {0} not supported for biomart lookup'.\
-                         format(org))
-    s.add_filter_to_xml("biotype", "rRNA")                                      # filter query for rRNA genes
+    s.add_dataset_to_xml(dataset)
+    s.add_attribute_to_xml(symbol_attribute)                                    # fetch gene names
+    s.add_filter_to_xml(filter_name,filter_value)                               # filter query for the gene set
     s.add_attribute_to_xml('chromosome_name')                                   # fetch chr names
     xml=s.get_xml()                                                             # fetch xml
-    res=pd.read_csv(StringIO(s.query(xml)), sep='\t', header=None)
+    res=pd.read_csv(StringIO(s.query(xml)), sep='\t', header=None, dtype=str)
     res.columns=['symbol','chromosome_name']                                    # reformat dataframe
-    res.set_index('symbol',inplace=True)
-    res=res[~res.index.duplicated(keep='first')]
-    return res.index
+    res=res.dropna(subset=['symbol'])
+    res=res[~res['symbol'].duplicated(keep='first')].\
+        reset_index(drop=True)
+    return res
+  except:
+    raise
+
+
+@lru_cache(maxsize=32)
+def _fetch_biomart_table_from_network(org,gene_set,host='www.ensembl.org'):
+  '''
+  An internal function for fetching a gene set table from biomart, cached for the
+  life of the process
+
+  :param org: An Ensembl organism name
+  :param gene_set: A gene set name
+  :param host: Biomart host name, default www.ensembl.org
+  :returns: A dataframe with symbol and chromosome_name columns
+  '''
+  return _query_biomart_gene_set(org=org,gene_set=gene_set,host=host)
+
+
+def fetch_rRNA_genes_from_biomart(org,host='www.ensembl.org'):
+  '''
+  A function for fetching rRNA gene names from biomart
+
+  :param org: An Ensembl organism name, hsapiens or mmusculus
+  :param host: Biomart host name, default www.ensembl.org
+  :returns: A pandas index of rRNA gene names
+  '''
+  try:
+    res=_fetch_biomart_table_from_network(org=org,gene_set='rRNA',host=host)
+    return pd.Index(res['symbol'].values,name='symbol')
+  except:
+    raise
+
+
+def build_biomart_snapshot(snapshot_dir,org_list=('hsapiens','mmusculus'),
+                           gene_set_list=('mitochondrial','rRNA'),
+                           host='www.ensembl.org',snapshot_version=None,
+                           file_format='tsv',max_workers=4):
+  '''
+  A function for building a versioned local snapshot of biomart gene set tables, for
+  running gene lookups on nodes without internet access. Biomart queries are run in
+  parallel and the snapshot dir is renamed to its version only after all the tables
+  are written
+
+  Snapshot layout
+
+    snapshot_dir/
+      VERSION/snapshot.json
+      VERSION/ORG_GENESET.tsv
+
+  :param snapshot_dir: A directory path for the snapshots
+  :param org_list: A list of Ensembl organism names, default ('hsapiens','mmusculus')
+  :param gene_set_list: A list of gene set names, default ('mitochondrial','rRNA')
+  :param host: Biomart host name, default www.ensembl.org
+  :param snapshot_version: A snapshot version name, default None for current date
+  :param file_format: Table file format, tsv or parquet, default tsv
+  :param max_workers: Number of parallel biomart queries, default 4
+  :returns: The snapshot version dir path
+  '''
+  try:
+    if file_format not in ('tsv','parquet'):
+      raise ValueError('File format {0} not supported'.format(file_format))
+    if snapshot_version is None:
+      snapshot_version = datetime.now().strftime('%Y%m%d')
+    snapshot_path = os.path.join(snapshot_dir,snapshot_version)
+    if os.path.exists(snapshot_path):
+      raise ValueError('Snapshot {0} already present'.format(snapshot_path))
+    os.makedirs(snapshot_dir,exist_ok=True)
+    query_list = [(org,gene_set)
+                    for org in org_list
+                      for gene_set in gene_set_list]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+      results = \
+        list(executor.map(
+          lambda query: _query_biomart_gene_set(
+                          org=query[0],
+                          gene_set=query[1],
+                          host=host),
+          query_list))                                                          # run biomart queries in parallel
+    temp_path = \
+      mkdtemp(
+        dir=snapshot_dir,
+        prefix='.{0}_'.format(snapshot_version))
+    try:
+      tables = dict()
+      for (org,gene_set),res in zip(query_list,results):
+        table_name = '{0}_{1}'.format(org,gene_set)
+        table_file = '{0}.{1}'.format(table_name,file_format)
+        if file_format=='parquet':
+          res.to_parquet(os.path.join(temp_path,table_file),index=False)        # requires pyarrow
+        else:
+          res.to_csv(os.path.join(temp_path,table_file),sep='\t',index=False)
+        tables.update({table_name:table_file})
+      with open(os.path.join(temp_path,_snapshot_manifest),'w') as fp:
+        json.dump({
+          'snapshot_version':snapshot_version,
+          'host':host,
+          'created':datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+          'tables':tables},fp,indent=2)
+      os.chmod(temp_path,0o755)
+      os.rename(temp_path,snapshot_path)                                        # publish complete snapshot
+    except:
+      rmtree(temp_path,ignore_errors=True)
+      raise
+    return snapshot_path
+  except Exception as e:
+    raise ValueError('Failed to build biomart snapshot, error: {0}'.format(e))
+
+
+def get_latest_snapshot_version(snapshot_dir):
+  '''
+  A function for fetching the latest complete snapshot version from a snapshot dir
+
+  :param snapshot_dir: A directory path for the snapshots
+  :returns: A snapshot version name or None if no snapshot found
+  '''
+  try:
+    if not os.path.exists(snapshot_dir):
+      return None
+    version_list = \
+      [entry.name
+         for entry in os.scandir(snapshot_dir)
+           if entry.is_dir() and \
+              not entry.name.startswith('.') and \
+              os.path.exists(os.path.join(entry.path,_snapshot_manifest))]
+    if len(version_list)==0:
+      return None
+    return sorted(version_list)[-1]
+  except:
+    raise
+
+
+def _get_file_key(file_path):
+  '''
+  An internal function for getting the file identity used as cache key
+
+  :param file_path: A file path
+  :returns: A tuple of file device, inode, mtime and size
+  '''
+  file_stat = os.stat(file_path)
+  return (file_stat.st_dev,
+          file_stat.st_ino,
+          file_stat.st_mtime_ns,
+          file_stat.st_size)
+
+
+@lru_cache(maxsize=32)
+def _read_snapshot_file(file_path,file_key):
+  '''
+  An internal function for reading a snapshot manifest or table, cached by the file identity
+
+  :param file_path: A snapshot file path
+  :param file_key: A tuple of file device, inode, mtime and size, used as the cache key
+  :returns: A dictionary for manifest file or a dataframe for table files
+  '''
+  try:
+    if file_path.endswith('.json'):
+      with open(file_path,'r') as fp:
+        return json.load(fp)
+    elif file_path.endswith('.parquet'):
+      return pd.read_parquet(file_path)                                         # requires pyarrow
+    else:
+      return pd.read_csv(file_path,sep='\t',dtype=str)
+  except:
+    raise
+
+
+def fetch_biomart_table(org,gene_set,snapshot_dir=None,snapshot_version=None,
+                        allow_network=False,host='www.ensembl.org'):
+  '''
+  A function for fetching a gene set table from the local biomart snapshot. Biomart is
+  queried over the network only if the table is not in the snapshot and allow_network is True.
+  Tables are cached in memory, so repeated lookups don't read the files again
+
+  :param org: An Ensembl organism name, e.g. hsapiens or mmusculus
+  :param gene_set: A gene set name, e.g. mitochondrial or rRNA
+  :param snapshot_dir: A directory path for the snapshots, default None
+  :param snapshot_version: A snapshot version name, default None for the latest version
+  :param allow_network: Toggle biomart network lookup if the table is not in the snapshot, default False
+  :param host: Biomart host name, default www.ensembl.org
+  :returns: A dataframe with symbol and chromosome_name columns
+  :raises ValueError: It raises ValueError if table not found and network lookup is not allowed
+  '''
+  try:
+    table_name = '{0}_{1}'.format(org,gene_set)
+    if snapshot_dir is not None:
+      if snapshot_version is None:
+        snapshot_version = get_latest_snapshot_version(snapshot_dir)
+      if snapshot_version is not None:
+        manifest_file = \
+          os.path.join(
+            snapshot_dir,
+            snapshot_version,
+            _snapshot_manifest)
+        manifest = \
+          _read_snapshot_file(
+            manifest_file,
+            _get_file_key(manifest_file))
+        table_file = manifest.get('tables').get(table_name)
+        if table_file is not None:
+          table_file = \
+            os.path.join(
+              snapshot_dir,
+              snapshot_version,
+              table_file)
+          table = \
+            _read_snapshot_file(
+              table_file,
+              _get_file_key(table_file))
+          return table.copy()
+
+    if not allow_network:
+      raise ValueError(
+              'No snapshot found for {0} in {1} and network lookup is not allowed'.\
+                format(table_name,snapshot_dir))
+    table = \
+      _fetch_biomart_table_from_network(
+        org=org,
+        gene_set=gene_set,
+        host=host)
+    return table.copy()
+  except:
+    raise
+
+
+def fetch_gene_set(org,gene_set,snapshot_dir=None,snapshot_version=None,
+                   allow_network=False,host='www.ensembl.org'):
+  '''
+  A function for fetching a list of gene names for a gene set, from the local biomart
+  snapshot or from the network if allowed
+
+  :param org: An Ensembl organism name, e.g. hsapiens or mmusculus
+  :param gene_set: A gene set name, e.g. mitochondrial or rRNA
+  :param snapshot_dir: A directory path for the snapshots, default None
+  :param snapshot_version: A snapshot version name, default None for the latest version
+  :param allow_network: Toggle biomart network lookup if the table is not in the snapshot, default False
+  :param host: Biomart host name, default www.ensembl.org
+  :returns: A list of gene names
+  '''
+  try:
+    table = \
+      fetch_biomart_table(
+        org=org,
+        gene_set=gene_set,
+        snapshot_dir=snapshot_dir,
+        snapshot_version=snapshot_version,
+        allow_network=allow_network,
+        host=host)
+    return list(table['symbol'].values)
   except:
-    raise
\ No newline at end of file
+    raise
@@ -1,7 +1,7 @@
 import os,subprocess
 from shlex import quote
-import pandas as pd
 from igf_data.utils.fileutils import check_file_path, get_temp_dir
+from igf_data.utils.tools.alignment_metrics_parser import Picard_metrics_parser,parse_metrics_file
 
 class Picard_tools:
   '''
@@ -268,71 +268,26 @@ class Picard_tools:
       metrics_output_list=list()
       for file in metrics_list:
         try:
-          check_file_path(file)                                                 # check input path
+          metrics = \
+            parse_metrics_file(
+              metrics_file=file,
+              parser=Picard_metrics_parser(typed=False)).\
+            get('metrics')                                                      # find metrics table by METRICS CLASS header
           if picard_cmd=='CollectAlignmentSummaryMetrics':
-            data = \
-              pd.read_csv(
-                file,
-                sep='\t',
-                dtype=object,
-                skiprows=6)                                                     # read alignment summary metrics, skip 6 lines
-            data.columns = \
-              list(map(lambda x: '{0}_{1}'.format(picard_cmd,x),
-                       data.columns))                                           # append picard command name
-            category_col = \
-              '{0}_{1}'.format(picard_cmd,'CATEGORY')                           # get key for modified category column
-            data = \
-              data[(data.get(category_col)=='PAIR') | \
-                   (data.get(category_col)=='UNPAIRED')].\
-              dropna(axis=1).\
-              to_dict(orient='records')                                         # filter data and convert to list of dicts
-            metrics_output_list.extend(data)                                    # append results
-          elif picard_cmd=='CollectGcBiasMetrics':
-            data = \
-              pd.read_csv(
-                file,
-                sep='\t',
-                dtype=object,
-                skiprows=6)                                                     # read GC bias metrics summary file
-            data.columns = \
-              list(map(lambda x: '{0}_{1}'.format(picard_cmd,x),
-                       data.columns))                                           # append picard command name
-            data = \
-              data.\
-              dropna(axis=1).\
-              to_dict(orient='records')                                         # filter data and convert tolist of dicts
-            metrics_output_list.extend(data)                                    # append results
-          elif picard_cmd=='CollectRnaSeqMetrics':
-            data = \
-              pd.read_csv(
-                file,
-                sep='\t',
-                skiprows=6,
-                dtype=object,
-                nrows=1)                                                        # read rnaseq metrics, skip 6 lines and read only one line
-            data.columns = \
-              list(map(lambda x: '{0}_{1}'.format(picard_cmd,x),
-                       data.columns))                                           # append picard command name
-            data = \
-              data.\
-              dropna(axis=1).\
-              to_dict(orient='records')                                         # filter data and convert tolist of dicts
-            metrics_output_list.extend(data)                                    # append results
-          elif picard_cmd=='MarkDuplicates':
-            data = \
-              pd.read_csv(
-                file,
-                sep='\t',
-                skiprows=6,
-                dtype=object,
-                nrows=1)                                                        # read markdup metrics, skip 6 lines and read only one line
-            data.columns = \
-              list(map(lambda x: '{0}_{1}'.format(picard_cmd,x),
-                       data.columns))                                           # append picard command name
-            data = \
-              data.to_dict(orient='records')                                    # convert to list of dicts
-            metrics_output_list.extend(data)                                    # append results
-
+            metrics = \
+              [row for row in metrics
+                 if row.get('CATEGORY') in ('PAIR','UNPAIRED')]                 # filter alignment summary metrics
+          elif picard_cmd in ('CollectRnaSeqMetrics','MarkDuplicates'):
+            metrics = metrics[:1]                                               # read only one line
+          elif picard_cmd!='CollectGcBiasMetrics':
+            continue
+
+          for row in metrics:
+            metrics_output_list.\
+              append({
+                '{0}_{1}'.format(picard_cmd,key):value
+                  for key,value in row.items()
+                    if value != ''})                                            # append picard command name, skip empty values
         except Exception as e:
           raise ValueError('Failed to parse file {0}, got error {1}'.\
                 format(file,e))
@@ -1,4 +1,9 @@
+import os,json,time,hashlib
+from sqlalchemy import func
 from igf_data.igfdb.collectionadaptor import CollectionAdaptor
+from igf_data.igfdb.igfTables import Collection,Collection_group,File
+
+_reference_files_cache = dict()                                                 # process level cache for reference files
 
 class Reference_genome_utils:
   '''
@@ -21,7 +26,8 @@ class Reference_genome_utils:
                gatk_indel_ref_type='INDEL_LIST_VCF',
                ribosomal_interval_type='RIBOSOMAL_INTERVAL',
                blacklist_interval_type='BLACKLIST_BED',
-               genome_twobit_uri_type='GENOME_TWOBIT_URI'):
+               genome_twobit_uri_type='GENOME_TWOBIT_URI',
+               cache_ttl=0,cache_dir=None):
     '''
     :param genome_tag: Collection name of the reference genome file
     :param dbsession_class: A sqlalchemy session class for database connection
@@ -41,6 +47,9 @@ class Reference_genome_utils:
     :param ribosomal_interval_type: Collection type for ribosomal interval, default RIBOSOMAL_INTERVAL
     :param genome_twobit_uri_type: Collection type for twobit genome uri, for remote ftp
     :param blacklist_interval_type: Collection type for blacklist_interval_type, default BLACKLIST_BED
+    :param cache_ttl: Number of seconds for reusing the reference files from the process level
+                      and on-disk cache without checking the database, default 0 for no caching
+    :param cache_dir: A directory path for on-disk reference file cache, default None
     '''
     self.genome_tag = genome_tag
     self.dbsession_class = dbsession_class
@@ -61,33 +70,198 @@ class Reference_genome_utils:
     self.blacklist_interval_type = blacklist_interval_type
     self.gene_rsem_type = gene_rsem_type
     self.genome_twobit_uri_type = genome_twobit_uri_type
+    self.cache_ttl = cache_ttl
+    self.cache_dir = cache_dir
+    self._reference_files = None
+
+
+  def _get_cache_key(self):
+    '''
+    An internal method for fetching the cache key for the genome_tag and the database
+
+    :returns: A string
+    '''
+    try:
+      db_url = ''
+      bind = getattr(self.dbsession_class,'kw',dict()).get('bind')
+      if bind is not None:
+        db_url = str(bind.url)
+      return \
+        hashlib.md5(
+          '{0}\t{1}'.format(db_url,self.genome_tag).\
+            encode('utf-8')).\
+          hexdigest()
+    except:
+      raise
+
+  def _fetch_collection_version(self,session):
+    '''
+    An internal method for fetching a version stamp for all the reference collections
+    of the genome_tag. It changes if any collection, collection group or file is added,
+    removed or modified
+
+    :param session: A database session
+    :returns: A list of strings
+    '''
+    try:
+      version = \
+        session.\
+          query(
+            func.count(Collection_group.collection_group_id),
+            func.max(Collection_group.collection_group_id),
+            func.max(Collection.date_stamp),
+            func.max(File.date_updated)).\
+          join(Collection_group,
+               Collection.collection_id==Collection_group.collection_id).\
+          join(File,
+               File.file_id==Collection_group.file_id).\
+          filter(Collection.name==self.genome_tag).\
+          one()
+      return [str(value) for value in version]
+    except:
+      raise
+
+  def _fetch_all_reference_files(self,session):
+    '''
+    An internal method for fetching files for all the collection types of the genome_tag in one query
 
+    :param session: A database session
+    :returns: A dictionary of collection types and list of file paths
+    '''
+    try:
+      ca = CollectionAdaptor(**{'session':session})
+      query = \
+        session.\
+          query(Collection.type,File.file_path).\
+          join(Collection_group,
+               Collection.collection_id==Collection_group.collection_id).\
+          join(File,
+               File.file_id==Collection_group.file_id).\
+          filter(Collection.name==self.genome_tag).\
+          order_by(Collection_group.collection_group_id)
+      reference_files = dict()
+      for collection_type,file_path in \
+        ca.fetch_records(query=query,output_mode='object'):
+        reference_files.\
+          setdefault(collection_type,list()).\
+          append(file_path)
+      return reference_files
+    except:
+      raise
+
+  def _read_cache_file(self,cache_key):
+    '''
+    An internal method for reading on-disk cache entry
+
+    :param cache_key: A cache key string
+    :returns: A dictionary or None if cache file is not found or invalid
+    '''
+    try:
+      if self.cache_dir is None:
+        return None
+      cache_file = os.path.join(self.cache_dir,'{0}.json'.format(cache_key))
+      if not os.path.exists(cache_file):
+        return None
+      with open(cache_file,'r') as fp:
+        cache_entry = json.load(fp)
+      if cache_entry.get('genome_tag') != self.genome_tag:
+        return None
+      return cache_entry
+    except ValueError:
+      return None                                                               # ignore broken cache file
+
+  def _write_cache_file(self,cache_key,cache_entry):
+    '''
+    An internal method for writing on-disk cache entry atomically
+
+    :param cache_key: A cache key string
+    :param cache_entry: A dictionary for the cache entry
+    '''
+    try:
+      if self.cache_dir is None:
+        return None
+      os.makedirs(self.cache_dir,mode=0o770,exist_ok=True)
+      cache_file = os.path.join(self.cache_dir,'{0}.json'.format(cache_key))
+      temp_cache_file = '{0}.{1}.tmp'.format(cache_file,os.getpid())
+      with open(temp_cache_file,'w') as fp:
+        json.dump(cache_entry,fp)
+      os.replace(temp_cache_file,cache_file)
+    except:
+      raise
+
+  def _get_reference_files(self):
+    '''
+    An internal method for fetching files for all the reference collections of the genome_tag.
+    Files are fetched once for each object. If cache_ttl is set, they are also kept in the process
+    level cache and in cache_dir. Cached entries are used without database lookup for cache_ttl
+    seconds, after that they are used only if the collection version stamp has not changed
+
+    :returns: A dictionary of collection types and list of file paths
+    '''
+    try:
+      if self._reference_files is not None:
+        return self._reference_files
+
+      cache_key = None
+      cache_entry = None
+      if self.cache_ttl > 0:
+        cache_key = self._get_cache_key()
+        cache_entry = _reference_files_cache.get(cache_key)
+        disk_entry = self._read_cache_file(cache_key)
+        if disk_entry is not None and \
+           (cache_entry is None or \
+            disk_entry.get('checked_at') > cache_entry.get('checked_at')):
+          cache_entry = disk_entry                                              # use the recent entry
+        if cache_entry is not None and \
+           time.time() - cache_entry.get('checked_at') < self.cache_ttl:
+          _reference_files_cache[cache_key] = cache_entry
+          self._reference_files = cache_entry.get('files')
+          return self._reference_files
+
+      ca = CollectionAdaptor(**{'session_class':self.dbsession_class})
+      ca.start_session()
+      try:
+        version = None
+        if self.cache_ttl > 0:
+          version = self._fetch_collection_version(session=ca.session)
+        if cache_entry is not None and \
+           cache_entry.get('version') == version:
+          reference_files = cache_entry.get('files')                            # no change in collections
+        else:
+          reference_files = self._fetch_all_reference_files(session=ca.session)
+      finally:
+        ca.close_session()
+
+      if self.cache_ttl > 0:
+        cache_entry = {
+          'genome_tag':self.genome_tag,
+          'version':version,
+          'checked_at':time.time(),
+          'files':reference_files}
+        _reference_files_cache[cache_key] = cache_entry
+        self._write_cache_file(cache_key,cache_entry)
+      self._reference_files = reference_files
+      return self._reference_files
+    except:
+      raise
 
   def _fetch_collection_files(self,collection_type,check_missing=False,
-                              unique_file=True,file_path_label='file_path'):
+                              unique_file=True):
     '''
     An internal method for fetching collection group files from database
     
     :param collection_type: Collection type information for database lookup
     :param check_missing: A toggle for checking errors for missing files, default False
     :param unique_file: A toggle for keeping only a single collection file, default True
-    :param file_path_label: Name of the file_path column in the File table, default file_path
     :returns: A single file if unique_file is true, else a list of files
     '''
     try:
       ref_file = None
-      ca = \
-        CollectionAdaptor(**{'session_class':self.dbsession_class})
-      ca.start_session()
-      collection_files = \
-        ca.\
-          get_collection_files(
-            collection_name=self.genome_tag,
-            collection_type=collection_type,
-            output_mode='dataframe')                                            # fetch collection files from db
-      ca.close_session()
-      if len(collection_files.index) >0:
-        files = list(collection_files[file_path_label].values)
+      files = \
+        self._get_reference_files().\
+          get(collection_type,list())                                           # fetch all reference files once
+      if len(files) >0:
+        files = list(files)
         if unique_file:
           ref_file = files[0]                                                   # select the first file from db results
         else:
@@ -1,7 +1,9 @@
 import os,subprocess,fnmatch
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from shlex import quote
 from igf_data.utils.fileutils import check_file_path,get_temp_dir,remove_dir,copy_local_file
+from igf_data.utils.tools.alignment_metrics_parser import Samtools_stats_parser,Samtools_flagstat_parser
+from igf_data.utils.tools.alignment_metrics_parser import Samtools_idxstats_parser,parse_metrics_file,run_and_tee_command_output
 
 def _check_cram_file(cram_path):
   '''
@@ -259,7 +261,7 @@ def filter_bam_file(samtools_exe,input_bam,output_bam,samFlagInclude=None,refere
 
 
 def run_bam_stats(samtools_exe,bam_file,output_dir,threads=1,force=False,
-                  output_prefix=None,dry_run=False):
+                  output_prefix=None,dry_run=False,check_index=True):
   '''
   A method for generating samtools stats output
   
@@ -270,12 +272,14 @@ def run_bam_stats(samtools_exe,bam_file,output_dir,threads=1,force=False,
   :param threads: Number of threads to use for conversion, default 1
   :param force: Output flagstat file will be overwritten if force is True, default False
   :param dry_run: A toggle for returning the samtools command without actually running it, default False
+  :param check_index: Check the bam index before run, default True
   :returns: Output file path, list containing samtools command and a list containing the SN matrics of report
   '''
   try:
     check_file_path(samtools_exe)
     _check_bam_file(bam_file=bam_file)
-    if not dry_run:
+    if not dry_run and \
+       check_index:
       _check_bam_index(\
         samtools_exe=samtools_exe,
         bam_file=bam_file)
@@ -306,18 +310,31 @@ def run_bam_stats(samtools_exe,bam_file,output_dir,threads=1,force=False,
     if dry_run:
       return stats_cmd
 
-    with open(output_path,'w') as fp:
-      with subprocess.Popen(stats_cmd, stdout=subprocess.PIPE) as proc:
-        fp.write(proc.stdout.read().decode('utf-8'))                            # write bam stats output
-
+    stats_metrics = \
+      run_and_tee_command_output(
+        cmd=stats_cmd,
+        output_path=output_path,
+        parser=Samtools_stats_parser(typed=False))                              # write and parse bam stats output
     stats_data_list = \
-      _parse_samtools_stats_output(stats_file=output_path)                      # parse stats output file
-
+      _format_samtools_stats_metrics(stats_metrics)
     return output_path,stats_cmd,stats_data_list
   except:
     raise
 
 
+def _format_samtools_stats_metrics(stats_metrics):
+  '''
+  An internal function for formatting samtools stats SN metrics for collection attribute table
+
+  :param stats_metrics: A dictionary of SN metrics name and value
+  :returns: A list of dictionaries
+  '''
+  stats_data_list = [
+    {'SAMTOOLS_STATS_{0}'.format(key):value}
+      for key,value in stats_metrics.items()]                                   # one dictionary per SN field
+  return stats_data_list
+
+
 def _parse_samtools_stats_output(stats_file):
   '''
   An internal static method for parsing samtools stats output
@@ -325,34 +342,15 @@ def _parse_samtools_stats_output(stats_file):
   :param stats_file: Samtools stats output file
   :returns: A list of dictionaries
   '''
-  try:
-    data = \
-      pd.read_csv(\
-        stats_file,
-        sep='\n',
-        header=None,
-        engine='python',
-        dtype=object,
-        comment='#')
-    sn_rows = \
-      data[data.get(0).map(lambda x: x.startswith('SN'))][0].\
-      map(lambda x: x.strip('SN\t')).values                                     # read SN fields from report
-    stats_data_list = list()
-    for row in sn_rows:
-      stats_data_list.\
-      append(\
-        {'SAMTOOLS_STATS_{0}'.format(item.replace(' ','_')):row.split(':')[index+1].strip()
-            for index, item in enumerate(row.split(':'))
-              if index % 2 == 0
-        })                                                                         # append sn fields with minor formatting
-    return stats_data_list
-  except Exception as e:
-    raise ValueError('Failed to parse file {0}, got error {1}'.\
-          format(stats_file,e))
+  stats_metrics = \
+    parse_metrics_file(
+      metrics_file=stats_file,
+      parser=Samtools_stats_parser(typed=False))                                # read SN fields from report
+  return _format_samtools_stats_metrics(stats_metrics)
 
 
 def run_bam_flagstat(samtools_exe,bam_file,output_dir,threads=1,force=False,
-                     output_prefix=None,dry_run=False):
+                     output_prefix=None,dry_run=False,return_metrics=False,check_index=True):
   '''
   A method for generating bam flagstat output
   
@@ -363,12 +361,15 @@ def run_bam_flagstat(samtools_exe,bam_file,output_dir,threads=1,force=False,
   :param threads: Number of threads to use for conversion, default 1
   :param force: Output flagstat file will be overwritten if force is True, default False
   :param dry_run: A toggle for returning the samtools command without actually running it, default False
+  :param return_metrics: Return the parsed metrics dictionary as the third value, default False
+  :param check_index: Check the bam index before run, default True
   :returns: Output file path and a list containing samtools command
   '''
   try:
     check_file_path(samtools_exe)
     _check_bam_file(bam_file=bam_file)                                          # check bam file
-    if not dry_run:
+    if not dry_run and \
+       check_index:
       _check_bam_index(\
         samtools_exe=samtools_exe,
         bam_file=bam_file)                                                      # generate bam index
@@ -398,9 +399,13 @@ def run_bam_flagstat(samtools_exe,bam_file,output_dir,threads=1,force=False,
     if dry_run:
       return flagstat_cmd
 
-    with open(output_path,'w') as fp:
-      with subprocess.Popen(flagstat_cmd, stdout=subprocess.PIPE) as proc:
-        fp.write(proc.stdout.read().decode('utf-8'))                            # write bam flagstat output
+    metrics = \
+      run_and_tee_command_output(
+        cmd=flagstat_cmd,
+        output_path=output_path,
+        parser=Samtools_flagstat_parser())                                      # write and parse bam flagstat output
+    if return_metrics:
+      return output_path,flagstat_cmd,metrics
 
     return output_path,flagstat_cmd
   except:
@@ -408,7 +413,7 @@ def run_bam_flagstat(samtools_exe,bam_file,output_dir,threads=1,force=False,
 
 
 def run_bam_idxstat(samtools_exe,bam_file,output_dir,output_prefix=None,
-                    force=False,dry_run=False):
+                    force=False,dry_run=False,return_metrics=False,check_index=True):
   '''
   A function for running samtools index stats generation
   
@@ -418,12 +423,15 @@ def run_bam_idxstat(samtools_exe,bam_file,output_dir,output_prefix=None,
   :param output_prefix: Output file prefix, default None
   :param force: Output idxstats file will be overwritten if force is True, default False
   :param dry_run: A toggle for returning the samtools command without actually running it, default False
+  :param return_metrics: Return the parsed metrics dictionary as the third value, default False
+  :param check_index: Check the bam index before run, default True
   :returns: Output file path and a list containing samtools command
   '''
   try:
     check_file_path(samtools_exe)
     _check_bam_file(bam_file=bam_file)                                          # check bam file
-    if not dry_run:
+    if not dry_run and \
+       check_index:
       _check_bam_index(\
         samtools_exe=samtools_exe,
         bam_file=bam_file)                                                      # generate bam index
@@ -452,15 +460,122 @@ def run_bam_idxstat(samtools_exe,bam_file,output_dir,output_prefix=None,
     if dry_run:
       return idxstat_cmd
 
-    with open(output_path,'w') as fp:
-      with subprocess.Popen(idxstat_cmd, stdout=subprocess.PIPE) as proc:
-        fp.write(proc.stdout.read().decode('utf-8'))                            # write bam flagstat output
+    metrics = \
+      run_and_tee_command_output(
+        cmd=idxstat_cmd,
+        output_path=output_path,
+        parser=Samtools_idxstats_parser())                                      # write and parse bam idxstats output
+    if return_metrics:
+      return output_path,idxstat_cmd,metrics
 
     return output_path,idxstat_cmd
   except:
     raise
 
 
+def run_bam_qc_metrics(samtools_exe,bam_file,output_dir,output_prefix=None,threads=1,
+                       force=False,qc_commands=('stats','flagstat','idxstats'),
+                       max_workers=3,dry_run=False):
+  '''
+  A function for running samtools stats, flagstat and idxstats concurrently on one bam file.
+  The bam file and index are checked only once before starting the commands
+
+  :param samtools_exe: samtools executable path
+  :param bam_file: A bam filepath with / without index. Index file will be created if its missing
+  :param output_dir: Output directory path
+  :param output_prefix: Output file prefix, default None
+  :param threads: Number of threads to use for samtools stats and flagstat, default 1
+  :param force: Output files will be overwritten if force is True, default False
+  :param qc_commands: A list of samtools commands to run, default stats, flagstat and idxstats
+  :param max_workers: Number of commands to run in parallel, default 3
+  :param dry_run: A toggle for returning the samtools commands without actually running it, default False
+  :returns: A dictionary of samtools command name and a dictionary containing output_path, cmd and metrics.
+            Dry run returns a dictionary of samtools command name and command list
+  '''
+  try:
+    check_file_path(samtools_exe)
+    _check_bam_file(bam_file=bam_file)                                          # check bam file
+    if not dry_run:
+      _check_bam_index(\
+        samtools_exe=samtools_exe,
+        bam_file=bam_file)                                                      # shared index check for all commands
+
+    qc_functions = {
+      'stats':run_bam_stats,
+      'flagstat':run_bam_flagstat,
+      'idxstats':run_bam_idxstat}
+    for qc_command in qc_commands:
+      if qc_command not in qc_functions:
+        raise ValueError('Samtools qc command {0} not supported'.\
+                         format(qc_command))
+
+    def _run_qc_command(qc_command):
+      params = {
+        'samtools_exe':samtools_exe,
+        'bam_file':bam_file,
+        'output_dir':output_dir,
+        'output_prefix':output_prefix,
+        'force':force,
+        'dry_run':dry_run,
+        'check_index':False}                                                    # index is already checked
+      if qc_command != 'idxstats':
+        params.update({'threads':threads})
+      if qc_command != 'stats':
+        params.update({'return_metrics':True})
+      if dry_run:
+        return qc_functions.get(qc_command)(**params)
+      output_path,cmd,metrics = \
+        qc_functions.get(qc_command)(**params)
+      return {
+        'output_path':output_path,
+        'cmd':cmd,
+        'metrics':metrics}
+
+    qc_commands = list(qc_commands)
+    if max_workers > 1 and \
+       len(qc_commands) > 1:
+      with ThreadPoolExecutor(max_workers=min(max_workers,len(qc_commands))) as executor:
+        results = \
+          list(executor.map(_run_qc_command,qc_commands))                       # samtools runs outside GIL
+    else:
+      results = [_run_qc_command(qc_command) for qc_command in qc_commands]
+    return dict(zip(qc_commands,results))
+  except:
+    raise
+
+
+def format_samtools_qc_metrics(qc_results):
+  '''
+  A function for formatting samtools stats, flagstat and idxstats metrics for collection attribute table
+
+  :param qc_results: A dictionary of samtools command name and a dictionary containing metrics,
+                     as returned by run_bam_qc_metrics
+  :returns: A list of dictionaries
+  '''
+  try:
+    metrics_list = list()
+    if 'stats' in qc_results:
+      metrics_list.extend(qc_results.get('stats').get('metrics'))               # already formatted SN fields
+    if 'flagstat' in qc_results:
+      for key,value in qc_results.get('flagstat').get('metrics').items():
+        metrics_list.append({
+          'SAMTOOLS_FLAGSTAT_{0}'.format(key):str(value.get('qc_passed'))})
+        metrics_list.append({
+          'SAMTOOLS_FLAGSTAT_{0}_qc_failed'.format(key):str(value.get('qc_failed'))})
+    if 'idxstats' in qc_results:
+      idxstats_metrics = qc_results.get('idxstats').get('metrics').values()
+      metrics_list.append({
+        'SAMTOOLS_IDXSTATS_total_mapped':\
+          str(sum([value.get('mapped') for value in idxstats_metrics]))})
+      metrics_list.append({                                                     # per reference counts are kept in the output file
+        'SAMTOOLS_IDXSTATS_total_unmapped':\
+          str(sum([value.get('unmapped') for value in idxstats_metrics]))})
+    return metrics_list
+  except Exception as e:
+    raise ValueError('Failed to format samtools qc metrics, error: {0}'.\
+                     format(e))
+
+
 def run_sort_bam(samtools_exe,input_bam_path,output_bam_path,sort_by_name=False,use_ephemeral_space=0,
                  threads=1,force=False,dry_run=False,cram_out=False,index_output=True):
   '''
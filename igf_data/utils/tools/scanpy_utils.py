@@ -1,4 +1,4 @@
-import os,base64
+import os,base64,resource
 import scanpy as sc
 import numpy as np
 import pandas as pd
@@ -7,6 +7,11 @@ from datetime import datetime
 import plotly.graph_objs as go
 from plotly.offline import download_plotlyjs, init_notebook_mode, plot, iplot
 from igf_data.utils.fileutils import get_temp_dir,copy_local_file,remove_dir
+from igf_data.utils.tools.ensembl_query.biomart_query import fetch_gene_set
+from igf_data.utils.tools.cellranger.cellranger_matrix_utils import read_mtx_as_csr
+from igf_data.utils.tools.cellranger.cellranger_matrix_utils import read_feature_and_barcode_names
+from igf_data.utils.tools.cellranger.cellranger_matrix_utils import calculate_cell_qc_metrics_from_mtx
+from igf_data.utils.tools.cellranger.cellranger_matrix_utils import count_cells_per_feature_from_mtx
 from jinja2 import Template,Environment, FileSystemLoader,select_autoescape
 
 class Scanpy_tool:
@@ -36,11 +41,21 @@ class Scanpy_tool:
   :param force_overwrite: A toggle for replacing existing output file, default True
   :param cellbrowser_h5ad: Path for h5ad output for cellbrowser, default None
   :param use_ephemeral_space: A toggle for temp dir settings, default 0
+  :param gene_snapshot_dir: A local biomart snapshot dir for MT-genes lookup, default None
+  :param allow_network_lookup: Toggle biomart network lookup if MT-genes are not in the snapshot, default True
+  :param low_memory: Toggle low memory mode, default False
+                     In this mode the qc metrics are calculated by streaming the matrix file and
+                     only the cells and genes passing the qc filters are loaded in memory, as
+                     float32 values. The matrix file is read four times
+  :param plot_subsample_size: Maximum number of cells for the qc and 3D UMAP plots, default None for all cells
+  :param mtx_chunk_size: Number of matrix entries per chunk for low memory mode, default 5000000
   '''
   def __init__(self,project_name,sample_name,matrix_file,features_tsv,barcode_tsv,
                output_file,html_template_file,species_name,min_gene_count=200,
                min_cell_count=3,force_overwrite=True,cellbrowser_h5ad=None,
-               use_ephemeral_space=0):
+               use_ephemeral_space=0,gene_snapshot_dir=None,
+               allow_network_lookup=True,low_memory=False,
+               plot_subsample_size=None,mtx_chunk_size=5000000):
     self.project_name = project_name
     self.sample_name = sample_name
     self.matrix_file = matrix_file
@@ -54,21 +69,38 @@ class Scanpy_tool:
     self.min_cell_count = min_cell_count
     self.force_overwrite = force_overwrite
     self.cellbrowser_h5ad = cellbrowser_h5ad
+    self.species_name = species_name
+    self.gene_snapshot_dir = gene_snapshot_dir
+    self.allow_network_lookup = allow_network_lookup
+    self.low_memory = low_memory
+    self.plot_subsample_size = plot_subsample_size
+    self.mtx_chunk_size = mtx_chunk_size
+    self.process_peak_rss_mb = None
 
   @staticmethod
-  def _fetch_mitochondrial_genes(species_name,url='www.ensembl.org'):
+  def _fetch_mitochondrial_genes(species_name,url='www.ensembl.org',
+                                 snapshot_dir=None,allow_network=True):
     '''
-    A static method for fetching mitochondrial genes from Ensembl
+    A static method for fetching mitochondrial genes from the local Ensembl snapshot
+    or from Ensembl biomart
     
     :param species_name: A string for species name
     :param url: A url string, default 'www.ensembl.org'
+    :param snapshot_dir: A local biomart snapshot dir, default None
+    :param allow_network: Toggle biomart network lookup, default True
     :returns: A list of mitochondial gene names
     '''
     try:
       if species_name not in ['hsapiens','mmusculus']:
         raise ValueError('Species {0} not supported'.format(species_name))
         
-      mito_genes=sc.queries.mitochondrial_genes(url,species_name)
+      mito_genes=\
+        fetch_gene_set(\
+          org=species_name,
+          gene_set='mitochondrial',
+          snapshot_dir=snapshot_dir,
+          allow_network=allow_network,
+          host=url)
       return mito_genes
     except:
       raise
@@ -84,9 +116,175 @@ class Scanpy_tool:
     except:
         raise
 
+  def _get_plot_data(self,adata):
+    '''
+    An internal method for subsampling cells for plots
+
+    :param adata: An AnnData object
+    :returns: An AnnData object with at most plot_subsample_size cells
+    '''
+    try:
+      if self.plot_subsample_size is not None and \
+         adata.n_obs > self.plot_subsample_size:
+        adata = \
+          sc.pp.subsample(\
+            adata,
+            n_obs=self.plot_subsample_size,
+            random_state=0,
+            copy=True)
+      return adata
+    except:
+      raise
+
+  def _read_data(self,input_dir):
+    '''
+    An internal method for reading the gene expression data from cellranger output
+
+    :param input_dir: A directory path with matrix.mtx.gz, features.tsv.gz and barcodes.tsv.gz files
+    :returns: An AnnData object
+    '''
+    try:
+      adata = sc.read_10x_mtx(\
+                input_dir,
+                var_names='gene_symbols',
+                cache=True)                                                     # read input files
+      adata.var_names_make_unique()
+      return adata
+    except:
+      raise
+
+  def _filter_data(self,adata,mt_genes):
+    '''
+    An internal method for filtering cells and genes and calculating the qc metrics
+
+    :param adata: An AnnData object
+    :param mt_genes: A list of mitochondrial gene names
+    :returns: An AnnData object with n_genes, percent_mito and n_counts observations
+    '''
+    try:
+      # step 2: filter data based on cell and genes
+      sc.pp.filter_cells(\
+        adata,
+        min_genes=self.min_gene_count)
+      sc.pp.filter_genes(\
+        adata,
+        min_cells=self.min_cell_count)
+      # step 3: filter mitochondrial genes
+      mt_genes = [name
+                   for name in adata.var_names
+                     if name in mt_genes]                                       # filter mito genes which are not present in data
+      # step 4: calculate mitochondrial read percentage
+      adata.obs['percent_mito'] = \
+        np.sum(adata[:, mt_genes].X, axis=1).A1 / np.sum(adata.X, axis=1).A1
+      adata.obs['n_counts'] = adata.X.sum(axis=1).A1                            # add the total counts per cell as observations-annotation to adata
+      return adata
+    except:
+      raise
+
+  @staticmethod
+  def _filter_cells_by_qc(adata):
+    '''
+    An internal static method for filtering cells based on n_genes and percent_mito
+
+    :param adata: An AnnData object
+    :returns: An AnnData object
+    '''
+    try:
+      # step 5: Filtering data bases on percent mito
+      adata = adata[adata.obs['n_genes']<2500,:]
+      adata = adata[adata.obs['percent_mito'] < 0.05, :]
+      return adata
+    except:
+      raise
+
+  def _read_filtered_data_low_memory(self,matrix_file,features_tsv,barcode_tsv,mt_genes):
+    '''
+    An internal method for reading cellranger output with low memory usage. It follows the
+    same steps as the default mode, i.e. gene expression features only, cell and gene filters
+    and then qc metrics for the remaining genes, using streaming passes over the matrix file.
+    Only the cells and genes passing all the filters are loaded as a float32 sparse matrix
+
+    :param matrix_file: A matrix.mtx.gz file
+    :param features_tsv: A features.tsv.gz file
+    :param barcode_tsv: A barcodes.tsv.gz file
+    :param mt_genes: A list of mitochondrial gene names
+    :returns: A filtered AnnData object and an AnnData object with qc metrics of all
+              the cells passing the min_gene_count filter, for plots
+    '''
+    try:
+      features,_ = \
+        read_feature_and_barcode_names(\
+          features_tsv=features_tsv,
+          barcode_tsv=barcode_tsv)
+      gex_mask = \
+        (features['feature_types'] == 'Gene Expression').values                 # same as gex_only for read_10x_mtx
+      gex_index = np.where(gex_mask)[0]
+      gene_qc = \
+        calculate_cell_qc_metrics_from_mtx(\
+          matrix_file=matrix_file,
+          features_tsv=features_tsv,
+          barcode_tsv=barcode_tsv,
+          chunk_size=self.mtx_chunk_size,
+          feature_mask=gex_mask)                                                # step 2: n_genes for cell filter
+      min_gene_filter = \
+        (gene_qc['n_genes'] >= self.min_gene_count).values
+      n_cells = \
+        count_cells_per_feature_from_mtx(\
+          matrix_file=matrix_file,
+          cell_mask=min_gene_filter,
+          chunk_size=self.mtx_chunk_size)                                       # step 2: n_cells for gene filter
+      gene_mask = \
+        gex_mask & \
+        (n_cells >= self.min_cell_count)
+      cell_qc = \
+        calculate_cell_qc_metrics_from_mtx(\
+          matrix_file=matrix_file,
+          features_tsv=features_tsv,
+          barcode_tsv=barcode_tsv,
+          mito_genes=mt_genes,
+          chunk_size=self.mtx_chunk_size,
+          feature_mask=gene_mask)                                               # step 3 - 4: qc metrics for filtered genes
+      cell_qc = \
+        pd.DataFrame({
+          'n_genes':gene_qc['n_genes'].values,
+          'percent_mito':cell_qc['percent_mito'].values,
+          'n_counts':cell_qc['n_counts'].values},
+          index=cell_qc.index,
+          columns=['n_genes','percent_mito','n_counts'])
+      qc_data = cell_qc[min_gene_filter]
+      qc_adata = \
+        sc.AnnData(\
+          X=np.zeros((len(qc_data.index),1),dtype=np.float32),
+          obs=qc_data.copy())                                                   # qc plots only need obs
+      selected_cells = \
+        min_gene_filter & \
+        (cell_qc['n_genes'] < 2500).values & \
+        (cell_qc['percent_mito'] < 0.05).values                                 # step 5: filter cells before loading matrix
+      adata = \
+        sc.AnnData(\
+          X=read_mtx_as_csr(\
+              matrix_file=matrix_file,
+              cell_index=np.where(selected_cells)[0],
+              dtype=np.float32,
+              chunk_size=self.mtx_chunk_size,
+              feature_index=gex_index),
+          obs=cell_qc[selected_cells].copy(),
+          var=pd.DataFrame(\
+                {'gene_ids':features['gene_ids'].values[gex_index],
+                 'feature_types':features['feature_types'].values[gex_index],
+                 'n_cells':n_cells[gex_index]},
+                index=features['gene_symbols'].values[gex_index]))
+      adata.var_names_make_unique()                                             # unique names for all genes, as in the default mode
+      adata = adata[:,gene_mask[gex_index]].copy()
+      return adata,qc_adata
+    except:
+      raise
+
   def generate_report(self):
     '''
-    A method for generating html report from scanpy analysis
+    A method for generating html report from scanpy analysis. It sets process_peak_rss_mb
+    to the peak resident memory of the whole process (ru_maxrss, in MB on Linux), which includes
+    any memory used before the report run, e.g. by earlier jobs of the same worker
 
     :param generate_cb_data: A toggle for generating cellbrowser data, default False
     :param cb_data_path: A output path for cellbrowser data, default None
@@ -122,39 +320,45 @@ class Scanpy_tool:
       copy_local_file(\
         source_path=self.features_tsv,
         destinationa_path=local_features_tsv)
-      adata = sc.read_10x_mtx(\
-                temp_input_dir,
-                var_names='gene_symbols',
-                cache=True)                                                     # read input files
-      adata.var_names_make_unique()
-      sc.pl.highest_expr_genes(\
-        adata,
-        n_top=30,
-        save='.png')                                                            # list of genes that yield the highest fraction of counts in each single cells, across all cells
+      mt_genes = \
+        self._fetch_mitochondrial_genes(\
+          species_name=self.species_name,
+          snapshot_dir=self.gene_snapshot_dir,
+          allow_network=self.allow_network_lookup)                              # fetch mitochondrial genes
+      mt_genes = set(mt_genes)
+      if self.low_memory:
+        # step 2 - 5: stream qc metrics and read filtered data
+        adata,qc_adata = \
+          self._read_filtered_data_low_memory(\
+            matrix_file=local_matrix_file,
+            features_tsv=local_features_tsv,
+            barcode_tsv=local_barcode_tsv,
+            mt_genes=mt_genes)
+        sc.pl.highest_expr_genes(\
+          self._get_plot_data(adata),
+          n_top=30,
+          save='.png')                                                          # highest expressed genes of the filtered cells
+      else:
+        adata = self._read_data(input_dir=temp_input_dir)
+        sc.pl.highest_expr_genes(\
+          self._get_plot_data(adata),
+          n_top=30,
+          save='.png')                                                          # list of genes that yield the highest fraction of counts in each single cells, across all cells
+        adata = \
+          self._filter_data(\
+            adata=adata,
+            mt_genes=mt_genes)                                                  # step 2 - 4: filter data and calculate qc metrics
+        qc_adata = adata
+
       highest_gene_expr = \
         self._encode_png_image(\
           png_file=\
             os.path.join(\
               self.work_dir,
               'figures/highest_expr_genes.png'))                                # encode highest gene expr data
-      # step 2: filter data based on cell and genes
-      sc.pp.filter_cells(\
-        adata,
-        min_genes=self.min_gene_count)
-      sc.pp.filter_genes(\
-        adata,
-        min_cells=self.min_cell_count)
-      # step 3: fetch mitochondrial genes
-      mt_genes = self._fetch_mitochondrial_genes(species_name='hsapiens')
-      mt_genes = [name
-                   for name in adata.var_names 
-                     if name in mt_genes]                                       # filter mito genes which are not present in data
-      # step 4: calculate mitochondrial read percentage
-      adata.obs['percent_mito'] = \
-        np.sum(adata[:, mt_genes].X, axis=1).A1 / np.sum(adata.X, axis=1).A1
-      adata.obs['n_counts'] = adata.X.sum(axis=1).A1                            # add the total counts per cell as observations-annotation to adata
+      qc_adata = self._get_plot_data(qc_adata)                                  # subsample cells for qc plots
       sc.pl.violin(\
-        adata,
+        qc_adata,
         ['n_genes', 'n_counts', 'percent_mito'],
         jitter=0.4,
         multi_panel=True,
@@ -167,7 +371,7 @@ class Scanpy_tool:
               self.work_dir,\
                 'figures/violin.png'))
       sc.pl.scatter(\
-        adata,
+        qc_adata,
         x='n_counts',
         y='percent_mito',
         show=True,
@@ -178,7 +382,7 @@ class Scanpy_tool:
             self.work_dir,
             'figures/scatter.png'))
       sc.pl.scatter(\
-        adata,
+        qc_adata,
         x='n_counts',
         y='n_genes',
         save='.png')                                                            # scatter plots for data quality 2
@@ -188,9 +392,9 @@ class Scanpy_tool:
             os.path.join(\
               self.work_dir,
               'figures/scatter.png'))
-      # step 5: Filtering data bases on percent mito
-      adata = adata[adata.obs['n_genes']<2500,:]
-      adata = adata[adata.obs['percent_mito'] < 0.05, :]
+      qc_adata = None
+      if not self.low_memory:
+        adata = self._filter_cells_by_qc(adata)                                 # step 5: filter cells
       # step 6: Normalise and filter data
       sc.pp.normalize_per_cell(adata)                                           # Total-count normalize (library-size correct) the data matrix to 10,000 reads per cell, so that counts become comparable among cells.
       sc.pp.log1p(adata)
@@ -269,18 +473,28 @@ class Scanpy_tool:
         '15':'#FFF0F5',
         '16':'#DB7093'
       }
-      louvain_series = deepcopy(adata.obs['louvain'])
+      plot_index = np.arange(adata.n_obs)
+      if self.plot_subsample_size is not None and \
+         adata.n_obs > self.plot_subsample_size:
+        plot_index = \
+          np.sort(
+            np.random.RandomState(0).\
+              choice(
+                adata.n_obs,
+                self.plot_subsample_size,
+                replace=False))                                                 # subsample cells for 3D plot
+      louvain_series = deepcopy(adata.obs['louvain'].iloc[plot_index])
       color_map = louvain_series.map(dict_map).values
-      labels = list(adata.obs.index)
+      labels = list(adata.obs.index[plot_index])
       hovertext = \
         ['cluster: {0}, barcode: {1}'.\
          format(grp,labels[index])
            for index,grp in enumerate(louvain_series.values)]
       threeDUmapDiv = \
         plot([go.Scatter3d( \
-                x=adata.obsm['X_umap'][:, 0],
-                y=adata.obsm['X_umap'][:, 1],
-                z=adata.obsm['X_umap'][:, 2], 
+                x=adata.obsm['X_umap'][plot_index, 0],
+                y=adata.obsm['X_umap'][plot_index, 1],
+                z=adata.obsm['X_umap'][plot_index, 2], 
                 mode = 'markers',
                 marker = dict(color = color_map,
                               size = 5),
@@ -446,5 +660,7 @@ class Scanpy_tool:
 
       remove_dir(temp_input_dir)
       remove_dir(self.work_dir)
+      self.process_peak_rss_mb = \
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024               # process lifetime peak memory usage, in MB
     except:
       raise
\ No newline at end of file
@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 import argparse,os
-from igf_data.utils.dbutils import read_dbconf_json,read_json_data
+from igf_data.utils.dbutils import read_dbconf_json,read_json_data_in_chunks
 from igf_data.igfdb.collectionadaptor import CollectionAdaptor
 
 '''
@@ -18,17 +18,23 @@ A script for loading file collections to the database
 
 :param dbconfig_path: A database configuration file
 :param calculate_checksum: Toggle file checksum calculation
+:param max_workers: Number of processes for file checksum calculation
+:param chunk_size: Number of json entries to load in each chunk
 '''
 
 parser = argparse.ArgumentParser()
 parser.add_argument('-f','--collection_file_data', required=True, help='Collection file data json file')
 parser.add_argument('-d','--dbconfig_path', required=True, help='Database configuration json file')
 parser.add_argument('-s','--calculate_checksum', default=False, action='store_true', help='Toggle file checksum calculation')
+parser.add_argument('-w','--max_workers', default=4, type=int, help='Number of processes for file checksum calculation')
+parser.add_argument('-c','--chunk_size', default=1000, type=int, help='Number of json entries to load in each chunk')
 args = parser.parse_args()
 
 dbconfig_path = args.dbconfig_path
 collection_file_data = args.collection_file_data
 calculate_checksum = args.calculate_checksum
+max_workers = args.max_workers
+chunk_size = args.chunk_size
 
 if __name__=='__main__':
   try:
@@ -40,14 +46,18 @@ if __name__=='__main__':
       raise IOError('Collection data json file {0} not found'.format(collection_file_data))
 
     dbparam = read_dbconf_json(dbconfig_path)                                       # read db config
-    collection_data = read_json_data(collection_file_data)                          # read collection data json
+    collection_data = \
+      read_json_data_in_chunks(
+        collection_file_data,
+        chunk_size=chunk_size)                                                  # read collection data json in chunks
     ca = CollectionAdaptor(**dbparam)
     ca.start_session()                                                            # connect to database
     dbconnected = True
-    ca.load_file_and_create_collection(
+    ca.load_file_and_create_collection_in_bulk(
       data=collection_data,
       calculate_file_size_and_md5=calculate_checksum,
-      autosave=True)                             # load data and commit changes
+      max_workers=max_workers,
+      autosave=True)                                                            # load data and commit changes
     ca.close_session()
     dbconnected=False
   except Exception as e:
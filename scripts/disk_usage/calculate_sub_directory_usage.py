@@ -8,12 +8,16 @@ parser.add_argument('-p','--directory_path', required=True, help='A directory pa
 parser.add_argument('-c','--copy_to_remoter', default=False, action='store_true', help='Toggle file copy to remote server')
 parser.add_argument('-r','--remote_server', required=False, help='Remote server address')
 parser.add_argument('-o','--output_filepath', required=True, help='Output gviz file path')
+parser.add_argument('-s','--snapshot_dir', default=None, help='Directory path for usage snapshots, for incremental rescans')
+parser.add_argument('-w','--max_workers', default=4, type=int, help='Number of parallel sub directory scans')
 args=parser.parse_args()
 
 directory_path=args.directory_path
 copy_to_remoter=args.copy_to_remoter
 remote_server=args.remote_server
 output_filepath=args.output_filepath
+snapshot_dir=args.snapshot_dir
+max_workers=args.max_workers
 
 try:
   if copy_to_remoter and not remote_server:
@@ -23,7 +27,10 @@ try:
   temp_dir=get_temp_dir()
   temp_file=os.path.join(temp_dir,'subdirectory_usage.json')                    # get temp file path
   storage_stats, description, column_order=\
-              get_sub_directory_size_in_gb(input_path=directory_path)           # calculate sub directory usage stats
+              get_sub_directory_size_in_gb(
+                input_path=directory_path,
+                snapshot_dir=snapshot_dir,
+                max_workers=max_workers)                                        # calculate sub directory usage stats
   convert_to_gviz_json_for_display(description=description,
                                    data=storage_stats,
                                    columns_order=column_order,
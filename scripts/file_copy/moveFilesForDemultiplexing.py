@@ -7,12 +7,14 @@ parser.add_argument('-i','--input_dir',  required=True, help='Input files  direc
 parser.add_argument('-o','--output_dir', required=True, help='Output files directory')
 parser.add_argument('-s','--samplesheet_file', required=True, help='Illumina format samplesheet file')
 parser.add_argument('-r','--runinfo_file', required=True, help='Illumina format RunInfo.xml file')
+parser.add_argument('-m','--staging_mode', default='copy', choices=['copy','symlink','hardlink'], help='Staging mode for BCL files, default copy')
 args = parser.parse_args()
 
 input_dir = args.input_dir
 output_dir  = args.output_dir
 samplesheet = args.samplesheet_file
 runinfo_file = args.runinfo_file
+staging_mode = args.staging_mode
 
 if __name__=='__main__':
   try:
@@ -22,6 +24,6 @@ if __name__=='__main__':
         output_dir=output_dir,
         samplesheet=samplesheet,
         run_info_xml=runinfo_file)
-    move_file.copy_bcl_files()
+    move_file.copy_bcl_files(staging_mode=staging_mode)
   except Exception as e:
     raise ValueError("Failed to move file, error: {0}".format(e))
\ No newline at end of file
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+import argparse
+from igf_data.utils.tools.ensembl_query.biomart_query import build_biomart_snapshot
+
+'''
+A script for building a versioned local snapshot of biomart gene sets, for the
+analysis jobs running on nodes without internet access
+
+:param snapshot_dir: A directory path for the snapshots
+:param org_list: A list of Ensembl organism names
+:param gene_set_list: A list of gene set names
+:param host: Biomart host name
+:param snapshot_version: A snapshot version name, default current date
+:param file_format: Table file format, tsv or parquet
+:param max_workers: Number of parallel biomart queries
+'''
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-d','--snapshot_dir', required=True, help='Biomart snapshot dir path')
+parser.add_argument('-o','--org_list', nargs='+', default=['hsapiens','mmusculus'], help='List of Ensembl organism names')
+parser.add_argument('-g','--gene_set_list', nargs='+', default=['mitochondrial','rRNA'], help='List of gene set names')
+parser.add_argument('-u','--host', default='www.ensembl.org', help='Biomart host name')
+parser.add_argument('-v','--snapshot_version', default=None, help='Snapshot version name, default current date')
+parser.add_argument('-f','--file_format', default='tsv', choices=['tsv','parquet'], help='Table file format')
+parser.add_argument('-w','--max_workers', default=4, type=int, help='Number of parallel biomart queries')
+args = parser.parse_args()
+
+if __name__=='__main__':
+  try:
+    snapshot_path = \
+      build_biomart_snapshot(
+        snapshot_dir=args.snapshot_dir,
+        org_list=args.org_list,
+        gene_set_list=args.gene_set_list,
+        host=args.host,
+        snapshot_version=args.snapshot_version,
+        file_format=args.file_format,
+        max_workers=args.max_workers)
+    print('Created biomart snapshot {0}'.format(snapshot_path))
+  except Exception as e:
+    raise ValueError('Error: {0}'.format(e))
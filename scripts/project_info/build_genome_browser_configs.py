@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+import argparse
+from igf_data.utils.dbutils import read_dbconf_json
+from igf_data.igfdb.baseadaptor import BaseAdaptor
+from igf_data.utils.fileutils import check_file_path
+from igf_data.utils.config_genome_browser import Config_genome_browser
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-d','--dbconfig_path', required=True, help='Database configuration json file')
+parser.add_argument('-t','--template_file', required=True, help='Genome browser config template file')
+parser.add_argument('-o','--output_dir', required=True, help='Output dir for project config files')
+parser.add_argument('-c','--collection_type', action='append', required=True, help='Track collection type, e.g. STAR_BIGWIG')
+parser.add_argument('-n','--pipeline_name', required=True, help='Analysis pipeline name')
+parser.add_argument('-s','--species_name', default='HG38', help='Species name, default HG38')
+parser.add_argument('-p','--project_list', default=None, help='A file containing project igf ids, one per line, default all projects')
+parser.add_argument('-f','--state_file', default=None, help='Build state json file, default OUTPUT_DIR/genome_browser_build_state.json')
+parser.add_argument('-r','--force', default=False, action='store_true', help='Rebuild all config files')
+parser.add_argument('-w','--max_workers', default=4, type=int, help='Number of parallel config writers')
+args = parser.parse_args()
+
+dbconfig_path = args.dbconfig_path
+template_file = args.template_file
+output_dir = args.output_dir
+collection_type_list = args.collection_type
+pipeline_name = args.pipeline_name
+species_name = args.species_name
+project_list = args.project_list
+state_file = args.state_file
+force = args.force
+max_workers = args.max_workers
+
+if __name__=='__main__':
+  try:
+    check_file_path(dbconfig_path)
+    check_file_path(template_file)
+    dbparam = read_dbconf_json(dbconfig_path)
+    base = BaseAdaptor(**dbparam)
+    project_igf_id_list = None
+    if project_list is not None:
+      check_file_path(project_list)
+      with open(project_list,'r') as fp:
+        project_igf_id_list = \
+          [line.strip() for line in fp
+             if line.strip() != '']
+    cg = \
+      Config_genome_browser(
+        dbsession_class=base.get_session_class(),
+        project_igf_id=None,
+        collection_type_list=collection_type_list,
+        pipeline_name=pipeline_name,
+        collection_table='experiment',
+        species_name=species_name,
+        ref_genome_type='GENOME_TWOBIT_URI')
+    output_files = \
+      cg.build_biodalliance_config_for_projects(
+        template_file=template_file,
+        output_dir=output_dir,
+        project_igf_id_list=project_igf_id_list,
+        state_file=state_file,
+        force=force,
+        max_workers=max_workers)
+    for project_igf_id,output_file in sorted(output_files.items()):
+      print('{0}\t{1}'.format(project_igf_id,output_file))
+  except Exception as e:
+    raise ValueError("Failed to build genome browser configs, error: {0}".format(e))
@@ -9,6 +9,8 @@ parser.add_argument('-n','--slack_config', required=True, help='Slack configurat
 parser.add_argument('-a','--asana_config', required=True, help='Asana configuration file path')
 parser.add_argument('-i','--asana_project_id', required=True, help='Asana project id')
 parser.add_argument('-f','--input_list', required=True, help='Sequencing run id list file')
+parser.add_argument('-b','--batch_mode', default=False, action='store_true', help='Reset all sequencing runs in one transaction')
+parser.add_argument('-w','--max_workers', default=4, type=int, help='Number of parallel json file updates for batch mode')
 args = parser.parse_args()
 
 seqrun_path = args.seqrun_path
@@ -17,6 +19,8 @@ slack_config = args.slack_config
 asana_config = args.asana_config
 asana_project_id = args.asana_project_id
 input_list = args.input_list
+batch_mode = args.batch_mode
+max_workers = args.max_workers
 
 if __name__=='__main__':
   try:
@@ -30,6 +34,9 @@ if __name__=='__main__':
         slack_config=slack_config,
         asana_project_id=asana_project_id,
         asana_config=asana_config)
-    rs.run()
+    if batch_mode:
+      rs.run_batch(max_workers=max_workers)
+    else:
+      rs.run()
   except Exception as e:
     raise ValueError('Error: {0}'.format(e))
\ No newline at end of file
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+import argparse
+from igf_data.task_tracking.igf_slack import IGF_slack
+from igf_data.task_tracking.igf_asana import IGF_asana
+from igf_data.task_tracking.notification_dispatcher import Notification_dispatcher
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-d','--spool_dir', required=True, help='Notification spool dir path')
+parser.add_argument('-n','--slack_config', default=None, help='Slack configuration file path')
+parser.add_argument('-a','--asana_config', default=None, help='Asana configuration file path')
+parser.add_argument('-i','--asana_project_id', default=None, help='Asana project id')
+parser.add_argument('-r','--max_retries', default=3, type=int, help='Number of retries for failed requests')
+parser.add_argument('-m','--max_message_age', default=86400, type=int, help='Drop unsent messages older than this many seconds')
+args = parser.parse_args()
+
+spool_dir = args.spool_dir
+slack_config = args.slack_config
+asana_config = args.asana_config
+asana_project_id = args.asana_project_id
+max_retries = args.max_retries
+max_message_age = args.max_message_age
+
+if __name__=='__main__':
+  try:
+    igf_slack = None
+    if slack_config is not None:
+      igf_slack = IGF_slack(slack_config=slack_config)
+
+    igf_asana = None
+    if asana_config is not None and \
+       asana_project_id is not None:
+      igf_asana = \
+        lambda: IGF_asana(
+                  asana_config=asana_config,
+                  asana_project_id=str(asana_project_id))                       # create asana client only if required
+
+    dispatcher = \
+      Notification_dispatcher(
+        igf_slack=igf_slack,
+        igf_asana=igf_asana,
+        spool_dir=spool_dir,
+        max_retries=max_retries,
+        max_message_age=max_message_age)
+    counts = dispatcher.flush_spool_dir()
+    if counts is None:
+      print('Another flusher is running for spool dir {0}'.format(spool_dir))
+    else:
+      print('Sent: {0}, dropped: {1}, pending: {2}'.\
+            format(counts['sent'],counts['dropped'],counts['pending']))
+      for error in dispatcher.errors:
+        print(error)
+  except Exception as e:
+    raise ValueError('Error: {0}'.format(e))
@@ -19,6 +19,7 @@ def full_suite():
   from .utils.platformutils_test import Platformutils_test1,Platformutils_test2
   from .dbadaptor.runadaptor_test import RunAdaptor_test1
   from .process.runinfo_xml_test import Hiseq4000RunInfo as Hiseq4000RunInfo_runinfo_xml
+  from .process.runinfo_xml_test import RunInfo_xml_cache_test
   from .process.runparameters_xml_test import Hiseq4000RunParam
   from .process.samplesheet_test import Hiseq4000SampleSheet,TestValidateSampleSheet
   from .process.samplesheet_test import TestValidateSampleSheet1,TestValidateSampleSheet2
@@ -37,11 +38,19 @@ def full_suite():
   from .dbadaptor.projectadaptor_test import Projectadaptor_test1,Projectadaptor_test2
   from .utils.analysis_collection_utils_test import Analysis_collection_utils_test1
   from .utils.fileutils_test import Fileutils_test1
+  from .utils.fastqc_utils_test import Fastqc_utils_test1
   from .utils.pipeseedfactory_utils_test import Pipeseedfactory_utils_test1
   from .utils.reference_genome_utils_test import Reference_genome_utils_test1
   from .dbadaptor.experimentadaptor_test import ExperimentAdaptor_test1
   from .utils.picard_util_test import Picard_util_test1,Picard_util_test2
-  from .utils.samtools_utils_test import Samtools_util_test1,Samtools_util_test2
+  from .utils.samtools_utils_test import Samtools_util_test1,Samtools_util_test2,Samtools_util_test3
+  from .utils.alignment_metrics_parser_test import Alignment_metrics_parser_test1,Alignment_metrics_parser_test2
+  from .utils.igf_asana_test import Igf_asana_test1
+  from .utils.notification_dispatcher_test import Notification_dispatcher_test1
+  from .utils.gviz_utils_test import Gviz_utils_test1
+  from .utils.config_genome_browser_test import Config_genome_browser_test1
+  from .utils.disk_usage_utils_test import Disk_usage_utils_test1
+  from .process.calculate_disk_usage_costs_test import Calculate_disk_usage_costs_test1
   from .utils.deeptools_utils_test import Deeptools_util_test1
   from .utils.ppqt_utils_test import Ppqt_util_test1
   from .dbadaptor.baseadaptor_test import Baseadaptor_test1
@@ -54,8 +63,12 @@ def full_suite():
   from .process.reformat_metadata_file_test import Reformat_metadata_file_testA
   from .process.reformat_samplesheet_file_test import Reformat_samplesheet_file_testA
   from .utils.singularity_run_wrapper_test import Singularity_run_test1
+  from .utils.singularity_image_cache_test import Singularity_image_cache_test1
   from .utils.jupyter_nbconvert_wrapper_test import Nbconvert_execute_test1
   from .utils.jupyter_nbconvert_wrapper_test import Nbconvert_execute_test2
+  from .utils.biomart_query_test import Biomart_query_test1
+  from .utils.cellranger_matrix_utils_test import Cellranger_matrix_utils_test1
+  from .utils.scanpy_utils_test import Scanpy_tool_test1
 
   return unittest.TestSuite([
       unittest.TestLoader().loadTestsFromTestCase(BasesMask_testA), 
@@ -81,6 +94,7 @@ def full_suite():
       unittest.TestLoader().loadTestsFromTestCase(Platformutils_test2),
       unittest.TestLoader().loadTestsFromTestCase(RunAdaptor_test1),
       unittest.TestLoader().loadTestsFromTestCase(Hiseq4000RunInfo_runinfo_xml),
+      unittest.TestLoader().loadTestsFromTestCase(RunInfo_xml_cache_test),
       unittest.TestLoader().loadTestsFromTestCase(Hiseq4000RunParam),
       unittest.TestLoader().loadTestsFromTestCase(Hiseq4000SampleSheet),
       unittest.TestLoader().loadTestsFromTestCase(TestValidateSampleSheet),
@@ -103,6 +117,7 @@ def full_suite():
       unittest.TestLoader().loadTestsFromTestCase(Projectadaptor_test2),
       unittest.TestLoader().loadTestsFromTestCase(Analysis_collection_utils_test1),
       unittest.TestLoader().loadTestsFromTestCase(Fileutils_test1),
+      unittest.TestLoader().loadTestsFromTestCase(Fastqc_utils_test1),
       unittest.TestLoader().loadTestsFromTestCase(Pipeseedfactory_utils_test1),
       unittest.TestLoader().loadTestsFromTestCase(Reference_genome_utils_test1),
       unittest.TestLoader().loadTestsFromTestCase(ExperimentAdaptor_test1),
@@ -111,6 +126,15 @@ def full_suite():
       unittest.TestLoader().loadTestsFromTestCase(Ppqt_util_test1),
       unittest.TestLoader().loadTestsFromTestCase(Samtools_util_test1),
       unittest.TestLoader().loadTestsFromTestCase(Samtools_util_test2),
+      unittest.TestLoader().loadTestsFromTestCase(Samtools_util_test3),
+      unittest.TestLoader().loadTestsFromTestCase(Alignment_metrics_parser_test1),
+      unittest.TestLoader().loadTestsFromTestCase(Alignment_metrics_parser_test2),
+      unittest.TestLoader().loadTestsFromTestCase(Igf_asana_test1),
+      unittest.TestLoader().loadTestsFromTestCase(Notification_dispatcher_test1),
+      unittest.TestLoader().loadTestsFromTestCase(Gviz_utils_test1),
+      unittest.TestLoader().loadTestsFromTestCase(Config_genome_browser_test1),
+      unittest.TestLoader().loadTestsFromTestCase(Disk_usage_utils_test1),
+      unittest.TestLoader().loadTestsFromTestCase(Calculate_disk_usage_costs_test1),
       unittest.TestLoader().loadTestsFromTestCase(Deeptools_util_test1),
       unittest.TestLoader().loadTestsFromTestCase(Baseadaptor_test1),
       unittest.TestLoader().loadTestsFromTestCase(Platformadaptor_test1),
@@ -124,6 +148,10 @@ def full_suite():
       unittest.TestLoader().loadTestsFromTestCase(Reformat_metadata_file_testA),
       unittest.TestLoader().loadTestsFromTestCase(Reformat_samplesheet_file_testA),
       unittest.TestLoader().loadTestsFromTestCase(Singularity_run_test1),
+      unittest.TestLoader().loadTestsFromTestCase(Singularity_image_cache_test1),
       unittest.TestLoader().loadTestsFromTestCase(Nbconvert_execute_test1),
       unittest.TestLoader().loadTestsFromTestCase(Nbconvert_execute_test2),
+      unittest.TestLoader().loadTestsFromTestCase(Biomart_query_test1),
+      unittest.TestLoader().loadTestsFromTestCase(Cellranger_matrix_utils_test1),
+      unittest.TestLoader().loadTestsFromTestCase(Scanpy_tool_test1),
     ])
\ No newline at end of file
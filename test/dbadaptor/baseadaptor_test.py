@@ -1,7 +1,14 @@
 import unittest,os
-from igf_data.igfdb.igfTables import Base,Project
+import pandas as pd
+from igf_data.igfdb.igfTables import Base,Project,Sample
 from igf_data.igfdb.baseadaptor import BaseAdaptor
 from igf_data.utils.dbutils import read_dbconf_json
+from igf_data.utils.fileutils import get_temp_dir,remove_dir
+try:
+  import pyarrow
+  import pyarrow.parquet
+except ImportError:
+  pyarrow=None                                                                  # parquet export is optional
 
 class Baseadaptor_test1(unittest.TestCase):
   def setUp(self):
@@ -64,5 +71,169 @@ class Baseadaptor_test1(unittest.TestCase):
                      'IGFP0001_test_22-8-2017_rna')
     base.close_session()
 
+  def test_fetch_records_by_column_values(self):
+    base=self.base
+    project_data=[{'project_igf_id':'IGFP000{0}'.format(i),
+                   'project_name':'project_{0}'.format(i)}
+                    for i in range(1,6)]
+    base.start_session()
+    base.store_records(table=Project,
+                       data=project_data,
+                       mode='bulk')
+    query=base.session.query(Project.project_igf_id,Project.project_name)
+    data=base.fetch_records_by_column_values(query=query,
+                                             column_name=Project.project_igf_id,
+                                             column_values=['IGFP0001','IGFP0003',
+                                                            'IGFP0005','IGFP0003',
+                                                            'IGFP0009'],
+                                             chunk_size=2)
+    base.close_session()
+    self.assertEqual(list(data.columns),['project_igf_id','project_name'])
+    self.assertEqual(sorted(data['project_igf_id'].tolist()),
+                     ['IGFP0001','IGFP0003','IGFP0005'])
+
+  def test_fetch_records_as_dataframe_chunks(self):
+    base=self.base
+    project_data=[{'project_igf_id':'IGFP000{0}'.format(i),
+                   'project_name':'project_{0}'.format(i),
+                   'status':'ACTIVE' if i % 2 else 'FINISHED'}
+                    for i in range(1,6)]
+    base.start_session()
+    base.store_records(table=Project,
+                       data=project_data,
+                       mode='bulk')                                             # not committed yet
+    query=base.session.query(Project).order_by(Project.project_igf_id)
+    chunks=list(base.fetch_records(query=query,
+                                   output_mode='dataframe_chunks',
+                                   chunk_size=2,
+                                   categorical_columns=['project_name']))
+    base.close_session()
+    self.assertEqual([len(data.index) for data in chunks],[2,2,1])
+    for data in chunks:
+      self.assertEqual(data['status'].dtype.name,'category')
+      self.assertEqual(list(data['status'].cat.categories),
+                       list(Project.__table__.c.status.type.enums))             # fixed enum categories
+      self.assertEqual(data['project_name'].dtype.name,'category')
+    data=pd.concat(chunks,ignore_index=True)
+    self.assertEqual(data['status'].dtype.name,'category')
+    self.assertEqual(data['project_igf_id'].tolist(),
+                     ['IGFP000{0}'.format(i) for i in range(1,6)])
+    self.assertEqual(data['status'].tolist()[:2],['ACTIVE','FINISHED'])
+
+  def test_fetch_records_as_dataframe_chunks_without_records(self):
+    base=self.base
+    base.start_session()
+    query=base.session.query(Project.project_igf_id,Project.status)
+    chunks=list(base.fetch_records(query=query,
+                                   output_mode='dataframe_chunks',
+                                   chunk_size=2))
+    base.close_session()
+    self.assertEqual(len(chunks),1)                                             # one empty chunk
+    data=pd.concat(chunks,ignore_index=True)
+    self.assertEqual(len(data.index),0)
+    self.assertEqual(list(data.columns),['project_igf_id','status'])
+    self.assertEqual(data['status'].dtype.name,'category')
+
+  @unittest.skipUnless(pyarrow,'pyarrow is required for parquet export')
+  def test_export_records_to_parquet(self):
+    base=self.base
+    project_data=[{'project_igf_id':'IGFP000{0}'.format(i),
+                   'project_name':'project_{0}'.format(i),
+                   'description':None if i < 3 else 'description_{0}'.format(i),
+                   'status':'ACTIVE' if i % 2 else 'FINISHED'}
+                    for i in range(1,6)]
+    temp_dir=get_temp_dir()
+    output_file=os.path.join(temp_dir,'projects.parquet')
+    try:
+      base.start_session()
+      base.store_records(table=Project,
+                         data=project_data,
+                         mode='bulk')
+      query=base.session.\
+            query(Project.project_id,Project.project_igf_id,Project.project_name,
+                  Project.description,Project.status).\
+            order_by(Project.project_igf_id)
+      row_count=base.export_records_to_parquet(query=query,
+                                               output_file=output_file,
+                                               chunk_size=2,
+                                               categorical_columns=['project_name'])
+      base.close_session()
+      self.assertEqual(row_count,5)
+      schema=pyarrow.parquet.read_schema(output_file)
+      self.assertTrue(
+        pyarrow.types.is_integer(
+          schema.types[schema.names.index('project_id')]))
+      self.assertTrue(
+        pyarrow.types.is_string(
+          schema.types[schema.names.index('description')]))                     # first chunk has only nulls
+      for column_name in ('status','project_name'):
+        self.assertTrue(
+          pyarrow.types.is_dictionary(
+            schema.types[schema.names.index(column_name)]))                     # categorical columns are dictionary encoded
+      data=pd.read_parquet(output_file)
+      self.assertEqual(data['project_igf_id'].tolist(),
+                       ['IGFP000{0}'.format(i) for i in range(1,6)])
+      self.assertEqual(data['project_name'].tolist(),
+                       ['project_{0}'.format(i) for i in range(1,6)])
+      self.assertEqual(data['status'].tolist(),
+                       ['ACTIVE','FINISHED','ACTIVE','FINISHED','ACTIVE'])
+      self.assertEqual(data['description'].tolist(),
+                       [None,None]+['description_{0}'.format(i) for i in range(3,6)])
+      self.assertEqual(data['status'].dtype.name,'category')                    # dictionary columns read as categorical
+    finally:
+      remove_dir(temp_dir)
+
+  def test_map_foreign_table_ids(self):
+    base=self.base
+    project_data=[{'project_igf_id':'IGFP0001','project_name':'project_1'},
+                  {'project_igf_id':'IGFP0002','project_name':'project_2'}]
+    sample_data=[{'sample_igf_id':'IGF0001','project_igf_id':'IGFP0001'},
+                 {'sample_igf_id':'IGF0002','project_igf_id':'IGFP0002'},
+                 {'sample_igf_id':'IGF0003','project_igf_id':'IGFP0001'}]
+    base.start_session()
+    base.store_records(table=Project,
+                       data=project_data,
+                       mode='bulk')
+    project_ids=dict(base.session.query(Project.project_igf_id,
+                                        Project.project_id).all())
+    data=base.map_foreign_table_ids(data=sample_data,
+                                    lookup_table=Project,
+                                    lookup_column_name='project_igf_id',
+                                    target_column_name='project_id',
+                                    chunk_size=1)
+    self.assertFalse('project_igf_id' in data.columns)
+    self.assertEqual(data['project_id'].tolist(),
+                     [project_ids['IGFP0001'],
+                      project_ids['IGFP0002'],
+                      project_ids['IGFP0001']])
+    base.store_records(table=Sample,
+                       data=data,
+                       mode='bulk')
+    self.assertEqual(base.session.query(Sample).count(),3)
+    with self.assertRaises(ValueError):
+      base.map_foreign_table_ids(data=[{'sample_igf_id':'IGF0004',
+                                        'project_igf_id':'IGFP0003'}],
+                                 lookup_table=Project,
+                                 lookup_column_name='project_igf_id',
+                                 target_column_name='project_id')
+    base.close_session()
+
+  def test_format_attribute_table_row(self):
+    base=self.base
+    data=[{'sample_igf_id':'IGF0001','expected_reads':1000,'insert_length':250.5},
+          {'sample_igf_id':'IGF0002','expected_reads':2000,'insert_length':None,
+           'species_name':'HG38'}]
+    data=base._format_attribute_table_row(data=data,
+                                          required_column='sample_igf_id',
+                                          attribute_name_column='attribute_name',
+                                          attribute_value_column='attribute_value')
+    data=data.to_dict(orient='records')
+    self.assertEqual(len(data),4)
+    self.assertEqual(data[0]['sample_igf_id'],'IGF0001')
+    self.assertTrue(isinstance(data[0]['attribute_value'],float))               # same row has a float value
+    self.assertEqual(data[2],{'attribute_name':'expected_reads',
+                              'attribute_value':2000,
+                              'sample_igf_id':'IGF0002'})
+
 if __name__ == '__main__':
   unittest.main()
\ No newline at end of file
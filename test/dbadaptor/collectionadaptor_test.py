@@ -5,6 +5,8 @@ from igf_data.igfdb.igfTables import Base,Collection,Collection_attribute
 from igf_data.igfdb.baseadaptor import BaseAdaptor
 from igf_data.igfdb.collectionadaptor import CollectionAdaptor
 from igf_data.igfdb.fileadaptor import FileAdaptor
+from igf_data.utils.dbutils import read_json_data_in_chunks
+from igf_data.utils.fileutils import get_temp_dir,remove_dir
 
 class CollectionAdaptor_test1(unittest.TestCase):
   def setUp(self):
@@ -40,6 +42,64 @@ class CollectionAdaptor_test1(unittest.TestCase):
     file_md5=file_data.md5
     self.assertEqual(file_md5, 'd5798564a14a09b9e80640ac2f42f47e')
 
+  def test_load_file_and_create_collection_in_bulk(self):
+    file_path='data/collect_fastq_dir/1_16/IGFP0001_test_22-8-2017_rna/IGF00002/IGF00002-2_S1_L001_R1_001.fastq.gz'
+    ca=CollectionAdaptor(**{'session_class':self.session_class})
+    ca.start_session()
+    ca.load_file_and_create_collection(data=[{'name':'IGF001_MISEQ',
+                                              'type':'ALIGNMENT_CRAM',
+                                              'table':'experiment',
+                                              'file_path':'a.cram'}],
+                                       calculate_file_size_and_md5=False)
+    temp_dir=get_temp_dir()
+    json_file=os.path.join(temp_dir,'collection_data.json')
+    collection_data=[{'name':'IGF001_MISEQ',
+                      'type':'ALIGNMENT_CRAM',
+                      'table':'experiment',
+                      'file_path':'a.cram'},
+                     {'name':'IGF001_MISEQ',
+                      'type':'ALIGNMENT_CRAM',
+                      'table':'experiment',
+                      'file_path':'a1.cram'},
+                     {'name':'IGF002_MISEQ',
+                      'type':'ALIGNMENT_CRAM',
+                      'table':'experiment',
+                      'file_path':'a1.cram'},
+                     {'name':'IGF003_MISEQ',
+                      'type':'ALIGNMENT_CRAM',
+                      'table':'experiment',
+                      'file_path':'b.cram'}]
+    with open(json_file,'w') as fp:
+      json.dump(collection_data,fp)
+    record_counts=\
+      ca.load_file_and_create_collection_in_bulk(
+        data=read_json_data_in_chunks(json_file,chunk_size=2),
+        calculate_file_size_and_md5=False)
+    self.assertEqual(record_counts,{'file':2,'collection':2,'collection_group':3})
+    cg_data=ca.get_collection_files(collection_name='IGF001_MISEQ',
+                                    collection_type='ALIGNMENT_CRAM')
+    self.assertEqual(sorted(cg_data['file_path'].values),['a.cram','a1.cram'])
+    record_counts=\
+      ca.load_file_and_create_collection_in_bulk(
+        data=collection_data,
+        calculate_file_size_and_md5=False)
+    self.assertEqual(record_counts,{'file':0,'collection':0,'collection_group':0})
+    ca.load_file_and_create_collection_in_bulk(
+      data=[{'name':'IGF00001_MISEQ_000000000-D0YLK_1',
+             'type':'demultiplexed_fastq',
+             'table':'run',
+             'file_path':file_path,
+             'location':'HPC_PROJECT'}],
+      max_workers=2)
+    ca.close_session()
+    remove_dir(temp_dir)
+    fa=FileAdaptor(**{'session_class':self.session_class})
+    fa.start_session()
+    file_data=fa.fetch_file_records_file_path(file_path)
+    fa.close_session()
+    self.assertEqual(file_data.md5,'d5798564a14a09b9e80640ac2f42f47e')
+    self.assertEqual(file_data.size,str(os.path.getsize(file_path)))
+
   def test_fetch_collection_name_and_table_from_file_path(self):
     file_path='data/collect_fastq_dir/1_16/IGFP0001_test_22-8-2017_rna/IGF00002/IGF00002-2_S1_L001_R1_001.fastq.gz'
     data=[{'name':'IGF00001_MISEQ_000000000-D0YLK_1',\
@@ -0,0 +1,155 @@
+import os,unittest
+import pandas as pd
+from igf_data.utils.dbutils import read_dbconf_json
+from igf_data.igfdb.igfTables import Base
+from igf_data.igfdb.baseadaptor import BaseAdaptor
+from igf_data.igfdb.useradaptor import UserAdaptor
+from igf_data.igfdb.projectadaptor import ProjectAdaptor
+from igf_data.igfdb.sampleadaptor import SampleAdaptor
+from igf_data.igfdb.platformadaptor import PlatformAdaptor
+from igf_data.igfdb.seqrunadaptor import SeqrunAdaptor
+from igf_data.igfdb.experimentadaptor import ExperimentAdaptor
+from igf_data.igfdb.runadaptor import RunAdaptor
+from igf_data.utils.fileutils import get_temp_dir,remove_dir
+from igf_data.process.disk_usage.calculate_disk_usage_costs import calculate_igf_disk_usage_costs,calculate_storage_costs
+
+class Calculate_disk_usage_costs_test1(unittest.TestCase):
+  def setUp(self):
+    self.dbconfig = 'data/dbconfig.json'
+    dbparam = read_dbconf_json(self.dbconfig)
+    base = BaseAdaptor(**dbparam)
+    self.engine = base.engine
+    self.dbname = dbparam['dbname']
+    Base.metadata.drop_all(self.engine)
+    if os.path.exists(self.dbname):
+      os.remove(self.dbname)
+    Base.metadata.create_all(self.engine)
+    base.start_session()
+    platform_data = [{
+      "platform_igf_id" : "K00345",
+      "model_name" : "HISEQ4000",
+      "vendor_name" : "ILLUMINA",
+      "software_name" : "RTA",
+      "software_version" : "RTA2"}]
+    pl = PlatformAdaptor(**{'session':base.session})
+    pl.store_platform_data(data=platform_data)
+    user_data = [
+      {'name':'user1','email_id':'user1@ic.ac.uk','username':'user1'},
+      {'name':'igf','email_id':'igf@imperial.ac.uk','username':'igf'}]
+    ua = UserAdaptor(**{'session':base.session})
+    ua.store_user_data(data=user_data)
+    project_data = [
+      {'project_igf_id':'ProjectA'},
+      {'project_igf_id':'ProjectB'},
+      {'project_igf_id':'ProjectC'}]
+    pa = ProjectAdaptor(**{'session':base.session})
+    pa.store_project_and_attribute_data(data=project_data)
+    project_user_data = [
+      {'project_igf_id':'ProjectA','email_id':'user1@ic.ac.uk','data_authority':True},
+      {'project_igf_id':'ProjectB','email_id':'user1@ic.ac.uk','data_authority':True},
+      {'project_igf_id':'ProjectC','email_id':'igf@imperial.ac.uk','data_authority':True}]
+    pa.assign_user_to_project(data=project_user_data)
+    sample_data = [
+      {'sample_igf_id':'SampleA{0}'.format(i),'project_igf_id':'ProjectA'}
+        for i in range(3)]
+    sa = SampleAdaptor(**{'session':base.session})
+    sa.store_sample_and_attribute_data(data=sample_data)
+    seqrun_data = [
+      {'seqrun_igf_id':'180518_K00345_0047_BHV2GJBBX{0}'.format(i),
+       'flowcell_id':'HV2GJBBX{0}'.format(i),
+       'platform_igf_id':'K00345'}
+         for i in range(2)]
+    sra = SeqrunAdaptor(**{'session':base.session})
+    sra.store_seqrun_and_attribute_data(data=seqrun_data)
+    experiment_data = [
+      {'experiment_igf_id':'SampleA{0}_HISEQ4000'.format(i),
+       'library_name':'SampleA{0}'.format(i),
+       'platform_name':'HISEQ4000',
+       'project_igf_id':'ProjectA',
+       'sample_igf_id':'SampleA{0}'.format(i)}
+         for i in range(3)]
+    ea = ExperimentAdaptor(**{'session':base.session})
+    ea.store_project_and_attribute_data(data=experiment_data)
+    run_data = [
+      {'experiment_igf_id':'SampleA{0}_HISEQ4000'.format(i),
+       'lane_number':str(lane),
+       'run_igf_id':'SampleA{0}_{1}_{2}'.format(i,j,lane),
+       'seqrun_igf_id':'180518_K00345_0047_BHV2GJBBX{0}'.format(j)}
+         for i in range(3)
+           for j in range(2)
+             for lane in (1,2)]                                                 # 12 runs on 2 flowcells
+    ra = RunAdaptor(**{'session':base.session})
+    ra.store_run_and_attribute_data(data=run_data)
+    base.close_session()
+    self.temp_dir = get_temp_dir()
+    self.list_of_dir_paths = list()
+    for tag_name,storage_class in (('raw_data','fast'),('results_data','archive')):
+      for project_name in ('ProjectA','ProjectB','ProjectC','Unknown'):
+        project_dir = os.path.join(self.temp_dir,tag_name,project_name)
+        os.makedirs(project_dir)
+        with open(os.path.join(project_dir,'data.txt'),'w') as fp:
+          fp.write('A' * 100000)
+      self.list_of_dir_paths.append({
+        'tag':tag_name,
+        'path':os.path.join(self.temp_dir,tag_name),
+        'storage_class':storage_class})
+
+  def tearDown(self):
+    Base.metadata.drop_all(self.engine)
+    os.remove(self.dbname)
+    remove_dir(self.temp_dir)
+
+  def test_calculate_igf_disk_usage_costs(self):
+    formatted_data,column_order,description = \
+      calculate_igf_disk_usage_costs(
+        list_of_dir_paths=self.list_of_dir_paths,
+        dbconf_file=self.dbconfig,
+        costs_unit={'fast':2,'archive':1})
+    self.assertEqual(
+      column_order,
+      ['email_id','name','project_igf_id','raw_data','results_data','costs_pm','flowcell_id'])
+    self.assertTrue('raw_data' in description)
+    data = pd.DataFrame(formatted_data).set_index('email_id')
+    self.assertEqual(list(data.index),['user1@ic.ac.uk','UNKNOWN'])             # igf user excluded
+    user1 = data.loc['user1@ic.ac.uk']
+    self.assertEqual(user1['project_igf_id'],'ProjectA;ProjectB')
+    self.assertEqual(user1['flowcell_id'],'HV2GJBBX0;HV2GJBBX1')                # one entry per flowcell
+    self.assertAlmostEqual(
+      user1['costs_pm'],
+      (user1['raw_data'] * 2 + user1['results_data'] * 1) / 1024)               # costs unit per TB
+    self.assertAlmostEqual(
+      data.loc['UNKNOWN']['costs_pm'],
+      user1['costs_pm'] / 2)
+    self.assertEqual(data.loc['UNKNOWN']['project_igf_id'],'Unknown')
+
+  def test_calculate_storage_costs(self):
+    usage_data = \
+      pd.DataFrame(
+        {'disk1':[10.0,20.0,0.0],'disk2':[1.0,0.0,5.0]},
+        index=['ProjectA','ProjectB','ProjectC'])
+    project_user_data = \
+      pd.DataFrame([
+        {'project_igf_id':'ProjectA','name':'user1','email_id':'user1@ic.ac.uk'},
+        {'project_igf_id':'ProjectB','name':'user2','email_id':'user2@ic.ac.uk'},
+        {'project_igf_id':'ProjectC','name':'user1','email_id':'user1@ic.ac.uk'}])
+    project_flowcell_data = \
+      pd.DataFrame(columns=['project_igf_id','flowcell_id'])
+    formatted_data,_,_ = \
+      calculate_storage_costs(
+        usage_data=usage_data,
+        project_user_data=project_user_data,
+        project_flowcell_data=project_flowcell_data,
+        costs_unit=512)
+    self.assertEqual(formatted_data[0].get('email_id'),'user2@ic.ac.uk')
+    self.assertEqual(formatted_data[0].get('costs_pm'),10.0)                    # 20 GB at 512 per TB
+    self.assertEqual(formatted_data[1].get('costs_pm'),8.0)
+    self.assertEqual(formatted_data[1].get('project_igf_id'),'ProjectA;ProjectC')
+    with self.assertRaises(ValueError):
+      calculate_storage_costs(
+        usage_data=usage_data,
+        project_user_data=project_user_data,
+        project_flowcell_data=project_flowcell_data,
+        costs_unit={'disk1':1})                                                 # missing cost unit for disk2
+
+if __name__=='__main__':
+  unittest.main()
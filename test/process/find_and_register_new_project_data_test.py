@@ -196,6 +196,51 @@ class Find_and_register_project_data1(unittest.TestCase):
     self.assertEqual(project_user_data1[0]['project_igf_id'],'IGFP0002_test_23-5-2017_rna')
     base.close_session()
     
+  def test_check_existing_data_in_bulk(self):
+    fa=Find_and_register_new_project_data(projet_info_path=os.path.join('.','data/check_project_data'),\
+                                          dbconfig=self.dbconfig,\
+                                          user_account_template='template/email_notification/send_new_account_info.txt',\
+                                          log_slack=False,\
+                                          check_hpc_user=False,\
+                                          )
+    base=BaseAdaptor(**{'session_class':self.session_class})
+    base.start_session()
+    project_data1=pd.DataFrame([{'project_igf_id':'IGFP0001_test_22-8-2017_rna',},
+                                {'project_igf_id':'IGFP0002_test_23-5-2017_rna',},
+                               ])
+    project_data1=fa._check_existing_data_in_bulk(data=project_data1,\
+                                                  dbsession=base.session,\
+                                                  table_name='project')
+    self.assertEqual(project_data1['EXISTS'].tolist(),[True,False])
+    user_data1=pd.DataFrame([{'name':'user1','email_id':'user1@ic.ac.uk'},\
+                             {'name':'user3','email_id':'user3@ic.ac.uk'},\
+                            ])
+    user_data1=fa._check_existing_data_in_bulk(data=user_data1,\
+                                               dbsession=base.session,\
+                                               table_name='user')
+    self.assertEqual(user_data1['EXISTS'].tolist(),[True,False])
+    sample_data1=pd.DataFrame([{'sample_igf_id':'IGF00001','project_igf_id':'IGFP0001_test_22-8-2017_rna',},
+                               {'sample_igf_id':'IGF00007','project_igf_id':'IGFP0001_test_22-8-2017_rna',},])
+    sample_data1=fa._check_existing_data_in_bulk(data=sample_data1,\
+                                                 dbsession=base.session,\
+                                                 table_name='sample')
+    self.assertEqual(sample_data1['EXISTS'].tolist(),[True,False])
+    sample_data2=pd.DataFrame([{'sample_igf_id':'IGF00001','project_igf_id':'IGFP0002_test_23-5-2017_rna',}])
+    with self.assertRaises(ValueError):
+      fa._check_existing_data_in_bulk(data=sample_data2,\
+                                      dbsession=base.session,\
+                                      table_name='sample')
+    project_user_data1=pd.DataFrame([{'project_igf_id':'IGFP0001_test_22-8-2017_rna'\
+                                      ,'email_id':'user1@ic.ac.uk'},\
+                                     {'project_igf_id':'IGFP0002_test_23-5-2017_rna',\
+                                      'email_id':'user3@ic.ac.uk'},\
+                                    ])
+    project_user_data1=fa._check_existing_data_in_bulk(data=project_user_data1,\
+                                                       dbsession=base.session,\
+                                                       table_name='project_user')
+    self.assertEqual(project_user_data1['EXISTS'].tolist(),[True,False])
+    base.close_session()
+
   def test_process_project_data_and_account(self):
       fa=Find_and_register_new_project_data(projet_info_path=os.path.join('.','data/check_project_data'),\
                                           dbconfig=self.dbconfig,\
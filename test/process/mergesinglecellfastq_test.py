@@ -1,4 +1,4 @@
-import unittest, os, subprocess,fnmatch
+import unittest, os, subprocess,fnmatch,gzip
 from igf_data.utils.fileutils import get_temp_dir,remove_dir
 from igf_data.process.singlecell_seqrun.mergesinglecellfastq import MergeSingleCellFastq
 
@@ -38,5 +38,31 @@ class MergeSingleCellFastq_testA(unittest.TestCase):
         if fnmatch.fnmatch(file,'*.fastq.gz'):
           all_fastq_file.append(file)
     self.assertEqual(len(all_fastq_file),24)
+
+  def test_merge_fastq_content(self):
+    fastq_dir=os.path.join(self.fastq_dir,'fastq','project_2')
+    for fragment_id in range(1,5):
+      file_path=os.path.join(fastq_dir,
+                             'IGF0004_{0}'.format(fragment_id),
+                             's4_{0}_S{0}_L001_R1_001.fastq.gz'.format(fragment_id))
+      with gzip.open(file_path,'wt') as fp:
+        fp.write('@read{0}\nATCG\n+\n####\n'.format(fragment_id))               # different reads for each fragment
+    sc_data=MergeSingleCellFastq(fastq_dir=self.fastq_dir,
+                                 samplesheet=self.samplesheet_file,
+                                 platform_name='NEXTSEQ',
+                                 max_workers=2)
+    sample_data=sc_data._fetch_lane_and_sample_info_from_samplesheet()
+    sample_files,samples_info=sc_data._group_singlecell_fastq(sample_data,self.fastq_dir)
+    self.assertEqual(samples_info['IGF0004']['sample_name'],'s4')
+    self.assertEqual(len(sample_files['1']['IGF0004']['R1']),4)
+    self.assertEqual(len(sample_files['1']['IGF0004']['I1']),4)
+    sc_data.merge_fastq_per_lane_per_sample()
+    output_file=os.path.join(self.fastq_dir,'project_2','IGF0004','s4_S1_L001_R1_001.fastq.gz')
+    with gzip.open(output_file,'rt') as fp:
+      reads=[line.strip() for line in fp if line.startswith('@')]
+    self.assertEqual(reads,['@read1','@read2','@read3','@read4'])               # merged in fragment order
+    self.assertEqual([f for f in os.listdir(os.path.dirname(output_file))
+                        if f.endswith('.tmp')],[])
+
 if __name__=='__main__':
   unittest.main()
\ No newline at end of file
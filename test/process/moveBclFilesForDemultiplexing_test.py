@@ -1,4 +1,4 @@
-import unittest, os
+import unittest, os, json, time, subprocess
 from shutil import rmtree
 from tempfile import mkdtemp
 from igf_data.process.moveBclFilesForDemultiplexing import moveBclFilesForDemultiplexing
@@ -86,5 +86,71 @@ class Hiseq4000RunInfo(unittest.TestCase):
     self.assertTrue(os.path.exists(os.path.join(self.output_dir,'Data/Intensities/s.locs')),1)
     self.assertTrue(os.path.exists(os.path.join(self.output_dir,'Data/Intensities/BaseCalls/L003')),1)
 
+  def _create_run_dir(self):
+    os.makedirs(os.path.join(self.input_dir,'Data/Intensities/BaseCalls/L003/C1.1'))
+    os.makedirs(os.path.join(self.input_dir,'InterOp'))
+    for file_path in ('Data/Intensities/s.locs',
+                      'Data/Intensities/BaseCalls/L003/C1.1/s_3_1101.bcl.gz',
+                      'InterOp/QMetricsOut.bin',
+                      'RunInfo.xml',
+                      'runParameters.xml'):
+      with open(os.path.join(self.input_dir,file_path),'w') as fp:
+        fp.write('AA')
+
+  def test_copy_bcl_files_with_links(self):
+    self._create_run_dir()
+    move_file=self.move_file
+    bcl_file='Data/Intensities/BaseCalls/L003/C1.1/s_3_1101.bcl.gz'
+    staged_bytes=move_file.copy_bcl_files(staging_mode='symlink')
+    self.assertEqual(staged_bytes.get('symlink'),10)
+    self.assertEqual(staged_bytes.get('copy'),0)
+    self.assertTrue(os.path.islink(os.path.join(self.output_dir,bcl_file)))
+    self.assertFalse(os.path.islink(os.path.join(self.output_dir,'Data/Intensities/BaseCalls/L003')))
+    hardlink_dir=os.path.join(self.output_dir,'hardlink')
+    staged_bytes=move_file.copy_bcl_files(staging_mode='hardlink',output_dir=hardlink_dir)
+    self.assertEqual(sum(staged_bytes.values()),10)
+    self.assertEqual(os.stat(os.path.join(self.input_dir,bcl_file)).st_ino,
+                     os.stat(os.path.join(hardlink_dir,bcl_file)).st_ino)
+    with self.assertRaises(ValueError):
+      move_file.copy_bcl_files(staging_mode='move')
+
+  def test_stage_shared_bcl_files(self):
+    self._create_run_dir()
+    move_file=self.move_file
+    staging_dir1,staged_bytes1=\
+      move_file.stage_shared_bcl_files(staging_mode='symlink',holder_id='job1')
+    staging_dir2,staged_bytes2=\
+      move_file.stage_shared_bcl_files(staging_mode='symlink',holder_id='job2')
+    self.assertEqual(staging_dir1,staging_dir2)
+    self.assertEqual(staged_bytes1.get('symlink'),10)
+    self.assertEqual(staged_bytes2,{})                                          # reused staged dir
+    self.assertTrue(os.path.exists(os.path.join(staging_dir1,'RunInfo.xml')))
+    self.assertFalse(move_file.release_shared_bcl_files(holder_id='job1'))
+    self.assertTrue(os.path.exists(staging_dir1))
+    self.assertTrue(move_file.release_shared_bcl_files(holder_id='job2'))
+    self.assertFalse(os.path.exists(staging_dir1))
+    self.assertTrue(os.path.exists(os.path.join(self.input_dir,'RunInfo.xml')))
+
+  def test_stage_shared_bcl_files_with_dead_holders(self):
+    self._create_run_dir()
+    move_file=self.move_file
+    staging_dir,staged_bytes=\
+      move_file.stage_shared_bcl_files(staging_mode='symlink',holder_id='job1')
+    _,_,holder_file=move_file._get_shared_staging_paths()
+    proc=subprocess.Popen(['true'])
+    proc.wait()                                                                 # pid of a finished process
+    with open(holder_file,'r') as fp:
+      holders=json.load(fp)
+    holders['job1']['pid']=proc.pid
+    holders['job2']={'hostname':'remote_host','pid':1,'timestamp':time.time()-100}
+    with open(holder_file,'w') as fp:
+      json.dump(holders,fp)
+    live_holders=move_file._get_live_holders(holder_file=holder_file,holder_timeout=50)
+    self.assertEqual(len(live_holders),0)
+    live_holders=move_file._get_live_holders(holder_file=holder_file,holder_timeout=500)
+    self.assertEqual(list(live_holders.keys()),['job2'])
+    self.assertTrue(move_file.release_shared_bcl_files(holder_id='job3',holder_timeout=50))
+    self.assertFalse(os.path.exists(staging_dir))
+
 if __name__=='__main__':
   unittest.main()
@@ -94,6 +94,80 @@ class Reformat_metadata_file_testA(unittest.TestCase):
     self.assertTrue('library_source' in data.keys())
     self.assertEqual(data.library_source,'TRANSCRIPTOMIC')
 
+  def test_populate_metadata_columns(self):
+    data = pd.DataFrame([\
+      {'project_igf_id':'IGFQ1 scRNA-seq5primeFB',
+       'sample_igf_id':'IGF3[',
+       'sample_submitter_id':'IGF*0(1_1)',
+       'library_preparation':'RNA Sequencing - Total RNA',
+       'sample_description':'NA',
+       'library_type':'NA',
+       'biomaterial_type':'',
+       'species_text':'mouse',
+       'species_name':'',
+       'expected_reads':''},
+      {'project_igf_id':'IGFQ1 scRNA-seq5primeFB',
+       'sample_igf_id':'IGF4 ',
+       'sample_submitter_id':'IGF4',
+       'library_preparation':'Not Applicable',
+       'sample_description':'Pre made library',
+       'library_type':"SINGLE CELL-3' RNA (NUCLEI)",
+       'biomaterial_type':'UNKNOWN',
+       'species_text':'human ',
+       'species_name':'',
+       'expected_reads':'1000'},
+      {'project_igf_id':'IGFQ1 scRNA-seq5primeFB',
+       'sample_igf_id':'IGF5',
+       'sample_submitter_id':'IGF5',
+       'library_preparation':'',
+       'sample_description':'NA',
+       'library_type':'NA',
+       'biomaterial_type':'',
+       'species_text':'HUMAN',
+       'species_name':'',
+       'expected_reads':0}])
+    re_metadata = \
+      Reformat_metadata_file(\
+        infile='data/metadata_validation/metadata_reformatting/incorrect_metadata.csv')
+    row_data = \
+      data.copy().\
+        apply(lambda x: \
+          re_metadata.populate_metadata_values(row=x),
+          axis=1,
+          result_type='reduce')
+    column_data = \
+      re_metadata.populate_metadata_columns(data=data)
+    for column in row_data.columns:
+      self.assertEqual(row_data[column].tolist(),column_data[column].tolist())
+    self.assertEqual(column_data['sample_igf_id'].tolist(),['IGF3','IGF4','IGF5'])
+    self.assertEqual(column_data['sample_submitter_id'].values[0],'IGF-0-1-1')
+    self.assertEqual(column_data['library_source'].values[0],'TRANSCRIPTOMIC')
+    self.assertEqual(column_data['biomaterial_type'].values[1],'SINGLE_NUCLEI')
+    self.assertEqual(column_data['experiment_type'].values[2],'UNKNOWN')
+    self.assertEqual(column_data['taxon_id'].tolist(),['10090','UNKNOWN','9606'])
+    self.assertEqual(column_data['expected_reads'].tolist(),[2000000,'1000',2000000])
+
+  def test_reformat_raw_metadata_file_in_chunks(self):
+    output_file = os.path.join(self.tmp_dir,'samplesheet.csv')
+    chunk_output_file = os.path.join(self.tmp_dir,'samplesheet_chunk.csv')
+    re_metadata = \
+      Reformat_metadata_file(\
+        infile='data/metadata_validation/metadata_reformatting/incorrect_metadata.csv')
+    re_metadata.\
+      reformat_raw_metadata_file(output_file=output_file)
+    re_metadata.\
+      reformat_raw_metadata_file(
+        output_file=chunk_output_file,
+        chunk_size=2)
+    with open(output_file,'r') as fp:
+      data = fp.read()
+    with open(chunk_output_file,'r') as fp:
+      chunk_data = fp.read()
+    self.assertEqual(data,chunk_data)
+    self.assertEqual(
+      sorted(os.listdir(self.tmp_dir)),
+      ['samplesheet.csv','samplesheet_chunk.csv'])                              # no temp file left
+
   def test_reformat_raw_metadata_file(self):
     output_file = os.path.join(self.tmp_dir,'samplesheet.csv')
     re_metadata = \
@@ -73,5 +73,57 @@ class Reset_samplesheet_md5_test1(unittest.TestCase):
     self.assertNotEqual(file.md5, self.initial_json_md5)                        # check db for updated json file md5 value
     fa.close_session()
 
+  def test_run_batch(self):
+    with open(self.seqrun_input_list,'w') as fp:
+      fp.write('{0}\nseqrun2\n'.format(self.json_collection_name))
+    rs=Reset_samplesheet_md5(seqrun_path=self.seqrun_path,
+                             seqrun_igf_list=self.seqrun_input_list,
+                             dbconfig_file=self.dbconfig,
+                             log_slack=False,
+                             log_asana=False)
+    summary=rs.run_batch(max_workers=2)
+    self.assertEqual(summary['updated'],[self.json_collection_name])
+    self.assertEqual([seqrun_id for seqrun_id,_ in summary['failed']],['seqrun2'])  # no md5 json for seqrun2
+    with open(self.json_file_path,'r') as jp:
+      json_data=json.load(jp)
+    new_md5_value=[json_row['file_md5']
+                     for json_row in json_data
+                       if json_row['seqrun_file_name']=='SampleSheet.csv'][0]
+    self.assertEqual(self.correct_samplesheet_md5,new_md5_value)
+    fa=FileAdaptor(**{'session_class': self.session_class})
+    fa.start_session()
+    file=fa.fetch_file_records_file_path(file_path=self.json_file_path)
+    fa.close_session()
+    self.assertEqual(file.md5,calculate_file_checksum(filepath=self.json_file_path))
+    self.assertEqual([f for f in os.listdir(os.path.dirname(self.json_file_path))
+                        if f.endswith('.tmp')],[])
+    with open(self.seqrun_input_list,'w') as fp:
+      fp.write(self.json_collection_name)
+    summary=rs.run_batch()
+    self.assertEqual(summary['unchanged'],[self.json_collection_name])
+
+  def test_run_batch_with_failed_commit(self):
+    with open(self.seqrun_input_list,'w') as fp:
+      fp.write(self.json_collection_name)
+    rs=Reset_samplesheet_md5(seqrun_path=self.seqrun_path,
+                             seqrun_igf_list=self.seqrun_input_list,
+                             dbconfig_file=self.dbconfig,
+                             log_slack=False,
+                             log_asana=False)
+    def _failed_commit():
+      raise ValueError('Failed commit')
+    rs.base_adaptor.commit_session=_failed_commit
+    with self.assertRaises(ValueError):
+      rs.run_batch()
+    self.assertEqual(calculate_file_checksum(filepath=self.json_file_path),
+                     self.initial_json_md5)                                     # original json file restored
+    self.assertEqual([f for f in os.listdir(os.path.dirname(self.json_file_path))
+                        if f.endswith('.tmp') or f.endswith('.orig')],[])       # no temp or backup files left
+    fa=FileAdaptor(**{'session_class': self.session_class})
+    fa.start_session()
+    file=fa.fetch_file_records_file_path(file_path=self.json_file_path)
+    fa.close_session()
+    self.assertEqual(file.md5,self.initial_json_md5)
+
 if __name__ == '__main__':
   unittest.main()
\ No newline at end of file
@@ -1,4 +1,5 @@
-import unittest
+import os,unittest
+from igf_data.utils.fileutils import get_temp_dir,remove_dir
 from igf_data.illumina.runinfo_xml import RunInfo_xml
 
 class Hiseq4000RunInfo(unittest.TestCase):
@@ -50,5 +51,41 @@ class Hiseq4000RunInfo(unittest.TestCase):
     self.assertEqual(flowcell_name, 'HXXXXXXXX')
 
 
+class RunInfo_xml_cache_test(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir=get_temp_dir()
+    self.xml_file=os.path.join(self.temp_dir,'RunInfo.xml')
+    with open('doc/data/Illumina/RunInfo2.xml','r') as fp:
+      self.xml_data=fp.read()
+    with open(self.xml_file,'w') as fp:
+      fp.write(self.xml_data)
+
+  def tearDown(self):
+    remove_dir(self.temp_dir)
+
+  def test_parse_cache(self):
+    runinfo_data=RunInfo_xml(xml_file=self.xml_file)
+    self.assertEqual(runinfo_data.get_flowcell_name(),'000000000-D0ABC')
+    self.assertEqual(len(runinfo_data.get_reads_stats()),3)
+    self.assertEqual(
+      runinfo_data.get_reads_stats(number_tag='Number',tags=['NumCycles'])['3']['NumCycles'],
+      '151')
+    self.assertIs(
+      RunInfo_xml(xml_file=self.xml_file)._xml_elements,
+      runinfo_data._xml_elements)                                               # cached parse
+    with open(self.xml_file,'w') as fp:
+      fp.write(self.xml_data.replace('000000000-D0ABC','000000000-D0XYZ'))
+    os.utime(self.xml_file,ns=(0,0))                                            # force a new file mtime
+    runinfo_data=RunInfo_xml(xml_file=self.xml_file)
+    self.assertEqual(runinfo_data.get_flowcell_name(),'000000000-D0XYZ')
+
+  def test_malformed_xml(self):
+    with open(self.xml_file,'w') as fp:
+      fp.write(self.xml_data.replace('</RunInfo>',''))                         # truncated xml file
+    runinfo_data=RunInfo_xml(xml_file=self.xml_file)
+    self.assertEqual(runinfo_data.get_platform_number(),'M00001')
+    self.assertEqual(len(runinfo_data.get_reads_stats()),3)
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,110 @@
+import os,unittest,sys
+from igf_data.utils.fileutils import get_temp_dir,remove_dir
+from igf_data.utils.tools.alignment_metrics_parser import Samtools_stats_parser,Samtools_flagstat_parser
+from igf_data.utils.tools.alignment_metrics_parser import Samtools_idxstats_parser,Picard_metrics_parser
+from igf_data.utils.tools.alignment_metrics_parser import parse_metrics_file,run_and_tee_command_output
+
+class Alignment_metrics_parser_test1(unittest.TestCase):
+  def test_samtools_stats_parser(self):
+    metrics = \
+      parse_metrics_file(
+        metrics_file='data/samtools_metrics/test.stats.txt',
+        parser=Samtools_stats_parser())
+    self.assertEqual(len(metrics),38)
+    self.assertEqual(metrics.get('raw_total_sequences'),162319656)
+    self.assertEqual(metrics.get('reads_mapped'),160190290)
+    self.assertEqual(metrics.get('reads_mapped_and_paired'),160190150)
+    self.assertEqual(metrics.get('bases_mapped_(cigar)'),11864234008)
+    self.assertEqual(metrics.get('error_rate'),0.002556171)
+    self.assertEqual(metrics.get('insert_size_average'),962.4)
+    metrics = \
+      parse_metrics_file(
+        metrics_file='data/samtools_metrics/test.stats.txt',
+        parser=Samtools_stats_parser(typed=False))
+    self.assertEqual(metrics.get('error_rate'),'2.556171e-03')
+
+  def test_samtools_flagstat_parser(self):
+    metrics = \
+      parse_metrics_file(
+        metrics_file='data/samtools_metrics/test.flagstat.txt',
+        parser=Samtools_flagstat_parser())
+    self.assertEqual(len(metrics),13)
+    self.assertEqual(metrics.get('in_total'),{'qc_passed':162319656,'qc_failed':0})
+    self.assertEqual(metrics.get('mapped').get('qc_passed'),160190290)
+    self.assertEqual(metrics.get('properly_paired').get('qc_passed'),160190150)
+    self.assertEqual(metrics.get('singletons').get('qc_passed'),140)
+    self.assertTrue('with_mate_mapped_to_a_different_chr' in metrics)
+    self.assertTrue('with_mate_mapped_to_a_different_chr_mapq_5' in metrics)
+
+  def test_samtools_idxstats_parser(self):
+    metrics = \
+      parse_metrics_file(
+        metrics_file='data/samtools_metrics/test.idxstats.txt',
+        parser=Samtools_idxstats_parser())
+    self.assertEqual(list(metrics.keys()),['chr1','chr2','chrM','*'])
+    self.assertEqual(metrics.get('chrM'),{'length':16569,'mapped':1271350,'unmapped':2})
+    self.assertEqual(metrics.get('*').get('unmapped'),2127478)
+
+  def test_picard_metrics_parser(self):
+    metrics = \
+      parse_metrics_file(
+        metrics_file='data/picard_metrics/test.CollectAlignmentSummaryMetrics.txt',
+        parser=Picard_metrics_parser())
+    self.assertEqual(metrics.get('metrics_class'),'picard.analysis.AlignmentSummaryMetrics')
+    self.assertEqual(len(metrics.get('metrics')),3)
+    pair_row = metrics.get('metrics')[2]
+    self.assertEqual(pair_row.get('CATEGORY'),'PAIR')
+    self.assertEqual(pair_row.get('PF_READS_ALIGNED'),160190290)
+    self.assertEqual(pair_row.get('STRAND_BALANCE'),0.5)
+    self.assertIsNone(pair_row.get('SAMPLE'))
+    metrics = \
+      parse_metrics_file(
+        metrics_file='data/picard_metrics/test.CollectRnaSeqMetrics.txt',
+        parser=Picard_metrics_parser())
+    self.assertEqual(metrics.get('metrics_class'),'picard.analysis.RnaSeqMetrics')
+    self.assertEqual(len(metrics.get('metrics')),1)                             # histogram is not included
+    self.assertEqual(metrics.get('metrics')[0].get('MEDIAN_5PRIME_BIAS'),0.477757)
+    metrics = \
+      parse_metrics_file(
+        metrics_file='data/picard_metrics/test.MarkDuplicates.summary.txt',
+        parser=Picard_metrics_parser())
+    self.assertEqual(metrics.get('metrics_class'),'picard.sam.DuplicationMetrics')
+    self.assertEqual(metrics.get('metrics')[0].get('LIBRARY'),'test')
+    self.assertEqual(metrics.get('metrics')[0].get('PERCENT_DUPLICATION'),0.63392)
+    metrics = \
+      parse_metrics_file(
+        metrics_file='data/picard_metrics/test.CollectGcBiasMetrics.summary.txt',
+        parser=Picard_metrics_parser())
+    self.assertEqual(metrics.get('metrics')[0].get('ACCUMULATION_LEVEL'),'All Reads')
+    self.assertEqual(metrics.get('metrics')[0].get('GC_NC_0_19'),0.282953)
+
+class Alignment_metrics_parser_test2(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir = get_temp_dir()
+
+  def tearDown(self):
+    remove_dir(self.temp_dir)
+
+  def test_run_and_tee_command_output(self):
+    stats_file = 'data/samtools_metrics/test.stats.txt'
+    output_path = os.path.join(self.temp_dir,'test.stats.txt')
+    metrics = \
+      run_and_tee_command_output(
+        cmd=['cat',stats_file],
+        output_path=output_path,
+        parser=Samtools_stats_parser())
+    with open(stats_file,'r') as fp1, open(output_path,'r') as fp2:
+      self.assertEqual(fp1.read(),fp2.read())                                   # output file is identical to command stdout
+    self.assertEqual(
+      metrics,
+      parse_metrics_file(
+        metrics_file=stats_file,
+        parser=Samtools_stats_parser()))
+    with self.assertRaises(ValueError):
+      run_and_tee_command_output(
+        cmd=[sys.executable,'-c','import sys; sys.exit(1)'],
+        output_path=output_path,
+        parser=Samtools_stats_parser())
+
+if __name__=='__main__':
+  unittest.main()
@@ -1,5 +1,7 @@
 import os, unittest
 from igf_data.utils.analysis_fastq_fetch_utils import get_fastq_input_list
+from igf_data.utils.analysis_fastq_fetch_utils import get_fastq_input_list_for_experiments
+from igf_data.utils.analysis_fastq_fetch_utils import Experiment_fastq_resolver
 from igf_data.igfdb.igfTables import Base, Pipeline
 from igf_data.igfdb.baseadaptor import BaseAdaptor
 from igf_data.igfdb.platformadaptor import PlatformAdaptor
@@ -204,5 +206,33 @@ class Analysis_fastq_fetch_utils_test1(unittest.TestCase):
         )
     self.assertTrue('/path' in fq_list)
 
+  def test_get_fastq_input_list_for_experiments(self):
+    fastq_data=\
+      get_fastq_input_list_for_experiments(\
+        db_session_class=self.session_class,
+        experiment_igf_id_list=['sampleA_MISEQ','sampleA_NEXTSEQ','sampleC_MISEQ'],
+        chunk_size=1)
+    self.assertEqual(
+      fastq_data['sampleA_MISEQ'],
+      {'sampleA_MISEQ_000000000-BRN47_1':['/path/sampleA_MISEQ_000000000-BRN47_1_R1.fastq.gz']})
+    self.assertEqual(
+      list(fastq_data['sampleA_NEXTSEQ'].keys()),
+      ['sampleA_NEXTSEQ_000000001-BRN47_2'])
+    self.assertEqual(fastq_data['sampleC_MISEQ'],{})                            # unknown experiment
+    self.assertTrue('sampleB_MISEQ' not in fastq_data)
+
+  def test_experiment_fastq_resolver(self):
+    resolver=Experiment_fastq_resolver(db_session_class=self.session_class)
+    fastq_data=resolver.resolve(['sampleA_MISEQ','sampleB_MISEQ'])
+    self.assertEqual(len(fastq_data),2)
+    resolver.db_session_class=None                                              # no more db lookup for resolved experiments
+    fq_list=resolver.get_fastq_input_list('sampleB_MISEQ',combine_fastq_dir=True)
+    self.assertEqual(fq_list,['/path'])
+    self.assertEqual(
+      resolver.get_run_fastq_list('sampleA_MISEQ'),
+      fastq_data['sampleA_MISEQ'])
+    with self.assertRaises(Exception):
+      resolver.get_fastq_input_list('sampleA_NEXTSEQ')                          # not resolved before
+
 if __name__ == '__main__':
   unittest.main()
\ No newline at end of file
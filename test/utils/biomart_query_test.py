@@ -0,0 +1,60 @@
+import os,json,unittest
+import pandas as pd
+from igf_data.utils.fileutils import get_temp_dir,remove_dir
+from igf_data.utils.tools.ensembl_query.biomart_query import fetch_gene_set,fetch_biomart_table,get_latest_snapshot_version
+
+class Biomart_query_test1(unittest.TestCase):
+  def setUp(self):
+    self.snapshot_dir = get_temp_dir()
+    for version,gene_list in (('20190101',['MT-ND1']),('20190201',['MT-ND1','MT-ND2'])):
+      snapshot_path = os.path.join(self.snapshot_dir,version)
+      os.makedirs(snapshot_path)
+      pd.DataFrame({'symbol':gene_list,'chromosome_name':'MT'}).\
+        to_csv(os.path.join(snapshot_path,'hsapiens_mitochondrial.tsv'),sep='\t',index=False)
+      with open(os.path.join(snapshot_path,'snapshot.json'),'w') as fp:
+        json.dump({'snapshot_version':version,
+                   'tables':{'hsapiens_mitochondrial':'hsapiens_mitochondrial.tsv'}},fp)
+    os.makedirs(os.path.join(self.snapshot_dir,'20190301'))                     # incomplete snapshot
+
+  def tearDown(self):
+    remove_dir(self.snapshot_dir)
+
+  def test_get_latest_snapshot_version(self):
+    self.assertEqual(get_latest_snapshot_version(self.snapshot_dir),'20190201')
+    self.assertEqual(get_latest_snapshot_version(os.path.join(self.snapshot_dir,'a')),None)
+
+  def test_fetch_gene_set(self):
+    gene_list = \
+      fetch_gene_set(
+        org='hsapiens',
+        gene_set='mitochondrial',
+        snapshot_dir=self.snapshot_dir)
+    self.assertEqual(gene_list,['MT-ND1','MT-ND2'])
+    gene_list = \
+      fetch_gene_set(
+        org='hsapiens',
+        gene_set='mitochondrial',
+        snapshot_dir=self.snapshot_dir,
+        snapshot_version='20190101')
+    self.assertEqual(gene_list,['MT-ND1'])
+    table = \
+      fetch_biomart_table(
+        org='hsapiens',
+        gene_set='mitochondrial',
+        snapshot_dir=self.snapshot_dir)
+    table['symbol'] = 'A'                                                       # cached table is not modified
+    gene_list = \
+      fetch_gene_set(
+        org='hsapiens',
+        gene_set='mitochondrial',
+        snapshot_dir=self.snapshot_dir)
+    self.assertEqual(gene_list,['MT-ND1','MT-ND2'])
+    with self.assertRaises(ValueError):
+      fetch_gene_set(
+        org='mmusculus',
+        gene_set='mitochondrial',
+        snapshot_dir=self.snapshot_dir,
+        allow_network=False)                                                    # not in snapshot
+
+if __name__ == '__main__':
+  unittest.main()
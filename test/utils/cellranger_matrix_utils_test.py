@@ -0,0 +1,87 @@
+import os,gzip,unittest
+import numpy as np
+from igf_data.utils.fileutils import get_temp_dir,remove_dir
+from igf_data.utils.tools.cellranger.cellranger_matrix_utils import calculate_cell_qc_metrics_from_mtx,iterate_mtx_chunks
+from igf_data.utils.tools.cellranger.cellranger_matrix_utils import count_cells_per_feature_from_mtx,read_feature_and_barcode_names
+
+class Cellranger_matrix_utils_test1(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir = get_temp_dir()
+    self.matrix_file = os.path.join(self.temp_dir,'matrix.mtx.gz')
+    self.features_tsv = os.path.join(self.temp_dir,'features.tsv.gz')
+    self.barcode_tsv = os.path.join(self.temp_dir,'barcodes.tsv.gz')
+    with gzip.open(self.matrix_file,'wt') as fp:
+      fp.write('%%MatrixMarket matrix coordinate integer general\n')
+      fp.write('%metadata_json: {}\n')
+      fp.write('3 3 6\n')
+      fp.write('1 1 3\n2 1 1\n3 1 4\n1 2 5\n3 3 2\n2 3 6\n')
+    with gzip.open(self.features_tsv,'wt') as fp:
+      fp.write('ENSG1\tGENE1\tGene Expression\n')
+      fp.write('ENSG2\tMT-ND1\tGene Expression\n')
+      fp.write('ENSG3\tGENE3\tGene Expression\n')
+    with gzip.open(self.barcode_tsv,'wt') as fp:
+      fp.write('AAAC-1\nAAAG-1\nAAAT-1\n')
+
+  def tearDown(self):
+    remove_dir(self.temp_dir)
+
+  def test_iterate_mtx_chunks(self):
+    chunks = list(iterate_mtx_chunks(self.matrix_file,chunk_size=4))
+    self.assertEqual(len(chunks),2)
+    feature_index,barcode_index,counts = chunks[0]
+    self.assertEqual(list(feature_index),[0,1,2,0])
+    self.assertEqual(list(barcode_index),[0,0,0,1])
+    self.assertEqual(counts.dtype,np.float32)
+
+  def test_calculate_cell_qc_metrics_from_mtx(self):
+    cell_qc = \
+      calculate_cell_qc_metrics_from_mtx(
+        matrix_file=self.matrix_file,
+        features_tsv=self.features_tsv,
+        barcode_tsv=self.barcode_tsv,
+        mito_genes=['MT-ND1','MT-ND2'],
+        chunk_size=2)
+    self.assertEqual(list(cell_qc.index),['AAAC-1','AAAG-1','AAAT-1'])
+    self.assertEqual(list(cell_qc['n_genes']),[3,1,2])
+    self.assertEqual(list(cell_qc['n_counts']),[8,5,8])
+    self.assertAlmostEqual(cell_qc.loc['AAAC-1','percent_mito'],0.125)
+    self.assertEqual(cell_qc.loc['AAAG-1','percent_mito'],0)
+    self.assertAlmostEqual(cell_qc.loc['AAAT-1','percent_mito'],0.75)
+
+  def test_calculate_cell_qc_metrics_from_mtx_with_feature_mask(self):
+    cell_qc = \
+      calculate_cell_qc_metrics_from_mtx(
+        matrix_file=self.matrix_file,
+        features_tsv=self.features_tsv,
+        barcode_tsv=self.barcode_tsv,
+        mito_genes=['MT-ND1','MT-ND2'],
+        chunk_size=2,
+        feature_mask=np.array([False,True,True]))                               # skip GENE1
+    self.assertEqual(list(cell_qc['n_genes']),[2,0,2])
+    self.assertEqual(list(cell_qc['n_counts']),[5,0,8])
+    self.assertAlmostEqual(cell_qc.loc['AAAC-1','percent_mito'],0.2)
+    self.assertEqual(cell_qc.loc['AAAG-1','percent_mito'],0)
+
+  def test_count_cells_per_feature_from_mtx(self):
+    n_cells = \
+      count_cells_per_feature_from_mtx(
+        matrix_file=self.matrix_file,
+        chunk_size=4)
+    self.assertEqual(list(n_cells),[2,2,2])
+    n_cells = \
+      count_cells_per_feature_from_mtx(
+        matrix_file=self.matrix_file,
+        cell_mask=np.array([True,True,False]),
+        chunk_size=4)
+    self.assertEqual(list(n_cells),[2,1,1])
+
+  def test_read_feature_and_barcode_names(self):
+    features,barcodes = \
+      read_feature_and_barcode_names(
+        features_tsv=self.features_tsv,
+        barcode_tsv=self.barcode_tsv)
+    self.assertEqual(list(features['feature_types']),['Gene Expression']*3)
+    self.assertEqual(barcodes,['AAAC-1','AAAG-1','AAAT-1'])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,148 @@
+import os,unittest,time
+from igf_data.igfdb.igfTables import Base,Pipeline_seed
+from igf_data.utils.dbutils import read_dbconf_json
+from igf_data.igfdb.baseadaptor import BaseAdaptor
+from igf_data.igfdb.projectadaptor import ProjectAdaptor
+from igf_data.igfdb.sampleadaptor import SampleAdaptor
+from igf_data.igfdb.experimentadaptor import ExperimentAdaptor
+from igf_data.igfdb.collectionadaptor import CollectionAdaptor
+from igf_data.igfdb.pipelineadaptor import PipelineAdaptor
+from igf_data.utils.fileutils import remove_dir,get_temp_dir
+from igf_data.utils.config_genome_browser import Config_genome_browser
+
+class Config_genome_browser_test1(unittest.TestCase):
+  def setUp(self):
+    self.dbconfig = 'data/dbconfig.json'
+    dbparam=read_dbconf_json(self.dbconfig)
+    base = BaseAdaptor(**dbparam)
+    self.engine = base.engine
+    self.dbname=dbparam['dbname']
+    Base.metadata.drop_all(self.engine)
+    if os.path.exists(self.dbname):
+      os.remove(self.dbname)
+    Base.metadata.create_all(self.engine)
+    self.session_class=base.get_session_class()
+    self.temp_dir=get_temp_dir()
+    base.start_session()
+    project_data=[{'project_igf_id':'Project{0}'.format(i)}
+                    for i in ('A','B','C')]
+    pa=ProjectAdaptor(**{'session':base.session})
+    pa.store_project_and_attribute_data(data=project_data)
+    sample_data=[{'sample_igf_id':'SampleA','project_igf_id':'ProjectA','species_name':'HG38'},
+                 {'sample_igf_id':'SampleB','project_igf_id':'ProjectB','species_name':'HG38'},
+                 {'sample_igf_id':'SampleC','project_igf_id':'ProjectC','species_name':'MM10'}]
+    sa=SampleAdaptor(**{'session':base.session})
+    sa.store_sample_and_attribute_data(data=sample_data)
+    experiment_data=[{'experiment_igf_id':'Experiment{0}'.format(i),
+                      'sample_igf_id':'Sample{0}'.format(i),
+                      'library_name':'Sample{0}'.format(i),
+                      'experiment_type':'POLYA-RNA',
+                      'platform_name':'HISEQ4000',
+                      'project_igf_id':'Project{0}'.format(i)}
+                       for i in ('A','B','C')]
+    ea=ExperimentAdaptor(**{'session':base.session})
+    ea.store_project_and_attribute_data(data=experiment_data)
+    self.track_files=dict()
+    collection_data=list()
+    for i in ('A','B','C'):
+      for strand in ('str1','str2'):
+        track_file = \
+          os.path.join(
+            self.temp_dir,
+            'Sample{0}.{1}.bw'.format(i,strand))
+        with open(track_file,'w') as fp:
+          fp.write('A')
+        self.track_files.setdefault(i,list()).append(track_file)
+        collection_data.append({
+          'name':'Experiment{0}'.format(i),
+          'type':'STAR_BIGWIG',
+          'table':'experiment',
+          'file_path':track_file})
+    collection_data.append({
+      'name':'HG38',
+      'type':'GENOME_TWOBIT_URI',
+      'table':'file',
+      'file_path':'http://hg38.2bit'})
+    ca=CollectionAdaptor(**{'session':base.session})
+    ca.load_file_and_create_collection(
+      data=collection_data,
+      calculate_file_size_and_md5=False)
+    pipeline_data=[{'pipeline_name':'PrimaryAnalysis',
+                    'pipeline_db':'sqlite:////analysis.db'}]
+    pp=PipelineAdaptor(**{'session':base.session})
+    pp.store_pipeline_data(data=pipeline_data)
+    pipeseed_data=[{'pipeline_name':'PrimaryAnalysis',
+                    'seed_table':'experiment',
+                    'seed_id':ea.fetch_experiment_records_id('Experiment{0}'.format(i)).experiment_id}
+                     for i in ('A','B','C')]
+    pp.create_pipeline_seed(
+      data=pipeseed_data,
+      required_columns=['pipeline_id','seed_id','seed_table'])
+    base.session.query(Pipeline_seed).update({'status':'FINISHED'})              # mark analysis as finished
+    base.commit_session()
+    base.close_session()
+    self.template_file = os.path.join(self.temp_dir,'biodalliance.html')
+    with open(self.template_file,'w') as fp:
+      fp.write('{{ twoBitRefRemoteUrl }}\n{% for row in bwdata %}{{ row.track_name }}:{{ row.track_path }}\n{% endfor %}')
+
+  def tearDown(self):
+    Base.metadata.drop_all(self.engine)
+    os.remove(self.dbname)
+    if os.path.exists(self.temp_dir):
+      remove_dir(dir_path=self.temp_dir)
+
+  def _get_config_genome_browser(self,project_igf_id=None):
+    return Config_genome_browser(
+             dbsession_class=self.session_class,
+             project_igf_id=project_igf_id,
+             collection_type_list=['STAR_BIGWIG'],
+             pipeline_name='PrimaryAnalysis',
+             collection_table='experiment',
+             species_name='HG38',
+             ref_genome_type='GENOME_TWOBIT_URI')
+
+  def test_build_biodalliance_config_for_projects(self):
+    output_dir = os.path.join(self.temp_dir,'output')
+    cg = self._get_config_genome_browser()
+    output_files = \
+      cg.build_biodalliance_config_for_projects(
+        template_file=self.template_file,
+        output_dir=output_dir)
+    self.assertEqual(sorted(output_files.keys()),['ProjectA','ProjectB'])       # no HG38 track for ProjectC
+    single_output = os.path.join(self.temp_dir,'single.html')
+    self._get_config_genome_browser(project_igf_id='ProjectA').\
+      build_biodalliance_config(
+        template_file=self.template_file,
+        output_file=single_output)
+    with open(single_output,'r') as fp:
+      single_data = fp.read()
+    with open(output_files.get('ProjectA'),'r') as fp:
+      batch_data = fp.read()
+    self.assertEqual(batch_data,single_data)
+    self.assertTrue('SampleA.POLYA-RNA.STAR_BIGWIG.str1:analysis/SampleA/SampleA.str1.bw' in batch_data)
+    self.assertTrue(os.path.exists(os.path.join(output_dir,'genome_browser_build_state.json')))
+    self.assertEqual(
+      [f for f in os.listdir(output_dir) if f.startswith('.')],[])              # no temp state file left
+    output_files = \
+      cg.build_biodalliance_config_for_projects(
+        template_file=self.template_file,
+        output_dir=output_dir,
+        project_igf_id_list=['ProjectA','ProjectB'])
+    self.assertEqual(output_files,{})                                           # no change in track files
+    new_mtime = time.time() + 10
+    os.utime(self.track_files.get('B')[0],(new_mtime,new_mtime))
+    output_files = \
+      cg.build_biodalliance_config_for_projects(
+        template_file=self.template_file,
+        output_dir=output_dir)
+    self.assertEqual(list(output_files.keys()),['ProjectB'])
+    output_files = \
+      cg.build_biodalliance_config_for_projects(
+        template_file=self.template_file,
+        output_dir=output_dir,
+        project_igf_id_list=['ProjectA'],
+        force=True)
+    self.assertEqual(list(output_files.keys()),['ProjectA'])
+
+if __name__=='__main__':
+  unittest.main()
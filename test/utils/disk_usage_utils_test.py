@@ -0,0 +1,99 @@
+import os,json,unittest,subprocess
+from igf_data.utils.fileutils import get_temp_dir,remove_dir
+from igf_data.utils.disk_usage_utils import get_sub_directory_size_in_gb,_scan_directory_tree
+
+class Disk_usage_utils_test1(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir = get_temp_dir()
+    self.input_path = os.path.join(self.temp_dir,'projects')
+    for project_name,file_count in (('ProjectA',3),('ProjectB',1)):
+      sub_dir = os.path.join(self.input_path,project_name,'sampleA','results')
+      os.makedirs(sub_dir)
+      for i in range(file_count):
+        with open(os.path.join(sub_dir,'file{0}.txt'.format(i)),'w') as fp:
+          fp.write('A' * 10000 * (i + 1))
+    os.link(
+      os.path.join(self.input_path,'ProjectA','sampleA','results','file2.txt'),
+      os.path.join(self.input_path,'ProjectA','file2_link.txt'))                # hard link in same project
+    with open(os.path.join(self.input_path,'readme.txt'),'w') as fp:
+      fp.write('A' * 5000)
+    self.snapshot_dir = os.path.join(self.temp_dir,'snapshot')
+
+  def tearDown(self):
+    remove_dir(self.temp_dir)
+
+  def _get_du_bytes(self,path):
+    proc = \
+      subprocess.run(
+        ['du','-s','-B1',path],
+        stdout=subprocess.PIPE,
+        check=True)
+    return int(proc.stdout.decode('utf-8').split()[0])
+
+  def test_get_sub_directory_size_in_gb(self):
+    storage_stats,description,column_order = \
+      get_sub_directory_size_in_gb(
+        input_path=self.input_path,
+        snapshot_dir=self.snapshot_dir)
+    self.assertEqual(column_order,['directory_name','directory_size'])
+    self.assertEqual(
+      [entry.get('directory_name') for entry in storage_stats],
+      ['ProjectA','ProjectB','readme.txt'])
+    for entry in storage_stats:
+      du_bytes = \
+        self._get_du_bytes(
+          os.path.join(self.input_path,entry.get('directory_name')))
+      self.assertAlmostEqual(
+        entry.get('directory_size'),
+        du_bytes/1024/1024/1024)                                                # same as du, hard links counted once
+    self.assertEqual(
+      sorted(os.listdir(self.snapshot_dir)),
+      ['ProjectA.json','ProjectB.json'])                                        # no snapshot for files
+
+  def test_incremental_scan(self):
+    project_path = os.path.join(self.input_path,'ProjectA')
+    total_bytes,dir_snapshot,scanned_dirs = \
+      _scan_directory_tree(dir_path=project_path)
+    self.assertEqual(scanned_dirs,3)
+    _,_,scanned_dirs = \
+      _scan_directory_tree(
+        dir_path=project_path,
+        dir_snapshot=dir_snapshot)
+    self.assertEqual(scanned_dirs,0)                                            # no change in dir mtime
+    with open(os.path.join(project_path,'sampleA','new_file.txt'),'w') as fp:
+      fp.write('A' * 10000)
+    new_bytes,_,scanned_dirs = \
+      _scan_directory_tree(
+        dir_path=project_path,
+        dir_snapshot=dir_snapshot)
+    self.assertEqual(scanned_dirs,1)                                            # only sampleA rescanned
+    self.assertEqual(new_bytes,self._get_du_bytes(project_path))
+    self.assertTrue(new_bytes > total_bytes)
+    get_sub_directory_size_in_gb(
+      input_path=self.input_path,
+      snapshot_dir=self.snapshot_dir)
+    snapshot_file = os.path.join(self.snapshot_dir,'ProjectA.json')
+    with open(snapshot_file,'r') as fp:
+      snapshot = json.load(fp)
+    snapshot['dirs']['sampleA/results']['bytes'] += 1024 ** 3                   # fake a large recorded usage
+    with open(snapshot_file,'w') as fp:
+      json.dump(snapshot,fp)
+    storage_stats,_,_ = \
+      get_sub_directory_size_in_gb(
+        input_path=self.input_path,
+        snapshot_dir=self.snapshot_dir)
+    self.assertTrue(storage_stats[0].get('directory_size') > 1)                 # recorded usage reused
+    storage_stats,_,_ = \
+      get_sub_directory_size_in_gb(
+        input_path=self.input_path,
+        snapshot_dir=self.snapshot_dir,
+        force=True)
+    self.assertTrue(storage_stats[0].get('directory_size') < 1)
+    remove_dir(os.path.join(self.input_path,'ProjectB'))
+    get_sub_directory_size_in_gb(
+      input_path=self.input_path,
+      snapshot_dir=self.snapshot_dir)
+    self.assertFalse(os.path.exists(os.path.join(self.snapshot_dir,'ProjectB.json')))
+
+if __name__=='__main__':
+  unittest.main()
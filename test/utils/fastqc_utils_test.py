@@ -0,0 +1,55 @@
+import os,zipfile,unittest
+from igf_data.utils.fileutils import get_temp_dir,remove_dir
+from igf_data.utils.fastqc_utils import get_fastq_info_from_fastq_zip
+from igf_data.utils.fastqc_utils import get_fastq_info_from_fastq_zip_list
+
+class Fastqc_utils_test1(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir = get_temp_dir()
+    self.fastqc_zip_list = list()
+    for i in range(5):
+      fastq_name = 'IGF{0}_S1_L001_R1_001.fastq.gz'.format(i)
+      fastqc_zip = \
+        os.path.join(
+          self.temp_dir,
+          fastq_name.replace('.fastq.gz','_fastqc.zip'))
+      fastqc_data = \
+        '##FastQC\t0.11.2\n>>Basic Statistics\tpass\n#Measure\tValue\nFilename\t{0}\n' + \
+        'File type\tConventional base calls\nTotal Sequences\t{1}\n>>END_MODULE\n'
+      with zipfile.ZipFile(fastqc_zip,'w',zipfile.ZIP_DEFLATED) as zip_obj:
+        zip_obj.writestr(
+          '{0}/fastqc_report.html'.format(os.path.basename(fastqc_zip)[:-4]),
+          'report')
+        zip_obj.writestr(
+          '{0}/fastqc_data.txt'.format(os.path.basename(fastqc_zip)[:-4]),
+          fastqc_data.format(fastq_name,1000*(i+1)))
+      self.fastqc_zip_list.append(fastqc_zip)
+
+  def tearDown(self):
+    remove_dir(self.temp_dir)
+
+  def test_get_fastq_info_from_fastq_zip(self):
+    total_reads,fastq_filename = \
+      get_fastq_info_from_fastq_zip(self.fastqc_zip_list[0])
+    self.assertEqual(total_reads,'1000')
+    self.assertEqual(fastq_filename,'IGF0_S1_L001_R1_001.fastq.gz')
+
+  def test_get_fastq_info_from_fastq_zip_list(self):
+    fastqc_info = \
+      get_fastq_info_from_fastq_zip_list(
+        fastqc_zip_list=self.fastqc_zip_list,
+        threads=2)
+    self.assertEqual(len(fastqc_info.index),5)
+    self.assertEqual(
+      fastqc_info['total_reads'].tolist(),
+      ['1000','2000','3000','4000','5000'])
+    self.assertEqual(
+      fastqc_info['fastqc_zip'].tolist(),
+      self.fastqc_zip_list)
+    with self.assertRaises(ValueError):
+      get_fastq_info_from_fastq_zip_list(
+        fastqc_zip_list=[os.path.join(self.temp_dir,'missing_fastqc.zip')],
+        threads=1)
+
+if __name__=='__main__':
+  unittest.main()
@@ -1,8 +1,11 @@
 import pandas as pd
-import os,tarfile,unittest
+import os,gzip,tarfile,unittest
 from dateutil.parser import parse
 from igf_data.utils.fileutils import prepare_file_archive,get_temp_dir,remove_dir
 from igf_data.utils.fileutils import create_file_manifest_for_dir,get_datestamp_label
+from igf_data.utils.fileutils import link_or_copy_local_file,read_archive_member,build_archive_member_index
+from igf_data.utils.fileutils import Parallel_gzip_writer
+from igf_data.utils.tools.cellranger.cellranger_count_utils import extract_cellranger_count_metrics_summary
 
 class Fileutils_test1(unittest.TestCase):
   def setUp(self):
@@ -75,6 +78,37 @@ class Fileutils_test1(unittest.TestCase):
     self.assertTrue('web_summary.html' in tar_file_list)
     self.assertTrue('possorted_genome_bam.bam.html' not in tar_file_list)
 
+  def test_parallel_targz_output_with_manifest(self):
+    with open(os.path.join(self.results_dir,'web_summary.html'),'w') as fp:
+      fp.write('ACGT' * 100000)
+    manifest_file=os.path.join(self.results_dir,'file_manifest.csv')
+    prepare_file_archive(results_dirpath=self.results_dir,
+                         output_file=self.output_targz_file,
+                         gzip_output=True,
+                         exclude_list=['*.bam','*.bam.bai'],
+                         threads=4,
+                         manifest_file=manifest_file)
+    with tarfile.open(self.output_targz_file,'r:gz') as tar:
+      tar_file_list=tar.getnames()
+      html_data=tar.extractfile('web_summary.html').read()
+    self.assertEqual(len(tar_file_list),18)
+    self.assertEqual(tar_file_list[-1],'file_manifest.csv')                     # manifest added at the end
+    self.assertTrue('possorted_genome_bam.bam' not in tar_file_list)
+    self.assertEqual(html_data,b'ACGT' * 100000)
+    manifest_data=pd.read_csv(manifest_file)
+    create_file_manifest_for_dir(results_dirpath=self.results_dir,
+                                 output_file=self.manifest_file,
+                                 exclude_list=['*.bam','*.bam.bai','file_manifest.csv'])
+    expected_data=pd.read_csv(self.manifest_file)
+    self.assertEqual(len(manifest_data.index),17)
+    self.assertTrue(manifest_data.sort_values('file_path').reset_index(drop=True).\
+                      equals(expected_data.sort_values('file_path').reset_index(drop=True)))
+    gzip_file=os.path.join(os.path.dirname(self.output_targz_file),'test.txt.gz')
+    with Parallel_gzip_writer(gzip_file,threads=2,block_size=1000) as fp:
+      fp.write(b'ACGT' * 1000)
+    with gzip.open(gzip_file,'rb') as fp:
+      self.assertEqual(fp.read(),b'ACGT' * 1000)
+
   def test_create_file_manifest_for_dir(self):
     create_file_manifest_for_dir(results_dirpath=self.results_dir,
                                  output_file=self.manifest_file)
@@ -88,6 +122,63 @@ class Fileutils_test1(unittest.TestCase):
     date_str='2018-08-23 15:15:01'
     self.assertEqual(get_datestamp_label(date_str),'20180823')
     self.assertEqual(get_datestamp_label(parse(date_str)),'20180823')
+  def test_link_or_copy_local_file(self):
+    temp_dir=get_temp_dir()
+    target_dir=os.path.join(temp_dir,'results')
+    staged_bytes=link_or_copy_local_file(source_path=self.results_dir,
+                                         destination_path=target_dir)
+    self.assertEqual(sum(staged_bytes.values()),19)
+    self.assertEqual(staged_bytes.get('hardlink'),19)                            # same filesystem
+    source_file=os.path.join(self.results_dir,'analysis/pca/10_components/variance.csv')
+    target_file=os.path.join(target_dir,'analysis/pca/10_components/variance.csv')
+    self.assertEqual(os.stat(source_file).st_ino,os.stat(target_file).st_ino)
+    with self.assertRaises(ValueError):
+      link_or_copy_local_file(source_path=self.results_dir,
+                              destination_path=target_dir)
+    target_file=os.path.join(temp_dir,'web_summary.html')
+    staged_bytes=link_or_copy_local_file(source_path=os.path.join(self.results_dir,'web_summary.html'),
+                                         destination_path=target_file,
+                                         use_hardlink=False,
+                                         use_reflink=False)
+    self.assertEqual(staged_bytes.get('copy'),1)
+    self.assertNotEqual(os.stat(target_file).st_ino,
+                        os.stat(os.path.join(self.results_dir,'web_summary.html')).st_ino)
+    remove_dir(temp_dir)
+  def test_read_archive_member(self):
+    with open(os.path.join(self.results_dir,'metrics_summary.csv'),'w') as fp:
+      fp.write('Estimated Number of Cells,Mean Reads per Cell\n"1,000",20\n')
+    for gzip_output,output_file in ((False,self.output_tar_file),(True,self.output_targz_file)):
+      prepare_file_archive(results_dirpath=self.results_dir,
+                           output_file=output_file,
+                           gzip_output=gzip_output)
+      member_name,data=read_archive_member(archive_path=output_file,
+                                           member_pattern='genes.tsv',
+                                           match_basename=True)
+      self.assertTrue(member_name.endswith('GRCh38/genes.tsv'))
+      self.assertEqual(data,b'A')
+      member_name,data=read_archive_member(archive_path=output_file,
+                                           member_pattern='analysis/pca/*/variance.csv',
+                                           use_index=True)
+      self.assertEqual(member_name,'analysis/pca/10_components/variance.csv')
+      self.assertEqual(data,b'A')
+      self.assertTrue(os.path.exists('{0}.index.json'.format(output_file)))
+      index_file=build_archive_member_index(archive_path=output_file)
+      _,data=read_archive_member(archive_path=output_file,
+                                 member_pattern='metrics_summary.csv',
+                                 use_index=True,
+                                 index_file=index_file)
+      self.assertTrue(data.startswith(b'Estimated Number of Cells'))
+      with self.assertRaises(ValueError):
+        read_archive_member(archive_path=output_file,
+                            member_pattern='*.cram',
+                            use_index=True)
+      os.remove(index_file)
+    metrics=extract_cellranger_count_metrics_summary(cellranger_tar=self.output_targz_file,
+                                                     collection_name='IGF0001',
+                                                     attribute_prefix='CELLRANGER')
+    metrics=dict([(entry['attribute_name'],entry['attribute_value'])
+                    for entry in metrics])
+    self.assertEqual(metrics.get('CELLRANGER_Estimated_Number_of_Cells'),'1,000')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,98 @@
+import os, gzip, datetime, unittest
+import gviz_api
+import pandas as pd
+from igf_data.utils.fileutils import get_temp_dir,remove_dir
+from igf_data.utils.gviz_utils import write_gviz_json,convert_to_gviz_json_for_display
+
+class Gviz_utils_test1(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir = get_temp_dir()
+    self.description = \
+      {'sample':('string','Sample'),
+       'reads':('number','Read count'),
+       'ratio':('number','Ratio'),
+       'status':('boolean','Status'),
+       'date':('datetime','Run date'),
+       'comment':('string','Comment äµ')}
+    self.columns_order = ['sample','reads','ratio','status','date','comment']
+    self.data = [
+      {'sample':'IGF{0}'.format(i),
+       'reads':1000 * i,
+       'ratio':i / 3,
+       'status':i % 2,
+       'date':datetime.datetime(2019,1,i + 1,10,30,0),
+       'comment':'<a href="x">\'sample\' {0}</a> ü'.format(i)}
+        for i in range(20)]
+    self.data.append({'sample':'IGF_missing'})
+
+  def tearDown(self):
+    remove_dir(self.temp_dir)
+
+  def _get_gviz_api_json(self,description,data,columns_order):
+    data_table = gviz_api.DataTable(description)
+    data_table.LoadData(data)
+    return data_table.ToJSon(columns_order=columns_order)
+
+  def test_write_gviz_json(self):
+    gviz_json = \
+      self._get_gviz_api_json(
+        description=self.description,
+        data=self.data,
+        columns_order=self.columns_order)
+    json_data = \
+      write_gviz_json(
+        description=self.description,
+        data=iter(self.data),
+        columns_order=self.columns_order)
+    self.assertEqual(json_data,gviz_json)
+    output_file = os.path.join(self.temp_dir,'test.json')
+    convert_to_gviz_json_for_display(
+      description=self.description,
+      data=self.data,
+      columns_order=self.columns_order,
+      output_file=output_file)
+    with open(output_file,'rb') as fp:
+      self.assertEqual(fp.read(),gviz_json.encode('utf-8'))
+    output_file = os.path.join(self.temp_dir,'test.json.gz')
+    write_gviz_json(
+      description=self.description,
+      data=self.data,
+      columns_order=self.columns_order,
+      output_file=output_file)
+    with gzip.open(output_file,'rb') as fp:
+      self.assertEqual(fp.read(),gviz_json.encode('utf-8'))
+
+  def test_write_gviz_json_from_dataframe(self):
+    data = pd.DataFrame(self.data[:-1])
+    gviz_json = \
+      self._get_gviz_api_json(
+        description=self.description,
+        data=data.to_dict(orient='records'),
+        columns_order=self.columns_order)
+    json_data = \
+      convert_to_gviz_json_for_display(
+        description=self.description,
+        data=data,
+        columns_order=self.columns_order)
+    self.assertEqual(json_data,gviz_json)
+    description = [('sample','string'),('reads','number')]
+    data = [['IGF1',10],['IGF2',20],['IGF3']]
+    self.assertEqual(
+      write_gviz_json(description=description,data=data),
+      self._get_gviz_api_json(description,data,None))
+    self.assertEqual(
+      write_gviz_json(description=description,data=[]),
+      self._get_gviz_api_json(description,[],None))
+    with self.assertRaises(ValueError):
+      write_gviz_json(description=description,data=[['IGF1','ten']])
+    description = {('sample','string'):{'reads':'number'}}                      # nested description
+    data = {'IGF1':{'reads':10},'IGF2':{'reads':20}}
+    self.assertEqual(
+      convert_to_gviz_json_for_display(
+        description=description,
+        data=data,
+        columns_order=['sample','reads']),
+      self._get_gviz_api_json(description,data,['sample','reads']))
+
+if __name__=='__main__':
+  unittest.main()
@@ -0,0 +1,212 @@
+import os,json,re,time,unittest,threading
+from http.server import HTTPServer,BaseHTTPRequestHandler
+from igf_data.utils.fileutils import get_temp_dir,remove_dir
+from igf_data.task_tracking.igf_asana import IGF_asana
+from igf_data.task_tracking.asana_task_cache import Asana_task_cache
+from igf_data.task_tracking.asana_comment_queue import Asana_comment_queue
+
+class _Fake_asana_handler(BaseHTTPRequestHandler):
+  '''
+  A minimal Asana api handler for testing, tasks are listed 2 per page
+  '''
+  def log_message(self,*args):
+    pass
+
+  def _send_data(self,data,code=200):
+    body = json.dumps(data).encode('utf-8')
+    self.send_response(code)
+    self.send_header('Content-Type','application/json')
+    self.send_header('Content-Length',str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def _read_body(self):
+    length = int(self.headers.get('Content-Length',0))
+    return self.rfile.read(length)
+
+  def do_GET(self):
+    server = self.server
+    path,_,query = self.path.partition('?')
+    server.requests.append(('GET',path))
+    params = dict([q.split('=',1) for q in query.split('&') if '=' in q])
+    if path == '/users/me':
+      self._send_data({'data':{
+        'gid':'1','name':'test',
+        'workspaces':[{'gid':'10','name':'test_workspace'}]}})
+    elif path == '/projects':
+      self._send_data({'data':[{'gid':'100','name':'test_project'}]})
+    elif path == '/tasks':
+      offset = int(params.get('offset',0))
+      tasks = server.tasks[offset:offset+2]
+      next_page = None
+      if offset + 2 < len(server.tasks):
+        next_page = {'offset':str(offset + 2)}
+      self._send_data({'data':tasks,'next_page':next_page})
+    else:
+      self._send_data({'errors':[{'message':'not found'}]},code=404)
+
+  def do_POST(self):
+    server = self.server
+    server.requests.append(('POST',self.path))
+    body = self._read_body()
+    if self.path == '/workspaces/10/tasks':
+      data = json.loads(body.decode('utf-8')).get('data')
+      task = {'gid':str(1000 + len(server.tasks)),'name':data.get('name')}
+      server.tasks.append(task)
+      self._send_data({'data':task},code=201)
+    elif re.match(r'^/tasks/\d+/stories$',self.path):
+      task_id = self.path.split('/')[2]
+      if task_id not in [t.get('gid') for t in server.tasks]:
+        self._send_data({'errors':[{'message':'not found'}]},code=404)
+        return
+      text = json.loads(body.decode('utf-8')).get('data').get('text')
+      server.stories.append((task_id,text))
+      self._send_data({'data':{'gid':'5','text':text}},code=201)
+    elif re.match(r'^/tasks/\d+/attachments$',self.path):
+      server.attachments.append(self.path.split('/')[2])
+      self._send_data({'data':{'gid':'6'}},code=200)
+    else:
+      self._send_data({'errors':[{'message':'not found'}]},code=404)
+
+
+class Igf_asana_test1(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir = get_temp_dir()
+    os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'                             # fake server is http only
+    self.server = HTTPServer(('127.0.0.1',0),_Fake_asana_handler)
+    self.server.requests = list()
+    self.server.stories = list()
+    self.server.attachments = list()
+    self.server.tasks = [
+      {'gid':str(1000 + i),'name':'IGFP000{0}'.format(i)}
+        for i in range(5)]
+    self.server_thread = \
+      threading.Thread(target=self.server.serve_forever,daemon=True)
+    self.server_thread.start()
+    self.asana_config = os.path.join(self.temp_dir,'asana_config.json')
+    with open(self.asana_config,'w') as fp:
+      json.dump({
+        'asana_personal_token':'test_token',
+        'asana_base_url':'http://127.0.0.1:{0}'.format(self.server.server_port)},fp)
+    self.cache_file = os.path.join(self.temp_dir,'asana_task_cache.json')
+
+  def tearDown(self):
+    self.server.shutdown()
+    self.server.server_close()
+    remove_dir(self.temp_dir)
+
+  def _count_requests(self,method,path):
+    return len([r for r in self.server.requests if r==(method,path)])
+
+  def test_get_asana_task_id(self):
+    igf_asana = \
+      IGF_asana(
+        asana_config=self.asana_config,
+        asana_project_id='100',
+        task_cache_file=self.cache_file)
+    self.assertEqual(igf_asana.get_asana_task_id('IGFP0003'),'1003')
+    self.assertEqual(self._count_requests('GET','/tasks'),3)                    # 5 tasks in 3 pages
+    self.assertEqual(igf_asana.get_asana_task_id('IGFP0004'),'1004')
+    self.assertEqual(igf_asana.get_asana_task_id('IGFP0001'),'1001')
+    self.assertEqual(self._count_requests('GET','/tasks'),3)                    # lookup from cache
+    igf_asana2 = \
+      IGF_asana(
+        asana_config=self.asana_config,
+        asana_project_id='100',
+        task_cache_file=self.cache_file)
+    self.assertEqual(igf_asana2.get_asana_task_id('IGFP0002'),'1002')
+    self.assertEqual(self._count_requests('GET','/tasks'),3)                    # lookup from cache file
+    igf_asana2.comment_asana_task(task_name='IGFP0009',comment='new task')
+    self.assertEqual(self._count_requests('POST','/workspaces/10/tasks'),1)
+    self.assertEqual(igf_asana.get_asana_task_id('IGFP0009'),'1005')            # new task id added to cache
+    self.assertEqual(self._count_requests('GET','/tasks'),6)
+    self.server.tasks[0]['gid'] = '2000'                                        # task id changed on server
+    igf_asana.comment_asana_task(task_name='IGFP0000',comment='stale id')
+    self.assertEqual(self.server.stories[-1],('2000','stale id'))
+    self.assertIsNone(igf_asana.get_asana_task_id('IGFP0010'))
+    task_listing_count = self._count_requests('GET','/tasks')
+    self.assertIsNone(igf_asana.get_asana_task_id('IGFP0010'))
+    self.assertEqual(self._count_requests('GET','/tasks'),task_listing_count)   # missing task is cached
+    self.assertEqual(igf_asana.task_cache.metrics.get('missing_hits'),1)
+    igf_asana.comment_asana_task(task_name='IGFP0010',comment='new task')
+    self.assertEqual(igf_asana2.get_asana_task_id('IGFP0010'),'1006')           # created task removed from missing list
+
+  def test_get_asana_task_id_with_broken_cache(self):
+    igf_asana = \
+      IGF_asana(
+        asana_config=self.asana_config,
+        asana_project_id='100',
+        task_cache_file=os.path.join(self.asana_config,'asana_task_cache.json')) # cache file path not writable
+    self.assertEqual(igf_asana.get_asana_task_id('IGFP0003'),'1003')
+    igf_asana.comment_asana_task(task_name='IGFP0009',comment='new task')
+    self.assertEqual(self.server.stories[-1],('1005','new task'))
+    self.assertTrue(igf_asana.task_cache.metrics.get('errors') > 0)
+
+  def test_asana_task_cache_ttl(self):
+    task_cache = Asana_task_cache(cache_file=self.cache_file,ttl=0)
+    task_cache.set_project_tasks('100',{'IGFP0001':['1001']})
+    self.assertIsNone(task_cache.get_task_ids('100','IGFP0001'))                # stale cache
+    task_cache = Asana_task_cache(cache_file=self.cache_file,ttl=100)
+    self.assertEqual(task_cache.get_task_ids('100','IGFP0001'),['1001'])
+    task_cache.rename_task('100','IGFP0001','IGFP0001_old')
+    self.assertIsNone(task_cache.get_task_ids('100','IGFP0001'))
+    self.assertEqual(task_cache.get_task_ids('100','IGFP0001_old'),['1001'])
+    task_cache.add_missing_task('100','IGFP0002')
+    self.assertEqual(task_cache.get_task_ids('100','IGFP0002'),[])
+    task_cache = Asana_task_cache(cache_file=self.cache_file,missing_ttl=0)
+    self.assertIsNone(task_cache.get_task_ids('100','IGFP0002'))                # missing entry expired
+
+  def test_asana_comment_queue(self):
+    igf_asana = \
+      IGF_asana(
+        asana_config=self.asana_config,
+        asana_project_id='100',
+        task_cache_file=self.cache_file)
+    asana_queue = \
+      Asana_comment_queue(
+        igf_asana=igf_asana,
+        flush_interval=0.2,
+        min_request_interval=0)
+    for i in range(5):
+      asana_queue.add_comment(task_name='IGFP0001',comment='comment {0}'.format(i))
+    asana_queue.add_comment(task_name='IGFP0002',comment='comment 5')
+    attachment = os.path.join(self.temp_dir,'report.txt')
+    with open(attachment,'w') as fp:
+      fp.write('report')
+    asana_queue.add_attachment(task_name='IGFP0002',filepath=attachment)
+    asana_queue.close()
+    metrics = asana_queue.get_metrics()
+    self.assertEqual(metrics.get('queued'),7)
+    self.assertEqual(metrics.get('comments'),6)
+    self.assertEqual(metrics.get('stories'),2)                                  # comments merged per task
+    self.assertEqual(metrics.get('attachments'),1)
+    self.assertEqual(metrics.get('failed'),0)
+    self.assertEqual(len(self.server.stories),2)
+    self.assertEqual(self.server.stories[0][0],'1001')
+    self.assertTrue('comment 0' in self.server.stories[0][1])
+    self.assertTrue('comment 4' in self.server.stories[0][1])
+    self.assertEqual(self.server.attachments,['1002'])
+    self.assertEqual(self._count_requests('GET','/tasks'),3)                    # one task listing for all items
+    with self.assertRaises(ValueError):
+      asana_queue.add_comment(task_name='IGFP0001',comment='closed')
+
+  def test_asana_comment_queue_rate_limit(self):
+    asana_queue = \
+      Asana_comment_queue(
+        igf_asana=lambda: IGF_asana(
+                            asana_config=self.asana_config,
+                            asana_project_id='100',
+                            task_cache_file=self.cache_file),
+        flush_interval=0,
+        merge_comments=False,
+        min_request_interval=0.2)
+    start_time = time.time()
+    for i in range(3):
+      asana_queue.add_comment(task_name='IGFP0001',comment='comment {0}'.format(i))
+    asana_queue.close()
+    self.assertTrue(time.time() - start_time >= 0.4)                            # two waits between three stories
+    self.assertEqual(asana_queue.get_metrics().get('stories'),3)
+    self.assertEqual(len(self.server.stories),3)
+
+if __name__=='__main__':
+  unittest.main()
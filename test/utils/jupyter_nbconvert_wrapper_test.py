@@ -2,6 +2,7 @@ import os,unittest
 from igf_data.utils.fileutils import get_temp_dir,remove_dir
 from igf_data.utils.jupyter_nbconvert_wrapper import nbconvert_execute_in_singularity
 from igf_data.utils.jupyter_nbconvert_wrapper import Notebook_runner
+from igf_data.utils.jupyter_nbconvert_wrapper import nbconvert_batch_in_singularity
 
 class Nbconvert_execute_test1(unittest.TestCase):
   def setUp(self):
@@ -115,6 +116,31 @@ class Nbconvert_execute_test2(unittest.TestCase):
     self.assertEqual(modified_path,os.path.join(nr.container_dir_prefix,os.path.basename(initial_path)))
     moved_path = os.path.join(nr.temp_dir,os.path.basename(initial_path))
     self.assertTrue(os.path.exists(moved_path))
+    self.assertEqual(
+      nr.bind_paths,
+      ['{0}:{1}:ro'.format(os.path.realpath(initial_path),modified_path)])
+    self.assertEqual(nr.get_staging_stats().get('bind'),1)
+    self.assertEqual(nr.get_staging_stats().get('copied_bytes'),0)
+
+  def test_substitute_input_path_and_link_files_to_tempdir(self):
+    input_path = os.path.join(self.temp_dir,'input_A')
+    nr = \
+      Notebook_runner(
+        template_ipynb_path=self.template_path,
+        output_dir=self.temp_dir,
+        input_param_map={'inputA':[input_path],'inputB':{'a':input_path}},
+        use_bind_mount=False)
+    modified_input_map = \
+      nr._substitute_input_path_and_copy_files_to_tempdir()
+    self.assertEqual(
+      modified_input_map.get('inputA')[0],
+      modified_input_map.get('inputB').get('a'))
+    moved_path = os.path.join(nr.temp_dir,'input_A')
+    self.assertEqual(os.stat(moved_path).st_ino,os.stat(input_path).st_ino)
+    staging_stats = nr.get_staging_stats()
+    self.assertEqual(staging_stats.get('hardlink'),1)                           # repeated input is staged once
+    self.assertEqual(staging_stats.get('staged_bytes'),1)
+    self.assertEqual(len(nr.bind_paths),0)
 
   def test_get_date_stamp(self):
     nr = \
@@ -159,6 +185,63 @@ class Nbconvert_execute_test2(unittest.TestCase):
         singularity_image_path=self.image_path,
         dry_run=True)
     self.assertTrue('--bind {0}:{1}'.format(nr.temp_dir,nr.container_dir_prefix) in run_cmd)
+    self.assertTrue(
+      '--bind {0}:/tmp/input_A:ro'.\
+        format(os.path.realpath(os.path.join(self.temp_dir,'input_A'))) in run_cmd)
+
+  def test_nbconvert_batch_in_singularity(self):
+    notebook_list = [
+      {'template_ipynb_path':self.template_path,
+       'input_param_map':self.input_param_map},
+      {'template_ipynb_path':os.path.join(self.temp_dir,'missing.ipynb'),
+       'input_param_map':self.input_param_map},
+      {'template_ipynb_path':self.template_path,
+       'input_param_map':{'inputB':'B'},
+       'output_dir':os.path.join(self.temp_dir,'sampleC')}]
+    results = \
+      nbconvert_batch_in_singularity(
+        singularity_image_path=self.image_path,
+        notebook_list=notebook_list,
+        output_dir=self.temp_dir,
+        max_workers=2,
+        use_image_cache=False,
+        dry_run=True)
+    self.assertEqual(
+      [result.get('status') for result in results],
+      ['success','failed','success'])
+    self.assertTrue('missing.ipynb' in results[1].get('error'))
+    image_path_list = \
+      [result.get('run_cmd').split()[2]
+         for result in results
+           if result.get('status')=='success']
+    self.assertEqual(image_path_list,[self.image_path,self.image_path])         # image is not staged for dry run
+    self.assertTrue(os.path.exists(os.path.join(self.temp_dir,'0')))
+    self.assertTrue(os.path.exists(os.path.join(self.temp_dir,'sampleC')))
+    self.assertTrue(all([result.get('runtime') >= 0 for result in results]))
+
+  def test_nbconvert_batch_in_singularity_with_image_cache(self):
+    notebook_list = [
+      {'template_ipynb_path':self.template_path,
+       'input_param_map':self.input_param_map},
+      {'template_ipynb_path':self.template_path,
+       'input_param_map':{'inputB':'B'}}]
+    image_cache_dir = os.path.join(self.temp_dir,'image_cache')
+    results = \
+      nbconvert_batch_in_singularity(
+        singularity_image_path=self.image_path,
+        notebook_list=notebook_list,
+        output_dir=self.temp_dir,
+        max_workers=2,
+        use_image_cache=True,
+        image_cache_dir=image_cache_dir,
+        dry_run=True)
+    self.assertEqual(
+      [result.get('status') for result in results],
+      ['success','success'])
+    self.assertEqual(
+      [result.get('run_cmd').split()[2] for result in results],
+      [self.image_path,self.image_path])
+    self.assertFalse(os.path.exists(image_cache_dir))                           # no cache lookup for dry run
 
 
 if __name__=='__main__':
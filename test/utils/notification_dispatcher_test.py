@@ -0,0 +1,204 @@
+import os,json,time,unittest,threading
+from http.server import HTTPServer
+from igf_data.utils.fileutils import get_temp_dir,remove_dir
+from igf_data.task_tracking.igf_asana import IGF_asana
+from igf_data.task_tracking.notification_dispatcher import Notification_dispatcher
+from test.utils.igf_asana_test import _Fake_asana_handler
+
+class _Stub_slack:
+  '''
+  A stub slack client, which fails for the first fail_count requests
+  '''
+  def __init__(self,fail_count=0,delay=0):
+    self.fail_count = fail_count
+    self.delay = delay
+    self.messages = list()
+    self.files = list()
+
+  def post_message_to_channel(self,message,reaction=''):
+    time.sleep(self.delay)
+    if self.fail_count > 0:
+      self.fail_count -= 1
+      return {'ok':False,'error':'ratelimited'}
+    self.messages.append(message)
+    return {'ok':True}
+
+  def post_file_to_channel(self,filepath,message=None):
+    self.files.append(filepath)
+
+
+class Notification_dispatcher_test1(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir = get_temp_dir()
+    os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'                             # fake server is http only
+    self.server = HTTPServer(('127.0.0.1',0),_Fake_asana_handler)
+    self.server.requests = list()
+    self.server.stories = list()
+    self.server.attachments = list()
+    self.server.tasks = [
+      {'gid':str(1000 + i),'name':'IGFP000{0}'.format(i)}
+        for i in range(5)]
+    self.server_thread = \
+      threading.Thread(target=self.server.serve_forever,daemon=True)
+    self.server_thread.start()
+    asana_config = os.path.join(self.temp_dir,'asana_config.json')
+    with open(asana_config,'w') as fp:
+      json.dump({
+        'asana_personal_token':'test_token',
+        'asana_base_url':'http://127.0.0.1:{0}'.format(self.server.server_port)},fp)
+    cache_file = os.path.join(self.temp_dir,'asana_task_cache.json')
+    self.asana_factory = \
+      lambda: IGF_asana(
+                asana_config=asana_config,
+                asana_project_id='100',
+                task_cache_file=cache_file)
+
+  def tearDown(self):
+    self.server.shutdown()
+    self.server.server_close()
+    remove_dir(self.temp_dir)
+
+  def test_dispatch_with_thread(self):
+    igf_slack = _Stub_slack(fail_count=2)
+    dispatcher = \
+      Notification_dispatcher(
+        igf_slack=igf_slack,
+        igf_asana=self.asana_factory,
+        flush_interval=0.2,
+        min_request_interval=0,
+        retry_delay=0)
+    for i in range(3):
+      dispatcher.post_slack_message('job {0}'.format(i),reaction='pass',group_key='SEQRUN1')
+    dispatcher.post_slack_message('job 3',reaction='fail',group_key='SEQRUN2')
+    for i in range(4):
+      dispatcher.comment_asana_task('IGFP0001','comment {0}'.format(i))
+    report = os.path.join(self.temp_dir,'report.txt')
+    with open(report,'w') as fp:
+      fp.write('report')
+    dispatcher.attach_file_to_asana_task('IGFP0002',report)
+    dispatcher.post_slack_file(report,message='report')
+    os.remove(report)                                                           # queued files are stored by the dispatcher
+    dispatcher.close()
+    self.assertEqual(len(igf_slack.messages),2)                                 # one post per seqrun
+    self.assertEqual(
+      igf_slack.messages[0],
+      ':heavy_check_mark: job 0\n:heavy_check_mark: job 1\n:heavy_check_mark: job 2')
+    self.assertEqual(igf_slack.messages[1],':X: job 3')
+    self.assertEqual(len(self.server.stories),1)
+    self.assertEqual(self.server.stories[0][0],'1001')
+    self.assertTrue('comment 3' in self.server.stories[0][1])
+    self.assertEqual(self.server.attachments,['1002'])
+    self.assertEqual(len(igf_slack.files),1)
+    self.assertEqual(os.path.basename(igf_slack.files[0]),'report.txt')
+    self.assertFalse(os.path.exists(igf_slack.files[0]))                        # stored file removed after upload
+    metrics = dispatcher.get_metrics()
+    self.assertEqual(metrics.get('queued'),10)
+    self.assertEqual(metrics.get('sent'),5)                                     # slack notifications
+    self.assertEqual(metrics.get('coalesced'),2)
+    self.assertEqual(metrics.get('retries'),2)
+    self.assertEqual(metrics.get('dropped'),0)
+    self.assertEqual(metrics.get('queue_depth'),0)
+    asana_metrics = metrics.get('asana_queue')
+    self.assertEqual(asana_metrics.get('comments'),4)
+    self.assertEqual(asana_metrics.get('stories'),1)
+    self.assertEqual(asana_metrics.get('attachments'),1)
+    self.assertEqual(asana_metrics.get('failed'),0)
+    self.assertFalse(dispatcher.post_slack_message('closed'))
+
+  def test_dropped_notifications(self):
+    igf_slack = _Stub_slack(fail_count=10)
+    dispatcher = \
+      Notification_dispatcher(
+        igf_slack=igf_slack,
+        max_retries=2,
+        retry_delay=0,
+        min_request_interval=0,
+        flush_interval=0)
+    dispatcher.post_slack_message('failed message')
+    dispatcher.close()
+    metrics = dispatcher.get_metrics()
+    self.assertEqual(metrics.get('requests'),3)
+    self.assertEqual(metrics.get('dropped'),1)
+    self.assertEqual(len(igf_slack.messages),0)
+    igf_slack = _Stub_slack(delay=1)
+    dispatcher = \
+      Notification_dispatcher(
+        igf_slack=igf_slack,
+        max_queue_size=2,
+        flush_interval=0)
+    accepted = [
+      dispatcher.post_slack_message('message {0}'.format(i))
+        for i in range(6)]
+    self.assertFalse(all(accepted))                                             # queue full, message dropped
+    start_time = time.time()
+    dispatcher.close(timeout=0.2)
+    self.assertTrue(time.time() - start_time < 1)                               # close never waits for slow server
+    metrics = dispatcher.get_metrics()
+    self.assertTrue(metrics.get('dropped') >= accepted.count(False))
+    self.assertTrue(metrics.get('queue_depth') > 0)
+
+  def test_dispatch_with_spool_dir(self):
+    spool_dir = os.path.join(self.temp_dir,'spool')
+    for i in range(3):
+      job_dispatcher = Notification_dispatcher(spool_dir=spool_dir)
+      job_dispatcher.post_slack_message('job {0}'.format(i),group_key='SEQRUN1')
+      job_dispatcher.comment_asana_task('IGFP0003','comment {0}'.format(i))
+      job_dispatcher.close()
+    report = os.path.join(self.temp_dir,'report.txt')
+    with open(report,'w') as fp:
+      fp.write('report')
+    job_dispatcher = Notification_dispatcher(spool_dir=spool_dir)
+    job_dispatcher.attach_file_to_asana_task('IGFP0004',report)
+    os.remove(report)
+    self.assertEqual(len(os.listdir(os.path.join(spool_dir,'files'))),1)
+    self.assertEqual(job_dispatcher.get_queue_depth(),7)
+    self.assertEqual(len(self.server.requests),0)                               # jobs never call the server
+    igf_slack = _Stub_slack(fail_count=10)
+    flusher = \
+      Notification_dispatcher(
+        igf_slack=igf_slack,
+        igf_asana=self.asana_factory,
+        spool_dir=spool_dir,
+        min_request_interval=0,
+        max_retries=0)
+    counts = flusher.flush_spool_dir()
+    self.assertEqual(counts,{'sent':4,'dropped':0,'pending':3})                 # slack messages kept for next flush
+    self.assertEqual(self.server.attachments,['1004'])
+    self.assertEqual(os.listdir(os.path.join(spool_dir,'files')),[])            # stored file removed after upload
+    self.assertEqual(len(self.server.stories),1)
+    self.assertEqual(self.server.stories[0][1],'comment 0\n\ncomment 1\n\ncomment 2')
+    igf_slack.fail_count = 0
+    counts = flusher.flush_spool_dir()
+    self.assertEqual(counts,{'sent':3,'dropped':0,'pending':0})
+    self.assertEqual(igf_slack.messages,['job 0\njob 1\njob 2'])
+    self.assertEqual(flusher.get_queue_depth(),0)
+    job_dispatcher = Notification_dispatcher(spool_dir=spool_dir)
+    job_dispatcher.post_slack_message('old message')
+    flusher.max_message_age = 0
+    igf_slack.fail_count = 10
+    counts = flusher.flush_spool_dir()
+    self.assertEqual(counts,{'sent':0,'dropped':1,'pending':0})
+
+  def test_dispatch_with_rate_limit(self):
+    igf_slack = _Stub_slack(fail_count=1)
+    dispatcher = \
+      Notification_dispatcher(
+        igf_slack=igf_slack,
+        igf_asana=self.asana_factory,
+        flush_interval=0,
+        retry_delay=0,
+        min_request_interval=0.2)
+    start_time = time.time()
+    dispatcher.post_slack_message('job 0')
+    dispatcher.comment_asana_task('IGFP0001','comment 0')
+    dispatcher.close()
+    self.assertTrue(time.time() - start_time >= 0.2)                            # wait before the slack retry
+    metrics = dispatcher.get_metrics()
+    self.assertEqual(metrics.get('requests'),2)
+    self.assertEqual(metrics.get('sent'),1)
+    self.assertEqual(metrics.get('asana_queue').get('stories'),1)
+    self.assertEqual(igf_slack.messages,['job 0'])
+    self.assertEqual(len(self.server.stories),1)
+
+if __name__=='__main__':
+  unittest.main()
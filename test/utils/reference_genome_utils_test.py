@@ -5,6 +5,8 @@ from igf_data.igfdb.baseadaptor import BaseAdaptor
 from igf_data.igfdb.fileadaptor import FileAdaptor
 from igf_data.igfdb.collectionadaptor import CollectionAdaptor
 from igf_data.igfdb.igfTables import Base,File,Collection,Collection_group
+from igf_data.utils.fileutils import get_temp_dir,remove_dir
+from igf_data.utils.tools import reference_genome_utils
 from igf_data.utils.tools.reference_genome_utils import Reference_genome_utils
 
 class Reference_genome_utils_test1(unittest.TestCase):
@@ -112,6 +114,46 @@ class Reference_genome_utils_test1(unittest.TestCase):
     file=rf.get_genome_fasta(check_missing=False)
     self.assertEqual(file,None)
 
+  def test_reference_files_cache(self):
+    temp_dir = get_temp_dir()
+    reference_genome_utils._reference_files_cache.clear()
+    rf = \
+      Reference_genome_utils(
+        genome_tag=self.species_name,
+        dbsession_class=self.session_class,
+        cache_ttl=3600,
+        cache_dir=temp_dir)
+    self.assertEqual(rf.get_genome_fasta(),'/path/HG38/fasta')
+    self.assertEqual(rf.get_genome_bwa(),'/path/HG38/bwa')
+    self.assertEqual(len(os.listdir(temp_dir)),1)                               # on-disk cache entry
+    base = BaseAdaptor(**{'session_class':self.session_class})
+    base.start_session()
+    ca = CollectionAdaptor(**{'session':base.session})
+    ca.load_file_and_create_collection(
+      data=[{'name':self.species_name,'type':'GENE_GTF','file_path':'/path/HG38/gtf'}],
+      calculate_file_size_and_md5=False)
+    base.close_session()
+    rf = \
+      Reference_genome_utils(
+        genome_tag=self.species_name,
+        dbsession_class=self.session_class,
+        cache_ttl=3600,
+        cache_dir=temp_dir)
+    self.assertEqual(rf.get_gene_gtf(check_missing=False),None)                # cached within ttl
+    reference_genome_utils._reference_files_cache.clear()
+    rf = \
+      Reference_genome_utils(
+        genome_tag=self.species_name,
+        dbsession_class=self.session_class,
+        cache_ttl=1e-6,
+        cache_dir=temp_dir)
+    self.assertEqual(rf.get_gene_gtf(),'/path/HG38/gtf')                        # new version stamp
+    rf = \
+      Reference_genome_utils(
+        genome_tag=self.species_name,
+        dbsession_class=self.session_class)
+    self.assertEqual(rf.get_gene_gtf(),'/path/HG38/gtf')
+    remove_dir(temp_dir)
 
 if __name__=='__main__':
   unittest.main()
\ No newline at end of file
@@ -2,6 +2,7 @@ import os,unittest
 from igf_data.utils.fileutils import get_temp_dir,remove_dir
 from igf_data.utils.tools.samtools_utils import _parse_samtools_stats_output,convert_bam_to_cram,filter_bam_file
 from igf_data.utils.tools.samtools_utils import run_bam_flagstat,run_bam_idxstat,run_sort_bam,merge_multiple_bam,index_bam_or_cram
+from igf_data.utils.tools.samtools_utils import run_bam_qc_metrics,format_samtools_qc_metrics
 
 class Samtools_util_test1(unittest.TestCase):
   def test_parse_samtools_stats_output(self):
@@ -188,5 +189,80 @@ class Samtools_util_test2(unittest.TestCase):
     self.assertTrue('-@1' in samtools_cmd)
     self.assertTrue(self.input_bam in samtools_cmd)
 
+class Samtools_util_test3(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir = get_temp_dir()
+    self.samtools_exe = os.path.join(self.temp_dir,'samtools')
+    metrics_dir = os.path.abspath('data/samtools_metrics')
+    with open (self.samtools_exe,'w') as fp:
+      fp.write('#!/bin/sh\ncat {0}/test.$1.txt\n'.format(metrics_dir))          # replay samtools output from test files
+    os.chmod(self.samtools_exe,0o755)
+    self.input_bam = os.path.join(self.temp_dir,'input.bam')
+    with open (self.input_bam,'w') as fp:
+      fp.write('1')
+
+    with open (os.path.join(self.temp_dir,'input.bam.bai'),'w') as fp:
+      fp.write('1')
+
+  def tearDown(self):
+    remove_dir(self.temp_dir)
+
+  def test_run_bam_qc_metrics(self):
+    qc_cmds = \
+      run_bam_qc_metrics(
+        samtools_exe=self.samtools_exe,
+        bam_file=self.input_bam,
+        output_dir=self.temp_dir,
+        output_prefix='test',
+        dry_run=True)
+    self.assertEqual(list(qc_cmds.keys()),['stats','flagstat','idxstats'])
+    self.assertTrue('flagstat' in qc_cmds.get('flagstat'))
+    qc_results = \
+      run_bam_qc_metrics(
+        samtools_exe=self.samtools_exe,
+        bam_file=self.input_bam,
+        output_dir=self.temp_dir,
+        output_prefix='test',
+        force=True)
+    for qc_command in ('stats','flagstat','idxstats'):
+      self.assertTrue(os.path.exists(qc_results.get(qc_command).get('output_path')))
+    self.assertEqual(len(qc_results.get('stats').get('metrics')),38)
+    self.assertEqual(
+      qc_results.get('flagstat').get('metrics').get('mapped').get('qc_passed'),
+      160190290)
+    metrics_list = format_samtools_qc_metrics(qc_results)
+    metrics = dict()
+    for entry in metrics_list:
+      metrics.update(entry)
+    self.assertEqual(metrics.get('SAMTOOLS_STATS_reads_mapped'),'160190290')
+    self.assertEqual(metrics.get('SAMTOOLS_FLAGSTAT_mapped'),'160190290')
+    self.assertEqual(metrics.get('SAMTOOLS_FLAGSTAT_mapped_qc_failed'),'0')
+    self.assertEqual(metrics.get('SAMTOOLS_IDXSTATS_total_mapped'),'26996112')
+    with self.assertRaises(ValueError):
+      run_bam_qc_metrics(
+        samtools_exe=self.samtools_exe,
+        bam_file=self.input_bam,
+        output_dir=self.temp_dir,
+        qc_commands=['depth'],
+        dry_run=True)
+
+  def test_run_bam_qc_metrics_index_check(self):
+    os.remove(os.path.join(self.temp_dir,'input.bam.bai'))
+    samtools_log = os.path.join(self.temp_dir,'samtools.log')
+    with open (self.samtools_exe,'w') as fp:
+      fp.write('#!/bin/sh\necho $1 >> {0}\n'.format(samtools_log))
+      fp.write('[ "$1" = "index" ] && exit 0\n')                                # index file is never created
+      fp.write('cat {0}/test.$1.txt\n'.format(os.path.abspath('data/samtools_metrics')))
+    run_bam_qc_metrics(
+      samtools_exe=self.samtools_exe,
+      bam_file=self.input_bam,
+      output_dir=self.temp_dir,
+      output_prefix='test',
+      force=True)
+    with open(samtools_log,'r') as fp:
+      samtools_cmds = [line.strip() for line in fp]
+    self.assertEqual(samtools_cmds.count('index'),1)                            # one shared index check
+    self.assertEqual(len(samtools_cmds),4)
+
 if __name__=='__main__':
   unittest.main()
\ No newline at end of file
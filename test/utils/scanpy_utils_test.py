@@ -0,0 +1,86 @@
+import os,gzip,unittest
+import numpy as np
+from igf_data.utils.fileutils import get_temp_dir,remove_dir
+try:
+  import scanpy
+  from igf_data.utils.tools.scanpy_utils import Scanpy_tool
+except ImportError:
+  scanpy=None                                                                   # scanpy is optional for tests
+
+@unittest.skipUnless(scanpy,'scanpy is required for the low memory mode test')
+class Scanpy_tool_test1(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir = get_temp_dir()
+    self.matrix_file = os.path.join(self.temp_dir,'matrix.mtx.gz')
+    self.features_tsv = os.path.join(self.temp_dir,'features.tsv.gz')
+    self.barcode_tsv = os.path.join(self.temp_dir,'barcodes.tsv.gz')
+    matrix = [
+      (1,1,50),(2,1,40),(3,1,30),(4,1,1),(6,1,100),
+      (1,2,20),(4,2,10),
+      (2,3,30),(3,3,20),(5,3,1),
+      (5,4,5),
+      (1,5,60),(2,5,10),(4,5,2)]                                                # GENE5 is only in two cells before the cell filter
+    with gzip.open(self.matrix_file,'wt') as fp:
+      fp.write('%%MatrixMarket matrix coordinate integer general\n')
+      fp.write('6 5 {0}\n'.format(len(matrix)))
+      for entry in matrix:
+        fp.write('{0} {1} {2}\n'.format(*entry))
+    with gzip.open(self.features_tsv,'wt') as fp:
+      for gene_name in ('GENE1','GENE2','GENE3','MT-ND1','GENE5'):
+        fp.write('ENSG_{0}\t{0}\tGene Expression\n'.format(gene_name))
+      fp.write('AB1\tAB1\tAntibody Capture\n')
+    with gzip.open(self.barcode_tsv,'wt') as fp:
+      for i in range(1,6):
+        fp.write('CELL{0}-1\n'.format(i))
+    self.scanpy_tool = \
+      Scanpy_tool(
+        project_name='ProjectA',
+        sample_name='SampleA',
+        matrix_file=self.matrix_file,
+        features_tsv=self.features_tsv,
+        barcode_tsv=self.barcode_tsv,
+        output_file=os.path.join(self.temp_dir,'report.html'),
+        html_template_file=os.path.join(self.temp_dir,'template.html'),
+        species_name='hsapiens',
+        min_gene_count=2,
+        min_cell_count=2,
+        low_memory=True,
+        mtx_chunk_size=4)
+    self.cwd = os.getcwd()
+    os.chdir(self.scanpy_tool.work_dir)                                         # read_10x_mtx cache dir
+
+  def tearDown(self):
+    os.chdir(self.cwd)
+    remove_dir(self.scanpy_tool.work_dir)
+    remove_dir(self.temp_dir)
+
+  def test_read_filtered_data_low_memory(self):
+    mt_genes = {'MT-ND1'}
+    adata,qc_adata = \
+      self.scanpy_tool._read_filtered_data_low_memory(
+        matrix_file=self.matrix_file,
+        features_tsv=self.features_tsv,
+        barcode_tsv=self.barcode_tsv,
+        mt_genes=mt_genes)
+    default_adata = \
+      self.scanpy_tool._filter_data(
+        adata=self.scanpy_tool._read_data(input_dir=self.temp_dir),
+        mt_genes=mt_genes)
+    self.assertEqual(list(qc_adata.obs_names),list(default_adata.obs_names))
+    for column in ('n_genes','n_counts','percent_mito'):
+      self.assertTrue(
+        np.allclose(
+          qc_adata.obs[column].values.astype(float),
+          default_adata.obs[column].values.astype(float)))
+    default_adata = self.scanpy_tool._filter_cells_by_qc(default_adata)
+    self.assertEqual(list(adata.obs_names),['CELL1-1','CELL3-1','CELL5-1'])
+    self.assertEqual(list(adata.obs_names),list(default_adata.obs_names))
+    self.assertEqual(list(adata.var_names),['GENE1','GENE2','GENE3','MT-ND1'])  # no GENE5 and AB1
+    self.assertEqual(list(adata.var_names),list(default_adata.var_names))
+    self.assertTrue(
+      np.allclose(
+        adata.X.toarray(),
+        default_adata.X.toarray()))
+
+if __name__ == '__main__':
+  unittest.main()
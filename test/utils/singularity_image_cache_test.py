@@ -0,0 +1,117 @@
+import os,unittest,time
+from concurrent.futures import ThreadPoolExecutor
+from igf_data.utils.fileutils import get_temp_dir,remove_dir
+from igf_data.utils.singularity_image_cache import Singularity_image_cache
+
+class Singularity_image_cache_test1(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir = get_temp_dir()
+    self.cache_dir = os.path.join(self.temp_dir,'cache')
+    self.image_list = list()
+    for image_name in ('imageA.sif','imageB.sif','imageC.sif'):
+      image_path = os.path.join(self.temp_dir,image_name)
+      with open(image_path,'w') as fp:
+        fp.write('a'*100)
+      self.image_list.append(image_path)
+
+  def tearDown(self):
+    remove_dir(self.temp_dir)
+
+  def test_fetch_image(self):
+    image_cache = \
+      Singularity_image_cache(cache_dir=self.cache_dir)
+    cached_path1 = image_cache.fetch_image(self.image_list[0])
+    cached_path2 = image_cache.fetch_image(self.image_list[0])
+    self.assertEqual(cached_path1,cached_path2)
+    self.assertTrue(cached_path1.startswith(self.cache_dir))
+    self.assertEqual(os.path.basename(cached_path1),'imageA.sif')
+    with open(cached_path1,'r') as fp:
+      self.assertEqual(fp.read(),'a'*100)
+    metrics = image_cache.get_metrics()
+    self.assertEqual(metrics.get('misses'),1)
+    self.assertEqual(metrics.get('hits'),1)
+    self.assertEqual(metrics.get('cache_size'),100)
+    with open(self.image_list[0],'w') as fp:
+      fp.write('b'*200)
+    os.utime(self.image_list[0],(time.time()+10,time.time()+10))
+    cached_path3 = image_cache.fetch_image(self.image_list[0])
+    self.assertNotEqual(cached_path1,cached_path3)                              # new key for modified image
+    with open(cached_path3,'r') as fp:
+      self.assertEqual(fp.read(),'b'*200)
+
+  def test_evict_images(self):
+    image_cache = \
+      Singularity_image_cache(
+        cache_dir=self.cache_dir,
+        max_cache_size=250)
+    cached_list = list()
+    for image_path in self.image_list:
+      cached_list.append(image_cache.fetch_image(image_path))
+      time.sleep(0.01)
+    self.assertFalse(os.path.exists(cached_list[0]))                            # least recently used image removed
+    self.assertFalse(
+      os.path.exists('{0}.lock'.format(os.path.dirname(cached_list[0]))))       # lock file removed with the entry
+    self.assertTrue(
+      os.path.exists('{0}.lock'.format(os.path.dirname(cached_list[1]))))
+    self.assertTrue(os.path.exists(cached_list[1]))
+    self.assertTrue(os.path.exists(cached_list[2]))
+    metrics = image_cache.get_metrics()
+    self.assertEqual(metrics.get('evictions'),1)
+    self.assertEqual(metrics.get('cache_size'),200)
+
+  def test_cached_image_in_use(self):
+    image_cache = \
+      Singularity_image_cache(
+        cache_dir=self.cache_dir,
+        max_cache_size=150)
+    with image_cache.cached_image(self.image_list[0]) as cached_path1:
+      cached_path2 = image_cache.fetch_image(self.image_list[1])
+      self.assertTrue(os.path.exists(cached_path1))                             # locked image is not removed
+      self.assertTrue(os.path.exists(cached_path2))
+    image_cache.evict_images()
+    self.assertFalse(os.path.exists(cached_path1))
+    self.assertTrue(os.path.exists(cached_path2))
+
+  def test_concurrent_fetch_image(self):
+    cache_list = [
+      Singularity_image_cache(cache_dir=self.cache_dir)
+        for _ in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+      cached_paths = \
+        list(executor.map(
+          lambda x: x.fetch_image(self.image_list[0]),
+          cache_list))
+    self.assertEqual(len(set(cached_paths)),1)
+    self.assertEqual(sum([c.metrics.get('misses') for c in cache_list]),1)
+    self.assertEqual(
+      len(os.listdir(os.path.dirname(cached_paths[0]))),1)                      # no temp file left in cache
+
+  def test_cache_dir_settings(self):
+    image_cache = \
+      Singularity_image_cache(cache_dir=self.cache_dir)
+    cached_path = image_cache.get_cached_image_path(self.image_list[0])
+    self.assertTrue(cached_path.startswith(self.cache_dir))
+    self.assertFalse(os.path.exists(self.cache_dir))                            # no dir for path lookup
+    self.assertEqual(image_cache.get_metrics().get('cache_size'),0)
+    env_backup = \
+      {key:os.environ.get(key)
+         for key in ('SINGULARITY_IMAGE_CACHE_DIR','EPHEMERAL')}
+    try:
+      os.environ.pop('SINGULARITY_IMAGE_CACHE_DIR',None)
+      os.environ['EPHEMERAL'] = self.temp_dir
+      self.assertEqual(
+        Singularity_image_cache.get_default_cache_dir(use_ephemeral_space=True),
+        os.path.join(self.temp_dir,'singularity_image_cache'))
+      os.environ['SINGULARITY_IMAGE_CACHE_DIR'] = self.cache_dir
+      self.assertEqual(
+        Singularity_image_cache.get_default_cache_dir(use_ephemeral_space=True),
+        self.cache_dir)
+    finally:
+      for key,value in env_backup.items():
+        if value is None:
+          os.environ.pop(key,None)
+        else:
+          os.environ[key] = value
+
+if __name__=='__main__':
+  unittest.main()
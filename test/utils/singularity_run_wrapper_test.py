@@ -1,6 +1,7 @@
 import os,unittest
 from igf_data.utils.fileutils import get_temp_dir,remove_dir
 from igf_data.utils.singularity_run_wrapper import singularity_run
+from igf_data.utils.singularity_image_cache import Singularity_image_cache
 
 class Singularity_run_test1(unittest.TestCase):
   def setUp(self):
@@ -23,5 +24,41 @@ class Singularity_run_test1(unittest.TestCase):
                        format(os.path.basename(self.image_path),self.temp_dir) \
                        in singularity_cmd)
 
+  def test_singularity_dry_run_without_side_effects(self):
+    cache_dir = os.path.join(self.temp_dir,'cache')
+    _,singularity_cmd = \
+      singularity_run(
+        image_path=self.image_path,
+        path_bind=self.temp_dir,
+        args_list=['ls'],
+        use_image_cache=True,
+        image_cache_dir=cache_dir,
+        dry_run=True)
+    self.assertTrue(singularity_cmd.startswith('singularity run {0}'.format(cache_dir)))
+    self.assertFalse(os.path.exists(cache_dir))                                 # dry run never creates the cache dir
+    _,singularity_cmd = \
+      singularity_run(
+        image_path=self.image_path,
+        path_bind=self.temp_dir,
+        args_list=['ls'],
+        dry_run=True)
+    self.assertTrue(singularity_cmd.startswith('singularity run {0}'.format(self.image_path)))
+    self.assertEqual(os.listdir(self.temp_dir),['image.sif'])                   # no cache or image copy by default
+
+  def test_singularity_run_with_image_cache(self):
+    cache_dir = os.path.join(self.temp_dir,'cache')
+    image_cache = Singularity_image_cache(cache_dir=cache_dir)
+    _,singularity_cmd = \
+      singularity_run(
+        image_path=self.image_path,
+        path_bind=self.temp_dir,
+        args_list=['ls'],
+        image_cache=image_cache,
+        dry_run=True)
+    self.assertTrue(
+      singularity_cmd.startswith(
+        'singularity run {0}'.format(image_cache.get_cached_image_path(self.image_path))))
+    self.assertFalse(os.path.exists(cache_dir))
+
 if __name__=='__main__':
   unittest.main()
\ No newline at end of file